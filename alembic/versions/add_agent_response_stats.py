@@ -0,0 +1,48 @@
+"""Add agent_response_stats table for response-time SLAs
+
+Revision ID: add_agent_response_stats
+Revises: add_metric_rollups
+Create Date: 2026-10-16 16:00:00
+
+Filled by services/agent_response_stats_service on startup and then
+periodically.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_agent_response_stats'
+down_revision: Union[str, None] = 'add_metric_rollups'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'agent_response_stats',
+        sa.Column('scope', sa.String(length=20), nullable=False),
+        sa.Column('scope_key', sa.String(length=255), nullable=False),
+        sa.Column('agent_id', sa.String(), nullable=True),
+        sa.Column('center_id', sa.String(), nullable=True),
+        sa.Column('organization_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('window_days', sa.Integer(), nullable=False),
+        sa.Column('responses', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('first_responses', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('avg_seconds', sa.Float(), nullable=True),
+        sa.Column('p50_seconds', sa.Float(), nullable=True),
+        sa.Column('p90_seconds', sa.Float(), nullable=True),
+        sa.Column('p99_seconds', sa.Float(), nullable=True),
+        sa.Column('first_p50_seconds', sa.Float(), nullable=True),
+        sa.Column('first_p90_seconds', sa.Float(), nullable=True),
+        sa.Column('first_p99_seconds', sa.Float(), nullable=True),
+        sa.Column('refreshed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('scope', 'scope_key', name='agent_response_stats_pk'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('agent_response_stats')
@@ -0,0 +1,83 @@
+"""Add conversation_summaries table for the inbox list
+
+Revision ID: add_conversation_summaries
+Revises: add_message_lookup_indexes
+Create Date: 2026-10-16 11:00:00
+
+Backfills one row per customer from the latest message and latest inbox
+flow step. Unread counts start at 0 (they were only kept in Redis).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_conversation_summaries'
+down_revision: Union[str, None] = 'add_message_lookup_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'conversation_summaries',
+        sa.Column('customer_id', postgresql.UUID(as_uuid=True),
+                  sa.ForeignKey('customers.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('wa_id', sa.String(), nullable=False, unique=True),
+        sa.Column('organization_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('assigned_user_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('last_message_id', sa.Integer(), nullable=True),
+        sa.Column('last_message_body', sa.String(), nullable=True),
+        sa.Column('last_message_at', sa.DateTime(), nullable=True),
+        sa.Column('last_message_from', sa.String(), nullable=True),
+        sa.Column('last_message_to', sa.String(), nullable=True),
+        sa.Column('last_message_direction', sa.String(length=10), nullable=True),
+        sa.Column('unread_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_flow_step', sa.String(length=100), nullable=True),
+        sa.Column('last_flow_description', sa.Text(), nullable=True),
+        sa.Column('last_flow_at', sa.DateTime(), nullable=True),
+        sa.Column('sort_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_conversation_summaries_org_sort', 'conversation_summaries',
+                    ['organization_id', 'sort_at', 'customer_id'])
+    op.create_index('ix_conversation_summaries_user_sort', 'conversation_summaries',
+                    ['assigned_user_id', 'sort_at', 'customer_id'])
+    op.create_index('ix_conversation_summaries_sort', 'conversation_summaries', ['sort_at', 'customer_id'])
+
+    op.execute("""
+        INSERT INTO conversation_summaries (
+            customer_id, wa_id, organization_id, assigned_user_id,
+            last_message_id, last_message_body, last_message_at, last_message_from, last_message_to,
+            last_message_direction, unread_count, last_flow_step, last_flow_description, last_flow_at,
+            sort_at, updated_at
+        )
+        SELECT c.id, c.wa_id, c.organization_id, c.user_id,
+               m.id, m.body, m.timestamp, m.from_wa_id, m.to_wa_id,
+               CASE WHEN m.id IS NULL THEN NULL
+                    WHEN m.sender_type = 'customer' THEN 'inbound' ELSE 'outbound' END,
+               0, f.step, f.description, f.created_at,
+               COALESCE(m.timestamp, c.last_message_at, c.created_at, now()), now()
+        FROM customers c
+        LEFT JOIN LATERAL (
+            SELECT id, body, timestamp, from_wa_id, to_wa_id, sender_type
+            FROM messages WHERE customer_id = c.id
+            ORDER BY timestamp DESC, id DESC LIMIT 1
+        ) m ON true
+        LEFT JOIN LATERAL (
+            SELECT step, description, created_at
+            FROM flow_logs
+            WHERE wa_id = c.wa_id
+              AND step IN ('entry', 'city_selection', 'treatment', 'concern_list', 'last_step')
+            ORDER BY created_at DESC LIMIT 1
+        ) f ON true
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_conversation_summaries_sort', table_name='conversation_summaries')
+    op.drop_index('ix_conversation_summaries_user_sort', table_name='conversation_summaries')
+    op.drop_index('ix_conversation_summaries_org_sort', table_name='conversation_summaries')
+    op.drop_table('conversation_summaries')
@@ -0,0 +1,28 @@
+"""Add customers.followup_lease_until for the lease-based follow-up scheduler
+
+Revision ID: add_customer_followup_lease
+Revises: add_agent_response_stats
+Create Date: 2026-10-16 17:00:00
+
+Set by claim_due_followups while an instance processes a due follow-up,
+cleared when it is done.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_customer_followup_lease'
+down_revision: Union[str, None] = 'add_agent_response_stats'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('customers', sa.Column('followup_lease_until', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('customers', 'followup_lease_until')
@@ -0,0 +1,38 @@
+"""Add keyword_tags array to messages
+
+Revision ID: add_message_keyword_tags
+Revises: add_zoho_lead_outbox
+Create Date: 2026-10-16 14:00:00
+
+Tags are filled in for new customer messages on insert. Existing rows are
+tagged by the startup backfill in services/message_tag_service. The GIN
+index is built CONCURRENTLY so messages stays writable.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_message_keyword_tags'
+down_revision: Union[str, None] = 'add_zoho_lead_outbox'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('keyword_tags', postgresql.ARRAY(sa.String()), nullable=True))
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_messages_keyword_tags', 'messages', ['keyword_tags'],
+            postgresql_using='gin', postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_messages_keyword_tags', table_name='messages', postgresql_concurrently=True, if_exists=True)
+    op.drop_column('messages', 'keyword_tags')
@@ -0,0 +1,76 @@
+"""Add lookup indexes to messages for webhook dedup and chat pagination
+
+Revision ID: add_message_lookup_indexes
+Revises: b9be422245eb
+Create Date: 2026-10-16 10:00:00
+
+Duplicate WhatsApp message ids (from Meta webhook retries) are moved to
+messages_duplicate_archive first, keeping the earliest row in messages, so the
+unique index can be built; downgrade moves them back. Indexes are built
+CONCURRENTLY so the messages table stays writable during the migration.
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_message_lookup_indexes'
+down_revision: Union[str, None] = 'b9be422245eb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _message_columns() -> str:
+    names = [c['name'] for c in sa.inspect(op.get_bind()).get_columns('messages')]
+    return ", ".join(f'"{name}"' for name in names)
+
+
+def upgrade() -> None:
+    op.execute("CREATE TABLE IF NOT EXISTS messages_duplicate_archive (LIKE messages)")
+    op.execute("ALTER TABLE messages_duplicate_archive ADD COLUMN IF NOT EXISTS archived_at timestamp DEFAULT now()")
+    columns = _message_columns()
+    op.execute(f"""
+        INSERT INTO messages_duplicate_archive ({columns})
+        SELECT {columns}
+        FROM messages m
+        WHERE m.message_id IS NOT NULL AND m.message_id <> ''
+          AND EXISTS (SELECT 1 FROM messages d WHERE d.message_id = m.message_id AND d.id < m.id)
+    """)
+    op.execute("DELETE FROM messages m USING messages_duplicate_archive a WHERE m.id = a.id")
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ux_messages_message_id', 'messages', ['message_id'], unique=True,
+            postgresql_where="message_id IS NOT NULL AND message_id <> ''",
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_messages_customer_timestamp_id', 'messages', ['customer_id', 'timestamp', 'id'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_messages_from_wa_id_timestamp', 'messages', ['from_wa_id', 'timestamp'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_messages_to_wa_id_timestamp', 'messages', ['to_wa_id', 'timestamp'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_messages_to_wa_id_timestamp', table_name='messages', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_messages_from_wa_id_timestamp', table_name='messages', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_messages_customer_timestamp_id', table_name='messages', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ux_messages_message_id', table_name='messages', postgresql_concurrently=True, if_exists=True)
+
+    columns = _message_columns()
+    op.execute(f"""
+        INSERT INTO messages ({columns})
+        SELECT {columns} FROM messages_duplicate_archive
+        ON CONFLICT (id) DO NOTHING
+    """)
+    op.execute("DROP TABLE IF EXISTS messages_duplicate_archive")
@@ -0,0 +1,83 @@
+"""Add metric_rollups table for dashboard counters
+
+Revision ID: add_metric_rollups
+Revises: add_message_keyword_tags
+Create Date: 2026-10-16 15:00:00
+
+Backfills hourly counts for every metric from the source tables; afterwards
+services/metric_rollup_service keeps recent hours current. Timestamp indexes
+used by the aggregator's range scans are built CONCURRENTLY.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_metric_rollups'
+down_revision: Union[str, None] = 'add_message_keyword_tags'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NO_ORG = "00000000-0000-0000-0000-000000000000"
+
+# Snapshot of services/metric_rollup_service.METRIC_SOURCES for ROLLUP_METRICS
+# (appointments are counted live, see LIVE_METRICS)
+METRIC_SOURCES = {
+    "messages": ("messages m LEFT JOIN customers c ON c.id = m.customer_id", "m.timestamp", "c.organization_id", ""),
+    "customers": ("customers c", "c.created_at", "c.organization_id", ""),
+    "leads": ("leads l LEFT JOIN customers c ON c.wa_id = l.wa_id", "l.created_at", "c.organization_id", ""),
+    "campaigns": ("campaigns cp LEFT JOIN users u ON u.id = cp.created_by", "cp.created_at", "u.organization_id", ""),
+    "orders": ("orders o LEFT JOIN customers c ON c.id = o.customer_id", "o.timestamp", "c.organization_id", ""),
+    "flow_completions": (
+        "flow_logs f LEFT JOIN customers c ON c.wa_id = f.wa_id", "f.created_at", "c.organization_id",
+        "AND f.step = 'result' AND f.status_code = 200",
+    ),
+}
+
+
+def upgrade() -> None:
+    op.create_table(
+        'metric_rollups',
+        sa.Column('metric', sa.String(length=50), nullable=False),
+        sa.Column('org_key', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('count', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('metric', 'org_key', 'bucket_start', name='metric_rollups_pk'),
+    )
+    op.create_index('ix_metric_rollups_metric_bucket', 'metric_rollups', ['metric', 'bucket_start'])
+
+    for metric, (source, ts, org, extra) in METRIC_SOURCES.items():
+        op.execute(f"""
+            INSERT INTO metric_rollups (metric, org_key, bucket_start, count, updated_at)
+            SELECT '{metric}', COALESCE({org}, '{NO_ORG}'::uuid), date_trunc('hour', {ts}), count(*), now()
+            FROM {source}
+            WHERE {ts} IS NOT NULL {extra}
+            GROUP BY 2, 3
+        """)
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_messages_timestamp', 'messages', ['timestamp'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_leads_created_at', 'leads', ['created_at'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_referrer_tracking_created_at', 'referrer_tracking', ['created_at'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_referrer_tracking_created_at', table_name='referrer_tracking', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_leads_created_at', table_name='leads', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_messages_timestamp', table_name='messages', postgresql_concurrently=True, if_exists=True)
+    op.drop_index('ix_metric_rollups_metric_bucket', table_name='metric_rollups')
+    op.drop_table('metric_rollups')
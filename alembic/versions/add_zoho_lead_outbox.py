@@ -0,0 +1,52 @@
+"""Add zoho_lead_outbox table for batched Zoho lead pushes
+
+Revision ID: add_zoho_lead_outbox
+Revises: add_conversation_summaries
+Create Date: 2026-10-16 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'add_zoho_lead_outbox'
+down_revision: Union[str, None] = 'add_conversation_summaries'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'zoho_lead_outbox',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('wa_id', sa.String(length=64), nullable=False),
+        sa.Column('customer_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('flow_type', sa.String(length=50), nullable=False, server_default='lead_appointment'),
+        sa.Column('phone_key', sa.String(length=20), nullable=False),
+        sa.Column('lead_source', sa.String(length=100), nullable=True),
+        sa.Column('sub_source', sa.String(length=50), nullable=True),
+        sa.Column('record', postgresql.JSONB(), nullable=False),
+        sa.Column('lead_fields', postgresql.JSONB(), nullable=True),
+        sa.Column('payload_log', postgresql.JSONB(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.Column('locked_at', sa.DateTime(), nullable=True),
+        sa.Column('zoho_lead_id', sa.String(length=100), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_zoho_lead_outbox_wa_id', 'zoho_lead_outbox', ['wa_id'])
+    op.create_index('ix_zoho_lead_outbox_status_next', 'zoho_lead_outbox', ['status', 'next_attempt_at'])
+    op.create_index('ix_zoho_lead_outbox_phone_source', 'zoho_lead_outbox', ['phone_key', 'lead_source', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_zoho_lead_outbox_phone_source', table_name='zoho_lead_outbox')
+    op.drop_index('ix_zoho_lead_outbox_status_next', table_name='zoho_lead_outbox')
+    op.drop_index('ix_zoho_lead_outbox_wa_id', table_name='zoho_lead_outbox')
+    op.drop_table('zoho_lead_outbox')
@@ -68,6 +68,7 @@ from controllers.components.lead_appointment_flow.zoho_lead_api import router as
 from controllers.components.zoho_mapping_controller import router as zoho_mapping_router
 from controllers.followup_debug_controller import router as followup_debug_router
 from controllers.flow_logs_controller import router as flow_logs_router
+from controllers.exports_controller import router as exports_router
 from controllers.analytics_controller import router as analytics_router
 from controllers.quick_reply_controller import router as quick_reply_router
 from controllers.organization_controller import router as organization_router
@@ -79,7 +80,6 @@ from schemas.token_schema import Token
 from automation.controller import router as automation_router
 import asyncio
 from datetime import datetime, timedelta
-from services.followup_service import due_customers_for_followup, FOLLOW_UP_2_TEXT, send_followup1_interactive, send_followup2
 from utils.whatsapp import send_message_to_waid
 
 
@@ -97,6 +97,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 @app.get("/test-this")
@@ -142,6 +143,7 @@ app.include_router(zoho_leads_router)
 app.include_router(zoho_mapping_router, prefix="/zoho-mappings")
 app.include_router(followup_debug_router)  # Debug endpoints for follow-ups
 app.include_router(flow_logs_router)  # Flow logs API
+app.include_router(exports_router)  # Background export jobs
 app.include_router(analytics_router)  # Analytics API
 app.include_router(quick_reply_router)
 app.include_router(organization_router)  # Organizations API
@@ -152,6 +154,14 @@ app.include_router(webhook2_router)  # Second webhook endpoint: POST/GET /webhoo
 
 
 
+@app.on_event("startup")
+def register_conversation_summary_hooks():
+    """Keep conversation_summaries current on ORM writes (before anything writes)."""
+    from services.conversation_summary_service import register_write_hooks
+
+    register_write_hooks()
+
+
 @app.on_event("startup")
 def seed_catalog_on_startup():
     db = SessionLocal()
@@ -165,119 +175,120 @@ def seed_catalog_on_startup():
 
 @app.on_event("startup")
 async def start_followup_scheduler():
-    """Start the follow-up scheduler with distributed locking support."""
-    from services.followup_service import acquire_followup_lock, release_followup_lock
-    
-    async def _runner():
-        scheduler_logger = logging.getLogger("followup_scheduler")
-        iteration = 0
-        while True:
-            db = None
-            try:
-                iteration += 1
-                # Only log every 100 iterations to reduce noise
-                if iteration % 100 == 1:
-                    scheduler_logger.info(f"Follow-up scheduler running (iteration {iteration})")
-                
-                db = SessionLocal()
-                customers = due_customers_for_followup(db)
-                
-                if customers:
-                    scheduler_logger.info(f"Found {len(customers)} customer(s) due for follow-up")
-                # No need to log when no customers are due - reduces noise
-                
-                for c in customers:
-                    lock_value = None
-                    try:
-                        # Acquire distributed lock to prevent duplicate processing
-                        lock_value = acquire_followup_lock(str(c.id))
-                        if lock_value is None:
-                            scheduler_logger.info(f"Skipping customer {c.id} (wa_id: {c.wa_id}) - already being processed")
-                            continue
-                        
-                        scheduler_logger.info(f"Processing follow-up for customer {c.id} (wa_id: {c.wa_id})")
-                        
-                        # Decide which follow-up to send based on last_message_type
-                        if (c.last_message_type or "").lower() == "follow_up_1_sent":
-                            # Only send Follow-Up 2 if NO replies since Follow-Up 1
-                            # infer follow-up 1 sent time as next_followup_time - FOLLOW_UP_2_DELAY_MINUTES
-                            from services.followup_service import FOLLOW_UP_2_DELAY_MINUTES
-                            fu1_sent_at = (c.next_followup_time - timedelta(minutes=FOLLOW_UP_2_DELAY_MINUTES)) if c.next_followup_time else None
-                            if fu1_sent_at and c.last_interaction_time and c.last_interaction_time >= fu1_sent_at:
-                                # user replied after Follow-Up 1; skip Follow-Up 2
-                                c.next_followup_time = None
-                                db.add(c)
-                                db.commit()
-                                scheduler_logger.info(f"Customer {c.wa_id} replied after Follow-Up 1, skipping Follow-Up 2")
-                                continue
-                            
-                            # Send Follow-Up 2 and create a lead with available details
-                            await send_followup2(db, wa_id=c.wa_id)
-                            
-                            # Create lead with available details
-                            try:
-                                from services import customer_service
-                                customer = customer_service.get_customer_record_by_wa_id(db, c.wa_id)
-                            except Exception as e:
-                                scheduler_logger.warning(f"Could not get customer record: {e}")
-                                customer = c
-                            
-                            try:
-                                from controllers.components.lead_appointment_flow.zoho_integration import trigger_zoho_lead_creation
-                                await trigger_zoho_lead_creation(db, wa_id=c.wa_id, customer=customer, lead_status="CALL_INITIATED")
-                            except Exception as e:
-                                scheduler_logger.warning(f"Could not create Zoho lead: {e}")
-                        else:
-                            # Before sending Follow-Up 1, double-check that user hasn't replied recently
-                            # This ensures we only send if 2 minutes have truly passed since last interaction
-                            from services.followup_service import FOLLOW_UP_1_DELAY_MINUTES
-                            db.refresh(c)  # Refresh to get latest state
-                            
-                            if c.last_interaction_time:
-                                time_since_last_interaction = (datetime.utcnow() - c.last_interaction_time).total_seconds() / 60
-                                if time_since_last_interaction < FOLLOW_UP_1_DELAY_MINUTES:
-                                    # User interacted less than 2 minutes ago, skip this follow-up
-                                    scheduler_logger.info(f"Skipping Follow-Up 1 for customer {c.wa_id} - user interacted {time_since_last_interaction:.1f} minutes ago (less than {FOLLOW_UP_1_DELAY_MINUTES} min)")
-                                    c.next_followup_time = None
-                                    db.add(c)
-                                    db.commit()
-                                    continue
-                            
-                            # Send Follow-Up 1 (interactive Yes/No) and schedule Follow-Up 2
-                            await send_followup1_interactive(db, wa_id=c.wa_id)
-                            # send_followup1_interactive already schedules Follow-Up 2 and sets label
-                        
-                        db.add(c)
-                        db.commit()
-                        scheduler_logger.info(f"Successfully processed follow-up for customer {c.wa_id}")
-                        
-                    except Exception as e:
-                        scheduler_logger.error(f"Failed to process follow-up for customer {c.id if c else 'unknown'}: {e}", exc_info=True)
-                        if db:
-                            db.rollback()
-                    finally:
-                        # Always release the lock
-                        if lock_value and c:
-                            release_followup_lock(str(c.id), lock_value)
-                
-                if db:
-                    db.close()
-                    db = None
-                
-                # Wait 30 seconds before next iteration
-                await asyncio.sleep(30)
-                
-            except Exception as e:
-                scheduler_logger.error(f"Critical error in scheduler: {e}", exc_info=True)
-                if db:
-                    try:
-                        db.close()
-                    except:
-                        pass
-                    db = None
-                # Wait before retrying after error
-                await asyncio.sleep(30)
-
-    # Start follow-up scheduler silently
-    asyncio.create_task(_runner())
+    """Start the lease-based follow-up scheduler (safe to run on every instance)."""
+    from marketing.services.followup_scheduler import start_followup_scheduler as _start
+
+    await _start()
+
+
+@app.on_event("shutdown")
+async def stop_followup_scheduler():
+    from marketing.services.followup_scheduler import stop_followup_scheduler as _stop
+
+    await _stop()
+
+
+@app.on_event("shutdown")
+async def close_whatsapp_client():
+    """Drain the pooled Graph API connections."""
+    from utils.whatsapp_client import whatsapp_client
+
+    await whatsapp_client.aclose()
+
+
+@app.on_event("startup")
+async def start_webhook_workers():
+    """Consume queued /webhook events when WEBHOOK_INGEST_MODE=queue."""
+    from services.webhook_ingest import start_webhook_workers as _start
+
+    await _start()
+
+
+@app.on_event("shutdown")
+async def stop_webhook_workers():
+    from services.webhook_ingest import stop_webhook_workers as _stop
+
+    await _stop()
+
+
+@app.on_event("startup")
+async def start_zoho_lead_pusher():
+    """Push queued Zoho leads in batches (ZOHO_LEAD_PUSH_MODE=outbox)."""
+    from services.zoho_lead_outbox import start_zoho_lead_pusher as _start
+
+    await _start()
+
+
+@app.on_event("shutdown")
+async def stop_zoho_lead_pusher():
+    from services.zoho_lead_outbox import stop_zoho_lead_pusher as _stop
+
+    await _stop()
+
+
+@app.on_event("startup")
+async def start_message_tag_backfill():
+    """Re-tag customer messages in the background when the keyword set changes."""
+    from services.message_tag_service import start_message_tag_backfill as _start
+
+    _start()
+
+
+@app.on_event("startup")
+async def start_ws_bridge():
+    """Relay WebSocket broadcasts between workers over Redis pub/sub."""
+    from utils.ws_manager import manager as ws_manager
+
+    ws_manager.start_bridge()
+
+
+@app.on_event("shutdown")
+async def stop_ws_bridge():
+    from utils.ws_manager import manager as ws_manager
+
+    ws_manager.stop_bridge()
+
+
+@app.on_event("startup")
+async def start_metric_rollups():
+    """Keep the dashboard metric rollups current."""
+    from services.metric_rollup_service import start_metric_rollups as _start
+
+    await _start()
+
+
+@app.on_event("shutdown")
+async def stop_metric_rollups():
+    from services.metric_rollup_service import stop_metric_rollups as _stop
+
+    await _stop()
+
+
+@app.on_event("startup")
+async def start_agent_response_stats():
+    """Refresh agent response-time SLAs periodically."""
+    from services.agent_response_stats_service import start_agent_response_stats as _start
+
+    await _start()
+
+
+@app.on_event("shutdown")
+async def stop_agent_response_stats():
+    from services.agent_response_stats_service import stop_agent_response_stats as _stop
+
+    await _stop()
+
+
+@app.on_event("startup")
+async def start_flow_log_writer():
+    """Batch FlowLog inserts off the request path."""
+    from utils.flow_log import start_flow_log_writer as _start
+
+    await _start()
+
+
+@app.on_event("shutdown")
+async def stop_flow_log_writer():
+    from utils.flow_log import stop_flow_log_writer as _stop
 
+    await _stop()
@@ -8,6 +8,7 @@ from database.db import get_db
 from services.crud import get_user_by_username
 from models.models import User
 from utils.utils import verify_password
+from cache.auth_cache import AuthPrincipal, get_principal, put_principal
 
 import os
 from dotenv import load_dotenv
@@ -41,6 +42,8 @@ def authenticate_user(db: Session, username: str, password: str):
 
 
 # -- Get current user from token --
+# Returns a cached AuthPrincipal snapshot (see cache/auth_cache.py), not a
+# session-bound User; load the User when relationships are needed.
 
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
@@ -56,13 +59,18 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
 
+    principal = get_principal(str(user_id))
+    if principal is not None:
+        return principal
+
     user = db.query(User).options(
-        joinedload(User.role_obj),
-        joinedload(User.organization)
+        joinedload(User.role_obj)
     ).filter(User.id == user_id).first()
     if user is None:
         raise credentials_exception
-    return user
+    principal = AuthPrincipal.from_user(user)
+    put_principal(str(user_id), principal)
+    return principal
 
 
 # -- Role-based access control --
@@ -0,0 +1,127 @@
+"""
+Cache of authenticated principals for auth.get_current_user.
+
+get_current_user used to load the User with its role and organisation on
+every request. The fields handlers actually read (id, names, legacy role,
+role_obj.name, organization_id, ...) are now snapshotted into an
+AuthPrincipal and kept in a bounded in-process LRU keyed by the token
+subject. Entries live for AUTH_CACHE_TTL_SECONDS, so a cache hit costs a
+dict lookup.
+
+Invalidation: the user, organisation and role write endpoints call
+invalidate_user() / invalidate_organization(). These drop the local entries
+and bump a generation counter in Redis (cache.versioned_snapshot.RedisVersion).
+Each process checks that counter at most every AUTH_CACHE_SYNC_SECONDS and
+clears its cache when it has moved, so other workers see the change within a
+few seconds. Without Redis only the TTL applies there.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional, Tuple
+
+from cache.versioned_snapshot import RedisVersion
+
+logger = logging.getLogger(__name__)
+
+AUTH_CACHE_ENABLED = os.getenv("AUTH_CACHE_ENABLED", "true").lower() == "true"
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "5000"))
+AUTH_CACHE_SYNC_SECONDS = float(os.getenv("AUTH_CACHE_SYNC_SECONDS", "5"))
+
+_GENERATION_KEY = "auth_cache:generation"
+
+
+@dataclass(frozen=True)
+class CachedRole:
+    id: Any
+    name: str
+    display_name: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class AuthPrincipal:
+    """Read-only snapshot of the authenticated User (what handlers use of it)."""
+
+    id: Any
+    username: str
+    first_name: str
+    last_name: str
+    email: str
+    phone_number: str
+    role: Any
+    organization_id: Any
+    role_id: Any
+    role_obj: Optional[CachedRole]
+
+    @classmethod
+    def from_user(cls, user) -> "AuthPrincipal":
+        role = user.role_obj
+        return cls(
+            id=user.id,
+            username=user.username,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            email=user.email,
+            phone_number=user.phone_number,
+            role=user.role,
+            organization_id=user.organization_id,
+            role_id=user.role_id,
+            role_obj=CachedRole(id=role.id, name=role.name, display_name=role.display_name) if role else None,
+        )
+
+
+_entries: "OrderedDict[str, Tuple[AuthPrincipal, float]]" = OrderedDict()
+_lock = threading.Lock()
+_generation = RedisVersion(_GENERATION_KEY, AUTH_CACHE_SYNC_SECONDS, "Auth cache")
+
+
+def get_principal(subject: str) -> Optional[AuthPrincipal]:
+    if not AUTH_CACHE_ENABLED:
+        return None
+    now = time.monotonic()
+    changed = _generation.changed(now)
+    with _lock:
+        if changed:
+            _entries.clear()  # another process has invalidated entries
+        entry = _entries.get(subject)
+        if entry is None:
+            return None
+        if entry[1] <= now:
+            del _entries[subject]
+            return None
+        _entries.move_to_end(subject)
+        return entry[0]
+
+
+def put_principal(subject: str, principal: AuthPrincipal) -> None:
+    if not AUTH_CACHE_ENABLED:
+        return
+    with _lock:
+        _entries[subject] = (principal, time.monotonic() + AUTH_CACHE_TTL_SECONDS)
+        _entries.move_to_end(subject)
+        while len(_entries) > AUTH_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+
+def invalidate_user(user_id) -> None:
+    with _lock:
+        _entries.pop(str(user_id), None)
+    _generation.bump()
+
+
+def invalidate_organization(organization_id) -> None:
+    with _lock:
+        for subject in [s for s, (p, _) in _entries.items() if str(p.organization_id) == str(organization_id)]:
+            del _entries[subject]
+    _generation.bump()
+
+
+def invalidate_all() -> None:
+    with _lock:
+        _entries.clear()
+    _generation.bump()
@@ -0,0 +1,103 @@
+"""
+Process-local snapshots kept in step across processes by a Redis counter.
+
+Several read-mostly tables are loaded once per process and served from
+memory (services.number_registry, services.catalog_cache, cache.auth_cache).
+They share one freshness scheme:
+
+- RedisVersion: invalidating bumps a counter in Redis (INCR). Each process
+  reads the counter at most every sync_seconds and sees a change when it has
+  moved since its last read. Without Redis only local invalidation applies.
+  services.whatsapp_service uses one on its own for the cached DB token.
+- VersionedSnapshot: a RedisVersion plus the loaded object. It is reloaded
+  (by one thread) when it was invalidated here, when the counter moved, or
+  after max_age_seconds, to pick up rows changed outside the API. A failed
+  load leaves it stale so the next read retries.
+"""
+
+import time
+import logging
+import threading
+from typing import Callable, Generic, Optional, TypeVar
+
+from cache.redis_connection import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class RedisVersion:
+    """Cross-process invalidation counter stored at `key`."""
+
+    def __init__(self, key: str, sync_seconds: float, label: str):
+        self.key = key
+        self.sync_seconds = sync_seconds
+        self.label = label
+        self._version: Optional[str] = None
+        self._next_sync = 0.0
+
+    def changed(self, now: float) -> bool:
+        """True when the counter moved since the last check (checked at most every sync_seconds)."""
+        if now < self._next_sync:
+            return False
+        self._next_sync = now + self.sync_seconds
+        redis_client = get_redis_client()
+        if not redis_client:
+            return False
+        try:
+            version = redis_client.get(self.key)
+        except Exception as e:
+            logger.debug(f"{self.label} version check failed: {e}")
+            return False
+        if version == self._version:
+            return False
+        self._version = version
+        return True
+
+    def bump(self) -> None:
+        redis_client = get_redis_client()
+        if not redis_client:
+            return
+        try:
+            redis_client.incr(self.key)
+        except Exception as e:
+            logger.warning(f"{self.label} invalidation not propagated: {e}")
+
+
+class VersionedSnapshot(Generic[T]):
+    """An object built by `load()`, reloaded when invalidated or older than max_age_seconds."""
+
+    def __init__(self, load: Callable[[], T], *, version_key: str, sync_seconds: float,
+                 max_age_seconds: float, label: str):
+        self._load = load
+        self._version = RedisVersion(version_key, sync_seconds, label)
+        self.max_age_seconds = max_age_seconds
+        self._snapshot: Optional[T] = None
+        self._loaded_at = 0.0
+        self._stale = True
+        self._lock = threading.Lock()
+
+    def _needs_load(self, now: float) -> bool:
+        return self._snapshot is None or self._stale or now - self._loaded_at >= self.max_age_seconds
+
+    def get(self) -> T:
+        now = time.monotonic()
+        if self._version.changed(now):
+            self._stale = True
+        if self._needs_load(now):
+            with self._lock:
+                if self._needs_load(now):
+                    self._stale = False
+                    try:
+                        self._snapshot = self._load()
+                    except Exception:
+                        self._stale = True
+                        raise
+                    self._loaded_at = time.monotonic()
+        return self._snapshot
+
+    def invalidate(self) -> None:
+        """Reload here on the next read, and tell the other processes to do the same."""
+        self._stale = True
+        self._version.bump()
@@ -16,14 +16,16 @@ import time
 import json
 import logging
 from datetime import datetime
-from uuid import UUID
+from uuid import UUID, uuid4
 from contextlib import contextmanager
 
 import requests
 import pika
+from psycopg2.extras import execute_values, Json
 from sqlalchemy.orm import Session
 
 from controllers.whatsapp_controller import WHATSAPP_API_URL
+from utils.rate_limiter import get_whatsapp_rate_limiter
 from database.db import SessionLocal
 from models.models import (
     JobStatus, Campaign, Job, Customer, CampaignRecipient, CampaignLog, WhatsAppAPILog, Message
@@ -31,6 +33,7 @@ from models.models import (
 from services import whatsapp_service
 from services import message_service
 from services import customer_service
+from services.conversation_summary_service import record_messages
 from schemas.message_schema import MessageCreate
 from schemas.customer_schema import CustomerCreate
 import os
@@ -45,20 +48,12 @@ logger = logging.getLogger(__name__)
 # =============================================================================
 # Rate Limiting Configuration - Meta WhatsApp API Limits
 # =============================================================================
-# Meta allows MAX 80 messages/second for WhatsApp Business API
-# Formula: RATE_LIMIT_DELAY_MS = 1000 / (80 / NUM_WORKERS)
-#
-# Examples:
-#   - 1 worker:  1000 / 80 = 12.5ms  -> use 15ms (safe margin)
-#   - 2 workers: 1000 / 40 = 25ms
-#   - 4 workers: 1000 / 20 = 50ms
-#   - 8 workers: 1000 / 10 = 100ms
+# Meta allows MAX 80 messages/second per phone_number_id. Every send reserves
+# a token from a bucket shared by all workers (Redis-backed, see
+# utils/rate_limiter.py), so throughput no longer depends on how many workers
+# are running. Tune with WHATSAPP_MAX_MSG_PER_SECOND if Meta raises the tier.
 # =============================================================================
-META_MAX_MSG_PER_SECOND = 80
-DEFAULT_NUM_WORKERS = 4  # Adjust based on how many workers you run
-
-# Calculate delay per worker to stay within Meta's limit
-RATE_LIMIT_DELAY_MS = max(15, int(1000 / (META_MAX_MSG_PER_SECOND / DEFAULT_NUM_WORKERS)))  # 50ms for 4 workers
+CAMPAIGN_PHONE_NUMBER_ID = WHATSAPP_API_URL.rstrip("/").split("/")[-2]
 
 MAX_RETRIES = 3
 RETRY_DELAY_SECONDS = 2  # Faster retries
@@ -230,6 +225,12 @@ def upsert_campaign_log(
         db.rollback()
 
 
+def _sanitize_headers(request_headers: dict) -> dict:
+    safe_headers = {k: v for k, v in (request_headers or {}).items() if k.lower() != 'authorization'}
+    safe_headers['authorization'] = 'Bearer ***REDACTED***'
+    return safe_headers
+
+
 def log_whatsapp_api_call(
     db: Session,
     campaign_id,
@@ -251,8 +252,7 @@ def log_whatsapp_api_call(
     """Log WhatsApp API request and response for debugging"""
     try:
         # Sanitize headers (remove auth token for security)
-        safe_headers = {k: v for k, v in (request_headers or {}).items() if k.lower() != 'authorization'}
-        safe_headers['authorization'] = 'Bearer ***REDACTED***'
+        safe_headers = _sanitize_headers(request_headers)
 
         log_entry = WhatsAppAPILog(
             campaign_id=campaign_id,
@@ -279,13 +279,374 @@ def log_whatsapp_api_call(
         db.rollback()
 
 
+# =============================================================================
+# Batched (write-behind) persistence
+# =============================================================================
+# The async consumer collects send outcomes and persists them here in one
+# transaction per batch instead of ~5 round trips + 2 commits per message.
+
+def _json(value):
+    return Json(value) if value is not None else None
+
+
+def flush_campaign_outcomes(db: Session, outcomes: list):
+    """
+    Persist a batch of send outcomes with set-based statements:
+
+    - campaign_logs: one UPDATE ... FROM (VALUES ...) for rows created at
+      queue time, one multi-row INSERT for the rest
+    - job_status / campaign_recipients: one UPDATE ... FROM (VALUES ...) each
+    - jobs / campaigns: one UPDATE each for last_triggered_time / last_job_id
+    - whatsapp_api_logs: one multi-row INSERT
+    - messages (successful template sends): one multi-row INSERT plus a
+      customers.last_message_at UPDATE
+
+    Each outcome is a dict with the same fields record_delivery_outcome() and
+    log_whatsapp_api_call() take. Commits once; raises on failure so the caller
+    can keep the batch unacknowledged.
+    """
+    if not outcomes:
+        return
+
+    now = datetime.utcnow()
+    # A redelivered message can appear twice in a batch; keep the latest result
+    latest = {}
+    for o in outcomes:
+        latest[(o["job_id"], o["target_id"])] = o
+    rows = list(latest.values())
+    page_size = len(rows)
+
+    cur = db.connection().connection.cursor()
+    try:
+        # --- campaign_logs: update rows created at queue time -----------------
+        log_values = [
+            (
+                str(o["job_id"]), str(o["target_id"]), o["status"], o.get("error_code"),
+                o.get("error_message"), o.get("http_status_code"), o.get("whatsapp_message_id"),
+                _json(o.get("request_payload")), _json(o.get("response_data")),
+                o.get("processing_time_ms"), now if o["status"] in ("success", "failure") else None, now,
+            )
+            for o in rows
+        ]
+        updated = execute_values(cur, """
+            UPDATE campaign_logs AS cl SET
+                status = v.status,
+                error_code = v.error_code,
+                error_message = v.error_message,
+                http_status_code = v.http_status_code,
+                whatsapp_message_id = v.whatsapp_message_id,
+                request_payload = v.request_payload,
+                response_data = v.response_data,
+                processing_time_ms = v.processing_time_ms,
+                processed_at = v.processed_at,
+                retry_count = COALESCE(cl.retry_count, 0) + 1,
+                last_retry_at = v.last_retry_at
+            FROM (VALUES %s) AS v(job_id, target_id, status, error_code, error_message,
+                                  http_status_code, whatsapp_message_id, request_payload,
+                                  response_data, processing_time_ms, processed_at, last_retry_at)
+            WHERE cl.job_id = v.job_id AND cl.target_id = v.target_id
+            RETURNING cl.job_id::text, cl.target_id::text
+        """,
+            log_values,
+            template="(%s::uuid, %s::uuid, %s, %s, %s, %s::int, %s, %s::jsonb, %s::jsonb, %s::int, %s::timestamp, %s::timestamp)",
+            page_size=page_size,
+            fetch=True,
+        )
+        updated_keys = {(job_id, target_id) for job_id, target_id in updated}
+
+        # --- campaign_logs: insert rows that were never queued ---------------
+        missing = [o for o in rows if (str(o["job_id"]), str(o["target_id"])) not in updated_keys]
+        if missing:
+            execute_values(cur, """
+                INSERT INTO campaign_logs (
+                    id, campaign_id, job_id, target_type, target_id, phone_number, status,
+                    error_code, error_message, http_status_code, whatsapp_message_id,
+                    request_payload, response_data, processing_time_ms, created_at,
+                    processed_at, retry_count
+                ) VALUES %s
+            """, [
+                (
+                    str(uuid4()), str(o["campaign_id"]), str(o["job_id"]), o["target_type"],
+                    str(o["target_id"]), o.get("wa_id") or "unknown", o["status"],
+                    o.get("error_code"), o.get("error_message"), o.get("http_status_code"),
+                    o.get("whatsapp_message_id"), _json(o.get("request_payload")),
+                    _json(o.get("response_data")), o.get("processing_time_ms"), now,
+                    now if o["status"] in ("success", "failure") else None, 0,
+                )
+                for o in missing
+            ], page_size=page_size)
+
+        # --- job_status / campaign_recipients ---------------------------------
+        customer_rows = [(str(o["job_id"]), str(o["target_id"]), o["status"])
+                         for o in rows if o["target_type"] == "customer"]
+        if customer_rows:
+            execute_values(cur, """
+                UPDATE job_status AS js SET status = v.status::job_status_enum
+                FROM (VALUES %s) AS v(job_id, customer_id, status)
+                WHERE js.job_id = v.job_id AND js.customer_id = v.customer_id
+            """, customer_rows, template="(%s::uuid, %s::uuid, %s)", page_size=page_size)
+
+        recipient_rows = [(str(o["target_id"]), "SENT" if o["status"] == "success" else "FAILED")
+                          for o in rows if o["target_type"] == "recipient"]
+        if recipient_rows:
+            execute_values(cur, """
+                UPDATE campaign_recipients AS cr SET status = v.status
+                FROM (VALUES %s) AS v(id, status)
+                WHERE cr.id = v.id
+            """, recipient_rows, template="(%s::uuid, %s)", page_size=page_size)
+
+        # --- job and campaign timestamps --------------------------------------
+        job_ids = sorted({str(o["job_id"]) for o in rows})
+        cur.execute("UPDATE jobs SET last_triggered_time = %s WHERE id = ANY(%s::uuid[])", (now, job_ids))
+        last_job_by_campaign = {str(o["campaign_id"]): str(o["job_id"]) for o in rows}
+        execute_values(cur, """
+            UPDATE campaigns AS c SET last_job_id = v.job_id
+            FROM (VALUES %s) AS v(id, job_id)
+            WHERE c.id = v.id
+        """, list(last_job_by_campaign.items()), template="(%s::uuid, %s::uuid)")
+
+        # --- whatsapp_api_logs --------------------------------------------------
+        api_rows = [
+            (
+                str(uuid4()), str(o["campaign_id"]), str(o["job_id"]), o.get("wa_id"), o.get("request_url"),
+                _json(o.get("request_payload")), _json(_sanitize_headers(o.get("request_headers"))),
+                o.get("http_status_code"), _json(o.get("response_data")),
+                _json(dict(o["response_headers"]) if o.get("response_headers") else None),
+                o.get("whatsapp_message_id"), o.get("error_code"), o.get("error_message"),
+                o.get("request_time"), o.get("response_time"), o.get("duration_ms"), now,
+            )
+            for o in outcomes if o.get("request_url")
+        ]
+        if api_rows:
+            execute_values(cur, """
+                INSERT INTO whatsapp_api_logs (
+                    id, campaign_id, job_id, phone_number, request_url, request_payload,
+                    request_headers, response_status_code, response_body, response_headers,
+                    whatsapp_message_id, error_code, error_message, request_time,
+                    response_time, duration_ms, created_at
+                ) VALUES %s
+            """, api_rows, page_size=len(api_rows))
+    finally:
+        cur.close()
+
+    db.commit()
+    logger.info(f"📝 Flushed {len(rows)} campaign outcome(s) ({len(updated_keys)} updated, {len(missing)} created)")
+
+    # --- conversation view: template messages for successful sends ------------
+    conversation_rows = [o for o in rows
+                         if o["status"] == "success" and o.get("campaign_type") == "template" and o.get("wa_id")]
+    if conversation_rows:
+        try:
+            _insert_campaign_messages(db, conversation_rows, now)
+            db.commit()
+        except Exception as msg_err:
+            # Don't fail the campaign if message save fails
+            logger.error(f"Failed to save campaign messages to conversation: {msg_err}")
+            db.rollback()
+
+
+def _insert_campaign_messages(db: Session, rows: list, now: datetime):
+    """Bulk version of the conversation-message save in record_delivery_outcome()."""
+    wa_ids = sorted({o["wa_id"] for o in rows})
+    customer_ids = {
+        wa_id: customer_id
+        for wa_id, customer_id in db.query(Customer.wa_id, Customer.id).filter(Customer.wa_id.in_(wa_ids))
+    }
+    # New customers are rare (mostly Excel recipients seen for the first time); reuse the ORM path
+    for o in rows:
+        if o["wa_id"] not in customer_ids:
+            customer = customer_service.get_or_create_customer(
+                db, CustomerCreate(wa_id=o["wa_id"], name=o.get("target_name") or "")
+            )
+            customer_ids[o["wa_id"]] = customer.id
+
+    from_wa_id = os.getenv("WHATSAPP_DISPLAY_NUMBER", "917729992376")
+    cur = db.connection().connection.cursor()
+    try:
+        inserted = execute_values(cur, """
+            INSERT INTO messages (message_id, from_wa_id, to_wa_id, type, body, timestamp,
+                                  customer_id, agent_id, sender_type)
+            VALUES %s
+            ON CONFLICT (message_id) WHERE message_id IS NOT NULL AND message_id <> '' DO NOTHING
+            RETURNING id, customer_id, body, timestamp, from_wa_id, to_wa_id, sender_type
+        """, [
+            (
+                o.get("whatsapp_message_id") or f"campaign_{o['campaign_id']}_{o['wa_id']}_{int(time.time())}",
+                from_wa_id, o["wa_id"], "template", f"📋 {o.get('template_name') or 'Template'}",
+                now, str(customer_ids[o["wa_id"]]), None, "agent",
+            )
+            for o in rows
+        ], page_size=len(rows), fetch=True)
+        execute_values(cur, """
+            UPDATE customers AS c SET last_message_at = v.ts
+            FROM (VALUES %s) AS v(id, ts)
+            WHERE c.id = v.id
+        """, [(str(cid), now) for cid in {customer_ids[o["wa_id"]] for o in rows}],
+            template="(%s::uuid, %s::timestamp)")
+    finally:
+        cur.close()
+    # Raw SQL bypasses the ORM hooks that keep the inbox summaries current
+    columns = ("id", "customer_id", "body", "timestamp", "from_wa_id", "to_wa_id", "sender_type")
+    record_messages(db.connection(), [dict(zip(columns, row)) for row in inserted])
+
+
+def build_campaign_payload(campaign: Campaign, target, target_type: str, wa_id: str) -> dict:
+    """Build the WhatsApp API payload for one campaign target."""
+    if campaign.type == "template":
+        if target_type == "recipient":
+            recipient_params = target.params if target.params else {}
+            try:
+                if not isinstance(recipient_params, dict):
+                    try:
+                        recipient_params = json.loads(recipient_params) if isinstance(recipient_params, str) else {}
+                    except:
+                        recipient_params = {}
+
+                recipient_dict = {
+                    "phone_number": target.phone_number,
+                    "name": target.name,
+                    "params": recipient_params
+                }
+
+                logger.debug(f"🔍 Building payload for recipient {target.phone_number}: params keys={list(recipient_params.keys())}")
+
+                payload = whatsapp_service.build_template_payload_for_recipient(
+                    recipient_dict, campaign.content
+                )
+
+                if 'template' in payload and 'components' in payload['template']:
+                    components = payload['template']['components']
+                    button_comp = next((c for c in components if c.get('type') == 'button'), None)
+                    if button_comp and isinstance(button_comp.get('index'), str):
+                        logger.error(f"⚠️ Button index is still a STRING for {target.phone_number}. This will cause (#131008) error.")
+            except Exception as payload_err:
+                import traceback
+                logger.error(f"❌ Failed to build payload for recipient {target.id}: {payload_err}")
+                logger.error(f"   Traceback: {traceback.format_exc()}")
+                logger.error(f"   Recipient params: {recipient_params}")
+                raise  # Re-raise to be caught by outer exception handler
+        else:
+            customer_dict = {
+                "wa_id": target.wa_id,
+                "name": target.name or ""
+            }
+            payload = whatsapp_service.build_template_payload(
+                customer_dict, campaign.content
+            )
+    else:
+        payload = {
+            "messaging_product": "whatsapp",
+            "to": wa_id,
+            "recipient_type": "individual",
+            "type": campaign.type,
+            campaign.type: campaign.content,
+        }
+
+    logger.debug(f"   Full payload for {wa_id}: {json.dumps(payload)}")
+    return payload
+
+
+def record_delivery_outcome(
+    db: Session,
+    campaign_id: UUID,
+    job_id: UUID,
+    target_type: str,
+    target_id: UUID,
+    wa_id: str,
+    status: str,
+    error_code: str = None,
+    error_message: str = None,
+    http_status_code: int = None,
+    whatsapp_message_id: str = None,
+    request_payload: dict = None,
+    response_data: dict = None,
+    processing_time_ms: int = None
+):
+    """
+    Persist the result of one send: job/recipient status, job and campaign
+    timestamps, the campaign log, and (on success) the conversation message.
+    """
+    job = db.get(Job, job_id)
+    campaign = db.get(Campaign, campaign_id)
+    target = db.get(CampaignRecipient if target_type == "recipient" else Customer, target_id)
+
+    if target_type == "customer":
+        job_status = db.query(JobStatus).filter_by(
+            job_id=job_id, customer_id=target_id
+        ).first()
+        if job_status:
+            job_status.status = status
+
+    if target_type == "recipient" and target:
+        target.status = "SENT" if status == "success" else "FAILED"
+
+    # Update job and campaign timestamps
+    if job:
+        job.last_triggered_time = datetime.utcnow()
+    if campaign:
+        campaign.last_job_id = job_id
+
+    # Upsert detailed log entry (update if exists, create if not)
+    upsert_campaign_log(
+        db=db,
+        campaign_id=campaign_id,
+        job_id=job_id,
+        target_type=target_type,
+        target_id=target_id,
+        phone_number=wa_id or "unknown",
+        status=status,
+        error_code=error_code,
+        error_message=error_message,
+        http_status_code=http_status_code,
+        whatsapp_message_id=whatsapp_message_id,
+        request_payload=request_payload,
+        response_data=response_data,
+        processing_time_ms=processing_time_ms
+    )
+
+    # Save campaign message to Message table for conversation view (only on success)
+    if status == "success" and campaign and campaign.type == "template" and wa_id:
+        try:
+            # Get or create customer
+            customer = customer_service.get_or_create_customer(
+                db, CustomerCreate(wa_id=wa_id, name=getattr(target, "name", None) or "")
+            )
+
+            # Get business number (from_wa_id) - default to env or common number
+            from_wa_id = os.getenv("WHATSAPP_DISPLAY_NUMBER", "917729992376")
+
+            # Format template message body for display - show only template name
+            template_name = campaign.content.get("name", "Template") if isinstance(campaign.content, dict) else "Template"
+            template_body = f"📋 {template_name}"
+
+            # Create message entry
+            message_data = MessageCreate(
+                message_id=whatsapp_message_id or f"campaign_{campaign_id}_{wa_id}_{int(time.time())}",
+                from_wa_id=from_wa_id,
+                to_wa_id=wa_id,
+                type="template",
+                body=template_body,
+                timestamp=datetime.utcnow(),
+                customer_id=customer.id,
+                agent_id=None,  # Campaign messages are system-sent
+                sender_type="agent",  # Show as agent message (right side)
+            )
+            message_service.create_message(db, message_data)
+            logger.info(f"💬 Saved campaign template message to conversation for {wa_id}")
+        except Exception as msg_err:
+            # Don't fail the campaign if message save fails
+            logger.error(f"Failed to save campaign message to conversation: {msg_err}")
+
+    db.commit()
+
+
 def callback(ch, method, properties, body):
     """
     Process a single message from the queue.
     FIXES:
     - Proper DB session management with context manager
     - Detailed error logging
-    - Rate limiting
+    - Rate limiting (shared token bucket per phone_number_id)
     - Token refresh
     """
     delivery_tag = method.delivery_tag
@@ -324,8 +685,7 @@ def callback(ch, method, properties, body):
             campaign_id_uuid = parse_uuid(campaign_id)
             target_id_uuid = parse_uuid(target_id)
 
-            # Load job and campaign
-            job = db.query(Job).filter_by(id=job_id_uuid).first()
+            # Load campaign
             campaign = db.query(Campaign).filter_by(id=campaign_id_uuid).first()
 
             if not campaign:
@@ -384,88 +744,12 @@ def callback(ch, method, properties, body):
                 "Content-Type": "application/json"
             }
 
-            # Build payload based on campaign type
-            if campaign.type == "template":
-                if target_type == "recipient":
-                    try:
-                        recipient_params = target.params if target.params else {}
-                        if not isinstance(recipient_params, dict):
-                            try:
-                                recipient_params = json.loads(recipient_params) if isinstance(recipient_params, str) else {}
-                            except:
-                                recipient_params = {}
-
-                        recipient_dict = {
-                            "phone_number": target.phone_number,
-                            "name": target.name,
-                            "params": recipient_params
-                        }
-                        
-                        # DEBUG: Log recipient params before building payload
-                        logger.info(f"🔍 Building payload for recipient {target.phone_number}:")
-                        logger.info(f"   Recipient params keys: {list(recipient_params.keys())}")
-                        logger.info(f"   button_params value: {recipient_params.get('button_params')}")
-                        logger.info(f"   button_index value: {recipient_params.get('button_index')}")
-                        logger.info(f"   body_var_* keys: {[k for k in recipient_params.keys() if k.startswith('body_var_')]}")
-                        logger.info(f"   button_param_* keys: {[k for k in recipient_params.keys() if k.startswith('button_param_')]}")
-                        
-                        payload = whatsapp_service.build_template_payload_for_recipient(
-                            recipient_dict, campaign.content
-                        )
-                        
-                        # DEBUG: Log what was built
-                        if 'template' in payload and 'components' in payload['template']:
-                            components = payload['template']['components']
-                            button_comp = next((c for c in components if c.get('type') == 'button'), None)
-                            if button_comp:
-                                logger.info(f"✅ Button component built: index={button_comp.get('index')}, params={[p.get('text', '')[:50] for p in button_comp.get('parameters', [])]}")
-                            else:
-                                logger.warning(f"⚠️  No button component in payload for {target.phone_number}")
-                    except Exception as payload_err:
-                        import traceback
-                        logger.error(f"❌ Failed to build payload for recipient {target.id}: {payload_err}")
-                        logger.error(f"   Traceback: {traceback.format_exc()}")
-                        logger.error(f"   Recipient params: {recipient_params}")
-                        raise  # Re-raise to be caught by outer exception handler
-                else:
-                    customer_dict = {
-                        "wa_id": target.wa_id,
-                        "name": target.name or ""
-                    }
-                    payload = whatsapp_service.build_template_payload(
-                        customer_dict, campaign.content
-                    )
-            else:
-                payload = {
-                    "messaging_product": "whatsapp",
-                    "to": wa_id,
-                    "recipient_type": "individual",
-                    "type": campaign.type,
-                    campaign.type: campaign.content,
-                }
+            payload = build_campaign_payload(campaign, target, target_type, wa_id)
+
+            # Shared rate limit across all workers for this phone_number_id
+            get_whatsapp_rate_limiter().acquire(CAMPAIGN_PHONE_NUMBER_ID)
 
-            # Rate limiting delay
-            time.sleep(RATE_LIMIT_DELAY_MS / 1000.0)
-
-            # DEBUG: Log the exact payload being sent to WhatsApp
-            import json
-            payload_debug = json.dumps(payload, indent=2)
-            logger.info(f"📤 Sending payload to WhatsApp for {wa_id}:")
-            logger.info(f"   Template: {payload.get('template', {}).get('name', 'N/A')}")
-            if 'template' in payload and 'components' in payload['template']:
-                components = payload['template']['components']
-                logger.info(f"   Components count: {len(components)}")
-                for idx, comp in enumerate(components):
-                    comp_type = comp.get('type', 'unknown')
-                    params = comp.get('parameters', [])
-                    logger.info(f"   Component {idx}: type={comp_type}, params_count={len(params)}")
-                    if comp_type == 'button':
-                        btn_index = comp.get('index')
-                        logger.info(f"      Button index: {btn_index} (type: {type(btn_index).__name__}), sub_type: {comp.get('sub_type')}")
-                        logger.info(f"      Button params: {[p.get('text', '')[:50] for p in params]}")
-                        if isinstance(btn_index, str):
-                            logger.error(f"      ⚠️ WARNING: Button index is still a STRING! Should be integer. This will cause (#131008) error.")
-            logger.debug(f"   Full payload: {payload_debug}")
+            logger.info(f"📤 Sending {campaign.type} to {wa_id} (template: {payload.get('template', {}).get('name', 'N/A')})")
 
             # Get HTTP session with connection pooling
             session = get_http_session()
@@ -570,32 +854,13 @@ def callback(ch, method, properties, body):
 
         # Update DB statuses
         try:
-            if target_type == "customer":
-                job_status = db.query(JobStatus).filter_by(
-                    job_id=job_id_uuid, customer_id=target_id_uuid
-                ).first()
-                if job_status:
-                    job_status.status = status
-
-            if target_type == "recipient":
-                recipient = db.query(CampaignRecipient).filter_by(id=target_id_uuid).first()
-                if recipient:
-                    recipient.status = "SENT" if status == "success" else "FAILED"
-
-            # Update job and campaign timestamps
-            if job:
-                job.last_triggered_time = datetime.utcnow()
-            if campaign:
-                campaign.last_job_id = job_id_uuid
-
-            # Upsert detailed log entry (update if exists, create if not)
-            upsert_campaign_log(
+            record_delivery_outcome(
                 db=db,
                 campaign_id=campaign_id_uuid,
                 job_id=job_id_uuid,
                 target_type=target_type,
                 target_id=target_id_uuid,
-                phone_number=wa_id or "unknown",
+                wa_id=wa_id,
                 status=status,
                 error_code=error_code,
                 error_message=error_message,
@@ -605,41 +870,6 @@ def callback(ch, method, properties, body):
                 response_data=response_data,
                 processing_time_ms=processing_time_ms
             )
-
-            # Save campaign message to Message table for conversation view (only on success)
-            if status == "success" and campaign.type == "template" and wa_id:
-                try:
-                    # Get or create customer
-                    customer = customer_service.get_or_create_customer(
-                        db, CustomerCreate(wa_id=wa_id, name=target.name if hasattr(target, 'name') else "")
-                    )
-                    
-                    # Get business number (from_wa_id) - default to env or common number
-                    from_wa_id = os.getenv("WHATSAPP_DISPLAY_NUMBER", "917729992376")
-                    
-                    # Format template message body for display - show only template name
-                    template_name = campaign.content.get("name", "Template") if isinstance(campaign.content, dict) else "Template"
-                    template_body = f"📋 {template_name}"
-                    
-                    # Create message entry
-                    message_data = MessageCreate(
-                        message_id=whatsapp_message_id or f"campaign_{campaign_id_uuid}_{wa_id}_{int(time.time())}",
-                        from_wa_id=from_wa_id,
-                        to_wa_id=wa_id,
-                        type="template",
-                        body=template_body,
-                        timestamp=datetime.utcnow(),
-                        customer_id=customer.id,
-                        agent_id=None,  # Campaign messages are system-sent
-                        sender_type="agent",  # Show as agent message (right side)
-                    )
-                    message_service.create_message(db, message_data)
-                    logger.info(f"💬 Saved campaign template message to conversation for {wa_id}")
-                except Exception as msg_err:
-                    # Don't fail the campaign if message save fails
-                    logger.error(f"Failed to save campaign message to conversation: {msg_err}")
-
-            db.commit()
             logger.info(f"[{status.upper()}] {target_type}:{wa_id} - {processing_time_ms}ms")
 
         except Exception as e:
@@ -651,7 +881,8 @@ def callback(ch, method, properties, body):
 
 def start_worker(worker_id: int = 1):
     """Start a single RabbitMQ consumer worker"""
-    logger.info(f"🚀 Campaign Worker {worker_id} started — prefetch={PREFETCH_COUNT}, rate_limit={RATE_LIMIT_DELAY_MS}ms")
+    limiter = get_whatsapp_rate_limiter()
+    logger.info(f"🚀 Campaign Worker {worker_id} started — prefetch={PREFETCH_COUNT}, rate_limit={limiter.rate:g} msg/s shared per phone_number_id")
 
     while True:
         try:
@@ -692,16 +923,15 @@ def start_multi_worker(num_workers: int = 4):
     """
     Start multiple consumer workers using threading for high throughput.
 
-    For 50,000 messages with 4 workers:
-    - Each worker: ~33 msg/sec
-    - Total: ~130 msg/sec
-    - Estimated time: ~6-7 minutes
+    Throughput is capped by the shared token bucket (80 msg/s per
+    phone_number_id), not by the number of workers. Threaded workers are
+    blocked on the HTTP round-trip, so for large campaigns prefer the asyncio
+    mode (`python consumer.py --async`), which keeps hundreds of sends in flight.
     """
     import threading
 
     logger.info(f"🚀 Starting {num_workers} campaign workers for high-volume processing...")
-    logger.info(f"   Config: prefetch={PREFETCH_COUNT}, rate_limit={RATE_LIMIT_DELAY_MS}ms/msg")
-    logger.info(f"   Estimated throughput: ~{num_workers * (1000 // RATE_LIMIT_DELAY_MS)} msg/sec")
+    logger.info(f"   Config: prefetch={PREFETCH_COUNT}, rate_limit={get_whatsapp_rate_limiter().rate:g} msg/s (shared)")
 
     threads = []
     for i in range(num_workers):
@@ -721,11 +951,20 @@ def start_multi_worker(num_workers: int = 4):
 if __name__ == "__main__":
     import sys
 
+    from services.conversation_summary_service import register_write_hooks
+    register_write_hooks()
+
     # Parse command line arguments
+    args = sys.argv[1:]
+    if "--async" in args:
+        from async_consumer import run_async_worker
+        run_async_worker()
+        sys.exit(0)
+
     num_workers = 1
-    if len(sys.argv) > 1:
+    if args:
         try:
-            num_workers = int(sys.argv[1])
+            num_workers = int(args[0])
         except ValueError:
             pass
 
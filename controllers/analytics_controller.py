@@ -12,6 +12,8 @@ from sqlalchemy.orm import Session
 from sqlalchemy import func, case, and_, or_, distinct, extract
 
 from database.db import get_db
+from services.metric_rollup_service import count_metric, rebuild_rollups
+from services.agent_response_stats_service import SCOPES as SLA_SCOPES, get_response_stats
 from models.models import (
     Customer, Lead, Campaign, Order, Payment, Message,
     FlowLog, CampaignLog, Job, JobStatus, User, CampaignRecipient
@@ -54,56 +56,31 @@ def get_dashboard_overview(
         dt_from = _parse_date(date_from) if date_from else None
         dt_to = _parse_date(date_to) if date_to else None
 
+        # Counters come from the hourly metric rollups (services/metric_rollup_service)
+        def counts(metric: str, *starts: datetime) -> List[int]:
+            return [count_metric(db, metric, start) for start in starts]
+
         # Customer counts
-        total_customers = db.query(func.count(Customer.id)).scalar() or 0
-        customers_today = db.query(func.count(Customer.id)).filter(
-            Customer.created_at >= today_start
-        ).scalar() or 0
-        customers_this_week = db.query(func.count(Customer.id)).filter(
-            Customer.created_at >= week_start
-        ).scalar() or 0
-        customers_this_month = db.query(func.count(Customer.id)).filter(
-            Customer.created_at >= month_start
-        ).scalar() or 0
+        total_customers, customers_today, customers_this_week, customers_this_month = counts(
+            "customers", None, today_start, week_start, month_start
+        )
 
         # Lead counts
-        total_leads = db.query(func.count(Lead.id)).scalar() or 0
-        leads_today = db.query(func.count(Lead.id)).filter(
-            Lead.created_at >= today_start
-        ).scalar() or 0
-        leads_this_week = db.query(func.count(Lead.id)).filter(
-            Lead.created_at >= week_start
-        ).scalar() or 0
-        leads_this_month = db.query(func.count(Lead.id)).filter(
-            Lead.created_at >= month_start
-        ).scalar() or 0
+        total_leads, leads_today, leads_this_week, leads_this_month = counts(
+            "leads", None, today_start, week_start, month_start
+        )
 
         # Campaign counts
-        total_campaigns = db.query(func.count(Campaign.id)).scalar() or 0
-        campaigns_this_month = db.query(func.count(Campaign.id)).filter(
-            Campaign.created_at >= month_start
-        ).scalar() or 0
+        total_campaigns, campaigns_this_month = counts("campaigns", None, month_start)
 
         # Order counts
-        total_orders = db.query(func.count(Order.id)).scalar() or 0
-        orders_today = db.query(func.count(Order.id)).filter(
-            Order.timestamp >= today_start
-        ).scalar() or 0
+        total_orders, orders_today = counts("orders", None, today_start)
 
         # Message counts
-        total_messages = db.query(func.count(Message.id)).scalar() or 0
-        messages_today = db.query(func.count(Message.id)).filter(
-            Message.timestamp >= today_start
-        ).scalar() or 0
+        total_messages, messages_today = counts("messages", None, today_start)
 
         # Flow completion counts
-        flow_completions_today = db.query(func.count(FlowLog.id)).filter(
-            and_(
-                FlowLog.created_at >= today_start,
-                FlowLog.step == "result",
-                FlowLog.status_code == 200
-            )
-        ).scalar() or 0
+        flow_completions_today = count_metric(db, "flow_completions", today_start)
 
         return {
             "success": True,
@@ -142,6 +119,30 @@ def get_dashboard_overview(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/rollups/rebuild")
+def rebuild_metric_rollups(
+    date_from: Optional[str] = Query(None, description="Start date YYYY-MM-DD (default: oldest row)"),
+    date_to: Optional[str] = Query(None, description="End date YYYY-MM-DD, inclusive (default: now)"),
+    metrics: Optional[str] = Query(None, description="Comma-separated metrics (default: all)"),
+):
+    """Re-aggregate the dashboard metric rollups for a date range (backfills, corrections)."""
+    dt_from = _parse_date(date_from)
+    dt_to = _parse_date(date_to)
+    if (date_from and not dt_from) or (date_to and not dt_to):
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    try:
+        rebuilt = rebuild_rollups(
+            start=datetime.combine(dt_from, datetime.min.time()) if dt_from else None,
+            end=datetime.combine(dt_to + timedelta(days=1), datetime.min.time()) if dt_to else None,
+            metrics=[m.strip() for m in metrics.split(",") if m.strip()] if metrics else None,
+        )
+        return {"success": True, "hours_rebuilt": rebuilt}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ============================================================================
 # CUSTOMER ANALYTICS
 # ============================================================================
@@ -760,6 +761,41 @@ def get_agent_analytics(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/agents/response-times")
+def get_agent_response_times(
+    db: Session = Depends(get_db),
+    scope: str = Query("agent", description="agent, agent_center, center, organization or all"),
+    key: Optional[str] = Query(None, description="Agent id, 'agent|center', center id or organization id"),
+):
+    """
+    Agent response-time SLAs (mean, p50/p90/p99, first-response percentiles).
+    Served from agent_response_stats, refreshed in the background.
+    """
+    if scope not in SLA_SCOPES:
+        raise HTTPException(status_code=400, detail=f"scope must be one of: {', '.join(SLA_SCOPES)}")
+    try:
+        rows = get_response_stats(db, scope, key)
+        if scope in ("agent", "agent_center"):
+            agent_uuids = []
+            for row in rows:
+                try:
+                    agent_uuids.append(UUID(row["agent_id"]))
+                except (TypeError, ValueError):
+                    pass
+            names = {}
+            if agent_uuids:
+                names = {
+                    str(user_id): f"{first_name} {last_name}".strip()
+                    for user_id, first_name, last_name in db.query(User.id, User.first_name, User.last_name)
+                    .filter(User.id.in_(agent_uuids))
+                }
+            for row in rows:
+                row["name"] = names.get(row["agent_id"])
+        return {"success": True, "scope": scope, "stats": rows}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ============================================================================
 # CONVERSION FUNNEL
 # ============================================================================
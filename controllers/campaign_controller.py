@@ -3,6 +3,7 @@ from typing import List
 import pandas as pd
 from fastapi import APIRouter, Depends, File, UploadFile, Response, Query
 from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from auth import get_current_user
@@ -39,6 +40,7 @@ from services.campaign_service import (
 import services.campaign_service as campaign_service
 from uuid import UUID
 from datetime import datetime, date
+from services.recipient_import_service import import_campaign_recipients
 from services.template_excel_service import (
     build_excel_response,
     get_template_metadata,
@@ -100,26 +102,26 @@ def campaign_reports_export(
     type_filter: Optional[str] = Query(None, alias="type", description="Filter by campaign type"),
     campaign_id: Optional[str] = Query(None, description="Filter by specific campaign ID"),
     search: Optional[str] = Query(None, description="Search by campaign name/description"),
+    file_format: str = Query("xlsx", alias="format", description="xlsx or csv"),
+    background: bool = Query(False, description="Build the file as a background job"),
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user),
 ):
     fd = _parse_report_date(from_date)
     td = _parse_report_date(to_date)
-    content = export_campaign_reports_excel(
+    today = datetime.utcnow().strftime("%Y-%m-%d")
+    return export_campaign_reports_excel(
         db,
         from_date=fd,
         to_date=td,
         type_filter=type_filter,
         campaign_id=campaign_id,
         search=search,
+        filename=f"campaign_reports_{today}",
+        file_format=file_format,
+        background=background,
+        owner=current_user,
     )
-    today = datetime.utcnow().strftime("%Y-%m-%d")
-    filename = f"campaign_reports_{today}.xlsx"
-    headers = {
-        "Content-Disposition": f'attachment; filename="{filename}"',
-        "Content-Type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    }
-    return Response(content=content, media_type=headers["Content-Type"], headers=headers)
 
 
 
@@ -462,149 +464,36 @@ async def upload_campaign_excel(
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    """Upload Excel with phone_number, name, params -> add recipients to campaign.
+    """Upload Excel/CSV with phone_number, name, params -> add recipients to campaign.
 
     Args:
         campaign_id: Campaign UUID
-        file: Excel file with phone_number column (required), name and other params (optional)
+        file: .xlsx or .csv file with phone_number column (required), name and other params (optional)
         clear_existing: If True, removes all existing recipients before adding new ones
-    """
-    import numpy as np
 
+    Rows are streamed in chunks, cleaned with vectorised pandas operations and
+    inserted with COPY; the response includes per-stage timings.
+    """
     # Ensure campaign exists
     campaign = campaign_service.get_campaign(db, campaign_id)
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
 
-    try:
-        contents = await file.read()
-        # Limit file size to 50MB (for up to 50,000 rows)
-        if len(contents) > 50 * 1024 * 1024:
-            raise HTTPException(status_code=400, detail="File size exceeds 50MB limit")
-        df = pd.read_excel(io.BytesIO(contents))
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Invalid Excel file: {e}")
-
-    # Limit row count
-    if len(df) > 50000:
-        raise HTTPException(status_code=400, detail="Excel file exceeds 50,000 rows limit")
-
-    # Validate required column
-    if "phone_number" not in df.columns:
-        raise HTTPException(status_code=400, detail="Excel must have 'phone_number' column")
-
-    # Clear existing recipients if requested
-    if clear_existing:
-        db.query(CampaignRecipient).filter(CampaignRecipient.campaign_id == campaign_id).delete()
-
-    # Get existing phone numbers to check for duplicates
-    existing_phones = set()
-    if not clear_existing:
-        existing_recipients = db.query(CampaignRecipient.phone_number).filter(
-            CampaignRecipient.campaign_id == campaign_id
-        ).all()
-        existing_phones = {r.phone_number for r in existing_recipients}
-
-    # Phone number validation helper
-    def is_valid_phone(phone: str) -> bool:
-        if not phone:
-            return False
-        cleaned = phone.replace("+", "").replace(" ", "").replace("-", "")
-        return len(cleaned) >= 10 and cleaned.isdigit()
-
-    # Normalize pandas/numpy types in params to JSON-serializable primitives
-    def to_jsonable(val):
-        try:
-            # Handle pandas NaT and NaN
-            if pd.isna(val) or (isinstance(val, float) and np.isnan(val)):
-                return None
-            if isinstance(val, (pd.Timestamp,)):
-                return val.isoformat()
-            if isinstance(val, (pd.Series, pd.DataFrame)):
-                return val.to_dict()
-            if isinstance(val, (np.integer,)):
-                return int(val)
-            if isinstance(val, (np.floating,)):
-                return float(val) if not np.isnan(val) else None
-            if isinstance(val, (np.bool_,)):
-                return bool(val)
-        except Exception:
-            pass
-        # Datetime from Python
-        try:
-            from datetime import datetime
-            if isinstance(val, datetime):
-                return val.isoformat()
-        except Exception:
-            pass
-        return val
-
-    # Track statistics
-    recipients = []
-    skipped_invalid = 0
-    skipped_duplicate = 0
-    processed_phones_in_batch = set()
-
-    for _, row in df.iterrows():
-        # FIX: Properly handle None/NaN phone numbers
-        raw_phone = row.get("phone_number")
-        if pd.isna(raw_phone) or raw_phone is None:
-            skipped_invalid += 1
-            continue
-
-        phone = str(raw_phone).strip()
-
-        # Skip empty or invalid phone numbers
-        if not phone or phone.lower() in ("none", "nan", "null", ""):
-            skipped_invalid += 1
-            continue
-
-        # Validate phone number format
-        if not is_valid_phone(phone):
-            skipped_invalid += 1
-            continue
-
-        # Check for duplicates (existing + within this batch)
-        if phone in existing_phones or phone in processed_phones_in_batch:
-            skipped_duplicate += 1
-            continue
-
-        processed_phones_in_batch.add(phone)
-
-        # Handle name field - also check for NaN
-        raw_name = row.get("name")
-        name = str(raw_name).strip() if pd.notna(raw_name) and raw_name is not None else None
-        if name and name.lower() in ("none", "nan", "null"):
-            name = None
-
-        clean_params = {
-            k: to_jsonable(row[k])
-            for k in df.columns
-            if k not in ["phone_number", "name"] and pd.notnull(row[k])
-        }
-
-        rec = CampaignRecipient(
-            campaign_id=campaign_id,
-            phone_number=phone,
-            name=name,
-            params=clean_params,
-            status="PENDING"
-        )
-        recipients.append(rec)
-
-    if recipients:
-        db.add_all(recipients)
-        db.commit()
+    contents = await file.read()
+    # Limit file size to 50MB (for up to 50,000 rows)
+    if len(contents) > 50 * 1024 * 1024:
+        raise HTTPException(status_code=400, detail="File size exceeds 50MB limit")
 
-    return {
-        "status": "uploaded",
-        "count": len(recipients),
-        "skipped_invalid_phone": skipped_invalid,
-        "skipped_duplicate": skipped_duplicate,
-        "cleared_existing": clear_existing
-    }
+    # Parsing and COPY are blocking; keep them off the event loop
+    return await run_in_threadpool(
+        import_campaign_recipients,
+        db,
+        campaign_id,
+        contents,
+        filename=file.filename,
+        content_type=file.content_type,
+        clear_existing=clear_existing,
+    )
 
 
 @router.post("/{campaign_id}/run-template")
@@ -1124,24 +1013,23 @@ def export_campaign_logs(
     status: Optional[str] = Query(None, description="Filter export by status"),
     from_date: Optional[str] = Query(None, description="Include logs created on/after this date (YYYY-MM-DD)"),
     to_date: Optional[str] = Query(None, description="Include logs created on/before this date (YYYY-MM-DD)"),
+    file_format: str = Query("xlsx", alias="format", description="xlsx or csv"),
+    background: bool = Query(False, description="Build the file as a background job"),
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user),
 ):
     fd = _parse_report_date(from_date)
     td = _parse_report_date(to_date)
-    content = export_campaign_delivery_logs_excel(
+    return export_campaign_delivery_logs_excel(
         db,
         str(campaign_id),
         status=status,
         from_date=fd,
         to_date=td,
+        file_format=file_format,
+        background=background,
+        owner=current_user,
     )
-    filename = f"campaign_{campaign_id}_delivery_logs.xlsx"
-    headers = {
-        "Content-Disposition": f'attachment; filename="{filename}"',
-        "Content-Type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    }
-    return Response(content=content, media_type=headers["Content-Type"], headers=headers)
 
 
 @router.get("/{campaign_id}/stats")
@@ -6,6 +6,7 @@ import pandas as pd
 
 from database.db import get_db
 from models.models import Category, SubCategory, Product
+from services.catalog_cache import catalog_cache, invalidate_catalog_cache
 from schemas.catalog_schema import (
     CategoryCreate, CategoryUpdate, CategoryOut,
     ProductCreate, ProductUpdate, ProductOut
@@ -92,6 +93,7 @@ def normalize_categories(confirm: Optional[str] = None, db: Session = Depends(ge
         deleted_cats += 1
 
     db.commit()
+    invalidate_catalog_cache()
     return {
         "status": "ok",
         "moved_products": moved_products,
@@ -102,13 +104,16 @@ def normalize_categories(confirm: Optional[str] = None, db: Session = Depends(ge
 
 
 def _category_to_tree(db: Session, category: Category) -> Dict:
+    tree = catalog_cache.category_tree(category.id)
+    if tree is not None:
+        return tree
     return {
         "id": str(category.id),
         "name": category.name,
         "description": category.description,
         "image_url": category.image_url,
         "subcategories": [
-            _category_to_tree(db, sc.category) if isinstance(sc, Category) else {
+            {
                 "id": str(sc.id),
                 "name": sc.name,
                 "description": sc.description,
@@ -130,11 +135,13 @@ def create_category(payload: CategoryCreate, db: Session = Depends(get_db)):
         subc = SubCategory(category_id=parent.id, name=payload.name, description=payload.description)
         db.add(subc)
         db.commit()
+        invalidate_catalog_cache()
         db.refresh(subc)
         return CategoryOut(id=subc.id, name=subc.name, description=subc.description, image_url=None, subcategories=[])
     cat = Category(name=payload.name, description=payload.description, image_url=payload.image_url)
     db.add(cat)
     db.commit()
+    invalidate_catalog_cache()
     db.refresh(cat)
     return CategoryOut(id=cat.id, name=cat.name, description=cat.description, image_url=cat.image_url, subcategories=[])
 
@@ -223,6 +230,7 @@ def create_product(payload: ProductCreate, db: Session = Depends(get_db)):
         existing.stock = payload.stock
         existing.image_url = payload.image_url
         db.commit()
+        invalidate_catalog_cache()
         db.refresh(existing)
         return existing
 
@@ -237,6 +245,7 @@ def create_product(payload: ProductCreate, db: Session = Depends(get_db)):
     )
     db.add(prod)
     db.commit()
+    invalidate_catalog_cache()
     db.refresh(prod)
     return prod
 
@@ -450,6 +459,7 @@ def upload_excel(file: UploadFile = File(...), db: Session = Depends(get_db)):
             created["products"] += 1
 
     db.commit()
+    invalidate_catalog_cache()
     return {
         "status": "ok",
         **created,
@@ -6,7 +6,6 @@ from typing import Any, Dict, Optional
 import os
 import re
 import json
-import requests
 from sqlalchemy.orm import Session
 
 from config.constants import get_messages_url
@@ -17,6 +16,7 @@ from models.models import Message
 from utils.whatsapp import send_message_to_waid
 from utils.ws_manager import manager
 from controllers.components.products_flow import route_product_flow
+from utils.whatsapp_client import whatsapp_client
 
 
 async def _send_payment_redirect_button(wa_id: str, payment_url: str, order_id: str, db: Session) -> None:
@@ -25,7 +25,6 @@ async def _send_payment_redirect_button(wa_id: str, payment_url: str, order_id:
         from services.whatsapp_service import get_latest_token
         from config.constants import get_messages_url
         import os
-        import requests
         
         token_entry = get_latest_token(db)
         if not token_entry or not token_entry.token:
@@ -73,7 +72,7 @@ async def _send_payment_redirect_button(wa_id: str, payment_url: str, order_id:
             }
         }
 
-        response = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+        response = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
         
         if response.status_code == 200:
             print(f"[payment_redirect_button] Payment redirect button sent successfully")
@@ -1219,7 +1218,7 @@ async def _send_week_list(*, db: Session, wa_id: str) -> Dict[str, Any]:
             }
         }
 
-        resp = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+        resp = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
         if resp.status_code == 200:
             # Save week list interactive message to database
             try:
@@ -1306,7 +1305,7 @@ async def _send_day_list_for_week(*, db: Session, wa_id: str, start_iso: str, en
             }
         }
 
-        resp = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+        resp = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
         if resp.status_code == 200:
             # Save day list interactive message to database
             try:
@@ -1443,7 +1442,7 @@ async def _send_time_slot_categories(*, db: Session, wa_id: str) -> Dict[str, An
             }
         }
 
-        resp = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+        resp = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
         if resp.status_code == 200:
             # Save time slot categories interactive message to database
             try:
@@ -1541,7 +1540,7 @@ async def _send_times_for_slot(*, db: Session, wa_id: str, slot_id: str) -> Dict
             }
         }
 
-        resp = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+        resp = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
         if resp.status_code == 200:
             # Save times list interactive message to database
             try:
@@ -1645,7 +1644,7 @@ async def _send_lead_week_list(*, db: Session, wa_id: str) -> Dict[str, Any]:
             }
         }
 
-        resp = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+        resp = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
         if resp.status_code == 200:
             # Save lead week list interactive message to database
             try:
@@ -1734,7 +1733,7 @@ async def _send_lead_day_list_for_week(*, db: Session, wa_id: str, start_iso: st
             }
         }
 
-        resp = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+        resp = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
         if resp.status_code == 200:
             # Save lead day list interactive message to database
             try:
@@ -1825,7 +1824,7 @@ async def _send_lead_time_slot_categories(*, db: Session, wa_id: str) -> Dict[st
             }
         }
 
-        resp = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+        resp = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
         if resp.status_code == 200:
             # Save lead time slot categories interactive message to database
             try:
@@ -1917,7 +1916,7 @@ async def _send_lead_times_for_slot(*, db: Session, wa_id: str, slot_id: str) ->
             }
         }
 
-        resp = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+        resp = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
         if resp.status_code == 200:
             # Save lead times list interactive message to database
             try:
@@ -7,7 +7,6 @@ from datetime import datetime
 from typing import Dict, Any, Optional
 import os
 import re
-import requests
 
 from sqlalchemy.orm import Session
 from services.whatsapp_service import get_latest_token
@@ -15,6 +14,7 @@ from config.constants import get_messages_url
 from utils.whatsapp import send_message_to_waid
 from utils.ws_manager import manager
 from marketing.whatsapp_numbers import WHATSAPP_NUMBERS, get_number_config
+from utils.whatsapp_client import whatsapp_client
 
 
 def _resolve_lead_phone_id(wa_id: str) -> tuple[Optional[str], Optional[str], str]:
@@ -130,7 +130,7 @@ async def send_auto_welcome_message(db: Session, *, wa_id: str, phone_id_hint: O
             }
         }
 
-        resp = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+        resp = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
         
         if resp.status_code == 200:
             try:
@@ -410,7 +410,7 @@ async def send_not_now_followup(db: Session, *, wa_id: str, customer: Any) -> Di
             }
         }
 
-        resp = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+        resp = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
         
         if resp.status_code == 200:
             try:
@@ -7,7 +7,6 @@ from datetime import datetime
 from typing import Dict, Any
 import os
 import re
-import requests
 
 from sqlalchemy.orm import Session
 from services.whatsapp_service import get_latest_token
@@ -15,6 +14,7 @@ from config.constants import get_messages_url
 from utils.whatsapp import send_message_to_waid
 from utils.ws_manager import manager
 from marketing.whatsapp_numbers import get_number_config
+from utils.whatsapp_client import whatsapp_client
 
 
 async def send_callback_confirmation(db: Session, *, wa_id: str) -> Dict[str, Any]:
@@ -109,7 +109,7 @@ async def send_callback_confirmation(db: Session, *, wa_id: str) -> Dict[str, An
             },
         }
 
-        resp = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+        resp = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
         
         if resp.status_code == 200:
             try:
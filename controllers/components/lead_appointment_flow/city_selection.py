@@ -5,7 +5,6 @@ Handles city selection with quick replies
 
 from datetime import datetime
 from typing import Dict, Any
-import requests
 
 from sqlalchemy.orm import Session
 from services.whatsapp_service import get_latest_token
@@ -13,6 +12,7 @@ from .config import LEAD_APPOINTMENT_PHONE_ID, LEAD_APPOINTMENT_DISPLAY_LAST10
 from config.constants import get_messages_url
 from utils.whatsapp import send_message_to_waid
 from utils.ws_manager import manager
+from utils.whatsapp_client import whatsapp_client
 
 
 async def send_city_selection(db: Session, *, wa_id: str) -> Dict[str, Any]:
@@ -78,7 +78,7 @@ async def send_city_selection(db: Session, *, wa_id: str) -> Dict[str, Any]:
             }
         }
 
-        resp = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+        resp = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
         
         if resp.status_code == 200:
             message_id = f"outbound_{datetime.now().timestamp()}"
@@ -190,7 +190,7 @@ async def send_city_selection_page2(db: Session, *, wa_id: str) -> Dict[str, Any
             }
         }
 
-        resp = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+        resp = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
         if resp.status_code == 200:
             return {"success": True}
         else:
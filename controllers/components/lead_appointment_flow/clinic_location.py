@@ -6,7 +6,6 @@ Handles clinic location selection based on selected city
 from datetime import datetime
 from typing import Dict, Any, List
 import os
-import requests
 
 from sqlalchemy.orm import Session
 from services.whatsapp_service import get_latest_token
@@ -14,6 +13,7 @@ from config.constants import get_messages_url
 from utils.whatsapp import send_message_to_waid
 from utils.ws_manager import manager
 from .config import LEAD_APPOINTMENT_PHONE_ID, LEAD_APPOINTMENT_DISPLAY_LAST10
+from utils.whatsapp_client import whatsapp_client
 
 
 def get_clinics_for_city(city: str) -> List[Dict[str, str]]:
@@ -140,7 +140,7 @@ async def send_clinic_location(db: Session, *, wa_id: str, city: str) -> Dict[st
             }
         }
 
-        resp = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+        resp = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
         
         if resp.status_code == 200:
             message_id = f"outbound_{datetime.now().timestamp()}"
@@ -14,6 +14,7 @@ from utils.ws_manager import manager
 from services.followup_service import mark_customer_replied
 from services import flow_config_service
 from .config import LEAD_APPOINTMENT_PHONE_ID, LEAD_APPOINTMENT_DISPLAY_LAST10
+from utils.whatsapp_client import whatsapp_client
 
 
 async def run_lead_appointment_flow(
@@ -861,7 +862,6 @@ async def send_callback_confirmation_interactive(
         from config.constants import get_messages_url
         from marketing.whatsapp_numbers import get_number_config
         import os
-        import requests
 
         # Resolve phone_id from state
         phone_id = None
@@ -950,7 +950,7 @@ async def send_callback_confirmation_interactive(
             }
         }
 
-        resp = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+        resp = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
         
         if resp.status_code == 200:
             message_id = f"outbound_{datetime.now().timestamp()}"
@@ -4,7 +4,6 @@ import os
 import re
 import asyncio
 
-import requests
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 
@@ -14,6 +13,7 @@ from schemas.customer_schema import CustomerCreate
 from schemas.message_schema import MessageCreate
 from config.constants import get_messages_url
 from marketing.whatsapp_numbers import get_number_config
+from utils.whatsapp_client import whatsapp_client
 
 
 # Follow-Up 1 content and timing
@@ -126,7 +126,7 @@ async def send_follow_up1(
         },
     }
 
-    res = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+    res = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
     if res.status_code != 200:
         raise HTTPException(status_code=500, detail=f"Failed to send follow-up 1 interactive: {res.text}")
 
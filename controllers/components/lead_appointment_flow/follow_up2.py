@@ -3,7 +3,6 @@ from typing import Dict, Any, Optional
 import os
 import asyncio
 
-import requests
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 
@@ -12,6 +11,7 @@ from services import whatsapp_service, customer_service, message_service
 from schemas.customer_schema import CustomerCreate
 from schemas.message_schema import MessageCreate
 from config.constants import get_messages_url
+from utils.whatsapp_client import whatsapp_client
 
 
 FOLLOW_UP_2_DELAY_MINUTES = 30
@@ -59,7 +59,7 @@ async def send_follow_up2(
         "text": {"body": FOLLOW_UP_2_TEXT},
     }
 
-    res = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+    res = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
     if res.status_code != 200:
         raise HTTPException(status_code=500, detail=f"Failed to send follow-up 2: {res.text}")
 
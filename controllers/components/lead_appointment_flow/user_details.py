@@ -9,6 +9,7 @@ import re
 
 from sqlalchemy.orm import Session
 from utils.whatsapp import send_message_to_waid
+from utils.whatsapp_client import whatsapp_client
 
 
 async def send_user_details_request(db: Session, *, wa_id: str) -> Dict[str, Any]:
@@ -189,7 +190,6 @@ async def send_callback_confirmation(db: Session, *, wa_id: str) -> Dict[str, An
     try:
         from utils.whatsapp import send_message_to_waid
         import os
-        import requests
         from services.whatsapp_service import get_latest_token
         from config.constants import get_messages_url
         
@@ -220,7 +220,7 @@ async def send_callback_confirmation(db: Session, *, wa_id: str) -> Dict[str, An
             }
         }
 
-        resp = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+        resp = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
         
         if resp.status_code == 200:
             try:
@@ -14,6 +14,7 @@ from controllers.components.lead_appointment_flow.zoho_lead_retrieval import (
     get_lead_by_id,
     get_lead_statistics
 )
+from utils.zoho_auth import zoho_token_manager
 
 # Create router for lead retrieval endpoints
 router = APIRouter(prefix="/api/zoho-leads", tags=["Zoho Leads"])
@@ -452,6 +453,13 @@ async def health_check():
             "/api/zoho-leads/whatsapp/latest",
             "/api/zoho-leads/whatsapp/q5-events",
             "/api/zoho-leads/whatsapp/termination-events",
-            "/api/zoho-leads/whatsapp/pending"
+            "/api/zoho-leads/whatsapp/pending",
+            "/api/zoho-leads/auth/token-metrics"
         ]
     }
+
+
+@router.get("/auth/token-metrics")
+async def token_metrics():
+    """Zoho OAuth token cache hit/miss counts and refresh latency"""
+    return zoho_token_manager.metrics()
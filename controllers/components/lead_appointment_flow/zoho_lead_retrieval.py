@@ -17,13 +17,10 @@ class ZohoLeadRetrievalService:
     
     def __init__(self):
         self.base_url = "https://www.zohoapis.in/crm/v2.1/Leads"
-        self.access_token = None
     
     def _get_access_token(self) -> str:
-        """Get valid access token for Zoho API"""
-        if not self.access_token:
-            self.access_token = get_valid_access_token()
-        return self.access_token
+        """Get valid access token for Zoho API (cached by utils.zoho_auth)"""
+        return get_valid_access_token()
     
     def get_whatsapp_leads(
         self,
@@ -126,8 +123,7 @@ class ZohoLeadRetrievalService:
                     body_lower = ""
                 if "invalid_token" in body_lower or "invalid oauth token" in body_lower or "invalid_oauth_token" in body_lower:
                     print("⚠️  [ZOHO LEAD RETRIEVAL] Detected INVALID_TOKEN (401). Refreshing token and retrying once...")
-                    self.access_token = get_valid_access_token()
-                    refreshed = self.access_token
+                    refreshed = get_valid_access_token(force_refresh=True, stale_token=access_token)
                     print(f"✅ [ZOHO LEAD RETRIEVAL] New access token obtained: {refreshed[:20]}...")
                     headers_retry = {
                         **headers,
@@ -288,8 +284,7 @@ class ZohoLeadRetrievalService:
                     body_lower = ""
                 if "invalid_token" in body_lower or "invalid oauth token" in body_lower or "invalid_oauth_token" in body_lower:
                     print("⚠️  [ZOHO LEAD BY ID] Detected INVALID_TOKEN (401). Refreshing token and retrying once...")
-                    self.access_token = get_valid_access_token()
-                    refreshed = self.access_token
+                    refreshed = get_valid_access_token(force_refresh=True, stale_token=access_token)
                     print(f"✅ [ZOHO LEAD BY ID] New access token obtained: {refreshed[:20]}...")
                     headers_retry = {
                         **headers,
@@ -12,6 +12,7 @@ import os
 from sqlalchemy.orm import Session
 from sqlalchemy import func, or_, and_
 from utils.zoho_auth import get_valid_access_token
+from services.zoho_lead_outbox import enqueue_lead, find_pending_duplicate, outbox_enabled
 
 
 class ZohoLeadService:
@@ -19,27 +20,10 @@ class ZohoLeadService:
 
     def __init__(self):
         self.base_url = "https://www.zohoapis.in/crm/v2.1/Leads"
-        self.access_token = None
-        self._token_fetched_at = None
 
     def _get_access_token(self) -> str:
-        """Get valid access token for Zoho API with proactive refresh"""
-        from datetime import datetime, timedelta
-
-        # Proactively refresh if token is older than 50 minutes (tokens expire in ~60 mins)
-        token_max_age = timedelta(minutes=50)
-        needs_refresh = (
-            not self.access_token or
-            not self._token_fetched_at or
-            (datetime.utcnow() - self._token_fetched_at) > token_max_age
-        )
-
-        if needs_refresh:
-            self.access_token = get_valid_access_token()
-            self._token_fetched_at = datetime.utcnow()
-            print(f"🔄 [ZOHO] Access token refreshed at {self._token_fetched_at}")
-
-        return self.access_token
+        """Get valid access token for Zoho API (cached and refreshed by utils.zoho_auth)"""
+        return get_valid_access_token()
     
     def _prepare_lead_data(
         self,
@@ -579,8 +563,7 @@ class ZohoLeadService:
                     print("🛠️  [ZOHO LEAD CREATION] This often caused leads to be created only after a server restart due to a stale cached token.")
                     print("🔄 [ZOHO LEAD CREATION] Refreshing Zoho access token and retrying once...")
                     # Force refresh access token
-                    self.access_token = get_valid_access_token()
-                    refreshed_token = self.access_token
+                    refreshed_token = get_valid_access_token(force_refresh=True, stale_token=access_token)
                     print(f"✅ [ZOHO LEAD CREATION] New access token obtained: {refreshed_token[:20]}...")
                     # Retry with new token
                     headers_retry = {
@@ -908,46 +891,64 @@ async def create_lead_for_appointment(
             except Exception as _e:
                 print(f"⚠️ [LEAD APPOINTMENT FLOW] DB duplicate check failed: {_e}")
 
-            # Zoho-side duplicate guard: check for leads by phone AND Lead Source (same day)
-            try:
-                existing_zoho = zoho_lead_service.find_existing_lead_by_phone_and_source(
-                    phone_number, 
-                    lead_source=expected_lead_source,
-                    within_same_day=True
-                )
-                if existing_zoho and isinstance(existing_zoho, dict):
-                    lead_id_existing = str(
-                        existing_zoho.get("id") or existing_zoho.get("Id") or ""
-                    )
-                    if lead_id_existing:
+            if outbox_enabled():
+                # The outbox pusher checks Zoho for a whole batch at once; here only
+                # look for a same-day lead that is still waiting in the outbox
+                try:
+                    pending = find_pending_duplicate(db, phone=phone_number, lead_source=expected_lead_source)
+                    if pending and not (
+                        desired_sub_source
+                        and pending.sub_source
+                        and str(desired_sub_source).strip().lower() != str(pending.sub_source).strip().lower()
+                    ):
                         print(
-                            f"✅ [LEAD APPOINTMENT FLOW] Duplicate prevented via Zoho: existing '{expected_lead_source}' lead "
-                            f"for {phone_number} on same day (lead_id={lead_id_existing})"
+                            f"✅ [LEAD APPOINTMENT FLOW] Duplicate prevented: '{expected_lead_source}' lead for "
+                            f"{phone_number} already queued (outbox id={pending.id})"
                         )
-                        try:
-                            from utils.flow_log import log_flow_event  # type: ignore
-
-                            log_flow_event(
-                                db,
-                                flow_type="lead_appointment",
-                                step="result",
-                                status_code=200,
-                                wa_id=wa_id,
-                                name=getattr(customer, "name", None) or "",
-                                description=(
-                                    f"Duplicate avoided (Zoho search): existing {expected_lead_source} lead {lead_id_existing}"
-                                ),
-                            )
-                        except Exception:
-                            pass
-                        return {"success": True, "duplicate": True, "lead_id": lead_id_existing}
-                else:
-                    print(
-                        f"🔍 [LEAD APPOINTMENT FLOW] No '{expected_lead_source}' lead found in Zoho for {phone_number} on same day. "
-                        f"Proceeding with lead creation..."
+                        return {"success": True, "duplicate": True, "queued": True, "outbox_id": pending.id, "lead_id": None}
+                except Exception as _e:
+                    print(f"⚠️ [LEAD APPOINTMENT FLOW] Outbox duplicate check failed: {_e}")
+            else:
+                # Zoho-side duplicate guard: check for leads by phone AND Lead Source (same day)
+                try:
+                    existing_zoho = zoho_lead_service.find_existing_lead_by_phone_and_source(
+                        phone_number, 
+                        lead_source=expected_lead_source,
+                        within_same_day=True
                     )
-            except Exception as _e:
-                print(f"⚠️ [LEAD APPOINTMENT FLOW] Zoho-side duplicate check failed: {_e}")
+                    if existing_zoho and isinstance(existing_zoho, dict):
+                        lead_id_existing = str(
+                            existing_zoho.get("id") or existing_zoho.get("Id") or ""
+                        )
+                        if lead_id_existing:
+                            print(
+                                f"✅ [LEAD APPOINTMENT FLOW] Duplicate prevented via Zoho: existing '{expected_lead_source}' lead "
+                                f"for {phone_number} on same day (lead_id={lead_id_existing})"
+                            )
+                            try:
+                                from utils.flow_log import log_flow_event  # type: ignore
+
+                                log_flow_event(
+                                    db,
+                                    flow_type="lead_appointment",
+                                    step="result",
+                                    status_code=200,
+                                    wa_id=wa_id,
+                                    name=getattr(customer, "name", None) or "",
+                                    description=(
+                                        f"Duplicate avoided (Zoho search): existing {expected_lead_source} lead {lead_id_existing}"
+                                    ),
+                                )
+                            except Exception:
+                                pass
+                            return {"success": True, "duplicate": True, "lead_id": lead_id_existing}
+                    else:
+                        print(
+                            f"🔍 [LEAD APPOINTMENT FLOW] No '{expected_lead_source}' lead found in Zoho for {phone_number} on same day. "
+                            f"Proceeding with lead creation..."
+                        )
+                except Exception as _e:
+                    print(f"⚠️ [LEAD APPOINTMENT FLOW] Zoho-side duplicate check failed: {_e}")
         else:
             print(f"✅ [LEAD APPOINTMENT FLOW] Duplicate check skipped (allow_duplicate_same_day=True)")
 
@@ -1374,7 +1375,7 @@ async def create_lead_for_appointment(
             }
         }
         
-        result = zoho_lead_service.create_lead(
+        lead_kwargs = dict(
             first_name=first_name,
             last_name=last_name,
             email=getattr(customer, 'email', '') or '',
@@ -1412,6 +1413,62 @@ async def create_lead_for_appointment(
             },
             sub_source=sub_source_val,
         )
+
+        # Columns for the local `leads` row once Zoho returns a lead id
+        from services.zoho_mapping_service import get_zoho_name
+        final_selected_concern = selected_concern or (appointment_details or {}).get("selected_concern")
+        try:
+            final_mapped_concern = (
+                zoho_mapped_concern
+                or (appointment_details or {}).get("zoho_mapped_concern")
+                or (get_zoho_name(db, final_selected_concern) if final_selected_concern else None)
+            )
+        except Exception as _e:
+            print(f"⚠️ [LEAD APPOINTMENT FLOW] Could not resolve mapped concern: {_e}")
+            final_mapped_concern = zoho_mapped_concern
+        print(
+            f"💡 [LEAD APPOINTMENT FLOW] Using concern values for DB save: "
+            f"selected='{final_selected_concern}', mapped='{final_mapped_concern}'"
+        )
+        local_lead_fields = {
+            "first_name": first_name,
+            "last_name": last_name,
+            "email": getattr(customer, "email", "") or "",
+            "phone": phone_number,
+            "mobile": phone_number,
+            "city": city,
+            "location": location,
+            "lead_source": lead_source_val,
+            "company": "Oliva Skin & Hair Clinic",
+            "appointment_details": {
+                "selected_city": city,
+                "selected_clinic": clinic,
+                **({"selected_location": location} if location else {}),
+                "selected_concern": final_selected_concern,
+                "zoho_mapped_concern": final_mapped_concern,
+            },
+            "treatment_name": final_selected_concern,
+            "zoho_mapped_concern": final_mapped_concern,
+            "primary_concern": final_mapped_concern or final_selected_concern,
+            "sub_source": sub_source_val,
+        }
+
+        if outbox_enabled():
+            # Hand the lead to the background pusher (batched bulk insert, retries,
+            # write-back to leads / zoho_payload_logs / flow_logs)
+            outbox_row = enqueue_lead(
+                db,
+                wa_id=wa_id,
+                customer_id=getattr(customer, "id", None),
+                flow_type="treatment" if flow_type == "treatment_flow" else "lead_appointment",
+                record=zoho_lead_service._prepare_lead_data(**lead_kwargs)["data"][0],
+                lead_fields=local_lead_fields,
+                payload_log=zoho_payload,
+            )
+            print(f"📥 [LEAD APPOINTMENT FLOW] Lead queued for Zoho (outbox id={outbox_row.id}) for {wa_id}")
+            return {"success": True, "queued": True, "outbox_id": outbox_row.id, "lead_id": None}
+
+        result = zoho_lead_service.create_lead(**lead_kwargs)
         
         # Log payload to database
         try:
@@ -1441,49 +1498,17 @@ async def create_lead_for_appointment(
             # Save lead to local database
             try:
                 from models.models import Lead
-                from services.zoho_mapping_service import get_zoho_name
                 
                 # Check if lead already exists
                 existing_lead = db.query(Lead).filter(Lead.zoho_lead_id == result.get('lead_id')).first()
                 
                 if not existing_lead:
-                    # Resolve concern values robustly
-                    final_selected_concern = selected_concern or (appointment_details or {}).get("selected_concern")
-                    final_mapped_concern = (
-                        zoho_mapped_concern
-                        or (appointment_details or {}).get("zoho_mapped_concern")
-                        or (get_zoho_name(db, final_selected_concern) if final_selected_concern else None)
-                    )
-                    print(
-                        f"💡 [LEAD APPOINTMENT FLOW] Using concern values for DB save: "
-                        f"selected='{final_selected_concern}', mapped='{final_mapped_concern}'"
-                    )
-                    
-        # Create new lead record
+                    # Create new lead record
                     new_lead = Lead(
                         zoho_lead_id=result.get("lead_id"),
-                        first_name=first_name,
-                        last_name=last_name,
-                        email=getattr(customer, "email", "") or "",
-                        phone=phone_number,
-                        mobile=phone_number,
-                        city=city,
-                        location=location,
-                        lead_source=lead_source_val,
-                        company="Oliva Skin & Hair Clinic",
                         wa_id=wa_id,
                         customer_id=getattr(customer, "id", None),
-                        appointment_details={
-                            "selected_city": city,
-                            "selected_clinic": clinic,
-                            **({"selected_location": location} if location else {}),
-                            "selected_concern": final_selected_concern,
-                            "zoho_mapped_concern": final_mapped_concern,
-                        },
-                        treatment_name=final_selected_concern,
-                        zoho_mapped_concern=final_mapped_concern,
-                        primary_concern=final_mapped_concern or final_selected_concern,
-                        sub_source=sub_source_val,
+                        **local_lead_fields,
                     )
                     db.add(new_lead)
                     db.commit()
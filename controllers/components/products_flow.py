@@ -5,6 +5,7 @@ from typing import Optional, Dict, Any
 from sqlalchemy.orm import Session
 
 from utils.whatsapp import send_products_list, send_message_to_waid
+from utils.whatsapp_client import whatsapp_client
 
 
 async def run_products_flow(
@@ -53,7 +54,6 @@ async def run_buy_products_flow(
 from datetime import datetime
 from typing import Any, Dict, Optional
 import os
-import requests
 from services.whatsapp_service import get_latest_token
 from config.constants import get_messages_url
 from services import order_service
@@ -93,7 +93,7 @@ async def send_cart_next_actions(db: Session, *, wa_id: str) -> Dict[str, Any]:
             },
         }
 
-        response = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+        response = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
         
         # Save to database and broadcast to WebSocket if message was sent successfully
         if response.status_code == 200:
@@ -275,7 +275,7 @@ async def handle_cart_next_action(
                 },
             }
             
-            response = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+            response = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
             
             # Log response for debugging
             print(f"[products_flow] DEBUG - Modify order response status: {response.status_code}")
@@ -5,7 +5,6 @@ from typing import Any, Dict, Optional
 
 import os
 import re
-import requests
 from sqlalchemy.orm import Session
 
 from services.whatsapp_service import get_latest_token
@@ -14,6 +13,7 @@ from schemas.message_schema import MessageCreate
 from config.constants import get_messages_url
 from utils.ws_manager import manager
 from controllers.components.products_flow import run_buy_products_flow
+from utils.whatsapp_client import whatsapp_client
 
 
 async def run_welcome_flow(
@@ -75,7 +75,7 @@ async def run_welcome_flow(
             }
         }
 
-        resp = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+        resp = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
         if resp.status_code != 200:
             return {"status": "failed", "status_code": resp.status_code, "error": resp.text[:500]}
 
@@ -27,6 +27,7 @@ def list_conversations_optimized(
     pending_reply_only: bool = Query(False, description="Show only customers pending agent reply"),
     date_filter: Optional[str] = Query(None, description="Filter by message date (YYYY-MM-DD)"),
     unread_only: bool = Query(False, description="Show only customers with unread messages"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (keyset pagination)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -42,19 +43,23 @@ def list_conversations_optimized(
     All in a single API call to replace multiple frontend calls.
     """
     organization_id = get_user_organization_id(current_user)
-    return customer_service.get_conversations_optimized(
-        db,
-        skip=skip,
-        limit=limit,
-        search=search,
-        business_number=business_number,
-        user_id=user_id,
-        unassigned_only=unassigned_only,
-        pending_reply_only=pending_reply_only,
-        date_filter=date_filter,
-        unread_only=unread_only,
-        organization_id=organization_id,
-    )
+    try:
+        return customer_service.get_conversations_optimized(
+            db,
+            skip=skip,
+            limit=limit,
+            search=search,
+            business_number=business_number,
+            user_id=user_id,
+            unassigned_only=unassigned_only,
+            pending_reply_only=pending_reply_only,
+            date_filter=date_filter,
+            unread_only=unread_only,
+            organization_id=organization_id,
+            cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/conversations/by-peer")
 def list_conversations_by_peer(
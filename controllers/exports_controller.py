@@ -0,0 +1,46 @@
+"""
+Status and download endpoints for background export jobs.
+
+Export endpoints called with background=true return a job id; clients poll
+GET /api/exports/{job_id} for progress and fetch the file from
+GET /api/exports/{job_id}/download once the status is "done". Both require
+the user (or organization) that started the job; other users get a 404.
+"""
+
+import os
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from auth import get_current_user
+from services.export_service import export_job_visible_to, file_response, get_export_job
+
+router = APIRouter(prefix="/api/exports", tags=["exports"])
+
+
+def _job_for(job_id: str, current_user) -> dict:
+    job = get_export_job(job_id)
+    if not job or not export_job_visible_to(job, current_user):
+        raise HTTPException(status_code=404, detail="Export job not found or expired")
+    return job
+
+
+@router.get("/{job_id}")
+def export_job_status(job_id: str, current_user=Depends(get_current_user)):
+    job = _job_for(job_id, current_user)
+    job.pop("path", None)
+    job["job_id"] = job_id
+    if job.get("status") == "done":
+        job["download_url"] = f"/api/exports/{job_id}/download"
+    return job
+
+
+@router.get("/{job_id}/download")
+def download_export(job_id: str, current_user=Depends(get_current_user)):
+    job = _job_for(job_id, current_user)
+    if job.get("status") != "done":
+        raise HTTPException(status_code=409, detail=f"Export is {job.get('status')}")
+    path = job.get("path")
+    if not path or not os.path.exists(path):
+        raise HTTPException(status_code=410, detail="Export file is no longer available")
+    # Keep the file until it expires so the download can be retried
+    return file_response(path, job.get("filename") or os.path.basename(path), job["file_format"], delete=False)
@@ -4,17 +4,13 @@ from uuid import UUID
 
 from fastapi import APIRouter, Depends, Query, HTTPException
 from pydantic import BaseModel
-from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, text, func, case
-import csv
-import io
 import json
 
-from openpyxl import Workbook
-
 from database.db import get_db
 from models.models import FlowLog, Lead, Customer, Message
+from services.export_service import export, iter_chunks, stream_rows
 
 router = APIRouter(prefix="/api/flow-logs", tags=["flow-logs"])
 
@@ -95,57 +91,30 @@ def _get_peer_numbers_for_customers(db: Session, wa_ids: List[str]) -> Dict[str,
 
 def _extract_keywords_from_messages(db: Session, wa_ids: List[str]) -> Dict[str, str]:
     """
-    Extract keywords from customer messages only (not agent messages).
+    Keywords found in customer messages only (not agent messages).
     Returns a dict mapping customer wa_id to comma-separated keywords found in their messages.
+
+    Tags are computed at insert time (services/message_tag_service), so this
+    reads messages.keyword_tags instead of scanning message bodies.
     """
     if not wa_ids:
         return {}
-    
-    # Define keywords to search for (case-insensitive)
-    keywords = [
-        "price",
-        "appointment",
-        "cost",
-        "vacancy",
-        "contact us",
-        "clinic address",
-        "clinic number",
-        "treatment information",
-        "treatment type",
-    ]
-    
-    # Get all messages from customers ONLY (not agent messages)
-    messages = (
-        db.query(
-            Customer.wa_id,
-            Message.body
-        )
+
+    tag = func.unnest(Message.keyword_tags).label("tag")
+    tagged = (
+        db.query(Customer.wa_id, tag)
         .join(Message, Customer.id == Message.customer_id)
         .filter(Customer.wa_id.in_(wa_ids))
         .filter(Message.sender_type == "customer")  # ONLY customer messages, not agent
-        .filter(Message.body.isnot(None))
-        .all()
+        .filter(Message.keyword_tags.isnot(None))
+        .distinct()
     )
-    
-    # Map wa_id to found keywords
+
     keyword_map: Dict[str, Set[str]] = {}
-    for wa_id, body in messages:
-        if not wa_id or not body:
-            continue
-        
-        body_lower = body.lower()
-        found_keywords = []
-        
-        for keyword in keywords:
-            if keyword.lower() in body_lower:
-                # Use the original keyword format for display
-                found_keywords.append(keyword)
-        
-        if found_keywords:
-            if wa_id not in keyword_map:
-                keyword_map[wa_id] = set()
-            keyword_map[wa_id].update(found_keywords)
-    
+    for wa_id, keyword in tagged:
+        if wa_id and keyword:
+            keyword_map.setdefault(wa_id, set()).add(keyword)
+
     # Convert sets to comma-separated strings
     return {wa_id: ", ".join(sorted(keywords)) for wa_id, keywords in keyword_map.items()}
 
@@ -289,281 +258,209 @@ def list_flow_logs(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/export-pushed-leads")
-def export_pushed_leads_excel(
-    db: Session = Depends(get_db),
-    flow_type: Optional[str] = Query(None),
-    date_from: Optional[str] = Query(None),
-    date_to: Optional[str] = Query(None),
-):
-    """
-    Export leads pushed to Zoho (stored in leads table) as an Excel workbook.
-    Results can be filtered by flow type and date range.
-    """
-    try:
-        dt_from = _parse_dt(date_from)
-        dt_to = _parse_dt(date_to)
-        dt_to_upper: Optional[datetime] = None
-        if dt_to:
-            # include entire day when only a date is provided
-            if date_to and len(date_to) == 10:
-                dt_to_upper = dt_to + timedelta(days=1)
-            else:
-                dt_to_upper = dt_to
+FLOW_TYPE_LABELS = {
+    "treatment": "Marketing",
+    "lead_appointment": "Meta Ad Campaign",
+}
 
-        lead_query = db.query(Lead)
-        if dt_from:
-            lead_query = lead_query.filter(Lead.created_at >= dt_from)
-        if dt_to_upper:
-            lead_query = lead_query.filter(Lead.created_at < dt_to_upper)
 
-        leads: List[Lead] = (
-            lead_query.order_by(Lead.created_at.desc()).limit(20000).all()
-        )
+def _infer_flow_from_source(lead_source: Optional[str]) -> Optional[str]:
+    if not lead_source:
+        return None
+    source_lower = lead_source.lower()
+    if "business" in source_lower:
+        return "treatment"
+    if "facebook" in source_lower or "meta" in source_lower:
+        return "lead_appointment"
+    return None
 
-        if not leads:
-            raise HTTPException(status_code=404, detail="No leads found for the selected filters.")
 
-        log_filters = [
-            FlowLog.step == "result",
-            FlowLog.status_code == 200,
-            FlowLog.response_json.isnot(None),
-        ]
-        if flow_type:
-            log_filters.append(FlowLog.flow_type == flow_type)
-        if dt_from:
-            log_filters.append(FlowLog.created_at >= dt_from)
-        if dt_to_upper:
-            log_filters.append(FlowLog.created_at < dt_to_upper)
+def _upper_bound(dt_to: Optional[datetime], date_to: Optional[str]) -> Optional[datetime]:
+    """Make a date-only upper bound include the entire day."""
+    if dt_to and date_to and len(date_to) == 10:
+        return dt_to + timedelta(days=1)
+    return dt_to
 
-        flow_log_map: Dict[str, str] = {}
-        wa_id_map: Dict[str, str] = {}
 
-        log_rows = db.query(FlowLog).filter(and_(*log_filters)).all()
-        for log in log_rows:
-            if not log.response_json:
-                continue
-            lead_id: Optional[str] = None
-            try:
-                payload = json.loads(log.response_json)
-                if isinstance(payload, dict):
-                    if payload.get("success") and not payload.get("duplicate") and not payload.get("skipped"):
-                        lead_id = payload.get("lead_id")
-                        if not lead_id:
-                            response_block = payload.get("response") or {}
-                            data_list = response_block.get("data") or []
-                            if data_list:
-                                details = (data_list[0] or {}).get("details") or {}
-                                lead_id = details.get("id")
-            except Exception:
-                continue
+def _export_suffix(*parts: Optional[str]) -> str:
+    parts = [p for p in parts if p]
+    return ("_" + "_".join(parts)) if parts else ""
 
-            if not lead_id:
-                continue
-            lead_id_str = str(lead_id)
-            flow_log_map.setdefault(lead_id_str, log.flow_type or "")
-            if log.wa_id:
-                wa_id_map.setdefault(lead_id_str, log.wa_id)
-
-        flow_type_labels = {
-            "treatment": "Marketing",
-            "lead_appointment": "Meta Ad Campaign",
-        }
 
-        def infer_flow_from_source(lead_source: Optional[str]) -> Optional[str]:
-            if not lead_source:
-                return None
-            source_lower = lead_source.lower()
-            if "business" in source_lower:
-                return "treatment"
-            if "facebook" in source_lower or "meta" in source_lower:
-                return "lead_appointment"
-            return None
+def _iso(value: Optional[datetime]) -> str:
+    return value.isoformat() if value else ""
+
+
+def _pushed_leads_rows(db: Session, *, flow_type, dt_from, dt_to_upper):
+    log_filters = [
+        FlowLog.step == "result",
+        FlowLog.status_code == 200,
+        FlowLog.response_json.isnot(None),
+    ]
+    if flow_type:
+        log_filters.append(FlowLog.flow_type == flow_type)
+    if dt_from:
+        log_filters.append(FlowLog.created_at >= dt_from)
+    if dt_to_upper:
+        log_filters.append(FlowLog.created_at < dt_to_upper)
+
+    flow_log_map: Dict[str, str] = {}
+    wa_id_map: Dict[str, str] = {}
+    log_query = db.query(FlowLog.flow_type, FlowLog.wa_id, FlowLog.response_json).filter(and_(*log_filters))
+    for log in stream_rows(log_query):
+        if not log.response_json:
+            continue
+        lead_id: Optional[str] = None
+        try:
+            payload = json.loads(log.response_json)
+            if isinstance(payload, dict):
+                if payload.get("success") and not payload.get("duplicate") and not payload.get("skipped"):
+                    lead_id = payload.get("lead_id")
+                    if not lead_id:
+                        response_block = payload.get("response") or {}
+                        data_list = response_block.get("data") or []
+                        if data_list:
+                            details = (data_list[0] or {}).get("details") or {}
+                            lead_id = details.get("id")
+        except Exception:
+            continue
 
-        # Get customer info for pushed leads FIRST
+        if not lead_id:
+            continue
+        lead_id_str = str(lead_id)
+        flow_log_map.setdefault(lead_id_str, log.flow_type or "")
+        if log.wa_id:
+            wa_id_map.setdefault(lead_id_str, log.wa_id)
+
+    lead_query = db.query(Lead)
+    if dt_from:
+        lead_query = lead_query.filter(Lead.created_at >= dt_from)
+    if dt_to_upper:
+        lead_query = lead_query.filter(Lead.created_at < dt_to_upper)
+
+    for leads in iter_chunks(stream_rows(lead_query.order_by(Lead.created_at.desc()))):
         lead_wa_ids = [lead.wa_id for lead in leads if lead.wa_id]
-        customer_map_pushed = {}
+        customer_names = {}
         if lead_wa_ids:
-            customers = db.query(Customer).filter(Customer.wa_id.in_(lead_wa_ids)).all()
-            customer_map_pushed = {c.wa_id: c for c in customers}
-
-        # Get peer numbers for all leads
+            customer_names = dict(
+                db.query(Customer.wa_id, Customer.name).filter(Customer.wa_id.in_(lead_wa_ids)).all()
+            )
         peer_number_map = _get_peer_numbers_for_customers(db, lead_wa_ids)
 
-        workbook = Workbook()
-        worksheet = workbook.active
-        worksheet.title = "Pushed Leads"
-        worksheet.append(["Name", "Lead ID", "Lead Source", "Sub Source", "Phone Number", "Peer Number", "Type of Flow", "Created At"])
-
-        rows_written = 0
         for lead in leads:
             lead_id = lead.zoho_lead_id
             if not lead_id:
                 continue
 
-            flow_code = flow_log_map.get(lead_id) or infer_flow_from_source(lead.lead_source)
-            if flow_type:
-                if not flow_code:
-                    continue
-                if flow_code != flow_type:
-                    continue
+            flow_code = flow_log_map.get(lead_id) or _infer_flow_from_source(lead.lead_source)
+            if flow_type and flow_code != flow_type:
+                continue
 
-            flow_label = flow_type_labels.get(flow_code or "", flow_code or "Unknown")
+            flow_label = FLOW_TYPE_LABELS.get(flow_code or "", flow_code or "Unknown")
 
             # Prioritize Customer.name, then Lead names, then "Unknown"
-            customer = customer_map_pushed.get(lead.wa_id) if lead.wa_id else None
-            if customer and customer.name and customer.name.strip():
-                name = customer.name.strip()
+            customer_name = customer_names.get(lead.wa_id) if lead.wa_id else None
+            if customer_name and customer_name.strip():
+                name = customer_name.strip()
             else:
                 name_parts = [lead.first_name or "", lead.last_name or ""]
                 name = " ".join(part.strip() for part in name_parts if part and part.strip()).strip() or "Unknown"
 
-            phone = lead.phone or lead.mobile or wa_id_map.get(lead_id) or ""
-            peer_number = peer_number_map.get(lead.wa_id, "")
-
-            worksheet.append([
+            yield [
                 name,
                 lead_id,
                 lead.lead_source or "",
                 lead.sub_source or "",
-                phone,
-                peer_number,
+                lead.phone or lead.mobile or wa_id_map.get(lead_id) or "",
+                peer_number_map.get(lead.wa_id, ""),
                 flow_label,
-                lead.created_at.isoformat() if lead.created_at else "",
-            ])
-            rows_written += 1
-
-        if rows_written == 0:
-            raise HTTPException(status_code=404, detail="No leads matched the selected filters.")
-
-        output = io.BytesIO()
-        workbook.save(output)
-        output.seek(0)
-
-        suffix_parts = []
-        if flow_type:
-            suffix_parts.append(flow_type)
-        if date_from:
-            suffix_parts.append(f"from_{date_from}")
-        if date_to:
-            suffix_parts.append(f"to_{date_to}")
-        suffix = ("_" + "_".join(suffix_parts)) if suffix_parts else ""
-
-        return StreamingResponse(
-            output,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={
-                "Content-Disposition": f"attachment; filename=pushed_leads{suffix}.xlsx"
-            },
-        )
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+                _iso(lead.created_at),
+            ]
 
 
-@router.get("/export-non-pushed-leads")
-def export_non_pushed_leads_excel(
+@router.get("/export-pushed-leads")
+def export_pushed_leads_excel(
     db: Session = Depends(get_db),
     flow_type: Optional[str] = Query(None),
     date_from: Optional[str] = Query(None),
     date_to: Optional[str] = Query(None),
+    file_format: str = Query("xlsx", alias="format", description="xlsx or csv"),
+    background: bool = Query(False, description="Build the file as a background job"),
 ):
     """
-    Export leads that started a flow but were NOT pushed to Zoho (no Lead entry).
+    Export leads pushed to Zoho (stored in leads table) as an Excel workbook.
     Results can be filtered by flow type and date range.
     """
     try:
         dt_from = _parse_dt(date_from)
-        dt_to = _parse_dt(date_to)
-        dt_to_upper: Optional[datetime] = None
-        if dt_to:
-            if date_to and len(date_to) == 10:
-                dt_to_upper = dt_to + timedelta(days=1)
-            else:
-                dt_to_upper = dt_to
-
-        # Get all FlowLog entries that represent flow starts
-        log_filters = [
-            FlowLog.step.isnot(None),
-            FlowLog.wa_id.isnot(None),
-        ]
-        if flow_type:
-            log_filters.append(FlowLog.flow_type == flow_type)
-        if dt_from:
-            log_filters.append(FlowLog.created_at >= dt_from)
-        if dt_to_upper:
-            log_filters.append(FlowLog.created_at < dt_to_upper)
-
-        # Get all unique wa_ids from FlowLog that have entries
-        flow_log_wa_ids_result = (
-            db.query(FlowLog.wa_id)
-            .filter(and_(*log_filters))
-            .distinct()
-            .all()
+        dt_to_upper = _upper_bound(_parse_dt(date_to), date_to)
+        return export(
+            db,
+            filename="pushed_leads" + _export_suffix(
+                flow_type, date_from and f"from_{date_from}", date_to and f"to_{date_to}"
+            ),
+            sheet_title="Pushed Leads",
+            header=["Name", "Lead ID", "Lead Source", "Sub Source", "Phone Number", "Peer Number", "Type of Flow", "Created At"],
+            rows=lambda session: _pushed_leads_rows(
+                session, flow_type=flow_type, dt_from=dt_from, dt_to_upper=dt_to_upper
+            ),
+            empty_detail="No leads matched the selected filters.",
+            file_format=file_format,
+            background=background,
         )
-        flow_log_wa_ids_set = {row[0] for row in flow_log_wa_ids_result if row[0]}
-
-        # Get all wa_ids that have Lead entries (pushed to Zoho)
-        pushed_wa_ids_result = (
-            db.query(Lead.wa_id)
-            .distinct()
-            .all()
-        )
-        pushed_wa_ids_set = {row[0] for row in pushed_wa_ids_result if row[0]}
-
-        # Find wa_ids that are in FlowLog but NOT in Lead (non-pushed leads)
-        non_pushed_wa_ids_set = flow_log_wa_ids_set - pushed_wa_ids_set
-        non_pushed_wa_ids = list(non_pushed_wa_ids_set)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        if not non_pushed_wa_ids:
-            raise HTTPException(status_code=404, detail="No non-pushed leads found for the selected filters.")
 
-        # Get latest FlowLog entry for each non-pushed wa_id
-        latest_log_subq = (
-            db.query(
-                FlowLog.wa_id,
-                func.max(FlowLog.created_at).label('max_created_at')
-            )
-            .filter(FlowLog.wa_id.in_(non_pushed_wa_ids))
-            .filter(and_(*log_filters))
-            .group_by(FlowLog.wa_id)
-            .subquery()
+def _non_pushed_leads_rows(db: Session, *, flow_type, dt_from, dt_to_upper):
+    # FlowLog entries that represent flow starts
+    log_filters = [
+        FlowLog.step.isnot(None),
+        FlowLog.wa_id.isnot(None),
+    ]
+    if flow_type:
+        log_filters.append(FlowLog.flow_type == flow_type)
+    if dt_from:
+        log_filters.append(FlowLog.created_at >= dt_from)
+    if dt_to_upper:
+        log_filters.append(FlowLog.created_at < dt_to_upper)
+
+    # wa_ids in FlowLog with no Lead entry (not pushed to Zoho)
+    pushed = db.query(Lead.id).filter(Lead.wa_id == FlowLog.wa_id).exists()
+
+    # Latest FlowLog entry for each non-pushed wa_id
+    latest_log_subq = (
+        db.query(
+            FlowLog.wa_id,
+            func.max(FlowLog.created_at).label('max_created_at')
         )
+        .filter(and_(*log_filters), ~pushed)
+        .group_by(FlowLog.wa_id)
+        .subquery()
+    )
 
-        # Get full FlowLog entries with customer info
-        results = (
-            db.query(
-                FlowLog,
-                Customer.name,
-                Customer.phone_1,
-                Customer.email
-            )
-            .join(
-                latest_log_subq,
-                and_(
-                    FlowLog.wa_id == latest_log_subq.c.wa_id,
-                    FlowLog.created_at == latest_log_subq.c.max_created_at
-                )
+    results = (
+        db.query(
+            FlowLog,
+            Customer.name,
+            Customer.phone_1,
+            Customer.email
+        )
+        .join(
+            latest_log_subq,
+            and_(
+                FlowLog.wa_id == latest_log_subq.c.wa_id,
+                FlowLog.created_at == latest_log_subq.c.max_created_at
             )
-            .outerjoin(Customer, FlowLog.wa_id == Customer.wa_id)
-            .all()
         )
+        .outerjoin(Customer, FlowLog.wa_id == Customer.wa_id)
+    )
 
-        # Get peer numbers for non-pushed leads
-        non_pushed_wa_ids = [log.wa_id for log, _, _, _ in results if log.wa_id]
-        peer_number_map = _get_peer_numbers_for_customers(db, non_pushed_wa_ids)
-
-        workbook = Workbook()
-        worksheet = workbook.active
-        worksheet.title = "Non-Pushed Leads"
-        worksheet.append([
-            "Name", "Phone Number", "Email", "WA ID", "Peer Number", "Flow Type", "Last Step", 
-            "Description", "Status Code", "Created At"
-        ])
-
-        rows_written = 0
-        for log, customer_name, phone_1, email in results:
+    for chunk in iter_chunks(stream_rows(results)):
+        peer_number_map = _get_peer_numbers_for_customers(db, [log.wa_id for log, _, _, _ in chunk if log.wa_id])
+        for log, customer_name, phone_1, email in chunk:
             # Prioritize Customer.name from join, then FlowLog.name, then "Unknown"
             if customer_name and customer_name.strip():
                 name = customer_name.strip()
@@ -571,175 +468,114 @@ def export_non_pushed_leads_excel(
                 name = log.name.strip()
             else:
                 name = "Unknown"
-            phone = phone_1 or log.wa_id or ""
-            peer_number = peer_number_map.get(log.wa_id, "") if log.wa_id else ""
-            
-            worksheet.append([
+
+            yield [
                 name,
-                phone,
+                phone_1 or log.wa_id or "",
                 email or "",
                 log.wa_id or "",
-                peer_number,
+                peer_number_map.get(log.wa_id, "") if log.wa_id else "",
                 log.flow_type or "",
                 log.step or "",
                 log.description or "",
                 log.status_code or "",
-                log.created_at.isoformat() if log.created_at else "",
-            ])
-            rows_written += 1
+                _iso(log.created_at),
+            ]
 
-        if rows_written == 0:
-            raise HTTPException(status_code=404, detail="No non-pushed leads matched the selected filters.")
 
-        output = io.BytesIO()
-        workbook.save(output)
-        output.seek(0)
-
-        suffix_parts = []
-        if flow_type:
-            suffix_parts.append(flow_type)
-        if date_from:
-            suffix_parts.append(f"from_{date_from}")
-        if date_to:
-            suffix_parts.append(f"to_{date_to}")
-        suffix = ("_" + "_".join(suffix_parts)) if suffix_parts else ""
-
-        return StreamingResponse(
-            output,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={
-                "Content-Disposition": f"attachment; filename=non_pushed_leads{suffix}.xlsx"
-            },
-        )
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-
-@router.get("/export-all-leads")
-def export_all_leads_excel(
+@router.get("/export-non-pushed-leads")
+def export_non_pushed_leads_excel(
     db: Session = Depends(get_db),
     flow_type: Optional[str] = Query(None),
     date_from: Optional[str] = Query(None),
     date_to: Optional[str] = Query(None),
+    file_format: str = Query("xlsx", alias="format", description="xlsx or csv"),
+    background: bool = Query(False, description="Build the file as a background job"),
 ):
     """
-    Export ALL customers (both pushed and non-pushed) who messaged in the date range.
-    Includes customers with messages but no FlowLog entries to ensure no contacts are missing.
+    Export leads that started a flow but were NOT pushed to Zoho (no Lead entry).
     Results can be filtered by flow type and date range.
     """
     try:
-        # Validate and parse dates
-        if not date_from or not date_to:
-            raise HTTPException(status_code=400, detail="Both date_from and date_to are required (YYYY-MM-DD)")
-        
         dt_from = _parse_dt(date_from)
-        dt_to = _parse_dt(date_to)
-        
-        if not dt_from or not dt_to:
-            raise HTTPException(status_code=400, detail="Invalid date format. Please use YYYY-MM-DD format.")
-        
-        # Ensure dt_to includes the entire day
-        if date_to and len(date_to) == 10:
-            dt_to_upper = dt_to + timedelta(days=1)
-        else:
-            dt_to_upper = dt_to
-
-        workbook = Workbook()
-        worksheet = workbook.active
-        worksheet.title = "All Customers"
-
-        flow_type_labels = {
-            "treatment": "Marketing",
-            "lead_appointment": "Meta Ad Campaign",
-        }
+        dt_to_upper = _upper_bound(_parse_dt(date_to), date_to)
+        return export(
+            db,
+            filename="non_pushed_leads" + _export_suffix(
+                flow_type, date_from and f"from_{date_from}", date_to and f"to_{date_to}"
+            ),
+            sheet_title="Non-Pushed Leads",
+            header=[
+                "Name", "Phone Number", "Email", "WA ID", "Peer Number", "Flow Type", "Last Step",
+                "Description", "Status Code", "Created At"
+            ],
+            rows=lambda session: _non_pushed_leads_rows(
+                session, flow_type=flow_type, dt_from=dt_from, dt_to_upper=dt_to_upper
+            ),
+            empty_detail="No non-pushed leads found for the selected filters.",
+            file_format=file_format,
+            background=background,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        def infer_flow_from_source(lead_source: Optional[str]) -> Optional[str]:
-            if not lead_source:
-                return None
-            source_lower = lead_source.lower()
-            if "business" in source_lower:
-                return "treatment"
-            if "facebook" in source_lower or "meta" in source_lower:
-                return "lead_appointment"
-            return None
 
-        # Unified header with all columns
-        worksheet.append([
-            "Status", "Name", "Phone Number", "Email", "WA ID", "Lead ID", 
-            "Lead Source", "Sub Source", "Peer Number", "Flow Type", 
-            "Last Step", "Description", "Status Code", "Keywords", "Who Ended Chat First", "Message Count", "First Message", "Last Message", "Created At"
-        ])
-        
-        # FIRST: Get ALL customers who messaged in the date range from Message table (PRIMARY SOURCE)
-        # Start from Message table to ensure we get EVERY customer who messaged
-        message_filters = [
+def _latest_flow_logs(db: Session, wa_ids: List[str], filters: List[Any]) -> Dict[str, FlowLog]:
+    """Latest matching FlowLog per wa_id."""
+    latest: Dict[str, FlowLog] = {}
+    if not wa_ids:
+        return latest
+    logs = db.query(FlowLog).filter(FlowLog.wa_id.in_(wa_ids), *filters).order_by(FlowLog.created_at.asc())
+    for log in logs:
+        if log.wa_id:
+            latest[log.wa_id] = log
+    return latest
+
+
+def _all_leads_rows(db: Session, *, flow_type, dt_from, dt_to_upper):
+    # Start from the Message table so EVERY customer who messaged in the range is included,
+    # even when there is no Customer record (customer_id is null -> use from_wa_id)
+    messages_query = (
+        db.query(
+            Message.customer_id,
+            Message.from_wa_id,
+            func.count(Message.id).label("message_count"),
+            func.min(Message.timestamp).label("first_message"),
+            func.max(Message.timestamp).label("last_message")
+        )
+        .filter(
             Message.sender_type == "customer",
             Message.timestamp >= dt_from,
-            Message.timestamp < dt_to_upper
-        ]
-        
-        # Get all unique customer_ids from messages in date range
-        # Use outerjoin to include messages even if Customer record doesn't exist
-        messages_query = (
-            db.query(
-                Message.customer_id,
-                Message.from_wa_id,  # Use from_wa_id as wa_id if customer_id is null
-                func.count(Message.id).label("message_count"),
-                func.min(Message.timestamp).label("first_message"),
-                func.max(Message.timestamp).label("last_message")
-            )
-            .outerjoin(Customer, Message.customer_id == Customer.id)
-            .filter(and_(*message_filters))
-            .group_by(Message.customer_id, Message.from_wa_id)
+            Message.timestamp < dt_to_upper,
         )
-        
-        messages_result = messages_query.all()
-        
-        if not messages_result:
-            raise HTTPException(status_code=404, detail=f"No messages found for the selected date range ({date_from} to {date_to}).")
-        
-        # Build maps: customer_id -> wa_id and wa_id -> message stats
-        customer_id_to_wa_id = {}
-        message_stats = {}
-        all_customer_ids = []
-        
-        for row in messages_result:
-            customer_id = row[0]
-            from_wa_id = row[1]
-            msg_count = row[2]
-            first_msg = row[3]
-            last_msg = row[4]
-            
-            # Determine wa_id: use Customer.wa_id if customer_id exists, otherwise use from_wa_id
-            if customer_id:
-                all_customer_ids.append(customer_id)
-                # We'll get wa_id from Customer table below
-            else:
-                # If no customer_id, use from_wa_id directly
-                wa_id = from_wa_id
-                if wa_id:
-                    message_stats[wa_id] = {
-                        'count': msg_count,
-                        'first': first_msg,
-                        'last': last_msg
-                    }
-        
-        # Get all Customer records for the customer_ids we found
-        all_customers = []
-        if all_customer_ids:
-            all_customers = db.query(Customer).filter(Customer.id.in_(all_customer_ids)).all()
-        
-        customer_map_all = {}
-        for customer in all_customers:
-            if customer.wa_id:
-                customer_map_all[customer.wa_id] = customer
-                customer_id_to_wa_id[customer.id] = customer.wa_id
-        
-        # Now get message stats for customers with Customer records
-        if all_customer_ids:
-            message_stats_query = (
+        .group_by(Message.customer_id, Message.from_wa_id)
+    )
+
+    flow_log_filters = [FlowLog.created_at >= dt_from, FlowLog.created_at < dt_to_upper]
+    if flow_type:
+        flow_log_filters.append(FlowLog.flow_type == flow_type)
+
+    seen_wa_ids = set()
+    for chunk in iter_chunks(stream_rows(messages_query)):
+        customer_ids = [row.customer_id for row in chunk if row.customer_id]
+        message_stats: Dict[str, Dict[str, Any]] = {}
+        customer_map: Dict[str, Customer] = {}
+
+        for row in chunk:
+            if not row.customer_id and row.from_wa_id:
+                message_stats[row.from_wa_id] = {
+                    'count': row.message_count,
+                    'first': row.first_message,
+                    'last': row.last_message,
+                }
+
+        if customer_ids:
+            for customer in db.query(Customer).filter(Customer.id.in_(customer_ids)):
+                if customer.wa_id:
+                    customer_map[customer.wa_id] = customer
+            stats_query = (
                 db.query(
                     Customer.wa_id,
                     func.count(Message.id).label("message_count"),
@@ -747,262 +583,158 @@ def export_all_leads_excel(
                     func.max(Message.timestamp).label("last_message")
                 )
                 .join(Message, Customer.id == Message.customer_id)
-                .filter(and_(
-                    Message.customer_id.in_(all_customer_ids),
+                .filter(
+                    Message.customer_id.in_(customer_ids),
                     Message.timestamp >= dt_from,
-                    Message.timestamp < dt_to_upper
-                ))
+                    Message.timestamp < dt_to_upper,
+                )
                 .group_by(Customer.wa_id)
             )
-            
-            for row in message_stats_query.all():
-                wa_id = row[0]
+            for wa_id, count, first, last in stats_query:
                 if wa_id:
-                    message_stats[wa_id] = {
-                        'count': row[1],
-                        'first': row[2],
-                        'last': row[3]
-                    }
-        
-        # Get all unique wa_ids (from Customer records + from_wa_id for messages without customer_id)
-        all_wa_ids_set = set(customer_map_all.keys())
-        for row in messages_result:
-            if not row[0] and row[1]:  # No customer_id but has from_wa_id
-                all_wa_ids_set.add(row[1])
-        
-        if not all_wa_ids_set:
-            raise HTTPException(status_code=404, detail=f"No customers found for the selected date range ({date_from} to {date_to}).")
-        
-        all_wa_ids_list = list(all_wa_ids_set)
+                    message_stats[wa_id] = {'count': count, 'first': first, 'last': last}
 
-        lead_query = db.query(Lead)
-        if dt_from:
-            lead_query = lead_query.filter(Lead.created_at >= dt_from)
-        if dt_to_upper:
-            lead_query = lead_query.filter(Lead.created_at < dt_to_upper)
+        wa_ids = [
+            wa_id for wa_id in dict.fromkeys(
+                list(customer_map.keys())
+                + [row.from_wa_id for row in chunk if not row.customer_id and row.from_wa_id]
+            )
+            if wa_id not in seen_wa_ids
+        ]
+        seen_wa_ids.update(wa_ids)
+        if not wa_ids:
+            continue
 
-        leads: List[Lead] = (
-            lead_query.order_by(Lead.created_at.desc()).limit(20000).all()
-        )
+        peer_number_map = _get_peer_numbers_for_customers(db, wa_ids)
+        keywords_map = _extract_keywords_from_messages(db, wa_ids)
+        who_ended_map = _get_who_ended_chat_first(db, wa_ids)
+        customer_flow_map = _latest_flow_logs(db, wa_ids, flow_log_filters)
+
+        # Pushed leads created in the range (oldest one per wa_id)
+        lead_map_by_wa_id = {
+            lead.wa_id: lead
+            for lead in db.query(Lead)
+            .filter(Lead.wa_id.in_(wa_ids), Lead.created_at >= dt_from, Lead.created_at < dt_to_upper)
+            .order_by(Lead.created_at.desc())
+        }
 
-        # Get peer numbers for ALL customers
-        peer_number_map_all = _get_peer_numbers_for_customers(db, all_wa_ids_list)
-        
-        # Get keywords and who ended for ALL customers
-        keywords_map_all = _extract_keywords_from_messages(db, all_wa_ids_list)
-        who_ended_map_all = _get_who_ended_chat_first(db, all_wa_ids_list)
-        
-        # Get FlowLog info for customers who entered flows in date range
-        flow_log_filters = [
-            FlowLog.wa_id.in_(all_wa_ids_list),
-        ]
-        if dt_from:
-            flow_log_filters.append(FlowLog.created_at >= dt_from)
-        if dt_to_upper:
-            flow_log_filters.append(FlowLog.created_at < dt_to_upper)
-        if flow_type:
-            flow_log_filters.append(FlowLog.flow_type == flow_type)
-        
-        flow_logs_all = db.query(FlowLog).filter(and_(*flow_log_filters)).all()
-        
-        # Get latest flow log for each customer
-        customer_flow_map = {}
-        for log in flow_logs_all:
-            if not log.wa_id:
+        for wa_id in wa_ids:
+            flow_log = customer_flow_map.get(wa_id)
+            # With a flow_type filter, only customers whose latest flow matches are included
+            if flow_type and not flow_log:
                 continue
-            if log.wa_id not in customer_flow_map:
-                customer_flow_map[log.wa_id] = log
-            else:
-                # Keep the latest flow log
-                if log.created_at and customer_flow_map[log.wa_id].created_at:
-                    if log.created_at > customer_flow_map[log.wa_id].created_at:
-                        customer_flow_map[log.wa_id] = log
-        
-        # Get pushed leads (customers who have Lead entries)
-        lead_map_by_wa_id = {lead.wa_id: lead for lead in leads if lead.wa_id}
-        pushed_wa_ids_set = set(lead_map_by_wa_id.keys())
-        
-        # Process ALL customers who messaged in date range
-        rows_written = 0
-        
-        for wa_id in all_wa_ids_list:
-            customer = customer_map_all.get(wa_id)
-            
-            # If no customer record, create a minimal customer object from message data
-            if not customer:
-                # Try to get wa_id from messages
-                customer_wa_id = wa_id
-                customer_name = "Unknown"
-                customer_phone = wa_id if wa_id else ""
-                customer_email = ""
-                customer_org_id = None
+
+            customer = customer_map.get(wa_id)
+            if customer:
+                customer_name, customer_phone, customer_email = customer.name, customer.phone_1, customer.email
             else:
-                customer_wa_id = customer.wa_id
-                customer_name = customer.name
-                customer_phone = customer.phone_1
-                customer_email = customer.email
-                customer_org_id = customer.organization_id
-            
-            # Get customer name (prioritize Customer.name)
-            name = customer_name if customer_name and customer_name.strip() else "Unknown"
-            phone = customer_phone or wa_id or ""
-            email = customer_email or ""
-            peer_number = peer_number_map_all.get(wa_id, "") if wa_id else ""
-            
-            # Get message stats
+                customer_name, customer_phone, customer_email = "Unknown", wa_id, ""
+
             stats = message_stats.get(wa_id, {'count': 0, 'first': None, 'last': None})
-            message_count = stats['count']
-            first_message = stats['first']
-            last_message = stats['last']
-            
-            # Get keywords and who ended
-            keywords = keywords_map_all.get(wa_id, "") if wa_id else ""
-            who_ended = who_ended_map_all.get(wa_id, "") if wa_id else ""
-            
-            # Determine if pushed or non-pushed
-            is_pushed = wa_id in pushed_wa_ids_set
-            status = "Pushed" if is_pushed else "Non-Pushed"
-            
-            # Get Lead info if pushed
-            lead_id = ""
-            lead_source = ""
-            sub_source = ""
-            lead_created_at = ""
-            if is_pushed:
-                lead = lead_map_by_wa_id.get(wa_id)
-                if lead:
-                    lead_id = lead.zoho_lead_id or ""
-                    lead_source = lead.lead_source or ""
-                    sub_source = lead.sub_source or ""
-                    lead_created_at = lead.created_at.isoformat() if lead.created_at else ""
-            
-            # Get FlowLog info if available
-            flow_log = customer_flow_map.get(wa_id)
-            flow_type_str = ""
-            last_step = ""
-            description = ""
-            status_code = ""
-            
+            lead = lead_map_by_wa_id.get(wa_id)
+
+            flow_type_str = last_step = description = status_code = ""
             if flow_log:
-                flow_type_str = flow_type_labels.get(flow_log.flow_type or "", flow_log.flow_type or "")
+                flow_type_str = FLOW_TYPE_LABELS.get(flow_log.flow_type or "", flow_log.flow_type or "")
                 last_step = flow_log.step or ""
                 description = flow_log.description or ""
                 status_code = str(flow_log.status_code) if flow_log.status_code else ""
-            
-            # If flow_type filter is set, only include customers with matching flow type
-            # Include customers who messaged even if they don't have a flow log (they might have messaged but not entered a flow)
-            if flow_type:
-                # If customer has a flow log, check if it matches the filter
-                if flow_log:
-                    if flow_log.flow_type != flow_type:
-                        continue  # Skip if flow type doesn't match
-                # If customer has no flow log but flow_type filter is set, 
-                # we skip them as they didn't enter any flow (and we're filtering by flow type)
-                else:
-                    continue
-            
-            worksheet.append([
-                status,
-                name,
-                phone,
-                email,
+
+            lead_created_at = _iso(lead.created_at) if lead else ""
+            yield [
+                "Pushed" if lead else "Non-Pushed",
+                customer_name if customer_name and customer_name.strip() else "Unknown",
+                customer_phone or wa_id or "",
+                customer_email or "",
                 wa_id,
-                lead_id,
-                lead_source,
-                sub_source,
-                peer_number,
+                (lead.zoho_lead_id or "") if lead else "",
+                (lead.lead_source or "") if lead else "",
+                (lead.sub_source or "") if lead else "",
+                peer_number_map.get(wa_id, ""),
                 flow_type_str,
                 last_step,
                 description,
                 status_code,
-                keywords,
-                who_ended,
-                message_count,
-                first_message.isoformat() if first_message else "",
-                last_message.isoformat() if last_message else "",
-                lead_created_at if lead_created_at else (flow_log.created_at.isoformat() if flow_log and flow_log.created_at else "")
-            ])
-            rows_written += 1
-
-        if rows_written == 0:
-            raise HTTPException(status_code=404, detail="No customers found for the selected filters.")
-
-        output = io.BytesIO()
-        workbook.save(output)
-        output.seek(0)
-
-        suffix_parts = []
-        if flow_type:
-            suffix_parts.append(flow_type)
-        if date_from:
-            suffix_parts.append(f"from_{date_from}")
-        if date_to:
-            suffix_parts.append(f"to_{date_to}")
-        suffix = ("_" + "_".join(suffix_parts)) if suffix_parts else ""
-
-        return StreamingResponse(
-            output,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={
-                "Content-Disposition": f"attachment; filename=all_leads{suffix}.xlsx"
-            },
-        )
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+                keywords_map.get(wa_id, ""),
+                who_ended_map.get(wa_id, ""),
+                stats['count'],
+                _iso(stats['first']),
+                _iso(stats['last']),
+                lead_created_at or (_iso(flow_log.created_at) if flow_log else ""),
+            ]
 
 
-@router.get("/export-all-customers-by-date")
-def export_all_customers_by_date_excel(
+@router.get("/export-all-leads")
+def export_all_leads_excel(
     db: Session = Depends(get_db),
-    date_from: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
-    date_to: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
-    flow_type: Optional[str] = Query(None, description="Filter by flow type"),
+    flow_type: Optional[str] = Query(None),
+    date_from: Optional[str] = Query(None),
+    date_to: Optional[str] = Query(None),
+    file_format: str = Query("xlsx", alias="format", description="xlsx or csv"),
+    background: bool = Query(False, description="Build the file as a background job"),
 ):
     """
     Export ALL customers (both pushed and non-pushed) who messaged in the date range.
-    Includes all customer data with peer numbers in a single Excel sheet.
-    Ensures no customers are missing - includes all who messaged in the date range.
+    Includes customers with messages but no FlowLog entries to ensure no contacts are missing.
+    Results can be filtered by flow type and date range.
     """
     try:
+        # Validate and parse dates
+        if not date_from or not date_to:
+            raise HTTPException(status_code=400, detail="Both date_from and date_to are required (YYYY-MM-DD)")
+
         dt_from = _parse_dt(date_from)
         dt_to = _parse_dt(date_to)
-        
+
         if not dt_from or not dt_to:
-            raise HTTPException(status_code=400, detail="Both date_from and date_to are required (YYYY-MM-DD)")
-        
-        # Ensure dt_to includes the entire day
-        if date_to and len(date_to) == 10:
-            dt_to_upper = dt_to + timedelta(days=1)
-        else:
-            dt_to_upper = dt_to
-        
-        # Get ALL customers who messaged in the date range
-        message_filters = [
-            Message.timestamp >= dt_from,
-            Message.timestamp < dt_to_upper,
-            Message.sender_type == "customer"  # Only customer messages
-        ]
-        
-        # Get all unique customers who messaged in date range
-        customers_with_messages_query = (
-            db.query(Customer.wa_id)
-            .join(Message, Customer.id == Message.customer_id)
-            .filter(and_(*message_filters))
-            .distinct()
+            raise HTTPException(status_code=400, detail="Invalid date format. Please use YYYY-MM-DD format.")
+
+        dt_to_upper = _upper_bound(dt_to, date_to)
+        return export(
+            db,
+            filename="all_leads" + _export_suffix(flow_type, f"from_{date_from}", f"to_{date_to}"),
+            sheet_title="All Customers",
+            header=[
+                "Status", "Name", "Phone Number", "Email", "WA ID", "Lead ID",
+                "Lead Source", "Sub Source", "Peer Number", "Flow Type",
+                "Last Step", "Description", "Status Code", "Keywords", "Who Ended Chat First", "Message Count", "First Message", "Last Message", "Created At"
+            ],
+            rows=lambda session: _all_leads_rows(
+                session, flow_type=flow_type, dt_from=dt_from, dt_to_upper=dt_to_upper
+            ),
+            empty_detail=f"No customers found for the selected date range ({date_from} to {date_to}).",
+            file_format=file_format,
+            background=background,
         )
-        customers_with_messages_result = customers_with_messages_query.all()
-        all_wa_ids = [row[0] for row in customers_with_messages_result if row[0]]
-        
-        if not all_wa_ids:
-            raise HTTPException(status_code=404, detail="No customers found for the selected date range.")
-        
-        # Get all customer details
-        customers = db.query(Customer).filter(Customer.wa_id.in_(all_wa_ids)).all()
-        customer_map = {c.wa_id: c for c in customers}
-        
-        # Get message counts and timestamps for each customer in date range
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _all_customers_by_date_rows(db: Session, *, flow_type, dt_from, dt_to_upper):
+    message_filters = [
+        Message.timestamp >= dt_from,
+        Message.timestamp < dt_to_upper,
+        Message.sender_type == "customer"  # Only customer messages
+    ]
+
+    # All unique customers who messaged in date range
+    customers_with_messages_query = (
+        db.query(Customer.wa_id)
+        .join(Message, Customer.id == Message.customer_id)
+        .filter(and_(*message_filters), Customer.wa_id.isnot(None))
+        .distinct()
+    )
+
+    flow_log_filters = [FlowLog.created_at >= dt_from, FlowLog.created_at < dt_to_upper]
+    if flow_type:
+        flow_log_filters.append(FlowLog.flow_type == flow_type)
+
+    for chunk in iter_chunks(stream_rows(customers_with_messages_query)):
+        wa_ids = [row[0] for row in chunk]
+        customer_map = {c.wa_id: c for c in db.query(Customer).filter(Customer.wa_id.in_(wa_ids))}
+
         message_stats_query = (
             db.query(
                 Customer.wa_id,
@@ -1011,319 +743,186 @@ def export_all_customers_by_date_excel(
                 func.max(Message.timestamp).label("last_message")
             )
             .join(Message, Customer.id == Message.customer_id)
-            .filter(Customer.wa_id.in_(all_wa_ids))
+            .filter(Customer.wa_id.in_(wa_ids))
             .filter(and_(*message_filters))
             .group_by(Customer.wa_id)
         )
-        message_stats = {row[0]: {
-            'count': row[1],
-            'first': row[2],
-            'last': row[3]
-        } for row in message_stats_query.all()}
-        
-        # Get FlowLog info for customers (if they entered a flow in date range)
-        flow_log_filters = [
-            FlowLog.wa_id.in_(all_wa_ids),
-            FlowLog.created_at >= dt_from,
-            FlowLog.created_at < dt_to_upper
-        ]
-        if flow_type:
-            flow_log_filters.append(FlowLog.flow_type == flow_type)
-        
-        flow_logs_query = db.query(FlowLog).filter(and_(*flow_log_filters))
-        flow_logs = flow_logs_query.all()
-        
-        # Group flow logs by wa_id - get latest flow info for each customer
-        flow_log_map = {}
-        for log in flow_logs:
-            if not log.wa_id:
-                continue
-            if log.wa_id not in flow_log_map:
-                flow_log_map[log.wa_id] = []
-            flow_log_map[log.wa_id].append(log)
-        
-        # Get latest flow log for each customer
-        customer_flow_info = {}
-        for wa_id, logs in flow_log_map.items():
-            latest_log = max(logs, key=lambda x: x.created_at if x.created_at else datetime.min)
-            customer_flow_info[wa_id] = {
-                'flow_type': latest_log.flow_type or "",
-                'step': latest_log.step or "",
-                'status_code': str(latest_log.status_code) if latest_log.status_code else "",
-                'description': latest_log.description or ""
+        message_stats = {row[0]: {'count': row[1], 'first': row[2], 'last': row[3]} for row in message_stats_query}
+
+        customer_flow_map = _latest_flow_logs(db, wa_ids, flow_log_filters)
+        peer_number_map = _get_peer_numbers_for_customers(db, wa_ids)
+
+        # Pushed = has any Lead entry; Lead details only from leads created in the range
+        pushed_wa_ids_set = {
+            row[0] for row in db.query(Lead.wa_id).filter(Lead.wa_id.in_(wa_ids)).distinct()
+        }
+        lead_map = {}
+        if pushed_wa_ids_set:
+            lead_map = {
+                lead.wa_id: lead
+                for lead in db.query(Lead).filter(
+                    Lead.wa_id.in_(list(pushed_wa_ids_set)),
+                    Lead.created_at >= dt_from,
+                    Lead.created_at < dt_to_upper,
+                )
             }
-        
-        # Get peer numbers for all customers
-        peer_number_map = _get_peer_numbers_for_customers(db, all_wa_ids)
-        
-        # Check which customers are pushed (have Lead entries)
-        pushed_wa_ids_result = (
-            db.query(Lead.wa_id)
-            .filter(Lead.wa_id.in_(all_wa_ids))
-            .distinct()
-            .all()
-        )
-        pushed_wa_ids_set = {row[0] for row in pushed_wa_ids_result if row[0]}
-        
-        # Get Lead info for pushed customers
-        leads_query = db.query(Lead).filter(Lead.wa_id.in_(list(pushed_wa_ids_set)))
-        if dt_from:
-            leads_query = leads_query.filter(Lead.created_at >= dt_from)
-        if dt_to_upper:
-            leads_query = leads_query.filter(Lead.created_at < dt_to_upper)
-        leads = leads_query.all()
-        lead_map = {lead.wa_id: lead for lead in leads}
-        
-        # Create workbook with single sheet
-        workbook = Workbook()
-        worksheet = workbook.active
-        worksheet.title = "All Customers"
-        
-        # Header row
-        worksheet.append([
-            "Status", "Name", "Phone Number", "Email", "WA ID", "Peer Number",
-            "Message Count", "First Message Time", "Last Message Time",
-            "Flow Type", "Last Flow Step", "Flow Status", "Flow Description",
-            "Lead ID", "Lead Source", "Sub Source", "Organization ID"
-        ])
-        
-        rows_written = 0
-        for wa_id in all_wa_ids:
+
+        for wa_id in wa_ids:
             customer = customer_map.get(wa_id)
             if not customer:
                 continue
-            
-            # Get customer name (prioritize Customer.name)
-            name = customer.name if customer.name and customer.name.strip() else "Unknown"
-            phone = customer.phone_1 or wa_id or ""
-            email = customer.email or ""
-            peer_number = peer_number_map.get(wa_id, "") if wa_id else ""
-            
-            # Get message stats
+
             stats = message_stats.get(wa_id, {'count': 0, 'first': None, 'last': None})
-            message_count = stats['count']
-            first_message = stats['first']
-            last_message = stats['last']
-            
-            # Get flow info
-            flow_info = customer_flow_info.get(wa_id, {
-                'flow_type': "",
-                'step': "",
-                'status_code': "",
-                'description': ""
-            })
-            
-            # Determine status (Pushed or Non-Pushed)
-            is_pushed = wa_id in pushed_wa_ids_set
-            status = "Pushed" if is_pushed else "Non-Pushed"
-            
-            # Get Lead info if pushed
-            lead_id = ""
-            lead_source = ""
-            sub_source = ""
-            if is_pushed:
-                lead = lead_map.get(wa_id)
-                if lead:
-                    lead_id = lead.zoho_lead_id or ""
-                    lead_source = lead.lead_source or ""
-                    sub_source = lead.sub_source or ""
-            
-            worksheet.append([
-                status,
-                name,
-                phone,
-                email,
+            flow_log = customer_flow_map.get(wa_id)
+            lead = lead_map.get(wa_id)
+
+            yield [
+                "Pushed" if wa_id in pushed_wa_ids_set else "Non-Pushed",
+                customer.name if customer.name and customer.name.strip() else "Unknown",
+                customer.phone_1 or wa_id or "",
+                customer.email or "",
                 wa_id,
-                peer_number,
-                message_count,
-                first_message.isoformat() if first_message else "",
-                last_message.isoformat() if last_message else "",
-                flow_info['flow_type'],
-                flow_info['step'],
-                flow_info['status_code'],
-                flow_info['description'],
-                lead_id,
-                lead_source,
-                sub_source,
+                peer_number_map.get(wa_id, ""),
+                stats['count'],
+                _iso(stats['first']),
+                _iso(stats['last']),
+                (flow_log.flow_type or "") if flow_log else "",
+                (flow_log.step or "") if flow_log else "",
+                str(flow_log.status_code) if flow_log and flow_log.status_code else "",
+                (flow_log.description or "") if flow_log else "",
+                (lead.zoho_lead_id or "") if lead else "",
+                (lead.lead_source or "") if lead else "",
+                (lead.sub_source or "") if lead else "",
                 str(customer.organization_id) if customer.organization_id else ""
-            ])
-            rows_written += 1
-        
-        if rows_written == 0:
-            raise HTTPException(status_code=404, detail="No data to export.")
-        
-        output = io.BytesIO()
-        workbook.save(output)
-        output.seek(0)
-        
-        suffix = f"_{date_from}_to_{date_to}" if date_from and date_to else ""
-        if flow_type:
-            suffix += f"_{flow_type}"
-        
-        return StreamingResponse(
-            output,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={
-                "Content-Disposition": f"attachment; filename=all_customers_by_date{suffix}.xlsx"
-            },
-        )
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to export customers: {str(e)}")
+            ]
 
 
-@router.get("/export-chats-without-push")
-def export_chats_without_push_excel(
+@router.get("/export-all-customers-by-date")
+def export_all_customers_by_date_excel(
     db: Session = Depends(get_db),
-    date_from: Optional[str] = Query(None),
-    date_to: Optional[str] = Query(None),
+    date_from: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+    flow_type: Optional[str] = Query(None, description="Filter by flow type"),
+    file_format: str = Query("xlsx", alias="format", description="xlsx or csv"),
+    background: bool = Query(False, description="Build the file as a background job"),
 ):
     """
-    Export customers who have messages (chats) but no FlowLog entries (never entered a flow).
-    Results can be filtered by date range.
+    Export ALL customers (both pushed and non-pushed) who messaged in the date range.
+    Includes all customer data with peer numbers in a single Excel sheet.
+    Ensures no customers are missing - includes all who messaged in the date range.
     """
     try:
         dt_from = _parse_dt(date_from)
         dt_to = _parse_dt(date_to)
-        dt_to_upper: Optional[datetime] = None
-        if dt_to:
-            if date_to and len(date_to) == 10:
-                dt_to_upper = dt_to + timedelta(days=1)
-            else:
-                dt_to_upper = dt_to
 
-        # Get all wa_ids that have messages (join Message with Customer)
-        message_filters = []
-        if dt_from:
-            message_filters.append(Message.timestamp >= dt_from)
-        if dt_to_upper:
-            message_filters.append(Message.timestamp < dt_to_upper)
-
-        customers_with_messages_query = (
-            db.query(Customer.wa_id)
-            .join(Message, Customer.id == Message.customer_id)
-        )
-        if message_filters:
-            customers_with_messages_query = customers_with_messages_query.filter(and_(*message_filters))
-        customers_with_messages_result = customers_with_messages_query.distinct().all()
-        customers_with_messages_set = {row[0] for row in customers_with_messages_result if row[0]}
-
-        # Get all wa_ids that have FlowLog entries (entered a flow)
-        customers_with_flows_wa_ids = (
-            db.query(FlowLog.wa_id)
-            .distinct()
-            .all()
-        )
-        customers_with_flows_set = {row[0] for row in customers_with_flows_wa_ids if row[0]}
-
-        # Find customers with messages but NO FlowLog entries
-        chats_without_flow_wa_ids = customers_with_messages_set - customers_with_flows_set
-
-        if not chats_without_flow_wa_ids:
-            raise HTTPException(status_code=404, detail="No chats without flow push found for the selected filters.")
+        if not dt_from or not dt_to:
+            raise HTTPException(status_code=400, detail="Both date_from and date_to are required (YYYY-MM-DD)")
 
-        # Get customers
-        customers_query = (
-            db.query(Customer)
-            .filter(Customer.wa_id.in_(list(chats_without_flow_wa_ids)))
+        dt_to_upper = _upper_bound(dt_to, date_to)
+        return export(
+            db,
+            filename=f"all_customers_by_date_{date_from}_to_{date_to}" + _export_suffix(flow_type),
+            sheet_title="All Customers",
+            header=[
+                "Status", "Name", "Phone Number", "Email", "WA ID", "Peer Number",
+                "Message Count", "First Message Time", "Last Message Time",
+                "Flow Type", "Last Flow Step", "Flow Status", "Flow Description",
+                "Lead ID", "Lead Source", "Sub Source", "Organization ID"
+            ],
+            rows=lambda session: _all_customers_by_date_rows(
+                session, flow_type=flow_type, dt_from=dt_from, dt_to_upper=dt_to_upper
+            ),
+            empty_detail="No customers found for the selected date range.",
+            file_format=file_format,
+            background=background,
         )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to export customers: {str(e)}")
 
-        if dt_from or dt_to_upper:
-            # Also filter by customer creation date if date filters are provided
-            customer_date_filters = []
-            if dt_from:
-                customer_date_filters.append(Customer.created_at >= dt_from)
-            if dt_to_upper:
-                customer_date_filters.append(Customer.created_at < dt_to_upper)
-            if customer_date_filters:
-                customers_query = customers_query.filter(and_(*customer_date_filters))
-
-        customers = customers_query.order_by(Customer.created_at.desc()).limit(20000).all()
-
-        if not customers:
-            raise HTTPException(status_code=404, detail="No chats without flow push found for the selected filters.")
 
-        # Get latest message for each customer (join via customer_id)
-        customer_wa_ids = [c.wa_id for c in customers if c.wa_id]
-        if not customer_wa_ids:
-            message_map = {}
-        else:
-            latest_message_subq = (
-                db.query(
-                    Message.customer_id,
-                    func.max(Message.timestamp).label('max_timestamp')
-                )
-                .join(Customer, Message.customer_id == Customer.id)
-                .filter(Customer.wa_id.in_(customer_wa_ids))
-                .group_by(Message.customer_id)
-                .subquery()
+def _chats_without_push_rows(db: Session, *, dt_from, dt_to_upper):
+    message_filters = [Message.customer_id == Customer.id]
+    if dt_from:
+        message_filters.append(Message.timestamp >= dt_from)
+    if dt_to_upper:
+        message_filters.append(Message.timestamp < dt_to_upper)
+
+    # Customers with messages (chats) but NO FlowLog entries (never entered a flow)
+    has_messages = db.query(Message.id).filter(*message_filters).exists()
+    has_flow_logs = db.query(FlowLog.id).filter(FlowLog.wa_id == Customer.wa_id).exists()
+    customers_query = db.query(Customer).filter(Customer.wa_id.isnot(None), has_messages, ~has_flow_logs)
+
+    # Also filter by customer creation date if date filters are provided
+    if dt_from:
+        customers_query = customers_query.filter(Customer.created_at >= dt_from)
+    if dt_to_upper:
+        customers_query = customers_query.filter(Customer.created_at < dt_to_upper)
+
+    for customers in iter_chunks(stream_rows(customers_query.order_by(Customer.created_at.desc()))):
+        # Latest message for each customer in this chunk
+        customer_ids = [c.id for c in customers]
+        latest_message_subq = (
+            db.query(
+                Message.customer_id,
+                func.max(Message.timestamp).label('max_timestamp')
             )
-
-            latest_messages = (
-                db.query(
-                    Customer.wa_id,
-                    Message.body,
-                    Message.timestamp
-                )
-                .select_from(Message)
-                .join(
-                    latest_message_subq,
-                    and_(
-                        Message.customer_id == latest_message_subq.c.customer_id,
-                        Message.timestamp == latest_message_subq.c.max_timestamp
-                    )
+            .filter(Message.customer_id.in_(customer_ids))
+            .group_by(Message.customer_id)
+            .subquery()
+        )
+        latest_messages = (
+            db.query(Message.customer_id, Message.body, Message.timestamp)
+            .join(
+                latest_message_subq,
+                and_(
+                    Message.customer_id == latest_message_subq.c.customer_id,
+                    Message.timestamp == latest_message_subq.c.max_timestamp
                 )
-                .join(Customer, Message.customer_id == Customer.id)
-                .all()
             )
-            message_map = {wa_id: (body, timestamp) for wa_id, body, timestamp in latest_messages}
-
-        workbook = Workbook()
-        worksheet = workbook.active
-        worksheet.title = "Chats Without Push"
-        worksheet.append([
-            "Name", "Phone Number", "Email", "WA ID", "Last Message", "Last Message Time", "Created At"
-        ])
+        )
+        message_map = {customer_id: (body, timestamp) for customer_id, body, timestamp in latest_messages}
 
-        rows_written = 0
         for customer in customers:
-            last_msg_body, last_msg_time = message_map.get(customer.wa_id, ("", None))
-            
-            name = customer.name or "Unknown"
-            phone = customer.phone_1 or customer.wa_id or ""
-            
-            worksheet.append([
-                name,
-                phone,
+            last_msg_body, last_msg_time = message_map.get(customer.id, ("", None))
+            yield [
+                customer.name or "Unknown",
+                customer.phone_1 or customer.wa_id or "",
                 customer.email or "",
                 customer.wa_id or "",
                 (last_msg_body[:100] if last_msg_body else ""),  # Truncate long messages
-                last_msg_time.isoformat() if last_msg_time else "",
-                customer.created_at.isoformat() if customer.created_at else "",
-            ])
-            rows_written += 1
-
-        if rows_written == 0:
-            raise HTTPException(status_code=404, detail="No chats without flow push matched the selected filters.")
+                _iso(last_msg_time),
+                _iso(customer.created_at),
+            ]
 
-        output = io.BytesIO()
-        workbook.save(output)
-        output.seek(0)
 
-        suffix_parts = []
-        if date_from:
-            suffix_parts.append(f"from_{date_from}")
-        if date_to:
-            suffix_parts.append(f"to_{date_to}")
-        suffix = ("_" + "_".join(suffix_parts)) if suffix_parts else ""
-
-        return StreamingResponse(
-            output,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={
-                "Content-Disposition": f"attachment; filename=chats_without_push{suffix}.xlsx"
-            },
+@router.get("/export-chats-without-push")
+def export_chats_without_push_excel(
+    db: Session = Depends(get_db),
+    date_from: Optional[str] = Query(None),
+    date_to: Optional[str] = Query(None),
+    file_format: str = Query("xlsx", alias="format", description="xlsx or csv"),
+    background: bool = Query(False, description="Build the file as a background job"),
+):
+    """
+    Export customers who have messages (chats) but no FlowLog entries (never entered a flow).
+    Results can be filtered by date range.
+    """
+    try:
+        dt_from = _parse_dt(date_from)
+        dt_to_upper = _upper_bound(_parse_dt(date_to), date_to)
+        return export(
+            db,
+            filename="chats_without_push" + _export_suffix(
+                date_from and f"from_{date_from}", date_to and f"to_{date_to}"
+            ),
+            sheet_title="Chats Without Push",
+            header=["Name", "Phone Number", "Email", "WA ID", "Last Message", "Last Message Time", "Created At"],
+            rows=lambda session: _chats_without_push_rows(session, dt_from=dt_from, dt_to_upper=dt_to_upper),
+            empty_detail="No chats without flow push found for the selected filters.",
+            file_format=file_format,
+            background=background,
         )
     except HTTPException:
         raise
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from typing import List
 from uuid import UUID
@@ -6,6 +6,7 @@ import uuid
 from schemas.message_schema import MessageCreate, MessageOut
 from services import message_service
 from database.db import get_db
+from services.message_service import CHAT_PAGE_SIZE, CHAT_MAX_PAGE_SIZE
 from services.message_service import get_messages, get_customer_wa_ids_by_business_number, get_customer_wa_ids_by_date, get_customer_wa_ids_pending_agent_reply
 from models.models import User
 
@@ -61,10 +62,18 @@ def delete_message(message_id: int, db: Session = Depends(get_db)):
 @router.get("/chat/{wa_id}", response_model=List[MessageOut])
 def get_chat(
     wa_id: str,
+    response: Response,
     peer: str | None = Query(None, description="Optional other wa_id to filter chat with"),
+    limit: int = Query(CHAT_PAGE_SIZE, ge=1, le=CHAT_MAX_PAGE_SIZE, description="Messages per page"),
+    before: str | None = Query(None, description="Cursor from X-Next-Cursor to load older messages"),
     db: Session = Depends(get_db),
 ):
-    messages = get_messages(db, wa_id, peer)
+    try:
+        messages, next_cursor = get_messages(db, wa_id, peer, limit=limit, before=before)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
 
     if not messages:
         raise HTTPException(
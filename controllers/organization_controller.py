@@ -20,6 +20,8 @@ from schemas.organization_schema import (
 )
 from services import organization_service
 from auth import get_current_user, get_current_super_admin
+from cache.auth_cache import invalidate_organization
+from services.number_registry import invalidate_number_registry
 
 router = APIRouter(prefix="/organizations", tags=["Organizations"])
 
@@ -35,6 +37,7 @@ def create_organization(
         organization = organization_service.create_organization(
             db, organization_data, current_user
         )
+        invalidate_number_registry()  # the organisation may come with WhatsApp numbers
         return organization
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -109,6 +112,8 @@ def update_organization(
         )
         if not organization:
             raise HTTPException(status_code=404, detail="Organization not found")
+        invalidate_organization(organization_id)
+        invalidate_number_registry()  # organisation names are part of the number routes
         return organization
     except PermissionError as e:
         raise HTTPException(status_code=403, detail=str(e))
@@ -128,6 +133,8 @@ def delete_organization(
     success = organization_service.delete_organization(db, organization_id, current_user)
     if not success:
         raise HTTPException(status_code=404, detail="Organization not found")
+    invalidate_organization(organization_id)
+    invalidate_number_registry()
 
 
 @router.get("/export/csv")
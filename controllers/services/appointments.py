@@ -2,7 +2,6 @@ import os
 from datetime import datetime
 from typing import Optional, Dict, Any
 
-import requests
 from sqlalchemy.orm import Session
 
 from config.constants import get_messages_url
@@ -10,6 +9,7 @@ from services.whatsapp_service import get_latest_token
 from utils.whatsapp import send_message_to_waid
 from utils.ws_manager import manager
 from controllers.state.memory import appointment_state  # keep state centralized
+from utils.whatsapp_client import whatsapp_client
 
 
 async def send_time_buttons(wa_id: str, db: Session) -> Dict[str, Any]:
@@ -43,7 +43,7 @@ async def send_time_buttons(wa_id: str, db: Session) -> Dict[str, Any]:
             }
         }
 
-        resp = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+        resp = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
         if resp.status_code == 200:
             try:
                 display_from = os.getenv("WHATSAPP_DISPLAY_NUMBER", "917729992376")
@@ -137,7 +137,7 @@ async def _confirm_appointment(wa_id: str, db: Session, date_iso: str, time_labe
                     },
                 }
                 try:
-                    _resp_btn = requests.post(get_messages_url(phone_id_btn), headers=headers_btn, json=payload_btn)
+                    _resp_btn = await whatsapp_client.post(get_messages_url(phone_id_btn), headers=headers_btn, json=payload_btn)
                     try:
                         print(f"[ws_webhook] DEBUG - confirm buttons sent phone_id={phone_id_btn} status={_resp_btn.status_code}")
                     except Exception:
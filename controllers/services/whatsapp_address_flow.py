@@ -1,5 +1,4 @@
 import os
-import requests
 from datetime import datetime
 from typing import Optional
 
@@ -13,6 +12,7 @@ from services.whatsapp_service import get_latest_token
 from utils.whatsapp import send_message_to_waid
 from utils.ws_manager import manager
 from controllers.state.memory import awaiting_address_users, address_nudge_sent, generate_flow_token
+from utils.whatsapp_client import whatsapp_client
 
 # Expose a single entry point that callers can use.
 async def send_address_flow_directly(wa_id: str, db: Session, customer_id: Optional[int] = None):
@@ -74,7 +74,7 @@ async def _send_smart_address_selection(wa_id: str, db: Session, saved_addresses
             }
         }
 
-        resp = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+        resp = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
         if resp.status_code == 200:
             try:
                 msg_id = resp.json()["messages"][0]["id"]
@@ -138,7 +138,7 @@ async def _send_address_form_directly(wa_id: str, db: Session, customer_id: Opti
             }
         }
 
-        resp = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+        resp = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
         if resp.status_code == 200:
             try:
                 flow_msg_id = resp.json()["messages"][0]["id"]
@@ -1,22 +1,27 @@
 import uuid
-from typing import Dict
 
-# In-memory store: { wa_id: True/False }
-awaiting_address_users: Dict[str, bool] = {}
+from controllers.state.store import FlowStateMap, FlowValueMap
+
+# Per-customer flow state lives in a FlowStateStore (Redis when available) so
+# every webhook worker sees the same state. The maps below keep the old dict
+# interface; see controllers/state/store.py for the write-through semantics.
+
+# { wa_id: True/False }
+awaiting_address_users = FlowValueMap("awaiting_address")
 # Track whether we've already nudged the user to use the form to avoid repeats
-address_nudge_sent: Dict[str, bool] = {}
+address_nudge_sent = FlowValueMap("address_nudge")
 
-# In-memory appointment scheduling state per user
+# Appointment scheduling state per user
 # Structure: { wa_id: { "date": "YYYY-MM-DD" } }
-appointment_state: Dict[str, dict] = {}
+appointment_state = FlowStateMap("appointment")
 
-# In-memory lead appointment flow state per user
+# Lead appointment flow state per user
 # Structure: { wa_id: { "selected_city": str, "selected_clinic": str,
 # "custom_date": str, "waiting_for_custom_date": bool, "clinic_id": str } }
-lead_appointment_state: Dict[str, dict] = {}
+lead_appointment_state = FlowStateMap("lead_appointment")
 
 # Flow token storage
-flow_tokens: Dict[str, str] = {}
+flow_tokens = FlowValueMap("flow_token")
 
 def generate_flow_token(wa_id: str) -> str:
     token = str(uuid.uuid4())
@@ -40,7 +45,8 @@ def clear_flow_state_for_restart(wa_id: str) -> None:
     try:
         # Clear appointment state flags that prevent flow restart
         if wa_id in appointment_state:
-            state = appointment_state[wa_id]
+            # Work on a local copy; the result is written back in one go below
+            state = dict(appointment_state.get(wa_id) or {})
             # Clear all flow-related flags to allow fresh start
             state.pop("mr_welcome_sent", None)
             state.pop("mr_welcome_sending_ts", None)
@@ -76,11 +82,12 @@ def clear_flow_state_for_restart(wa_id: str) -> None:
                 lead_appointment_state.pop(wa_id, None)
                 # Restore phone_id fields if they existed
                 if lead_phone_id or lead_display_number:
-                    lead_appointment_state[wa_id] = {}
+                    preserved_state = {}
                     if lead_phone_id:
-                        lead_appointment_state[wa_id]["lead_phone_id"] = lead_phone_id
+                        preserved_state["lead_phone_id"] = lead_phone_id
                     if lead_display_number:
-                        lead_appointment_state[wa_id]["lead_display_number"] = lead_display_number
+                        preserved_state["lead_display_number"] = lead_display_number
+                    lead_appointment_state[wa_id] = preserved_state
                     print(f"[state/memory] DEBUG - Cleared lead appointment state but preserved phone_id: wa_id={wa_id}, lead_phone_id={lead_phone_id}")
                 else:
                     print(f"[state/memory] DEBUG - Cleared lead appointment state for restart: wa_id={wa_id}")
@@ -0,0 +1,475 @@
+"""
+Pluggable conversation/flow state store.
+
+The flow modules keep per-customer state (phone routing, flow step flags,
+selected city/clinic, ...) in dict-like maps keyed by wa_id. Plain module
+dicts only work with a single process, so the maps are backed by a
+FlowStateStore:
+
+- InMemoryFlowStateStore: per-process LRU with per-key TTL (single worker/dev)
+- RedisFlowStateStore: one Redis hash per key, shared by every worker/node
+
+Each key holds a flat mapping of field -> JSON value. FlowStateMap exposes the
+store with the same interface as the old `Dict[str, dict]`: reading a key
+returns a StateRecord, a dict snapshot whose item assignment / pop / update
+are written through to the store as atomic field updates. Mutating a nested
+list/dict *inside* a field is not written through; assign the field instead.
+
+Select the backend with FLOW_STATE_BACKEND=redis|memory (default: redis when
+reachable, otherwise memory).
+
+The dict interface is synchronous: with the Redis backend every read and
+write is a blocking Redis round-trip (typically well under a millisecond on
+the same network), made on the calling thread. Async handlers on hot paths
+can use FlowStateMap.aget() / aupdate_fields() instead, which run the store
+call in a worker thread so a slow Redis does not stall the event loop.
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, Optional
+
+from cache.redis_connection import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+FLOW_STATE_BACKEND = os.getenv("FLOW_STATE_BACKEND", "auto").lower()
+FLOW_STATE_TTL_SECONDS = int(os.getenv("FLOW_STATE_TTL_SECONDS", str(3 * 24 * 3600)))
+FLOW_STATE_MAX_KEYS = int(os.getenv("FLOW_STATE_MAX_KEYS", "50000"))
+FLOW_STATE_KEY_PREFIX = "flowstate"
+
+# Marks that a key exists even when it has no fields (e.g. state[wa_id] = {})
+_EXISTS_FIELD = "__exists__"
+
+
+class FlowStateStore(ABC):
+    """Backend interface. `namespace` separates maps; `key` is usually a wa_id."""
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def replace(self, namespace: str, key: str, fields: Dict[str, Any], ttl: Optional[int] = None) -> None:
+        ...
+
+    @abstractmethod
+    def update_fields(self, namespace: str, key: str, fields: Dict[str, Any], ttl: Optional[int] = None) -> None:
+        ...
+
+    @abstractmethod
+    def set_field_if_absent(self, namespace: str, key: str, field: str, value: Any,
+                            ttl: Optional[int] = None) -> bool:
+        ...
+
+    @abstractmethod
+    def delete_fields(self, namespace: str, key: str, *fields: str) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def exists(self, namespace: str, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def expire(self, namespace: str, key: str, ttl: int) -> None:
+        ...
+
+    @abstractmethod
+    def keys(self, namespace: str) -> Iterator[str]:
+        ...
+
+
+class InMemoryFlowStateStore(FlowStateStore):
+    """Per-process store bounded by LRU eviction and per-key expiry."""
+
+    def __init__(self, max_keys: int = FLOW_STATE_MAX_KEYS, default_ttl: int = FLOW_STATE_TTL_SECONDS):
+        self.max_keys = max_keys
+        self.default_ttl = default_ttl
+        self._lock = threading.RLock()
+        # (namespace, key) -> (expires_at, fields)
+        self._data: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+    def _live(self, namespace: str, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._data.get((namespace, key))
+        if entry is None:
+            return None
+        expires_at, fields = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[(namespace, key)]
+            return None
+        self._data.move_to_end((namespace, key))
+        return fields
+
+    def _store(self, namespace: str, key: str, fields: Dict[str, Any], ttl: Optional[int]) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        self._data[(namespace, key)] = (time.monotonic() + ttl if ttl else None, fields)
+        self._data.move_to_end((namespace, key))
+        while len(self._data) > self.max_keys:
+            self._data.popitem(last=False)
+
+    def get(self, namespace, key):
+        with self._lock:
+            fields = self._live(namespace, key)
+            return dict(fields) if fields is not None else None
+
+    def replace(self, namespace, key, fields, ttl=None):
+        with self._lock:
+            self._store(namespace, key, dict(fields), ttl)
+
+    def update_fields(self, namespace, key, fields, ttl=None):
+        with self._lock:
+            current = self._live(namespace, key) or {}
+            current.update(fields)
+            self._store(namespace, key, current, ttl)
+
+    def set_field_if_absent(self, namespace, key, field, value, ttl=None):
+        with self._lock:
+            current = self._live(namespace, key) or {}
+            if field in current:
+                return False
+            current[field] = value
+            self._store(namespace, key, current, ttl)
+            return True
+
+    def delete_fields(self, namespace, key, *fields):
+        with self._lock:
+            current = self._live(namespace, key)
+            if current is not None:
+                for field in fields:
+                    current.pop(field, None)
+
+    def delete(self, namespace, key):
+        with self._lock:
+            return self._data.pop((namespace, key), None) is not None
+
+    def exists(self, namespace, key):
+        with self._lock:
+            return self._live(namespace, key) is not None
+
+    def expire(self, namespace, key, ttl):
+        with self._lock:
+            fields = self._live(namespace, key)
+            if fields is not None:
+                self._store(namespace, key, fields, ttl)
+
+    def keys(self, namespace):
+        with self._lock:
+            candidates = [k for (ns, k) in self._data.keys() if ns == namespace]
+        return iter([k for k in candidates if self.exists(namespace, k)])
+
+
+class RedisFlowStateStore(FlowStateStore):
+    """
+    One Redis hash per (namespace, key); field values are JSON encoded.
+    Every write refreshes the key's TTL in the same MULTI block.
+    Falls back to an in-process store if Redis errors, so a Redis blip
+    degrades to single-process behaviour instead of failing the webhook.
+    """
+
+    def __init__(self, client=None, default_ttl: int = FLOW_STATE_TTL_SECONDS,
+                 key_prefix: str = FLOW_STATE_KEY_PREFIX):
+        self._client = client
+        self.default_ttl = default_ttl
+        self.key_prefix = key_prefix
+        self.fallback = InMemoryFlowStateStore(default_ttl=default_ttl)
+
+    @property
+    def client(self):
+        return self._client or get_redis_client()
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.key_prefix}:{namespace}:{key}"
+
+    @staticmethod
+    def _encode(fields: Dict[str, Any]) -> Dict[str, str]:
+        return {field: json.dumps(value, default=str) for field, value in fields.items()}
+
+    @staticmethod
+    def _decode(raw: Dict[str, str]) -> Dict[str, Any]:
+        fields = {}
+        for field, value in raw.items():
+            if field == _EXISTS_FIELD:
+                continue
+            try:
+                fields[field] = json.loads(value)
+            except (TypeError, ValueError):
+                fields[field] = value
+        return fields
+
+    def _write(self, namespace, key, fields, ttl, replace=False):
+        pipe = self.client.pipeline(transaction=True)
+        redis_key = self._key(namespace, key)
+        if replace:
+            pipe.delete(redis_key)
+        pipe.hset(redis_key, mapping={_EXISTS_FIELD: "1", **self._encode(fields)})
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl:
+            pipe.expire(redis_key, ttl)
+        pipe.execute()
+
+    def _fail(self, op: str, e: Exception):
+        logger.warning(f"[flow_state] Redis {op} failed, using in-process state: {e}")
+
+    def get(self, namespace, key):
+        try:
+            raw = self.client.hgetall(self._key(namespace, key))
+            return self._decode(raw) if raw else None
+        except Exception as e:
+            self._fail("get", e)
+            return self.fallback.get(namespace, key)
+
+    def replace(self, namespace, key, fields, ttl=None):
+        try:
+            self._write(namespace, key, fields, ttl, replace=True)
+        except Exception as e:
+            self._fail("replace", e)
+            self.fallback.replace(namespace, key, fields, ttl)
+
+    def update_fields(self, namespace, key, fields, ttl=None):
+        try:
+            self._write(namespace, key, fields, ttl)
+        except Exception as e:
+            self._fail("update", e)
+            self.fallback.update_fields(namespace, key, fields, ttl)
+
+    def set_field_if_absent(self, namespace, key, field, value, ttl=None):
+        try:
+            redis_key = self._key(namespace, key)
+            pipe = self.client.pipeline(transaction=True)
+            pipe.hsetnx(redis_key, field, json.dumps(value))
+            pipe.hsetnx(redis_key, _EXISTS_FIELD, "1")
+            ttl = self.default_ttl if ttl is None else ttl
+            if ttl:
+                pipe.expire(redis_key, ttl)
+            return bool(pipe.execute()[0])
+        except Exception as e:
+            self._fail("setnx", e)
+            return self.fallback.set_field_if_absent(namespace, key, field, value, ttl)
+
+    def delete_fields(self, namespace, key, *fields):
+        if not fields:
+            return
+        try:
+            self.client.hdel(self._key(namespace, key), *fields)
+        except Exception as e:
+            self._fail("hdel", e)
+            self.fallback.delete_fields(namespace, key, *fields)
+
+    def delete(self, namespace, key):
+        try:
+            return bool(self.client.delete(self._key(namespace, key)))
+        except Exception as e:
+            self._fail("delete", e)
+            return self.fallback.delete(namespace, key)
+
+    def exists(self, namespace, key):
+        try:
+            return bool(self.client.exists(self._key(namespace, key)))
+        except Exception as e:
+            self._fail("exists", e)
+            return self.fallback.exists(namespace, key)
+
+    def expire(self, namespace, key, ttl):
+        try:
+            self.client.expire(self._key(namespace, key), ttl)
+        except Exception as e:
+            self._fail("expire", e)
+            self.fallback.expire(namespace, key, ttl)
+
+    def keys(self, namespace):
+        prefix = self._key(namespace, "")
+        try:
+            return iter([k[len(prefix):] for k in self.client.scan_iter(match=f"{prefix}*", count=500)])
+        except Exception as e:
+            self._fail("scan", e)
+            return self.fallback.keys(namespace)
+
+
+_store: Optional[FlowStateStore] = None
+_store_lock = threading.Lock()
+
+
+def get_flow_state_store() -> FlowStateStore:
+    """Process-wide store chosen by FLOW_STATE_BACKEND."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if FLOW_STATE_BACKEND == "memory":
+                    _store = InMemoryFlowStateStore()
+                elif FLOW_STATE_BACKEND == "redis" or get_redis_client() is not None:
+                    _store = RedisFlowStateStore()
+                else:
+                    logger.warning("[flow_state] Redis unavailable; flow state is per-process (run a single worker)")
+                    _store = InMemoryFlowStateStore()
+    return _store
+
+
+def set_flow_state_store(store: FlowStateStore) -> None:
+    """Swap the backend (tests, or explicit wiring at startup)."""
+    global _store
+    _store = store
+
+
+class StateRecord(dict):
+    """
+    Snapshot of one key's fields. Item assignment, deletion, pop, update and
+    setdefault are applied locally and written through to the store.
+    """
+
+    def __init__(self, state_map: "FlowStateMap", key: str, fields: Dict[str, Any]):
+        super().__init__(fields)
+        self._state_map = state_map
+        self._key = key
+
+    def __setitem__(self, field, value):
+        super().__setitem__(field, value)
+        self._state_map.update_fields(self._key, {field: value})
+
+    def __delitem__(self, field):
+        super().__delitem__(field)
+        self._state_map.store.delete_fields(self._state_map.namespace, self._key, field)
+
+    def pop(self, field, *default):
+        present = field in self
+        value = super().pop(field, *default)
+        if present:
+            self._state_map.store.delete_fields(self._state_map.namespace, self._key, field)
+        return value
+
+    def popitem(self):
+        field, value = super().popitem()
+        self._state_map.store.delete_fields(self._state_map.namespace, self._key, field)
+        return field, value
+
+    def update(self, *args, **kwargs):
+        fields = dict(*args, **kwargs)
+        super().update(fields)
+        if fields:
+            self._state_map.update_fields(self._key, fields)
+
+    def setdefault(self, field, default=None):
+        if field not in self:
+            self[field] = default
+        return super().__getitem__(field)
+
+    def clear(self):
+        super().clear()
+        self._state_map.store.replace(self._state_map.namespace, self._key, {}, self._state_map.ttl)
+
+
+class FlowStateMap(MutableMapping):
+    """Dict-compatible view of one namespace: `map[wa_id]` -> StateRecord."""
+
+    def __init__(self, namespace: str, ttl: Optional[int] = None, store: Optional[FlowStateStore] = None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self._store = store
+
+    @property
+    def store(self) -> FlowStateStore:
+        return self._store or get_flow_state_store()
+
+    def __getitem__(self, key) -> StateRecord:
+        fields = self.store.get(self.namespace, key)
+        if fields is None:
+            raise KeyError(key)
+        return StateRecord(self, key, fields)
+
+    def __setitem__(self, key, value) -> None:
+        self.store.replace(self.namespace, key, dict(value or {}), self.ttl)
+
+    def __delitem__(self, key) -> None:
+        if not self.store.delete(self.namespace, key):
+            raise KeyError(key)
+
+    def __contains__(self, key) -> bool:
+        return self.store.exists(self.namespace, key)
+
+    def __iter__(self):
+        return self.store.keys(self.namespace)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.store.keys(self.namespace))
+
+    def get(self, key, default=None):
+        fields = self.store.get(self.namespace, key)
+        return StateRecord(self, key, fields) if fields is not None else default
+
+    def pop(self, key, *default):
+        fields = self.store.get(self.namespace, key)
+        if fields is None:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        self.store.delete(self.namespace, key)
+        return fields
+
+    def setdefault(self, key, default=None):
+        record = self.get(key)
+        if record is None:
+            self[key] = default or {}
+            record = StateRecord(self, key, dict(default or {}))
+        return record
+
+    def update_fields(self, key: str, fields: Dict[str, Any]) -> None:
+        """Atomically set several fields on one key (creating it if needed)."""
+        self.store.update_fields(self.namespace, key, fields, self.ttl)
+
+    async def aget(self, key, default=None):
+        """get() without blocking the event loop on the store round-trip."""
+        fields = await asyncio.to_thread(self.store.get, self.namespace, key)
+        return StateRecord(self, key, fields) if fields is not None else default
+
+    async def aupdate_fields(self, key: str, fields: Dict[str, Any]) -> None:
+        """update_fields() without blocking the event loop on the store round-trip."""
+        await asyncio.to_thread(self.store.update_fields, self.namespace, key, fields, self.ttl)
+
+    def set_field_if_absent(self, key: str, field: str, value: Any) -> bool:
+        """Atomic claim of a field; returns False if another process set it first."""
+        return self.store.set_field_if_absent(self.namespace, key, field, value, self.ttl)
+
+    def touch(self, key: str, ttl: Optional[int] = None) -> None:
+        """Reset the key's expiry (per-key TTL override)."""
+        self.store.expire(self.namespace, key, ttl or self.ttl or FLOW_STATE_TTL_SECONDS)
+
+
+class FlowValueMap(MutableMapping):
+    """Dict-compatible view of one namespace holding a single scalar per key."""
+
+    _FIELD = "value"
+
+    def __init__(self, namespace: str, ttl: Optional[int] = None, store: Optional[FlowStateStore] = None):
+        self._map = FlowStateMap(namespace, ttl=ttl, store=store)
+
+    def __getitem__(self, key):
+        fields = self._map.store.get(self._map.namespace, key)
+        if fields is None or self._FIELD not in fields:
+            raise KeyError(key)
+        return fields[self._FIELD]
+
+    def __setitem__(self, key, value):
+        self._map[key] = {self._FIELD: value}
+
+    def __delitem__(self, key):
+        del self._map[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self._map
+
+    def __iter__(self):
+        return iter(self._map)
+
+    def __len__(self) -> int:
+        return len(self._map)
@@ -9,6 +9,7 @@ from schemas.user_schema import UserCreate, UserRead, UserUpdate
 from models.models import User, Customer
 from services import crud
 from auth import get_current_user, get_current_admin_user
+from cache.auth_cache import invalidate_user
 from database.db import get_db
 from services.customer_service import get_customers_for_user
 from utils.organization_filter import get_user_organization_id
@@ -18,9 +19,12 @@ router = APIRouter(
 )
 
 @router.get("/me", response_model=UserRead)
-def read_current_user(current_user: User = Depends(get_current_user)):
+def read_current_user(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """Get the current user's details based on the token"""
-    return current_user
+    user = crud.get_user(db, current_user.id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
 
 @router.post("/", response_model=UserRead)
 def create_user(
@@ -205,6 +209,7 @@ def update_user(
         updated = crud.update_user(db, user_id, user)
         if not updated:
             raise HTTPException(status_code=404, detail="User not found")
+        invalidate_user(user_id)
         return updated
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -220,6 +225,7 @@ def delete_user(
     deleted = crud.delete_user(db, user_id)
     if not deleted:
         raise HTTPException(status_code=404, detail="User not found")
+    invalidate_user(user_id)
     return {"ok": True}
 
 @router.get("/{user_id}/customers")
@@ -24,10 +24,13 @@ from schemas.customer_schema import CustomerCreate
 from schemas.message_schema import MessageCreate
 from models.models import Message
 from utils.whatsapp import send_message_to_waid
-from marketing.name_validator import validate_human_name
-from marketing.phone_validator import validate_indian_phone
+from marketing.name_validator import validate_human_name_async
+from marketing.phone_validator import validate_indian_phone_async
 from services.whatsapp_service import get_latest_token
 from config.constants import get_messages_url, get_media_url
+from utils.whatsapp_client import whatsapp_client
+from services import webhook_ingest
+from utils.webhook_event_log import webhook_event_log
 
 # =============================================================================
 # WHATSAPP FLOW HANDLING
@@ -61,6 +64,29 @@ from controllers.state.memory import *
 
 @router.post("/webhook")
 async def receive_message(request: Request, db: Session = Depends(get_db)):
+    raw_body = await request.body()
+    if not webhook_ingest.verify_signature(raw_body, request.headers.get("x-hub-signature-256")):
+        print("[ws_webhook] WARNING - Rejected webhook with invalid signature")
+        return JSONResponse(status_code=401, content={"status": "error", "message": "Invalid signature"})
+
+    if webhook_ingest.queue_mode_enabled():
+        # Fast ack: persist the raw event and let the flow workers process it
+        try:
+            body = json.loads(raw_body)
+        except ValueError:
+            return {"status": "error", "message": "Invalid JSON payload"}
+        routing = webhook_ingest.extract_routing(body)
+        if webhook_ingest.is_duplicate(routing["message_id"]):
+            return {"status": "ok", "message": "Duplicate delivery ignored"}
+        event = webhook_ingest.build_event(raw_body, request.headers, str(request.url.query))
+        if await webhook_ingest.enqueue_event(event, routing["wa_id"]):
+            return {"status": "queued", "message_id": routing["message_id"]}
+
+    return await process_webhook_request(request, db)
+
+
+async def process_webhook_request(request: Request, db: Session):
+    """Full inbound processing: logging, flow routing, sends and broadcasts."""
     try:
         # CRITICAL: Capture raw request body BEFORE JSON parsing to avoid truncation
         raw_body = await request.body()
@@ -74,29 +100,12 @@ async def receive_message(request: Request, db: Session = Depends(get_db)):
             print(f"[ws_webhook] Raw body: {raw_body_str[:500]}...")
             return {"status": "error", "message": "Invalid JSON payload"}
         
-        # Persist raw webhook payload to file for debugging/auditing
+        # Persist raw webhook payload for debugging/auditing (written by a background thread)
         try:
-            log_dir = "webhook_logs"
-            os.makedirs(log_dir, exist_ok=True)
-            ts = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-            log_path = os.path.join(log_dir, f"webhook_{ts}.json")
-
-            # Write the complete raw body to ensure no truncation
-            with open(log_path, "w", encoding="utf-8") as lf:
-                lf.write(raw_body_str)
-                
-            # Also create a formatted version for easier debugging
-            formatted_path = os.path.join(log_dir, f"webhook_{ts}_formatted.json")
-            try:
-                formatted_json = json.dumps(body, ensure_ascii=False, indent=2, default=str)
-                with open(formatted_path, "w", encoding="utf-8") as lf:
-                    lf.write(formatted_json)
-            except Exception as e:
-                print(f"[ws_webhook] WARN - Could not create formatted log: {e}")
-
+            webhook_event_log.append("webhook", raw_body_str)
         except Exception as e:
             print(f"[ws_webhook] WARN - webhook logging failed: {e}")
-        
+
         # Enhanced debugging for webhook payloads
         debug_webhook_payload(body, raw_body_str)
         
@@ -1693,7 +1702,7 @@ async def receive_message(request: Request, db: Session = Depends(get_db)):
                             try:
                                 from controllers.auto_welcome_controller import _send_template
                                 lang_code_skin = os.getenv("WELCOME_TEMPLATE_LANG", "en_US")
-                                resp_skin = _send_template(
+                                resp_skin = await _send_template(
                                     wa_id=wa_id,
                                     template_name="skin_treat_flow",
                                     access_token=token_entry2.token,
@@ -1729,7 +1738,7 @@ async def receive_message(request: Request, db: Session = Depends(get_db)):
                             try:
                                 from controllers.auto_welcome_controller import _send_template
                                 lang_code_hair = os.getenv("WELCOME_TEMPLATE_LANG", "en_US")
-                                resp_hair = _send_template(
+                                resp_hair = await _send_template(
                                     wa_id=wa_id,
                                     template_name="hair_treat_flow",
                                     access_token=token_entry2.token,
@@ -1792,7 +1801,7 @@ async def receive_message(request: Request, db: Session = Depends(get_db)):
                                 }
                             }
                             # Send to WA API
-                            requests.post(get_messages_url(phone_id2), headers=headers2, json=payload_list)
+                            await whatsapp_client.post(get_messages_url(phone_id2), headers=headers2, json=payload_list)
                             # Broadcast to ChatWindow so the UI shows the outgoing list
                             try:
                                 await manager.broadcast({
@@ -1815,7 +1824,7 @@ async def receive_message(request: Request, db: Session = Depends(get_db)):
                                 try:
                                     from controllers.auto_welcome_controller import _send_template
                                     lang_code_body = os.getenv("WELCOME_TEMPLATE_LANG", "en_US")
-                                    resp_body = _send_template(
+                                    resp_body = await _send_template(
                                         wa_id=wa_id,
                                         template_name="body_treat_flow",
                                         access_token=token_entry2.token,
@@ -1852,7 +1861,7 @@ async def receive_message(request: Request, db: Session = Depends(get_db)):
 
                       
                         # Send to WhatsApp API
-                        requests.post(get_messages_url(phone_id2), headers=headers2, json=payload_list)
+                        await whatsapp_client.post(get_messages_url(phone_id2), headers=headers2, json=payload_list)
                         # Broadcast to ChatWindow so the UI shows the outgoing list
                         try:
                             await manager.broadcast({
@@ -2194,7 +2203,7 @@ async def receive_message(request: Request, db: Session = Depends(get_db)):
         # BUT: Only validate if message looks like name/phone input, not conversational text
         try:
             if message_type == "text":
-                st = appointment_state.get(wa_id) or {}
+                st = await appointment_state.aget(wa_id) or {}
                 if bool(st.get("from_treatment_flow")) and not bool(st.get("awaiting_name")) and not bool(st.get("awaiting_phone")):
                     # Check if message is conversational (contains common conversational phrases)
                     # If so, skip validation - user should use Yes/No buttons instead
@@ -2217,7 +2226,7 @@ async def receive_message(request: Request, db: Session = Depends(get_db)):
                         # Only validate if we are explicitly awaiting details (set after confirm_no)
                         # and the message looks like it might be name/phone input.
                         try:
-                            st = appointment_state.get(wa_id) or {}
+                            st = await appointment_state.aget(wa_id) or {}
                         except Exception:
                             st = {}
                         awaiting_details = bool(st.get("awaiting_name") or st.get("awaiting_phone"))
@@ -2226,8 +2235,10 @@ async def receive_message(request: Request, db: Session = Depends(get_db)):
                             pass
                         else:
                             # Must be relatively short and not contain request words
-                            name_res = validate_human_name(body_text)
-                            phone_res = validate_indian_phone(body_text)
+                            name_res, phone_res = await asyncio.gather(
+                                validate_human_name_async(body_text),
+                                validate_indian_phone_async(body_text),
+                            )
                             name_ok = bool(name_res.get("valid")) and bool(name_res.get("name"))
                             phone_ok = bool(phone_res.get("valid")) and bool(phone_res.get("phone"))
                         if name_ok and phone_ok:
@@ -2293,9 +2304,9 @@ async def receive_message(request: Request, db: Session = Depends(get_db)):
         # Handle text while awaiting_phone using validator
         try:
             if message_type == "text":
-                st = appointment_state.get(wa_id) or {}
+                st = await appointment_state.aget(wa_id) or {}
                 if bool(st.get("awaiting_phone")):
-                    phone_res = validate_indian_phone(body_text)
+                    phone_res = await validate_indian_phone_async(body_text)
                     if phone_res.get("valid") and phone_res.get("phone"):
                         st["corrected_phone"] = phone_res.get("phone")
                         st["awaiting_phone"] = False
@@ -10,7 +10,6 @@ from sqlalchemy.orm import Session
 from starlette.responses import PlainTextResponse
 import asyncio
 import httpx
-import requests
 from pydantic import BaseModel
 
 from database.db import get_db
@@ -21,6 +20,8 @@ from schemas.message_schema import MessageCreate
 from models.models import Message, User
 from utils.ws_manager import manager
 from auth import get_current_user
+from utils.whatsapp_client import whatsapp_client
+from utils.webhook_event_log import webhook_event_log
 
 # =============================================================================
 # CONFIG
@@ -41,21 +42,13 @@ ALOTS_CONFIG = {
 def get_whatsapp_config_by_peer(db: Session, peer: str):
     """
     Get WhatsApp API config for a peer number (display_number or phone_number_id)
-    Looks up from whatsapp_numbers table, falls back to ALOTS_CONFIG
+    Looks up from the in-memory number registry, falls back to ALOTS_CONFIG
     """
-    from services.whatsapp_number_service import get_whatsapp_number_by_phone_id
-    from models.models import WhatsAppNumber
-    import re
-
-    # Normalize peer: remove all non-digits for comparison
-    peer_digits = re.sub(r"\D", "", peer)
-
-    print(f"[webhook2] Looking up peer: {peer} (normalized: {peer_digits})")
+    from services.number_registry import number_registry
 
     # Check ALOTS_CONFIG first (for alots.io numbers)
     if peer in ALOTS_CONFIG:
         config = ALOTS_CONFIG[peer]
-        print(f"[webhook2] Found in ALOTS_CONFIG: {config['display_name']}")
         return {
             "api_url": f"{config['api_base_url']}/{config['phone_number_id']}/messages",
             "media_url": f"{config['api_base_url']}/{config['phone_number_id']}/media",
@@ -63,60 +56,13 @@ def get_whatsapp_config_by_peer(db: Session, peer: str):
             "phone_number_id": config["phone_number_id"],
             "display_name": config.get("display_name", peer)
         }
-    
-    # Try to find by phone_number_id first (exact match)
-    whatsapp_number = get_whatsapp_number_by_phone_id(db, peer)
-    if whatsapp_number:
-        print(f"[webhook2] Found by phone_number_id: {whatsapp_number.phone_number_id}")
-    
-    # If not found, try to find by display_number
-    if not whatsapp_number:
-        # Try exact match on display_number
-        whatsapp_number = db.query(WhatsAppNumber).filter(
-            WhatsAppNumber.display_number == peer
-        ).first()
-        if whatsapp_number:
-            print(f"[webhook2] Found by exact display_number match: {whatsapp_number.display_number}")
-    
-    # If still not found, try normalized digit match on display_number
-    if not whatsapp_number and peer_digits:
-        # Query ALL numbers first (for debugging and to avoid boolean filter issues)
-        all_numbers = db.query(WhatsAppNumber).all()
-        print(f"[webhook2] Found {len(all_numbers)} total numbers in database, filtering for active ones...")
-        
-        # Filter active numbers in Python (more reliable than SQL boolean comparison)
-        active_numbers = [num for num in all_numbers if num.is_active is True]
-        print(f"[webhook2] Trying normalized match on {len(active_numbers)} active numbers...")
-        
-        for num in active_numbers:
-            if num.display_number:
-                num_digits = re.sub(r"\D", "", num.display_number)
-                print(f"[webhook2] Comparing: peer_digits={peer_digits} vs num_digits={num_digits} (from {num.display_number})")
-                # Try full digit match
-                if num_digits == peer_digits:
-                    whatsapp_number = num
-                    print(f"[webhook2] Found by normalized display_number match: {num.display_number} -> {num.phone_number_id}")
-                    break
-                # Try last 10 digits match (for numbers with country codes)
-                if len(peer_digits) >= 10 and len(num_digits) >= 10:
-                    peer_last10 = peer_digits[-10:]
-                    num_last10 = num_digits[-10:]
-                    if peer_last10 == num_last10:
-                        whatsapp_number = num
-                        print(f"[webhook2] Found by last 10 digits match: {num.display_number} (last10: {num_last10}) -> {num.phone_number_id}")
-                        break
-    
-    # Debug: List all available numbers if still not found
-    if not whatsapp_number:
-        all_numbers = db.query(WhatsAppNumber).all()
-        print(f"[webhook2] DEBUG - All WhatsApp numbers in database:")
-        for num in all_numbers:
-            print(f"  - phone_number_id: {num.phone_number_id}, display_number: {num.display_number}, is_active: {num.is_active}")
-    
+
+    # phone_number_id, exact display_number, then normalized / last-10 digit match on active numbers
+    whatsapp_number = number_registry.number_for_peer(peer)
+
     if not whatsapp_number:
-        all_numbers = db.query(WhatsAppNumber).all()
-        active_numbers = [num for num in all_numbers if num.is_active is True]
-        available_list = ", ".join([f"{num.display_number or num.phone_number_id}" for num in active_numbers[:5]])
+        available_list = ", ".join([f"{num.display_number or num.phone_number_id}" for num in number_registry.active_numbers()[:5]])
+        print(f"[webhook2] No WhatsApp number found for peer: {peer}")
         raise HTTPException(
             status_code=400, 
             detail=f"Invalid or inactive peer number: {peer}. Please ensure the WhatsApp number is registered and active in the database. Available numbers: {available_list if available_list else 'None'}"
@@ -144,7 +90,6 @@ def get_whatsapp_config_by_peer(db: Session, peer: str):
         )
     
     phone_number_id = whatsapp_number.phone_number_id
-    print(f"[webhook2] Successfully resolved peer {peer} -> phone_number_id: {phone_number_id}")
     
     return {
         "api_url": f"https://graph.facebook.com/v22.0/{phone_number_id}/messages",
@@ -169,24 +114,16 @@ router2 = APIRouter(
 # =============================================================================
 
 def log_webhook(payload: str, prefix: str):
+    """Queue a raw payload for the background webhook event log."""
     try:
-        log_dir = "webhook_logs"
-        os.makedirs(log_dir, exist_ok=True)
-        ts = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-        raw_path = os.path.join(log_dir, f"{prefix}_{ts}.json")
-
-        with open(raw_path, "w", encoding="utf-8") as f:
-            f.write(payload)
-
-        try:
-            formatted = json.dumps(json.loads(payload), indent=2, ensure_ascii=False)
-            with open(raw_path.replace(".json", "_formatted.json"), "w", encoding="utf-8") as f:
-                f.write(formatted)
-        except Exception:
-            pass
+        webhook_event_log.append(prefix, payload)
     except Exception as e:
         print(f"[{prefix}] LOG ERROR:", e)
 
+
+def _parse_since(since: Optional[str]) -> Optional[float]:
+    return datetime.fromisoformat(since).timestamp() if since else None
+
 # =============================================================================
 # WEBHOOK 1
 # =============================================================================
@@ -243,61 +180,32 @@ async def verify_webhook(request: Request):
 
 
 @router.get("/logs")
-async def get_webhook_logs(limit: int = 20):
+async def get_webhook_logs(
+    limit: int = 20,
+    wa_id: Optional[str] = None,
+    message_id: Optional[str] = None,
+    since: Optional[str] = None,
+):
     """View recent webhook logs from browser"""
     try:
-        log_dir = "webhook_logs"
-        if not os.path.exists(log_dir):
-            return {"logs": [], "message": "No logs folder yet"}
-
-        files = [f for f in os.listdir(log_dir) if f.startswith("webhook_") and "_formatted" in f]
-        files.sort(reverse=True)
-        files = files[:limit]
-
-        logs = []
-        for filename in files:
-            filepath = os.path.join(log_dir, filename)
-            try:
-                with open(filepath, "r", encoding="utf-8") as f:
-                    content = json.loads(f.read())
-                    logs.append({
-                        "file": filename,
-                        "timestamp": filename.replace("webhook_", "").replace("_formatted.json", ""),
-                        "data": content
-                    })
-            except Exception as e:
-                logs.append({"file": filename, "error": str(e)})
-
+        logs = webhook_event_log.query(
+            kinds=["webhook"], wa_id=wa_id, message_id=message_id, since=_parse_since(since), limit=limit
+        )
         return {"total": len(logs), "logs": logs}
     except Exception as e:
         return {"error": str(e)}
 
 
 @router.get("/logs/all")
-async def get_all_webhook_logs(limit: int = 50):
+async def get_all_webhook_logs(
+    limit: int = 50,
+    wa_id: Optional[str] = None,
+    message_id: Optional[str] = None,
+    since: Optional[str] = None,
+):
     """View ALL webhook logs (webhook + webhook2)"""
     try:
-        log_dir = "webhook_logs"
-        if not os.path.exists(log_dir):
-            return {"logs": [], "message": "No logs folder yet"}
-
-        files = [f for f in os.listdir(log_dir) if "_formatted" in f]
-        files.sort(reverse=True)
-        files = files[:limit]
-
-        logs = []
-        for filename in files:
-            filepath = os.path.join(log_dir, filename)
-            try:
-                with open(filepath, "r", encoding="utf-8") as f:
-                    content = json.loads(f.read())
-                    logs.append({
-                        "file": filename,
-                        "data": content
-                    })
-            except Exception as e:
-                logs.append({"file": filename, "error": str(e)})
-
+        logs = webhook_event_log.query(wa_id=wa_id, message_id=message_id, since=_parse_since(since), limit=limit)
         return {"total": len(logs), "logs": logs}
     except Exception as e:
         return {"error": str(e)}
@@ -511,35 +419,22 @@ async def verify_webhook2(request: Request):
 
 
 @router2.get("/logs")
-async def get_webhook2_logs(limit: int = 20):
+async def get_webhook2_logs(
+    limit: int = 20,
+    wa_id: Optional[str] = None,
+    message_id: Optional[str] = None,
+    since: Optional[str] = None,
+):
     """View recent webhook2 logs from browser"""
     try:
-        log_dir = "webhook_logs"
-        if not os.path.exists(log_dir):
-            return {"logs": [], "message": "No logs folder yet"}
-
         # Include both normal logs and error logs
-        files = [f for f in os.listdir(log_dir) if f.startswith("webhook2")]
-        files.sort(reverse=True)
-        files = files[:limit]
-
-        logs = []
-        for filename in files:
-            filepath = os.path.join(log_dir, filename)
-            try:
-                with open(filepath, "r", encoding="utf-8") as f:
-                    content = f.read()
-                    try:
-                        content = json.loads(content)
-                    except:
-                        pass  # Keep as string if not JSON
-                    logs.append({
-                        "file": filename,
-                        "data": content
-                    })
-            except Exception as e:
-                logs.append({"file": filename, "error": str(e)})
-
+        logs = webhook_event_log.query(
+            kinds=["webhook2", "webhook2_error"],
+            wa_id=wa_id,
+            message_id=message_id,
+            since=_parse_since(since),
+            limit=limit,
+        )
         return {"total": len(logs), "logs": logs}
     except Exception as e:
         return {"error": str(e)}
@@ -730,11 +625,10 @@ async def send_message_webhook2(
                     file_bytes, uploaded_filename, mime_type
                 )
 
-            files = {
-                "file": (uploaded_filename, file_bytes, mime_type),
-                "messaging_product": (None, "whatsapp")
-            }
-            upload_res = requests.post(MEDIA_URL, headers=headers, files=files)
+            files = {"file": (uploaded_filename, file_bytes, mime_type)}
+            upload_res = await whatsapp_client.post(
+                MEDIA_URL, headers=headers, data={"messaging_product": "whatsapp"}, files=files
+            )
             if upload_res.status_code != 200:
                 raise HTTPException(status_code=500, detail=f"Media upload failed: {upload_res.text}")
             media_id = upload_res.json().get("id")
@@ -952,7 +846,7 @@ async def send_message_webhook2(
         print(f"[webhook2] Payload: {json.dumps(payload, indent=2)}")
 
         # Send to WhatsApp API
-        res = requests.post(
+        res = await whatsapp_client.post(
             WHATSAPP_API_URL,
             json=payload,
             headers={**headers, "Content-Type": "application/json"}
@@ -1168,7 +1062,7 @@ async def send_template_webhook2(
         print(f"[webhook2] Payload: {json.dumps(payload, indent=2)}")
 
         # Send to WhatsApp API
-        res = requests.post(
+        res = await whatsapp_client.post(
             whatsapp_config['api_url'],
             headers=headers,
             json=payload
@@ -27,6 +27,7 @@ from schemas.whatsapp_token_schema import WhatsAppTokenCreate
 from database.db import get_db
 from services import customer_service, message_service, whatsapp_service
 from services.whatsapp_service import create_whatsapp_token, get_latest_token
+from utils.whatsapp_client import whatsapp_client
 
 router = APIRouter(tags=["WhatsApp Token"])
 
@@ -168,6 +169,13 @@ def add_token(token_data: WhatsAppTokenCreate, db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/credentials/resolution-stats")
+def get_credential_resolution_stats(current_user: User = Depends(get_current_user)):
+    """Lookups and mean resolution time of outbound credentials (this worker)."""
+    from utils.whatsapp import credential_resolution_stats
+
+    return credential_resolution_stats()
+
 @router.post("/send-message")
 async def send_whatsapp_message(
     peer: str = Form(...),
@@ -241,11 +249,10 @@ async def send_whatsapp_message(
                     file_bytes, uploaded_filename, mime_type
                 )
 
-            files = {
-                "file": (uploaded_filename, file_bytes, mime_type),
-                "messaging_product": (None, "whatsapp")
-            }
-            upload_res = requests.post(MEDIA_URL, headers=headers, files=files)
+            files = {"file": (uploaded_filename, file_bytes, mime_type)}
+            upload_res = await whatsapp_client.post(
+                MEDIA_URL, headers=headers, data={"messaging_product": "whatsapp"}, files=files
+            )
             if upload_res.status_code != 200:
                 raise HTTPException(status_code=500, detail=f"Media upload failed: {upload_res.text}")
             media_id = upload_res.json().get("id")
@@ -481,7 +488,7 @@ async def send_whatsapp_message(
         print(f"[whatsapp_controller] API URL: {WHATSAPP_API_URL}")
         print(f"[whatsapp_controller] Payload: {json.dumps(payload, indent=2)}")
         
-        res = requests.post(
+        res = await whatsapp_client.post(
             WHATSAPP_API_URL,
             json=payload,
             headers={**headers, "Content-Type": "application/json"}
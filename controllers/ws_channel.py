@@ -1,22 +1,37 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 import asyncio
-from utils.ws_manager import manager
+import json
+from utils.ws_manager import manager, Subscription
 
 router = APIRouter()
 
 @router.websocket("/channel")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    """
+    Dashboard event stream.
+
+    Optional filters (query string, comma-separated): org, numbers, wa_ids, events.
+    Filters can be changed later by sending
+    {"action": "subscribe", "org": ..., "numbers": [...], "wa_ids": [...], "events": [...]}.
+    """
+    await manager.connect(websocket, Subscription.from_params(dict(websocket.query_params)))
     try:
         while True:
             try:
-                _ = await websocket.receive_text()
+                raw = await websocket.receive_text()
             except WebSocketDisconnect:
                 break
             except RuntimeError:
                 break
             except Exception:
                 await asyncio.sleep(0.5)
+                continue
+            try:
+                data = json.loads(raw)
+            except ValueError:
+                continue
+            if isinstance(data, dict) and data.get("action") == "subscribe":
+                manager.subscribe(websocket, Subscription.from_params(data))
     except WebSocketDisconnect:
         pass
     finally:
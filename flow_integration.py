@@ -5,7 +5,6 @@ Handles native flow message generation, sending, and response processing
 
 import os
 import json
-import requests
 import uuid
 from datetime import datetime
 from typing import Dict, Any, Optional
@@ -14,6 +13,8 @@ from sqlalchemy.orm import Session
 from database.db import get_db
 from services.whatsapp_service import get_latest_token
 from config.constants import get_messages_url
+from controllers.state.store import FlowValueMap
+from utils.whatsapp_client import whatsapp_client
 
 router = APIRouter()
 
@@ -23,8 +24,8 @@ router = APIRouter()
 FLOW_ID = "1314521433687006"  # ✅ Replace with your published Flow ID
 PHONE_ID = os.getenv("WHATSAPP_PHONE_ID", "367633743092037")
 WABA_ID = os.getenv("WHATSAPP_BUSINESS_ACCOUNT_ID", "367633743092037")
-# In-memory cache (use Redis or DB in production)
-flow_tokens: dict[str, str] = {}  # {wa_id: flow_token}
+# {wa_id: flow_token}, shared across workers via the flow state store
+flow_tokens = FlowValueMap("flow_integration_token")
 
 
 # -------------------------------
@@ -98,7 +99,7 @@ class FlowIntegration:
                 },
             }
 
-            response = requests.post(get_messages_url(PHONE_ID), headers=headers, json=payload)
+            response = await whatsapp_client.post(get_messages_url(PHONE_ID), headers=headers, json=payload)
             if response.status_code == 200:
                 print(f"✅ Flow message sent to {wa_id}")
                 return {"success": True, "response": response.json()}
@@ -6,7 +6,6 @@ Handles city selection with quick replies
 from datetime import datetime
 from typing import Dict, Any
 import os
-import requests
 
 from sqlalchemy.orm import Session
 from services.whatsapp_service import get_latest_token
@@ -15,6 +14,7 @@ from config.constants import get_messages_url
 from utils.whatsapp import send_message_to_waid
 from utils.ws_manager import manager
 from marketing.whatsapp_numbers import get_number_config
+from utils.whatsapp_client import whatsapp_client
 
 
 async def send_city_selection(db: Session, *, wa_id: str, phone_id_hint: str | None = None) -> Dict[str, Any]:
@@ -156,7 +156,7 @@ async def send_city_selection(db: Session, *, wa_id: str, phone_id_hint: str | N
             }
         }
 
-        resp = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+        resp = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
         
         if resp.status_code == 200:
             message_id = f"outbound_{datetime.now().timestamp()}"
@@ -330,7 +330,7 @@ async def send_city_selection_page2(db: Session, *, wa_id: str) -> Dict[str, Any
             }
         }
 
-        resp = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+        resp = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
         if resp.status_code == 200:
             return {"success": True}
         else:
@@ -639,12 +639,12 @@ async def handle_city_selection(
                     st_mr = _appt_mr.get(wa_id) or {}
                     mr_sent = bool(st_mr.get("mr_treatment_sent"))
                     if not mr_sent:
-                        _ = send_mr_treatment(db, wa_id=wa_id, phone_id_hint=str(phone_id_hint))
+                        _ = await send_mr_treatment(db, wa_id=wa_id, phone_id_hint=str(phone_id_hint))
                         print(f"[city_selection] DEBUG - Sent mr_treatment template for wa_id={wa_id}")
                     else:
                         print(f"[city_selection] DEBUG - Skipping mr_treatment template (already sent)")
                 except Exception:
-                    _ = send_mr_treatment(db, wa_id=wa_id, phone_id_hint=str(phone_id_hint))
+                    _ = await send_mr_treatment(db, wa_id=wa_id, phone_id_hint=str(phone_id_hint))
             except Exception as _e_mr:
                 print(f"[city_selection] WARNING - Could not send mr_treatment template: {_e_mr}")
             
@@ -659,11 +659,11 @@ async def handle_city_selection(
                     st_concern = _appt_concern.get(wa_id) or {}
                     concern_sent = bool(st_concern.get("concern_buttons_sent"))
                     if not concern_sent:
-                        _ = send_concern_buttons(db, wa_id=wa_id, phone_id_hint=str(phone_id_hint))
+                        _ = await send_concern_buttons(db, wa_id=wa_id, phone_id_hint=str(phone_id_hint))
                     else:
                         print(f"[city_selection] DEBUG - Skipping concern buttons (already sent)")
                 except Exception:
-                    _ = send_concern_buttons(db, wa_id=wa_id, phone_id_hint=str(phone_id_hint))
+                    _ = await send_concern_buttons(db, wa_id=wa_id, phone_id_hint=str(phone_id_hint))
             except Exception as _e_int:
                 print(f"[city_selection] WARNING - interactive senders failed: {_e_int}")
             
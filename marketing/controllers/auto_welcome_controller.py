@@ -3,6 +3,7 @@ from datetime import datetime
 from fastapi import APIRouter, Request, Depends, HTTPException
 from sqlalchemy.orm import Session
 import os
+import httpx
 import requests
 
 from database.db import get_db
@@ -19,12 +20,13 @@ from services.followup_service import mark_customer_replied
 from services.followup_service import schedule_next_followup
 from utils.whatsapp import send_message_to_waid
 import re
+from utils.whatsapp_client import whatsapp_client
 
 
 router = APIRouter()
 
 
-def _send_template(wa_id: str, template_name: str, access_token: str, phone_id: str, components: list | None = None, lang_code: str | None = None) -> requests.Response:
+async def _send_template(wa_id: str, template_name: str, access_token: str, phone_id: str, components: list | None = None, lang_code: str | None = None) -> httpx.Response:
     headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
     effective_lang = lang_code or os.getenv("WELCOME_TEMPLATE_LANG", "en_US")
     payload = {
@@ -54,7 +56,7 @@ def _send_template(wa_id: str, template_name: str, access_token: str, phone_id:
     except Exception:
         pass
     try:
-        resp = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+        resp = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
         # Detailed debug for 200 and non-200
         preview = None
         try:
@@ -432,7 +434,7 @@ async def whatsapp_auto_welcome_webhook(request: Request, db: Session = Depends(
                                 section_title = "Body"
 
                          
-                            requests.post(get_messages_url(phone_id2), headers=headers2, json=payload_list)
+                            await whatsapp_client.post(get_messages_url(phone_id2), headers=headers2, json=payload_list)
                             try:
                                 await manager.broadcast({
                                     "from": to_wa_id,
@@ -538,7 +540,7 @@ async def whatsapp_auto_welcome_webhook(request: Request, db: Session = Depends(
         except Exception:
             pass
 
-        resp = _send_template(
+        resp = await _send_template(
             wa_id=wa_id,
             template_name="mr_welcome",
             access_token=access_token,
@@ -627,7 +629,7 @@ async def whatsapp_auto_welcome_webhook(request: Request, db: Session = Depends(
                 }
 
                 try:
-                    btn_resp = requests.post(get_messages_url(phone_id_btn), headers=headers_btn, json=payload_btn)
+                    btn_resp = await whatsapp_client.post(get_messages_url(phone_id_btn), headers=headers_btn, json=payload_btn)
 
                     if btn_resp.status_code == 200:
                         response_data = btn_resp.json()
@@ -5,13 +5,13 @@ from typing import Any, Dict, Optional, Tuple
 
 import os
 import re
-import requests
 
 from sqlalchemy.orm import Session
 
 from marketing.whatsapp_numbers import get_number_config, WHATSAPP_NUMBERS
 from config.constants import get_messages_url
 from utils.ws_manager import manager
+from utils.whatsapp_client import whatsapp_client
 
 
 def _resolve_credentials(
@@ -109,7 +109,7 @@ def _display_from_for_phone_id(phone_id: Optional[str]) -> str:
         return os.getenv("WHATSAPP_DISPLAY_NUMBER", "917729992376")
 
 
-def send_mr_treatment(
+async def send_mr_treatment(
     db: Session,
     *,
     wa_id: str,
@@ -122,7 +122,7 @@ def send_mr_treatment(
 
     from controllers.auto_welcome_controller import _send_template  # local import to avoid cycles
     lang_code = os.getenv("WELCOME_TEMPLATE_LANG", "en_US")
-    resp = _send_template(
+    resp = await _send_template(
         wa_id=wa_id,
         template_name="mr_treatment",
         access_token=access_token,
@@ -173,7 +173,7 @@ def send_mr_treatment(
         except Exception:
             pass
     try:
-        awaitable = manager.broadcast({
+        await manager.broadcast({
             "from": _display_from_for_phone_id(phone_id),
             "to": wa_id,
             "type": "template",
@@ -182,23 +182,12 @@ def send_mr_treatment(
             "timestamp": datetime.now().isoformat(),
             "message_id": template_message_id_mr,
         })
-        # manager.broadcast is async; support both sync/async contexts
-        if hasattr(awaitable, "__await__"):
-            import asyncio
-            try:
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    asyncio.create_task(awaitable)
-                else:
-                    loop.run_until_complete(awaitable)
-            except Exception:
-                pass
     except Exception:
         pass
     return {"success": resp.status_code == 200, "status_code": resp.status_code}
 
 
-def send_concern_buttons(
+async def send_concern_buttons(
     db: Session,
     *,
     wa_id: str,
@@ -226,7 +215,7 @@ def send_concern_buttons(
             },
         },
     }
-    resp = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+    resp = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
     if resp.status_code == 200:
         # Save message to database
         try:
@@ -279,7 +268,7 @@ def send_concern_buttons(
         except Exception as e:
             print(f"[treatment_flow] WARNING - Could not log last step: {e}")
     try:
-        awaitable = manager.broadcast({
+        await manager.broadcast({
             "from": _display_from_for_phone_id(phone_id),
             "to": wa_id,
             "type": "interactive",
@@ -289,22 +278,12 @@ def send_concern_buttons(
             "interactive_data": {"kind": "buttons", "options": ["Skin", "Hair", "Body"]},
             "meta": {"kind": "buttons", "options": ["Skin", "Hair", "Body"]},
         })
-        if hasattr(awaitable, "__await__"):
-            import asyncio
-            try:
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    asyncio.create_task(awaitable)
-                else:
-                    loop.run_until_complete(awaitable)
-            except Exception:
-                pass
     except Exception:
         pass
     return {"success": resp.status_code == 200, "status_code": resp.status_code}
 
 
-def send_next_actions(
+async def send_next_actions(
     db: Session,
     *,
     wa_id: str,
@@ -331,7 +310,7 @@ def send_next_actions(
             },
         },
     }
-    resp = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+    resp = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
     if resp.status_code == 200:
         # Save message to database
         try:
@@ -382,7 +361,7 @@ def send_next_actions(
         except Exception as e:
             print(f"[treatment_flow] WARNING - Could not log last step: {e}")
     try:
-        awaitable = manager.broadcast({
+        await manager.broadcast({
             "from": _display_from_for_phone_id(phone_id),
             "to": wa_id,
             "type": "interactive",
@@ -392,16 +371,6 @@ def send_next_actions(
             "interactive_data": {"kind": "buttons", "options": ["📅 Book an Appointment", "📞 Request a Call Back"]},
             "meta": {"kind": "buttons", "options": ["📅 Book an Appointment", "📞 Request a Call Back"]},
         })
-        if hasattr(awaitable, "__await__"):
-            import asyncio
-            try:
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    asyncio.create_task(awaitable)
-                else:
-                    loop.run_until_complete(awaitable)
-            except Exception:
-                pass
     except Exception:
         pass
     return {"success": resp.status_code == 200, "status_code": resp.status_code}
@@ -0,0 +1,324 @@
+"""
+Shared OpenAI plumbing for the name and phone validators.
+
+The validators settle clear cases with their local heuristics and only come
+here for ambiguous input. This module puts three things in front of the
+chat-completions call:
+
+- a result cache keyed on (kind, normalised input): a bounded in-process LRU
+  (LLM_VALIDATION_CACHE_SIZE) backed by Redis (LLM_VALIDATION_CACHE_SECONDS),
+  so the same answer is not asked for twice across workers
+- a concurrency cap (LLM_VALIDATION_MAX_CONCURRENCY); callers that cannot get
+  a slot within LLM_VALIDATION_QUEUE_SECONDS give up and use the local result
+- a circuit breaker: after LLM_VALIDATION_BREAKER_FAILURES consecutive
+  failures, calls are skipped for LLM_VALIDATION_BREAKER_SECONDS, then one
+  trial call is let through
+
+resolve_async() uses a pooled httpx.AsyncClient per event loop and never
+blocks the loop; resolve() is the blocking equivalent for sync callers. Both
+return None when the LLM gives no usable answer, and the caller falls back to
+its local heuristic. Only LLM answers are cached.
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from cache.redis_connection import get_redis_client
+from utils.http_session import http_session
+
+logger = logging.getLogger(__name__)
+
+OPENAI_CHAT_URL = "https://api.openai.com/v1/chat/completions"
+
+LLM_VALIDATION_TIMEOUT = float(os.getenv("LLM_VALIDATION_TIMEOUT", "6"))
+LLM_VALIDATION_MAX_CONCURRENCY = int(os.getenv("LLM_VALIDATION_MAX_CONCURRENCY", "8"))
+LLM_VALIDATION_QUEUE_SECONDS = float(os.getenv("LLM_VALIDATION_QUEUE_SECONDS", "2"))
+LLM_VALIDATION_CACHE_SIZE = int(os.getenv("LLM_VALIDATION_CACHE_SIZE", "5000"))
+LLM_VALIDATION_CACHE_SECONDS = int(os.getenv("LLM_VALIDATION_CACHE_SECONDS", str(7 * 24 * 3600)))
+LLM_VALIDATION_BREAKER_FAILURES = int(os.getenv("LLM_VALIDATION_BREAKER_FAILURES", "5"))
+LLM_VALIDATION_BREAKER_SECONDS = float(os.getenv("LLM_VALIDATION_BREAKER_SECONDS", "60"))
+
+_REDIS_PREFIX = "llm_validation"
+
+Interpret = Callable[[Dict[str, Any]], Dict[str, object]]
+
+
+# ---------------------------------------------------------------------------
+# Result cache
+# ---------------------------------------------------------------------------
+
+class _ResultCache:
+    """Bounded LRU of validation results, with TTL."""
+
+    def __init__(self, max_size: int, ttl_seconds: int):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Dict[str, object], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, kind: str, key: str) -> Optional[Dict[str, object]]:
+        with self._lock:
+            entry = self._entries.get((kind, key))
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[(kind, key)]
+                return None
+            self._entries.move_to_end((kind, key))
+            return dict(entry[0])
+
+    def put(self, kind: str, key: str, result: Dict[str, object]) -> None:
+        with self._lock:
+            self._entries[(kind, key)] = (dict(result), time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end((kind, key))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_local_cache = _ResultCache(LLM_VALIDATION_CACHE_SIZE, LLM_VALIDATION_CACHE_SECONDS)
+
+
+def _redis_key(kind: str, key: str) -> str:
+    return f"{_REDIS_PREFIX}:{kind}:{hashlib.sha1(key.encode('utf-8')).hexdigest()}"
+
+
+def _redis_get(kind: str, key: str) -> Optional[Dict[str, object]]:
+    redis_client = get_redis_client()
+    if not redis_client:
+        return None
+    try:
+        raw = redis_client.get(_redis_key(kind, key))
+        return json.loads(raw) if raw else None
+    except Exception as e:
+        logger.debug(f"LLM validation cache read failed: {e}")
+        return None
+
+
+def _redis_put(kind: str, key: str, result: Dict[str, object]) -> None:
+    redis_client = get_redis_client()
+    if not redis_client:
+        return
+    try:
+        redis_client.set(_redis_key(kind, key), json.dumps(result), ex=LLM_VALIDATION_CACHE_SECONDS)
+    except Exception as e:
+        logger.debug(f"LLM validation cache write failed: {e}")
+
+
+# ---------------------------------------------------------------------------
+# Circuit breaker
+# ---------------------------------------------------------------------------
+
+class _CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open trial call."""
+
+    def __init__(self, threshold: int, cooldown_seconds: float):
+        self.threshold = threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._failures = 0
+        self._open_until = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._failures < self.threshold:
+            return "closed"
+        return "open" if time.monotonic() < self._open_until else "half_open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._failures < self.threshold:
+                return True
+            if time.monotonic() < self._open_until or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def release(self) -> None:
+        """An allowed call that was never made (no concurrency slot)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._failures >= self.threshold:
+                if self._failures == self.threshold:
+                    logger.warning(
+                        f"⚠️ OpenAI validation failing; skipping LLM calls for {self.cooldown_seconds:.0f}s"
+                    )
+                self._open_until = time.monotonic() + self.cooldown_seconds
+
+
+_breaker = _CircuitBreaker(LLM_VALIDATION_BREAKER_FAILURES, LLM_VALIDATION_BREAKER_SECONDS)
+
+
+# ---------------------------------------------------------------------------
+# OpenAI calls
+# ---------------------------------------------------------------------------
+
+def _request(system_prompt: str, user_content: str) -> Optional[Tuple[Dict[str, str], Dict[str, Any]]]:
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return None
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+    data = {
+        "model": os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+        "temperature": 0,
+        "response_format": {"type": "json_object"},
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content},
+        ],
+    }
+    return headers, data
+
+
+def _parse(status_code: int, body: Callable[[], Any]) -> Optional[Dict[str, Any]]:
+    if status_code != 200:
+        logger.warning(f"⚠️ OpenAI validation returned {status_code}")
+        return None
+    try:
+        result = json.loads(body()["choices"][0]["message"]["content"])
+        return result if isinstance(result, dict) else None
+    except Exception:
+        return None
+
+
+# httpx connection pools and asyncio semaphores are bound to their event loop
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_async_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+_sync_slots = threading.BoundedSemaphore(LLM_VALIDATION_MAX_CONCURRENCY)
+
+
+def _async_client() -> Tuple[httpx.AsyncClient, asyncio.Semaphore]:
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=LLM_VALIDATION_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=LLM_VALIDATION_MAX_CONCURRENCY,
+                max_keepalive_connections=LLM_VALIDATION_MAX_CONCURRENCY,
+            ),
+        )
+        _async_clients[loop] = client
+    slots = _async_slots.get(loop)
+    if slots is None:
+        slots = asyncio.Semaphore(LLM_VALIDATION_MAX_CONCURRENCY)
+        _async_slots[loop] = slots
+    return client, slots
+
+
+async def _chat_json_async(system_prompt: str, user_content: str) -> Optional[Dict[str, Any]]:
+    request = _request(system_prompt, user_content)
+    if request is None or not _breaker.allow():
+        return None
+    headers, data = request
+    client, slots = _async_client()
+    try:
+        await asyncio.wait_for(slots.acquire(), LLM_VALIDATION_QUEUE_SECONDS)
+    except asyncio.TimeoutError:
+        _breaker.release()
+        return None
+    try:
+        resp = await client.post(OPENAI_CHAT_URL, headers=headers, json=data)
+        result = _parse(resp.status_code, resp.json)
+    except Exception as e:
+        logger.warning(f"⚠️ OpenAI validation request failed: {e}")
+        result = None
+    finally:
+        slots.release()
+    if result is not None:
+        _breaker.record_success()
+    else:
+        _breaker.record_failure()
+    return result
+
+
+def _chat_json(system_prompt: str, user_content: str) -> Optional[Dict[str, Any]]:
+    request = _request(system_prompt, user_content)
+    if request is None or not _breaker.allow():
+        return None
+    headers, data = request
+    if not _sync_slots.acquire(timeout=LLM_VALIDATION_QUEUE_SECONDS):
+        _breaker.release()
+        return None
+    try:
+        resp = http_session.post(OPENAI_CHAT_URL, headers=headers, json=data, timeout=LLM_VALIDATION_TIMEOUT)
+        result = _parse(resp.status_code, resp.json)
+    except Exception as e:
+        logger.warning(f"⚠️ OpenAI validation request failed: {e}")
+        result = None
+    finally:
+        _sync_slots.release()
+    if result is not None:
+        _breaker.record_success()
+    else:
+        _breaker.record_failure()
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def resolve(kind: str, key: str, system_prompt: str, user_content: str,
+            interpret: Interpret) -> Optional[Dict[str, object]]:
+    """Cached LLM validation of `key`; None when the LLM gave no answer."""
+    cached = _local_cache.get(kind, key)
+    if cached is not None:
+        return cached
+    cached = _redis_get(kind, key)
+    if cached is not None:
+        _local_cache.put(kind, key, cached)
+        return cached
+    answer = _chat_json(system_prompt, user_content)
+    if answer is None:
+        return None
+    result = interpret(answer)
+    _local_cache.put(kind, key, result)
+    _redis_put(kind, key, result)
+    return result
+
+
+async def resolve_async(kind: str, key: str, system_prompt: str, user_content: str,
+                        interpret: Interpret) -> Optional[Dict[str, object]]:
+    """Async resolve(); Redis and OpenAI round-trips do not block the event loop."""
+    cached = _local_cache.get(kind, key)
+    if cached is not None:
+        return cached
+    cached = await asyncio.to_thread(_redis_get, kind, key)
+    if cached is not None:
+        _local_cache.put(kind, key, cached)
+        return cached
+    answer = await _chat_json_async(system_prompt, user_content)
+    if answer is None:
+        return None
+    result = interpret(answer)
+    _local_cache.put(kind, key, result)
+    await asyncio.to_thread(_redis_put, kind, key, result)
+    return result
+
+
+def validation_stats() -> Dict[str, object]:
+    return {"cached_results": len(_local_cache), "breaker": _breaker.state}
@@ -1,9 +1,17 @@
 from __future__ import annotations
 
-import os
 import re
-import requests
-from typing import Dict
+from typing import Dict, Optional, Tuple
+
+from marketing import llm_validation
+
+
+# Common Indian names; a message that is just one of these is accepted locally
+_COMMON_NAMES = frozenset({
+    "mohammed", "kumar", "sree", "sri", "anil", "raj", "ravi", "venkat",
+    "suresh", "priya", "anita", "arun", "deepak", "meenakshi", "nisha",
+    "swathi", "sandeep", "rajesh", "ganesh",
+})
 
 
 def _looks_like_human_name(name: str | None) -> bool:
@@ -89,76 +97,102 @@ def _looks_like_human_name(name: str | None) -> bool:
         return False
 
     # Allow some common Indian name patterns (optional enhancement)
-    indian_name_whitelist = [
-        "mohammed", "kumar", "sree", "sri", "anil", "raj", "ravi", "venkat",
-        "suresh", "priya", "anita", "arun", "deepak", "meenakshi", "nisha",
-        "swathi", "sandeep", "rajesh", "ganesh"
-    ]
-    for pat in indian_name_whitelist:
+    for pat in _COMMON_NAMES:
         if pat in lowered:
             return True
 
     return True
 
 
-def validate_human_name(text: str) -> Dict[str, object]:
-    """Validate that the input text is a plausible human name.
+_NAME_PROMPT = (
+    "You are a strict validator for human names. Check if the text is a plausible human name.\n"
+    "Rules:\n"
+    "- Accept full name or first name.\n"
+    "- At least 3 alphabetic characters total.\n"
+    "- Only letters, spaces, hyphens, apostrophes.\n"
+    "- Must look like a real name (has vowels and consonants, not gibberish).\n"
+    "- Reject placeholders like 'test', 'user', 'asdfghjkl', 'qwerty', etc.\n\n"
+    "Return ONLY JSON: {\"valid\": true|false, \"name\": string|null, \"reason\": string}."
+)
 
-    Returns dict: { valid: bool, name: str|None, reason: str }
-    - Accepts full name or first name
-    - Uses OpenAI when available, with local heuristic fallback
-    """
+# A name, optionally followed or preceded by a phone number
+_PLAIN_NAME_RE = re.compile(r"[A-Za-z\s\-'\d+().,]+")
+
+
+def _candidate_name(text: str) -> Tuple[str, str]:
     text = (text or "").strip()
     # Extract potential name tokens from text
     tokens = re.findall(r"[A-Za-z][A-Za-z\-']+", text)
-    candidate_name = " ".join(tokens[:3]) if tokens else text
-
-    api_key = os.getenv("OPENAI_API_KEY")
-    if api_key:
-        try:
-            url = "https://api.openai.com/v1/chat/completions"
-            headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-            prompt = (
-                "You are a strict validator for human names. Check if the text is a plausible human name.\n"
-                "Rules:\n"
-                "- Accept full name or first name.\n"
-                "- At least 3 alphabetic characters total.\n"
-                "- Only letters, spaces, hyphens, apostrophes.\n"
-                "- Must look like a real name (has vowels and consonants, not gibberish).\n"
-                "- Reject placeholders like 'test', 'user', 'asdfghjkl', 'qwerty', etc.\n\n"
-                "Return ONLY JSON: {\"valid\": true|false, \"name\": string|null, \"reason\": string}."
-            )
-            data = {
-                "model": os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
-                "temperature": 0,
-                "response_format": {"type": "json_object"},
-                "messages": [
-                    {"role": "system", "content": prompt},
-                    {"role": "user", "content": f"Validate this name: {candidate_name}"},
-                ],
-            }
-            resp = requests.post(url, headers=headers, json=data, timeout=12)
-            if resp.status_code == 200:
-                try:
-                    content = resp.json()["choices"][0]["message"]["content"]
-                    import json as _json
-                    result = _json.loads(content)
-                    # Combine OpenAI and local check
-                    name_out = (result.get("name") or candidate_name or "").strip()
-                    valid_flag = bool(result.get("valid")) and _looks_like_human_name(name_out)
-                    return {
-                        "valid": valid_flag,
-                        "name": name_out if valid_flag else None,
-                        "reason": result.get("reason")
-                        or ("validated" if valid_flag else "not a plausible name"),
-                    }
-                except Exception:
-                    pass
-        except Exception:
-            pass
-
-    # Local fallback (offline mode)
+    return text, (" ".join(tokens[:3]) if tokens else text)
+
+
+def _local_decision(text: str, candidate_name: str) -> Optional[Dict[str, object]]:
+    """
+    Settle clear cases without the LLM; None when it is ambiguous.
+
+    Locally we only reject, or accept a message that is a single common name
+    (optionally with a phone number). Anything else that passes the heuristic
+    ("Price list", "Need callback") goes to the cached LLM.
+    """
+    if len(re.sub(r"[^A-Za-z]", "", text)) < 3:
+        return {"valid": False, "name": None, "reason": "local_reject"}
+    tokens = re.findall(r"[A-Za-z][A-Za-z\-']*", text)
+    if len(tokens) > 3 or not _PLAIN_NAME_RE.fullmatch(text):
+        return None
+    if len(tokens) == 1:
+        if not _looks_like_human_name(candidate_name):
+            # The LLM can only return this token, which must pass the heuristic too
+            return {"valid": False, "name": None, "reason": "local_reject"}
+        if tokens[0].lower() in _COMMON_NAMES:
+            return {"valid": True, "name": candidate_name, "reason": "local_accept"}
+    return None
+
+
+def _interpret(candidate_name: str):
+    def interpret(result: Dict[str, object]) -> Dict[str, object]:
+        # Combine OpenAI and local check
+        name_out = (result.get("name") or candidate_name or "").strip()
+        valid_flag = bool(result.get("valid")) and _looks_like_human_name(name_out)
+        return {
+            "valid": valid_flag,
+            "name": name_out if valid_flag else None,
+            "reason": result.get("reason") or ("validated" if valid_flag else "not a plausible name"),
+        }
+    return interpret
+
+
+def _local_fallback(candidate_name: str) -> Dict[str, object]:
     name_out = candidate_name.strip()
     if _looks_like_human_name(name_out):
         return {"valid": True, "name": name_out, "reason": "local_fallback"}
-    return {"valid": False, "name": None, "reason": "local_reject"}
\ No newline at end of file
+    return {"valid": False, "name": None, "reason": "local_reject"}
+
+
+def validate_human_name(text: str) -> Dict[str, object]:
+    """Validate that the input text is a plausible human name.
+
+    Returns dict: { valid: bool, name: str|None, reason: str }
+    - Accepts full name or first name
+    - Clear cases are decided locally; the rest go to OpenAI (cached),
+      with local heuristic fallback
+    """
+    text, candidate_name = _candidate_name(text)
+    decided = _local_decision(text, candidate_name)
+    if decided:
+        return decided
+    result = llm_validation.resolve(
+        "name", candidate_name, _NAME_PROMPT, f"Validate this name: {candidate_name}", _interpret(candidate_name)
+    )
+    return result or _local_fallback(candidate_name)
+
+
+async def validate_human_name_async(text: str) -> Dict[str, object]:
+    """validate_human_name() for async handlers; never blocks the event loop."""
+    text, candidate_name = _candidate_name(text)
+    decided = _local_decision(text, candidate_name)
+    if decided:
+        return decided
+    result = await llm_validation.resolve_async(
+        "name", candidate_name, _NAME_PROMPT, f"Validate this name: {candidate_name}", _interpret(candidate_name)
+    )
+    return result or _local_fallback(candidate_name)
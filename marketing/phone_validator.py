@@ -1,6 +1,7 @@
-import os
 import re
-import requests
+from typing import Optional
+
+from marketing import llm_validation
 
 
 def _normalize_indian_phone(text: str | None) -> str | None:
@@ -18,54 +19,81 @@ def _normalize_indian_phone(text: str | None) -> str | None:
     return "+91" + last10
 
 
-def validate_indian_phone(text: str) -> dict[str, object]:
-    """Validate Indian mobile number.
-
-    Returns: { valid: bool, phone: str|None, reason: str }
-    - Normalizes to +91XXXXXXXXXX
-    - Uses OpenAI if available, otherwise local fallback
-    """
-    api_key = os.getenv("OPENAI_API_KEY")
-    if api_key:
-        try:
-            url = "https://api.openai.com/v1/chat/completions"
-            headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-            prompt = """You validate Indian mobile numbers. Extract a phone from the text and validate it.
+_PHONE_PROMPT = """You validate Indian mobile numbers. Extract a phone from the text and validate it.
 Rules:
 - Must be exactly 10 digits (Indian mobile).
 - Allow +91 prefix or separators, but final result must be +91XXXXXXXXXX (10 digits).
 - Must start with 6, 7, 8, or 9.
 
 Return ONLY JSON: {"valid": true|false, "phone": string|null, "reason": string}."""
-            data = {
-                "model": os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
-                "temperature": 0,
-                "response_format": {"type": "json_object"},
-                "messages": [
-                    {"role": "system", "content": prompt},
-                    {"role": "user", "content": f"Validate this phone: {text}"},
-                ],
-            }
-            resp = requests.post(url, headers=headers, json=data, timeout=12)
-            if resp.status_code == 200:
-                try:
-                    content = resp.json()["choices"][0]["message"]["content"]
-                    import json as _json
-                    result = _json.loads(content)
-                    phone_out = _normalize_indian_phone(result.get("phone") or text)
-                    valid_flag = bool(result.get("valid")) and bool(phone_out)
-                    return {
-                        "valid": valid_flag,
-                        "phone": phone_out if valid_flag else None,
-                        "reason": result.get("reason") or ("validated" if valid_flag else "invalid"),
-                    }
-                except Exception:
-                    pass
-        except Exception:
-            pass
-
-    # Local fallback
+
+
+def _is_single_number(digits: str) -> bool:
+    """10 digits, optionally with a 91 country code or a 0 trunk prefix."""
+    return (
+        len(digits) == 10
+        or (len(digits) == 12 and digits.startswith("91"))
+        or (len(digits) == 11 and digits.startswith("0"))
+    )
+
+
+def _local_decision(text: str) -> Optional[dict[str, object]]:
+    """Settle clear cases without the LLM; None when it is ambiguous."""
+    digits = re.sub(r"\D", "", text)
+    if len(digits) < 10:
+        return {"valid": False, "phone": None, "reason": "local_reject"}
+    if _is_single_number(digits):
+        phone_out = _normalize_indian_phone(text)
+        if phone_out:
+            return {"valid": True, "phone": phone_out, "reason": "local_accept"}
+        return {"valid": False, "phone": None, "reason": "local_reject"}
+    return None
+
+
+def _interpret(text: str):
+    def interpret(result: dict[str, object]) -> dict[str, object]:
+        phone_out = _normalize_indian_phone(result.get("phone") or text)
+        valid_flag = bool(result.get("valid")) and bool(phone_out)
+        return {
+            "valid": valid_flag,
+            "phone": phone_out if valid_flag else None,
+            "reason": result.get("reason") or ("validated" if valid_flag else "invalid"),
+        }
+    return interpret
+
+
+def _local_fallback(text: str) -> dict[str, object]:
     phone_out = _normalize_indian_phone(text)
     if phone_out:
         return {"valid": True, "phone": phone_out, "reason": "local_fallback"}
     return {"valid": False, "phone": None, "reason": "local_reject"}
+
+
+def validate_indian_phone(text: str) -> dict[str, object]:
+    """Validate Indian mobile number.
+
+    Returns: { valid: bool, phone: str|None, reason: str }
+    - Normalizes to +91XXXXXXXXXX
+    - Clear cases are decided locally; the rest go to OpenAI (cached),
+      with local fallback
+    """
+    text = " ".join((text or "").split())
+    decided = _local_decision(text)
+    if decided:
+        return decided
+    result = llm_validation.resolve(
+        "phone", text, _PHONE_PROMPT, f"Validate this phone: {text}", _interpret(text)
+    )
+    return result or _local_fallback(text)
+
+
+async def validate_indian_phone_async(text: str) -> dict[str, object]:
+    """validate_indian_phone() for async handlers; never blocks the event loop."""
+    text = " ".join((text or "").split())
+    decided = _local_decision(text)
+    if decided:
+        return decided
+    result = await llm_validation.resolve_async(
+        "phone", text, _PHONE_PROMPT, f"Validate this phone: {text}", _interpret(text)
+    )
+    return result or _local_fallback(text)
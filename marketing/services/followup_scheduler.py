@@ -0,0 +1,162 @@
+"""
+Follow-up scheduler.
+
+Each pass leases up to FOLLOWUP_BATCH_SIZE due customers with
+claim_due_followups (SELECT ... FOR UPDATE SKIP LOCKED plus a lease column),
+so any number of app instances can run the scheduler without sending the same
+follow-up twice. Claimed customers are processed concurrently, at most
+FOLLOWUP_CONCURRENCY at a time, each with its own DB session. The loop then
+sleeps until the next follow-up is due (capped at FOLLOWUP_MAX_SLEEP_SECONDS,
+so newly scheduled follow-ups are picked up) rather than polling on a fixed
+interval.
+
+A customer whose processing fails keeps its lease and is retried once the
+lease expires. A follow-up the send left due (it returned without
+rescheduling) is cleared, so the customer is not claimed again on every pass.
+"""
+
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from database.db import SessionLocal
+from models.models import Customer
+from marketing.services.followup_service import (
+    FOLLOW_UP_2_DELAY_MINUTES,
+    claim_due_followups,
+    finish_followup,
+    followup_skip_reason,
+    next_followup_due_at,
+    release_followup_lease,
+    send_followup1_interactive,
+    send_followup2,
+)
+
+logger = logging.getLogger("followup_scheduler")
+
+FOLLOWUP_SCHEDULER_ENABLED = os.getenv("FOLLOWUP_SCHEDULER_ENABLED", "true").lower() == "true"
+FOLLOWUP_BATCH_SIZE = int(os.getenv("FOLLOWUP_BATCH_SIZE", "50"))
+FOLLOWUP_CONCURRENCY = int(os.getenv("FOLLOWUP_CONCURRENCY", "10"))
+FOLLOWUP_MAX_SLEEP_SECONDS = float(os.getenv("FOLLOWUP_MAX_SLEEP_SECONDS", "30"))
+FOLLOWUP_MIN_SLEEP_SECONDS = 0.5
+
+_scheduler_task: Optional[asyncio.Task] = None
+
+
+def _claim_batch() -> List:
+    db = SessionLocal()
+    try:
+        return claim_due_followups(db, FOLLOWUP_BATCH_SIZE)
+    finally:
+        db.close()
+
+
+def _seconds_until_next_due() -> float:
+    db = SessionLocal()
+    try:
+        due_at = next_followup_due_at(db)
+    finally:
+        db.close()
+    if due_at is None:
+        return FOLLOWUP_MAX_SLEEP_SECONDS
+    delay = (due_at - datetime.utcnow()).total_seconds()
+    return min(max(delay, FOLLOWUP_MIN_SLEEP_SECONDS), FOLLOWUP_MAX_SLEEP_SECONDS)
+
+
+async def process_followup(customer_id) -> None:
+    """Send the due follow-up for one claimed customer and release its lease."""
+    db = SessionLocal()
+    try:
+        c = db.query(Customer).filter(Customer.id == customer_id).first()
+        now = datetime.utcnow()
+        if not c or not c.next_followup_time or c.next_followup_time > now:
+            # Replied or rescheduled since the claim
+            release_followup_lease(db, customer_id)
+            return
+
+        reason = followup_skip_reason(c, now)
+        if reason is not None:
+            logger.info(f"Skipping follow-up for customer {c.wa_id} - {reason}")
+            c.next_followup_time = None
+            c.followup_lease_until = None
+            db.commit()
+            return
+
+        logger.info(f"Processing follow-up for customer {c.id} (wa_id: {c.wa_id})")
+        if (c.last_message_type or "").lower() == "follow_up_1_sent":
+            # Only send Follow-Up 2 if NO replies since Follow-Up 1
+            # infer follow-up 1 sent time as next_followup_time - FOLLOW_UP_2_DELAY_MINUTES
+            fu1_sent_at = c.next_followup_time - timedelta(minutes=FOLLOW_UP_2_DELAY_MINUTES)
+            if c.last_interaction_time and c.last_interaction_time >= fu1_sent_at:
+                c.next_followup_time = None
+                c.followup_lease_until = None
+                db.commit()
+                logger.info(f"Customer {c.wa_id} replied after Follow-Up 1, skipping Follow-Up 2")
+                return
+
+            # Send Follow-Up 2 and create a lead with available details
+            await send_followup2(db, wa_id=c.wa_id)
+            try:
+                from services import customer_service
+                customer = customer_service.get_customer_record_by_wa_id(db, c.wa_id)
+            except Exception as e:
+                logger.warning(f"Could not get customer record: {e}")
+                customer = c
+            try:
+                from controllers.components.lead_appointment_flow.zoho_integration import trigger_zoho_lead_creation
+                await trigger_zoho_lead_creation(db, wa_id=c.wa_id, customer=customer, lead_status="CALL_INITIATED")
+            except Exception as e:
+                logger.warning(f"Could not create Zoho lead: {e}")
+        else:
+            # Send Follow-Up 1 (interactive Yes/No); it schedules Follow-Up 2 and sets the label
+            await send_followup1_interactive(db, wa_id=c.wa_id)
+
+        if finish_followup(db, customer_id, now):
+            logger.warning(f"Follow-up for customer {c.wa_id} was not rescheduled by the send; cleared it")
+        else:
+            logger.info(f"Successfully processed follow-up for customer {c.wa_id}")
+    except Exception as e:
+        logger.error(f"Failed to process follow-up for customer {customer_id}: {e}", exc_info=True)
+        db.rollback()
+    finally:
+        db.close()
+
+
+async def _run_scheduler():
+    semaphore = asyncio.Semaphore(FOLLOWUP_CONCURRENCY)
+
+    async def _bounded(customer_id):
+        async with semaphore:
+            await process_followup(customer_id)
+
+    while True:
+        try:
+            claimed = await asyncio.to_thread(_claim_batch)
+            if claimed:
+                logger.info(f"Claimed {len(claimed)} customer(s) due for follow-up")
+                await asyncio.gather(*(_bounded(customer_id) for customer_id in claimed))
+                if len(claimed) >= FOLLOWUP_BATCH_SIZE:
+                    continue  # more may be due right now
+            delay = await asyncio.to_thread(_seconds_until_next_due)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Critical error in scheduler: {e}", exc_info=True)
+            delay = FOLLOWUP_MAX_SLEEP_SECONDS
+        await asyncio.sleep(delay)
+
+
+async def start_followup_scheduler():
+    global _scheduler_task
+    if not FOLLOWUP_SCHEDULER_ENABLED or _scheduler_task is not None:
+        return
+    _scheduler_task = asyncio.create_task(_run_scheduler())
+
+
+async def stop_followup_scheduler():
+    global _scheduler_task
+    if _scheduler_task is not None:
+        _scheduler_task.cancel()
+        _scheduler_task = None
@@ -1,16 +1,14 @@
 from datetime import datetime, timedelta
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 import uuid
 import logging
-import sys
 
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, func
+from sqlalchemy import or_, func, text
 
 from models.models import Customer, Message
 
 import os
-import requests
 from fastapi import HTTPException
 from services import whatsapp_service, customer_service, message_service
 from schemas.message_schema import MessageCreate
@@ -20,6 +18,7 @@ from cache.redis_connection import get_redis_client
 from marketing.whatsapp_numbers import get_number_config, TREATMENT_FLOW_ALLOWED_PHONE_IDS, WHATSAPP_NUMBERS
 from utils.flow_log import log_flow_event  # flow logs
 import json
+from utils.whatsapp_client import whatsapp_client
 
 # Create logger for this module
 logger = logging.getLogger("followup_service")
@@ -294,101 +293,141 @@ def mark_customer_replied(db: Session, *, customer_id, reset_followup_timer: boo
         db.rollback()
 
 
-def due_customers_for_followup(db: Session):
+def followup_skip_reason(c: Customer, now: datetime) -> Optional[str]:
+    """Why a due follow-up should be dropped instead of sent (None when it should be sent)."""
+    # Skip users currently in lead appointment flow
+    if _is_in_lead_appointment_flow(getattr(c, "wa_id", None)):
+        return "user in lead appointment flow"
+    if c.last_interaction_time is None:
+        # No interaction recorded, proceed with follow-up (shouldn't happen normally)
+        return None
+    # Only send follow-up if at least FOLLOW_UP_1_DELAY_MINUTES have passed since last interaction
+    time_since_last_interaction = (now - c.last_interaction_time).total_seconds() / 60
+    if time_since_last_interaction < FOLLOW_UP_1_DELAY_MINUTES:
+        return f"user interacted {time_since_last_interaction:.2f} minutes ago (less than {FOLLOW_UP_1_DELAY_MINUTES} min threshold)"
+    return None
+
+
+def due_customers_for_followup(db: Session, limit: Optional[int] = None):
+    """
+    Customers whose follow-up is due now (diagnostics; the scheduler claims
+    rows with claim_due_followups instead). Stale follow-ups are cleared.
+    """
     now = datetime.utcnow()
-    
-    # Query for due customers - only those where follow-up time has passed
-    # AND user hasn't interacted since the follow-up was scheduled
-    due = db.query(Customer).filter(
+
+    query = db.query(Customer).filter(
         Customer.next_followup_time.isnot(None),
         Customer.next_followup_time <= now
-    ).all()
-    
-    # Filter out customers who have interacted recently
-    # Follow-Up 1 should ONLY be sent if 2 minutes have passed since last user interaction
-    actually_due = []
-    for c in due:
-        # Skip users currently in lead appointment flow
-        if _is_in_lead_appointment_flow(getattr(c, "wa_id", None)):
-            logger.info(f"[followup_service] Skipping due follow-up for {c.wa_id} - user in lead appointment flow")
-            c.next_followup_time = None
-            db.add(c)
-            continue
-        if c.last_interaction_time is None:
-            # No interaction recorded, proceed with follow-up (shouldn't happen normally)
-            actually_due.append(c)
+    ).order_by(Customer.next_followup_time)
+    if limit:
+        query = query.limit(limit)
+
+    due = []
+    cleared = 0
+    for c in query.all():
+        reason = followup_skip_reason(c, now)
+        if reason is None:
+            due.append(c)
             continue
-        
-        # Calculate time since last user interaction
-        time_since_last_interaction = (now - c.last_interaction_time).total_seconds() / 60
-        
-        # Only send follow-up if at least 2 minutes have passed since last interaction
-        if time_since_last_interaction >= FOLLOW_UP_1_DELAY_MINUTES:
-            # User hasn't interacted in the last 2 minutes, so follow-up is valid
-            actually_due.append(c)
-        else:
-            # User interacted less than 2 minutes ago - clear this stale follow-up
-            logger.info(f"[followup_service] Skipping follow-up for customer {c.wa_id} - user interacted {time_since_last_interaction:.2f} minutes ago (less than {FOLLOW_UP_1_DELAY_MINUTES} min threshold)")
-            c.next_followup_time = None
-            db.add(c)
-    
+        logger.info(f"[followup_service] Skipping follow-up for customer {c.wa_id} - {reason}")
+        c.next_followup_time = None
+        db.add(c)
+        cleared += 1
+
     # Commit any cleared follow-ups
-    if len(actually_due) < len(due):
+    if cleared:
         try:
             db.commit()
-            logger.info(f"[followup_service] Cleared {len(due) - len(actually_due)} stale follow-up(s) - users interacted recently")
+            logger.info(f"[followup_service] Cleared {cleared} stale follow-up(s)")
         except Exception as e:
             logger.error(f"[followup_service] Failed to clear stale follow-ups: {e}")
             db.rollback()
-    
-    due = actually_due
-    
-    # Enhanced debugging: always show status with detailed query info
-    total_scheduled = db.query(Customer).filter(Customer.next_followup_time.isnot(None)).count()
-    
-    # Also get customers that should be due (for debugging)
-    if total_scheduled > 0:
-        all_scheduled = db.query(Customer).filter(
-            Customer.next_followup_time.isnot(None)
-        ).all()
-        
-        # Check for any customers that should be due but weren't found
-        past_due = [c for c in all_scheduled if c.next_followup_time and c.next_followup_time <= now]
-        
-        if len(past_due) != len(due):
-            logger.warning(f"[followup_service] QUERY MISMATCH! Found {len(past_due)} customers that should be due, but query returned {len(due)}")
-            for c in past_due:
-                if c not in due:
-                    logger.warning(f"[followup_service] Customer {c.wa_id} (ID: {c.id}) has next_followup_time={c.next_followup_time} (past due) but not in query results!")
-    
-    if total_scheduled == 0:
-        logger.info(f"[followup_service] Current UTC time: {now} - No customers have follow-ups scheduled")
-        sys.stdout.flush()
-    elif not due:
-        # Get a few examples of scheduled follow-ups
-        examples = db.query(Customer).filter(
-            Customer.next_followup_time.isnot(None)
-        ).order_by(Customer.next_followup_time).limit(5).all()
-        
-        logger.info(f"[followup_service] Current UTC time: {now}")
-        logger.info(f"[followup_service] Found {total_scheduled} customer(s) with follow-ups scheduled, but none are due yet")
-        
-        for ex in examples:
-            if ex.next_followup_time:
-                time_diff = (ex.next_followup_time - now).total_seconds()
-                minutes_diff = int(time_diff / 60)
-                status = "PAST (due)" if time_diff <= 0 else f"FUTURE ({minutes_diff} min away)"
-                logger.info(f"[followup_service] Example: Customer {ex.wa_id} (ID: {ex.id}) - next_followup_time: {ex.next_followup_time}, status: {status}, time_diff: {time_diff:.1f} seconds")
-        sys.stdout.flush()
-    else:
-        logger.info(f"[followup_service] Current UTC time: {now} - Found {len(due)} customer(s) due for follow-up out of {total_scheduled} scheduled")
-        for d in due:
-            logger.info(f"[followup_service] Due customer: {d.wa_id} (ID: {d.id}), next_followup_time: {d.next_followup_time}, last_message_type: {d.last_message_type}")
-        sys.stdout.flush()
-    
+
+    if due:
+        logger.info(f"[followup_service] Current UTC time: {now} - Found {len(due)} customer(s) due for follow-up")
     return due
 
 
+# ---------------------------------------------------------------------------
+# Leases: let several app instances share the scheduler without double sends
+# ---------------------------------------------------------------------------
+
+FOLLOWUP_LEASE_SECONDS = int(os.getenv("FOLLOWUP_LEASE_SECONDS", "300"))
+
+
+def claim_due_followups(db: Session, limit: int) -> List[uuid.UUID]:
+    """
+    Lease up to `limit` due customers for this instance and return their ids.
+
+    Rows locked by a concurrent claim are skipped (FOR UPDATE SKIP LOCKED) and
+    leased rows are not claimed again until the lease runs out, so each due
+    follow-up is handed to exactly one instance. A lease left behind by a
+    crashed instance expires after FOLLOWUP_LEASE_SECONDS.
+    """
+    now = datetime.utcnow()
+    try:
+        rows = db.execute(
+            text("""
+                UPDATE customers SET followup_lease_until = :lease_until
+                WHERE id IN (
+                    SELECT id FROM customers
+                    WHERE next_followup_time <= :now
+                      AND (followup_lease_until IS NULL OR followup_lease_until <= :now)
+                    ORDER BY next_followup_time
+                    LIMIT :limit
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id
+            """),
+            {"now": now, "lease_until": now + timedelta(seconds=FOLLOWUP_LEASE_SECONDS), "limit": limit},
+        ).fetchall()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return [row.id for row in rows]
+
+
+def release_followup_lease(db: Session, customer_id) -> None:
+    db.execute(
+        text("UPDATE customers SET followup_lease_until = NULL WHERE id = :id"),
+        {"id": customer_id},
+    )
+    db.commit()
+
+
+def finish_followup(db: Session, customer_id, now: datetime) -> bool:
+    """
+    Release the lease after a follow-up was processed.
+
+    If the follow-up is still due, the send returned without rescheduling it
+    (e.g. the number is not enabled for the flow, or the state update after
+    Follow-Up 1 failed). It is cleared rather than claimed again on the next
+    pass. Returns True when it was cleared.
+    """
+    cleared = db.execute(
+        text("UPDATE customers SET next_followup_time = NULL WHERE id = :id AND next_followup_time <= :now"),
+        {"id": customer_id, "now": now},
+    ).rowcount > 0
+    db.execute(
+        text("UPDATE customers SET followup_lease_until = NULL WHERE id = :id"),
+        {"id": customer_id},
+    )
+    db.commit()
+    return cleared
+
+
+def next_followup_due_at(db: Session) -> Optional[datetime]:
+    """When the next follow-up becomes claimable (leased rows count from lease expiry)."""
+    return db.execute(
+        text("""
+            SELECT min(GREATEST(next_followup_time, COALESCE(followup_lease_until, next_followup_time)))
+            FROM customers
+            WHERE next_followup_time IS NOT NULL
+        """)
+    ).scalar()
+
+
 async def send_followup1_interactive(db: Session, *, wa_id: str, from_wa_id: str = None):
     """Send Follow-Up 1 as an interactive Yes/No message.
     This function is self-contained and does not rely on other send helpers.
@@ -428,7 +467,7 @@ async def send_followup1_interactive(db: Session, *, wa_id: str, from_wa_id: str
 
     logger.debug(f"Sending Follow-Up 1 interactive message to {wa_id} via phone_id {phone_id}")
     
-    res = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+    res = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
     if res.status_code != 200:
         logger.error(f"Failed to send Follow-Up 1 interactive to {wa_id}: Status {res.status_code}, Response: {res.text}")
         raise HTTPException(status_code=500, detail=f"Failed to send follow-up 1 interactive: {res.text}")
@@ -509,7 +548,7 @@ async def send_followup2(db: Session, *, wa_id: str, from_wa_id: str = None):
 
     logger.debug(f"Sending Follow-Up 2 message to {wa_id} via phone_id {phone_id}")
     
-    res = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+    res = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
     if res.status_code != 200:
         logger.error(f"Failed to send Follow-Up 2 to {wa_id}: Status {res.status_code}, Response: {res.text}")
         raise HTTPException(status_code=500, detail=f"Failed to send follow-up 2: {res.text}")
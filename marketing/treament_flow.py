@@ -5,7 +5,6 @@ from typing import Optional, Any, Dict
 
 import os
 import re
-import requests
 
 from sqlalchemy.orm import Session
 
@@ -14,6 +13,7 @@ from marketing.whatsapp_numbers import get_number_config, WHATSAPP_NUMBERS
 from config.constants import get_messages_url
 from utils.ws_manager import manager
 from utils.whatsapp import send_message_to_waid
+from utils.whatsapp_client import whatsapp_client
 
 
 def _safe_debug(prefix: str, **fields: Any) -> None:
@@ -595,7 +595,7 @@ async def run_treament_flow(
                                     },
                                 },
                             }
-                            resp_btn = requests.post(get_messages_url(treatment_phone_id), headers=headers_btn, json=payload_btn)
+                            resp_btn = await whatsapp_client.post(get_messages_url(treatment_phone_id), headers=headers_btn, json=payload_btn)
                             print(f"[treatment_flow] DEBUG - Sent treatment price button via phone_id={treatment_phone_id}, status={resp_btn.status_code}")
                             if resp_btn.status_code == 200:
                                 try:
@@ -1133,7 +1133,7 @@ async def run_treatment_buttons_flow(
 
                 if topic == "skin":
                     print(f"[treatment_flow] DEBUG - Sending skin_treat_flow template to wa_id={wa_id}")
-                    resp_skin = _send_template(wa_id=wa_id, template_name="skin_treat_flow", access_token=access_token2, phone_id=phone_id2, components=None, lang_code=lang_code)
+                    resp_skin = await _send_template(wa_id=wa_id, template_name="skin_treat_flow", access_token=access_token2, phone_id=phone_id2, components=None, lang_code=lang_code)
                     print(f"[treatment_flow] DEBUG - skin_treat_flow response status: {resp_skin.status_code}")
                     # Save template message to database
                     if resp_skin.status_code == 200:
@@ -1213,7 +1213,7 @@ async def run_treatment_buttons_flow(
                             },
                         },
                     }
-                    resp_list = requests.post(get_messages_url(phone_id2), headers=headers2, json=payload_list)
+                    resp_list = await whatsapp_client.post(get_messages_url(phone_id2), headers=headers2, json=payload_list)
                     if resp_list.status_code == 200:
                         try:
                             # Save outbound message to database
@@ -1256,7 +1256,7 @@ async def run_treatment_buttons_flow(
                     return {"status": "list_sent", "message_id": message_id}
 
                 if topic == "hair":
-                    resp_hair = _send_template(wa_id=wa_id, template_name="hair_treat_flow", access_token=access_token2, phone_id=phone_id2, components=None, lang_code=lang_code)
+                    resp_hair = await _send_template(wa_id=wa_id, template_name="hair_treat_flow", access_token=access_token2, phone_id=phone_id2, components=None, lang_code=lang_code)
                     # Save template message to database
                     if resp_hair.status_code == 200:
                         try:
@@ -1312,7 +1312,7 @@ async def run_treatment_buttons_flow(
                     return {"status": "hair_template_sent", "message_id": message_id}
 
                 if topic == "body":
-                    resp_body = _send_template(wa_id=wa_id, template_name="body_treat_flow", access_token=access_token2, phone_id=phone_id2, components=None, lang_code=lang_code)
+                    resp_body = await _send_template(wa_id=wa_id, template_name="body_treat_flow", access_token=access_token2, phone_id=phone_id2, components=None, lang_code=lang_code)
                     # Save template message to database
                     if resp_body.status_code == 200:
                         try:
@@ -8,10 +8,10 @@ import uuid
 import enum
 from datetime import datetime
 from sqlalchemy import (
-    Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, JSON, Table,
-    Enum as SAEnum, PrimaryKeyConstraint, Index
+    Column, Integer, BigInteger, String, Float, DateTime, ForeignKey, Text, Boolean, JSON, Table,
+    Enum as SAEnum, PrimaryKeyConstraint, Index, text
 )
-from sqlalchemy.dialects.postgresql import UUID, JSONB, ENUM
+from sqlalchemy.dialects.postgresql import UUID, JSONB, ENUM, ARRAY
 from sqlalchemy.orm import relationship, backref
 from sqlalchemy.sql import func
 from sqlalchemy.ext.declarative import declarative_base
@@ -184,6 +184,7 @@ class Customer(Base):
     last_interaction_time = Column(DateTime, nullable=True)
     last_message_type = Column(String(50), nullable=True)
     next_followup_time = Column(DateTime, nullable=True, index=True)  # Used by followup scheduler
+    followup_lease_until = Column(DateTime, nullable=True)  # Scheduler instance lease on the due follow-up
 
     # Relations
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
@@ -251,9 +252,27 @@ class Message(Base):
     latitude = Column(Float, nullable=True)
     longitude = Column(Float, nullable=True)
 
+    # Keywords matched in customer messages at insert (services/message_tag_service)
+    keyword_tags = Column(ARRAY(String), nullable=True)
+
     # Relationship back to customer for convenient access
     customer = relationship("Customer", backref="messages")
 
+    __table_args__ = (
+        # Webhook dedup lookups; WhatsApp message ids are unique when present
+        Index(
+            'ux_messages_message_id', 'message_id', unique=True,
+            postgresql_where=text("message_id IS NOT NULL AND message_id <> ''"),
+        ),
+        # Keyset pagination of chat histories
+        Index('ix_messages_customer_timestamp_id', 'customer_id', 'timestamp', 'id'),
+        Index('ix_messages_from_wa_id_timestamp', 'from_wa_id', 'timestamp'),
+        Index('ix_messages_to_wa_id_timestamp', 'to_wa_id', 'timestamp'),
+        Index('ix_messages_keyword_tags', 'keyword_tags', postgresql_using='gin'),
+        # Time-range scans (metric rollups)
+        Index('ix_messages_timestamp', 'timestamp'),
+    )
+
 
 class QuickReply(Base):
     __tablename__ = "quick_replies"
@@ -276,7 +295,7 @@ class ReferrerTracking(Base):
     wa_id = Column(String, index=True)
     center_name = Column(String)  # e.g., "Oliva Clinics Banjara Hills"
     location = Column(String)     # e.g., "Hyderabad"
-    created_at = Column(DateTime, default=func.now())
+    created_at = Column(DateTime, default=func.now(), index=True)
     
     # Appointment tracking fields
     appointment_date = Column(DateTime, nullable=True)  # Date of appointment
@@ -498,6 +517,43 @@ class FlowLog(Base):
         return f"<FlowLog(id={self.id}, wa_id='{self.wa_id}', flow_type='{self.flow_type}', step='{self.step}', status_code={self.status_code})>"
 
 
+class ConversationSummary(Base):
+    """
+    One row per customer for the inbox list, maintained on write by
+    services/conversation_summary_service (Message/FlowLog/Customer inserts).
+    """
+    __tablename__ = "conversation_summaries"
+
+    customer_id = Column(UUID(as_uuid=True), ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True)
+    wa_id = Column(String, nullable=False, unique=True)
+    organization_id = Column(UUID(as_uuid=True), nullable=True)
+    assigned_user_id = Column(UUID(as_uuid=True), nullable=True)
+
+    last_message_id = Column(Integer, nullable=True)  # messages.id of the latest message
+    last_message_body = Column(String, nullable=True)
+    last_message_at = Column(DateTime, nullable=True)
+    last_message_from = Column(String, nullable=True)
+    last_message_to = Column(String, nullable=True)
+    last_message_direction = Column(String(10), nullable=True)  # "inbound" | "outbound"
+    unread_count = Column(Integer, nullable=False, default=0)
+
+    last_flow_step = Column(String(100), nullable=True)
+    last_flow_description = Column(Text, nullable=True)
+    last_flow_at = Column(DateTime, nullable=True)
+
+    # Inbox ordering: latest message, else the customer's creation time
+    sort_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    customer = relationship("Customer")
+
+    __table_args__ = (
+        Index('ix_conversation_summaries_org_sort', 'organization_id', 'sort_at', 'customer_id'),
+        Index('ix_conversation_summaries_user_sort', 'assigned_user_id', 'sort_at', 'customer_id'),
+        Index('ix_conversation_summaries_sort', 'sort_at', 'customer_id'),
+    )
+
+
 # ------------------------------
 # Address Management
 # ------------------------------
@@ -801,7 +857,7 @@ class Lead(Base):
     sub_source = Column(String(50), nullable=True, default="Chats")
 
     # Timestamps
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def __repr__(self):
@@ -912,3 +968,83 @@ class ZohoPayloadLog(Base):
     
     def __repr__(self):
         return f"<ZohoPayloadLog(id={self.id}, wa_id={self.wa_id}, status={self.status})>"
+
+
+class ZohoLeadOutbox(Base):
+    """Leads waiting to be pushed to Zoho CRM by the background pusher"""
+    __tablename__ = "zoho_lead_outbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    wa_id = Column(String(64), nullable=False, index=True)
+    customer_id = Column(UUID(as_uuid=True), nullable=True)
+    flow_type = Column(String(50), nullable=False, default="lead_appointment")  # flow_logs.flow_type
+
+    # Duplicate-check key: last 10 phone digits + Lead Source (+ Sub Source)
+    phone_key = Column(String(20), nullable=False)
+    lead_source = Column(String(100), nullable=True)
+    sub_source = Column(String(50), nullable=True)
+
+    record = Column(JSONB, nullable=False)        # Zoho Leads API record (one entry of "data")
+    lead_fields = Column(JSONB, nullable=True)    # columns for the local `leads` row on success
+    payload_log = Column(JSONB, nullable=True)    # payload stored in zoho_payload_logs
+
+    status = Column(String(20), nullable=False, default="pending")  # pending | in_flight | done | duplicate | failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = Column(DateTime, nullable=True)
+    zoho_lead_id = Column(String(100), nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_zoho_lead_outbox_status_next", "status", "next_attempt_at"),
+        Index("ix_zoho_lead_outbox_phone_source", "phone_key", "lead_source", "created_at"),
+    )
+
+    def __repr__(self):
+        return f"<ZohoLeadOutbox(id={self.id}, wa_id={self.wa_id}, status={self.status})>"
+
+
+class MetricRollup(Base):
+    """Hourly row counts per metric and organisation (services/metric_rollup_service)"""
+    __tablename__ = "metric_rollups"
+
+    metric = Column(String(50), nullable=False)
+    org_key = Column(UUID(as_uuid=True), nullable=False)  # organization id, or all-zero for none
+    bucket_start = Column(DateTime, nullable=False)       # start of the hour
+    count = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("metric", "org_key", "bucket_start", name="metric_rollups_pk"),
+        Index("ix_metric_rollups_metric_bucket", "metric", "bucket_start"),
+    )
+
+
+class AgentResponseStat(Base):
+    """Precomputed agent response-time SLAs (services/agent_response_stats_service)"""
+    __tablename__ = "agent_response_stats"
+
+    scope = Column(String(20), nullable=False)       # agent | agent_center | center | organization | all
+    scope_key = Column(String(255), nullable=False)  # agent id, "agent|center", center id, organization id or ""
+    agent_id = Column(String, nullable=True)
+    center_id = Column(String, nullable=True)
+    organization_id = Column(UUID(as_uuid=True), nullable=True)
+    window_days = Column(Integer, nullable=False)
+
+    responses = Column(Integer, nullable=False, default=0)
+    first_responses = Column(Integer, nullable=False, default=0)
+    avg_seconds = Column(Float, nullable=True)
+    p50_seconds = Column(Float, nullable=True)
+    p90_seconds = Column(Float, nullable=True)
+    p99_seconds = Column(Float, nullable=True)
+    first_p50_seconds = Column(Float, nullable=True)
+    first_p90_seconds = Column(Float, nullable=True)
+    first_p99_seconds = Column(Float, nullable=True)
+    refreshed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("scope", "scope_key", name="agent_response_stats_pk"),
+    )
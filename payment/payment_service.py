@@ -4,7 +4,6 @@ Handles payment creation, status updates, and database operations
 """
 
 import os
-import requests
 from datetime import datetime
 from uuid import uuid4
 from typing import Optional, Tuple, Dict, Any
@@ -16,15 +15,20 @@ from .schemas import PaymentCreate, PaymentResponse
 from .razorpay_client import RazorpayClient, RazorpayError, ConfigurationError
 from .exceptions import PaymentError
 from utils.notification_service import send_payment_notifications
+from utils.razorpay_proxy import (
+    RAZORPAY_PASSWORD,
+    RAZORPAY_PAYMENT_URL,
+    RAZORPAY_TOKEN_URL,
+    RAZORPAY_USERNAME,
+    proxy_post,
+)
+from utils.http_session import http_session
 
 # Load env variables
 load_dotenv()
 
 # ---- Oliva Razorpay Proxy Config (Fallback) ----
-RAZORPAY_TOKEN_URL = "https://payments.olivaclinic.com/api/token"
-RAZORPAY_PAYMENT_URL = "https://payments.olivaclinic.com/api/payment"
-RAZORPAY_USERNAME = os.getenv("RAZORPAY_USERNAME", "test@example.com")
-RAZORPAY_PASSWORD = os.getenv("RAZORPAY_PASSWORD", "123")
+# Proxy URLs, credentials and the cached bearer token live in utils.razorpay_proxy
 
 # ---- Shopify Config ----
 SHOPIFY_STORE = os.getenv("SHOPIFY_STORE", "oliva-clinic")
@@ -39,25 +43,8 @@ class PaymentService:
         self.db = db
         self.razorpay_client = RazorpayClient()
     
-    def _get_payment_token(self) -> str:
-        """Get Bearer token from Razorpay proxy API."""
-        try:
-            data = {
-                "username": RAZORPAY_USERNAME,
-                "password": RAZORPAY_PASSWORD
-            }
-            headers = {
-                "Accept": "application/json",
-                "Content-Type": "application/x-www-form-urlencoded"
-            }
-            resp = requests.post(RAZORPAY_TOKEN_URL, data=data, headers=headers, timeout=20)
-            resp.raise_for_status()
-            return resp.json().get("access_token")
-        except Exception as e:
-            raise PaymentError(f"Failed to get Razorpay token: {e}")
-    
-    def _create_payment_link_proxy(self, token: str, payload: PaymentCreate, order: Order) -> dict:
-        """Create Razorpay payment link through Oliva proxy API."""
+    def _create_payment_link_proxy(self, payload: PaymentCreate, order: Order) -> dict:
+        """Create Razorpay payment link through Oliva proxy API (cached bearer token)."""
         try:
             amount_paise = int(round(payload.amount * 100))
             data = {
@@ -66,14 +53,7 @@ class PaymentService:
                 "description": f"Payment for order {str(order.id)}",
                 "reminder_enable": True,
             }
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-            }
-            resp = requests.post(RAZORPAY_PAYMENT_URL, json=data, headers=headers, timeout=20)
-            resp.raise_for_status()
-            return resp.json()
+            return proxy_post(RAZORPAY_PAYMENT_URL, data)
         except Exception as e:
             raise PaymentError(f"Failed to create Razorpay payment link via proxy: {e}")
     
@@ -132,8 +112,7 @@ class PaymentService:
                     raise PaymentError(f"Order not found: {payload.order_id}")
                 
                 try:
-                    token = self._get_payment_token()
-                    rzp_resp = self._create_payment_link_proxy(token, payload, order)
+                    rzp_resp = self._create_payment_link_proxy(payload, order)
                     
                     razorpay_id = rzp_resp.get("id", f"fallback_rzp_{uuid4().hex[:12]}")
                     short_url = rzp_resp.get("short_url", f"http://localhost:8000/payments/mock-pay/{razorpay_id}")
@@ -251,7 +230,7 @@ class PaymentService:
 
             shopify_url = f"https://{SHOPIFY_API_KEY}:{SHOPIFY_PASSWORD}@{SHOPIFY_STORE}.myshopify.com/admin/api/2024-04/orders.json"
             headers = {"Content-Type": "application/json"}
-            resp = requests.post(shopify_url, json=order_data, headers=headers, timeout=20)
+            resp = http_session.post(shopify_url, json=order_data, headers=headers, timeout=20)
 
             return resp.status_code, resp.json()
         except Exception as e:
@@ -11,6 +11,8 @@ import base64
 from typing import Dict, Any, Optional
 from datetime import datetime
 
+from utils.http_session import http_session
+
 
 class RazorpayError(Exception):
     """Base exception for Razorpay-related errors"""
@@ -112,7 +114,7 @@ class RazorpayClient:
             
             print(f"[RAZORPAY_CLIENT] Making API request to: {url}")
             
-            response = requests.post(url, json=data, headers=headers, timeout=30)
+            response = http_session.post(url, json=data, headers=headers, timeout=30)
             
             print(f"[RAZORPAY_CLIENT] Response status: {response.status_code}")
             
@@ -157,7 +159,7 @@ class RazorpayClient:
                 "Content-Type": "application/json"
             }
             
-            response = requests.get(url, headers=headers, timeout=30)
+            response = http_session.get(url, headers=headers, timeout=30)
             response.raise_for_status()
             
             return response.json()
@@ -197,7 +199,7 @@ class RazorpayClient:
                 "currency": currency
             }
             
-            response = requests.post(url, json=data, headers=headers, timeout=30)
+            response = http_session.post(url, json=data, headers=headers, timeout=30)
             response.raise_for_status()
             
             return response.json()
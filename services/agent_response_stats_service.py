@@ -0,0 +1,186 @@
+"""
+Agent response-time SLAs.
+
+A response is an agent message (agent_id set; automated replies have none)
+whose previous message in the conversation, ignoring automated messages, is
+from the customer. Its latency is measured from that customer message. The
+first response in a conversation is also measured from the customer's first
+message (first-response time).
+
+refresh_agent_response_stats() computes everything in one set-based query.
+LAG() runs over each customer's messages in the last AGENT_SLA_WINDOW_DAYS,
+and one GROUPING SETS pass produces mean and p50/p90/p99 per agent, per
+agent+centre, per centre, per organisation and overall. The results replace
+the rows of `agent_response_stats`. A background task refreshes them every
+AGENT_SLA_REFRESH_SECONDS, so readers only look up precomputed rows.
+"""
+
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database.db import SessionLocal
+from models.models import AgentResponseStat
+
+logger = logging.getLogger(__name__)
+
+AGENT_SLA_ENABLED = os.getenv("AGENT_SLA_ENABLED", "true").lower() == "true"
+AGENT_SLA_WINDOW_DAYS = int(os.getenv("AGENT_SLA_WINDOW_DAYS", "30"))
+AGENT_SLA_REFRESH_SECONDS = int(os.getenv("AGENT_SLA_REFRESH_SECONDS", "900"))
+
+SCOPES = ("agent", "agent_center", "center", "organization", "all")
+
+# Serialises refreshes across app processes (pg_try_advisory_xact_lock key)
+_REFRESH_LOCK_KEY = 7316002
+
+_refresher_task: Optional[asyncio.Task] = None
+
+_REFRESH_SQL = text("""
+    WITH convo AS (
+        SELECT m.customer_id, m.id, m.timestamp AS ts, m.agent_id, m.center_id,
+               LAG(m.sender_type) OVER w AS prev_sender,
+               LAG(m.timestamp) OVER w AS prev_ts,
+               MIN(m.timestamp) FILTER (WHERE m.sender_type = 'customer')
+                   OVER (PARTITION BY m.customer_id) AS first_customer_at
+        FROM messages m
+        WHERE m.timestamp >= :since
+          AND m.customer_id IS NOT NULL
+          AND (m.sender_type = 'customer' OR m.agent_id IS NOT NULL)
+        WINDOW w AS (PARTITION BY m.customer_id ORDER BY m.timestamp, m.id)
+    ),
+    responses AS (
+        SELECT r.agent_id, r.center_id, c.organization_id,
+               EXTRACT(EPOCH FROM (r.ts - r.prev_ts)) AS latency,
+               CASE WHEN ROW_NUMBER() OVER (PARTITION BY r.customer_id ORDER BY r.ts, r.id) = 1
+                    THEN EXTRACT(EPOCH FROM (r.ts - r.first_customer_at)) END AS first_latency
+        FROM convo r
+        LEFT JOIN customers c ON c.id = r.customer_id
+        WHERE r.agent_id IS NOT NULL AND r.prev_sender = 'customer'
+    ),
+    grouped AS (
+        SELECT GROUPING(agent_id, center_id, organization_id) AS g,
+               agent_id, center_id, organization_id,
+               count(*) AS responses,
+               count(first_latency) AS first_responses,
+               avg(latency) AS avg_seconds,
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY latency) AS p50,
+               percentile_cont(0.9) WITHIN GROUP (ORDER BY latency) AS p90,
+               percentile_cont(0.99) WITHIN GROUP (ORDER BY latency) AS p99,
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY first_latency) AS first_p50,
+               percentile_cont(0.9) WITHIN GROUP (ORDER BY first_latency) AS first_p90,
+               percentile_cont(0.99) WITHIN GROUP (ORDER BY first_latency) AS first_p99
+        FROM responses
+        GROUP BY GROUPING SETS ((agent_id), (agent_id, center_id), (center_id), (organization_id), ())
+    )
+    INSERT INTO agent_response_stats (
+        scope, scope_key, agent_id, center_id, organization_id, window_days,
+        responses, first_responses, avg_seconds, p50_seconds, p90_seconds, p99_seconds,
+        first_p50_seconds, first_p90_seconds, first_p99_seconds, refreshed_at
+    )
+    SELECT
+        CASE g WHEN 3 THEN 'agent' WHEN 1 THEN 'agent_center' WHEN 5 THEN 'center'
+               WHEN 6 THEN 'organization' ELSE 'all' END,
+        CASE g WHEN 3 THEN agent_id
+               WHEN 1 THEN agent_id || '|' || COALESCE(center_id, '')
+               WHEN 5 THEN COALESCE(center_id, '')
+               WHEN 6 THEN COALESCE(CAST(organization_id AS text), '')
+               ELSE '' END,
+        agent_id, center_id, organization_id, :window_days,
+        responses, first_responses, avg_seconds, p50, p90, p99, first_p50, first_p90, first_p99, now()
+    FROM grouped
+""")
+
+
+def refresh_agent_response_stats(window_days: int = AGENT_SLA_WINDOW_DAYS, force: bool = False) -> bool:
+    """
+    Recompute agent_response_stats. Returns False when another process is
+    refreshing or (unless force) another process refreshed recently.
+    """
+    db = SessionLocal()
+    try:
+        if not db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _REFRESH_LOCK_KEY}).scalar():
+            return False
+        if not force:
+            fresh = db.execute(
+                text("SELECT max(refreshed_at) > now() - make_interval(secs => :age) FROM agent_response_stats"),
+                {"age": AGENT_SLA_REFRESH_SECONDS / 2},
+            ).scalar()
+            if fresh:
+                return False
+        db.execute(text("DELETE FROM agent_response_stats"))
+        since = datetime.utcnow() - timedelta(days=window_days)
+        db.execute(_REFRESH_SQL, {"window_days": window_days, "since": since})
+        db.commit()
+        return True
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _row(stat: AgentResponseStat) -> Dict[str, Any]:
+    return {
+        "scope": stat.scope,
+        "agent_id": stat.agent_id,
+        "center_id": stat.center_id,
+        "organization_id": str(stat.organization_id) if stat.organization_id else None,
+        "window_days": stat.window_days,
+        "responses": stat.responses,
+        "first_responses": stat.first_responses,
+        "avg_seconds": stat.avg_seconds,
+        "p50_seconds": stat.p50_seconds,
+        "p90_seconds": stat.p90_seconds,
+        "p99_seconds": stat.p99_seconds,
+        "first_response_p50_seconds": stat.first_p50_seconds,
+        "first_response_p90_seconds": stat.first_p90_seconds,
+        "first_response_p99_seconds": stat.first_p99_seconds,
+        "refreshed_at": stat.refreshed_at.isoformat() if stat.refreshed_at else None,
+    }
+
+
+def get_response_stats(db: Session, scope: str = "agent", key: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Precomputed SLA rows for one scope (optionally one key), busiest first."""
+    query = db.query(AgentResponseStat).filter(AgentResponseStat.scope == scope)
+    if key is not None:
+        query = query.filter(AgentResponseStat.scope_key == key)
+    return [_row(stat) for stat in query.order_by(AgentResponseStat.responses.desc())]
+
+
+def get_agent_stat(db: Session, agent_id: str, center_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    if center_id:
+        rows = get_response_stats(db, "agent_center", f"{agent_id}|{center_id}")
+    else:
+        rows = get_response_stats(db, "agent", agent_id)
+    return rows[0] if rows else None
+
+
+async def _run_refresher():
+    while True:
+        try:
+            await asyncio.to_thread(refresh_agent_response_stats)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Agent response stats refresh failed: {e}")
+        await asyncio.sleep(AGENT_SLA_REFRESH_SECONDS)
+
+
+async def start_agent_response_stats():
+    global _refresher_task
+    if not AGENT_SLA_ENABLED or _refresher_task is not None:
+        return
+    _refresher_task = asyncio.create_task(_run_refresher())
+    logger.info(f"✅ Agent response stats refresher started (every {AGENT_SLA_REFRESH_SECONDS}s)")
+
+
+async def stop_agent_response_stats():
+    global _refresher_task
+    if _refresher_task is not None:
+        _refresher_task.cancel()
+        _refresher_task = None
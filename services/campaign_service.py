@@ -18,13 +18,13 @@ from models.models import (
     User,
     CampaignLog,
 )
-from sqlalchemy import func, case, and_, or_, desc, cast, String
+from sqlalchemy import func, case, and_, or_, desc, cast, String, text
 from datetime import datetime, date
-from io import BytesIO
-import pandas as pd
 from typing import Any, Dict, List, Optional, Tuple
 from schemas.campaign_schema import CampaignCreate, CampaignUpdate
 from uuid import UUID
+from services.conversation_summary_service import record_customer_updates
+from services.export_service import export, stream_rows
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -601,7 +601,8 @@ def publish_batch_to_queue(
     failed_messages = []
     total_messages = len(messages)
 
-    logger.info(f"📤 Starting batch publish of {total_messages} messages")
+    if log_progress:
+        logger.info(f"📤 Starting batch publish of {total_messages} messages")
 
     try:
         channel = rabbitmq_manager.get_channel(queue_name)
@@ -681,7 +682,8 @@ def publish_batch_to_queue(
                 except:
                     pass
 
-        logger.info(f"✅ Batch publish complete: {success_count} queued, {failure_count} failed")
+        if log_progress:
+            logger.info(f"✅ Batch publish complete: {success_count} queued, {failure_count} failed")
         return success_count, failure_count, failed_messages
 
     except Exception as e:
@@ -691,6 +693,158 @@ def publish_batch_to_queue(
         return success_count, failure_count + remaining, messages[success_count:]
 
 
+# SQL equivalents of normalize_phone_number() / validate_phone_number() so that
+# normalisation, validation and dedup run inside Postgres instead of over ORM objects.
+_SQL_CLEAN_PHONE = "btrim(replace(replace(replace({col}, '+', ''), ' ', ''), '-', ''))"
+_SQL_NORMALIZED_PHONE = (
+    "CASE WHEN " + _SQL_CLEAN_PHONE + " ~ '^[0-9]{{10}}$' "
+    "THEN '91' || " + _SQL_CLEAN_PHONE + " ELSE " + _SQL_CLEAN_PHONE + " END"
+)
+_SQL_VALID_PHONE = "coalesce({col}, '') ~ '^[0-9]{{10,}}$'"
+
+# Recipients: normalise in place, fail invalid numbers, then queue the first
+# row per phone number. Already SENT/FAILED recipients are skipped (dedup on re-run).
+_RECIPIENT_NORMALIZE_SQL = f"""
+    UPDATE campaign_recipients
+    SET phone_number = {_SQL_NORMALIZED_PHONE.format(col="phone_number")}
+    WHERE campaign_id = CAST(:campaign_id AS uuid)
+      AND status NOT IN ('SENT', 'FAILED')
+      AND phone_number IS DISTINCT FROM {_SQL_NORMALIZED_PHONE.format(col="phone_number")}
+"""
+
+_RECIPIENT_INVALID_SQL = f"""
+    WITH invalid AS (
+        UPDATE campaign_recipients
+        SET status = 'FAILED'
+        WHERE campaign_id = CAST(:campaign_id AS uuid)
+          AND status NOT IN ('SENT', 'FAILED')
+          AND NOT ({_SQL_VALID_PHONE.format(col="phone_number")})
+        RETURNING id, phone_number
+    )
+    INSERT INTO campaign_logs (id, campaign_id, job_id, target_type, target_id, phone_number,
+                               status, error_code, error_message, created_at, retry_count)
+    SELECT gen_random_uuid(), CAST(:campaign_id AS uuid), CAST(:job_id AS uuid), 'recipient', id, left(phone_number, 20),
+           'failure', 'INVALID_PHONE', 'Invalid phone number format: ' || coalesce(phone_number, ''),
+           :now, 0
+    FROM invalid
+"""
+
+_RECIPIENT_QUEUE_SQL = """
+    WITH eligible AS (
+        SELECT id, phone_number,
+               row_number() OVER (PARTITION BY phone_number ORDER BY created_at, id) AS rn
+        FROM campaign_recipients
+        WHERE campaign_id = CAST(:campaign_id AS uuid) AND status NOT IN ('SENT', 'FAILED')
+    ),
+    picked AS (
+        UPDATE campaign_recipients cr
+        SET status = 'QUEUED'
+        FROM eligible e
+        WHERE cr.id = e.id AND e.rn = 1
+        RETURNING cr.id, cr.phone_number
+    ),
+    logs AS (
+        INSERT INTO campaign_logs (id, campaign_id, job_id, target_type, target_id, phone_number,
+                                   status, created_at, retry_count)
+        SELECT gen_random_uuid(), CAST(:campaign_id AS uuid), CAST(:job_id AS uuid), 'recipient', id, phone_number, 'queued', :now, 0
+        FROM picked
+        RETURNING 1
+    )
+    SELECT (SELECT count(*) FROM logs) AS queued,
+           (SELECT count(*) FROM eligible WHERE rn > 1) AS duplicates
+"""
+
+# CRM customers: wa_id is unique, so only normalise when no other customer
+# already holds the normalised number; dedup on the normalised value.
+_CUSTOMER_NORMALIZE_SQL = f"""
+    UPDATE customers c
+    SET wa_id = {_SQL_NORMALIZED_PHONE.format(col="c.wa_id")}
+    FROM campaign_customers cc
+    WHERE cc.customer_id = c.id AND cc.campaign_id = CAST(:campaign_id AS uuid)
+      AND c.wa_id IS DISTINCT FROM {_SQL_NORMALIZED_PHONE.format(col="c.wa_id")}
+      AND NOT EXISTS (
+          SELECT 1 FROM customers o WHERE o.wa_id = {_SQL_NORMALIZED_PHONE.format(col="c.wa_id")}
+      )
+    RETURNING c.id, c.wa_id, c.organization_id, c.user_id
+"""
+
+_CUSTOMER_QUEUE_SQL = f"""
+    WITH targets AS (
+        SELECT c.id, c.wa_id,
+               {_SQL_VALID_PHONE.format(col="c.wa_id")} AS valid,
+               row_number() OVER (
+                   PARTITION BY {_SQL_NORMALIZED_PHONE.format(col="c.wa_id")}
+                   ORDER BY c.created_at, c.id
+               ) AS rn
+        FROM customers c
+        JOIN campaign_customers cc ON cc.customer_id = c.id
+        WHERE cc.campaign_id = CAST(:campaign_id AS uuid)
+    ),
+    invalid_logs AS (
+        INSERT INTO campaign_logs (id, campaign_id, job_id, target_type, target_id, phone_number,
+                                   status, error_code, error_message, created_at, retry_count)
+        SELECT gen_random_uuid(), CAST(:campaign_id AS uuid), CAST(:job_id AS uuid), 'customer', id, left(wa_id, 20),
+               'failure', 'INVALID_PHONE', 'Invalid wa_id format: ' || coalesce(wa_id, ''), :now, 0
+        FROM targets WHERE NOT valid
+        RETURNING 1
+    ),
+    queued_logs AS (
+        INSERT INTO campaign_logs (id, campaign_id, job_id, target_type, target_id, phone_number,
+                                   status, created_at, retry_count)
+        SELECT gen_random_uuid(), CAST(:campaign_id AS uuid), CAST(:job_id AS uuid), 'customer', id, left(wa_id, 20), 'queued', :now, 0
+        FROM targets WHERE valid AND rn = 1
+        RETURNING 1
+    )
+    SELECT (SELECT count(*) FROM queued_logs) AS queued,
+           (SELECT count(*) FROM targets WHERE valid AND rn > 1) AS duplicates,
+           (SELECT count(*) FROM invalid_logs) AS invalid
+"""
+
+_QUEUED_TARGETS_SQL = """
+    SELECT target_id FROM campaign_logs
+    WHERE job_id = CAST(:job_id AS uuid) AND status = 'queued'
+"""
+
+
+def _publish_queued_targets(
+    db: Session,
+    campaign: Campaign,
+    job: Job,
+    target_type: str,
+    batch_size: int,
+    batch_delay: int,
+    chunk_size: int,
+) -> Tuple[int, List[str]]:
+    """
+    Stream the job's queued targets with a server-side cursor and publish them
+    chunk by chunk, so memory stays flat regardless of campaign size.
+    Returns (published_count, failed_target_ids).
+    """
+    published = 0
+    failed_target_ids: List[str] = []
+    result = db.execute(
+        text(_QUEUED_TARGETS_SQL).execution_options(yield_per=chunk_size),
+        {"job_id": str(job.id)},
+    )
+    for rows in result.partitions(chunk_size):
+        tasks = [
+            {
+                "job_id": str(job.id),
+                "campaign_id": str(campaign.id),
+                "target_type": target_type,
+                "target_id": str(row.target_id),
+                "batch_size": int(batch_size) if batch_size is not None else 0,
+                "batch_delay": int(batch_delay) if batch_delay is not None else 0,
+            }
+            for row in rows
+        ]
+        success, failure, failed_msgs = publish_batch_to_queue(tasks, log_progress=False)
+        published += success
+        failed_target_ids.extend(msg.get("target_id") for msg in failed_msgs)
+        logger.info(f"📤 Published {published:,} {target_type} messages so far ({len(failed_target_ids)} failed)")
+    return published, failed_target_ids
+
+
 def run_campaign(
     campaign: Campaign,
     job: Job,
@@ -698,20 +852,20 @@ def run_campaign(
     *,
     batch_size: int = 0,
     batch_delay: int = 0,
-    log_batch_size: int = 500,  # Commit logs in batches for large campaigns
+    publish_chunk_size: int = 2000,
 ):
     """
     Run a campaign by queuing messages to RabbitMQ.
 
     OPTIMIZED for high volume (50,000+ messages):
-    - Uses single connection for all messages (no connection leak)
-    - Adds deduplication check
-    - Creates CampaignLog entries in batches for performance
-    - Validates phone numbers before queuing
+    - Normalisation, validation and dedup run as set-based SQL; no ORM objects
+      are loaded per recipient
+    - Queued CampaignLog rows are created with a single INSERT ... SELECT and
+      committed BEFORE publishing, so workers always find a log to update
+    - Queued targets are streamed from a server-side cursor and published in
+      chunks of `publish_chunk_size`
     - Supports batch_size and batch_delay for throttling
-    - Progress logging for large campaigns
     """
-    from models.models import CampaignRecipient, CampaignLog
     import time as time_module
 
     start_time = time_module.time()
@@ -719,225 +873,49 @@ def run_campaign(
     campaign.status = "running"
     db.commit()
 
-    recipients = db.query(CampaignRecipient).filter_by(campaign_id=campaign.id).all()
-    messages_to_queue = []
-    logs_to_create = []
-    skipped_count = 0
-    invalid_phone_count = 0
-    duplicate_count = 0
-
-    if recipients:
-        total_recipients = len(recipients)
-        is_large_campaign = total_recipients > 1000
-
-        if is_large_campaign:
-            logger.info(f"🚀 HIGH-VOLUME Campaign {campaign.id}: {total_recipients:,} recipients - starting queue process")
-        else:
-            logger.info(f"Campaign {campaign.id} has {total_recipients} recipients - preparing to queue")
-
-        # Track processed phone numbers to prevent duplicates
-        processed_phones = set()
-
-        for idx, r in enumerate(recipients):
-            # Skip already processed (SENT/FAILED) recipients - deduplication
-            if r.status in ("SENT", "FAILED"):
-                skipped_count += 1
-                continue
-
-            # Normalize phone number (add 91 country code if missing)
-            original_phone = r.phone_number
-            normalized_phone = normalize_phone_number(r.phone_number)
-            if normalized_phone != original_phone:
-                r.phone_number = normalized_phone
-                logger.info(f"Normalized phone: {original_phone} -> {normalized_phone}")
-
-            # Validate phone number
-            if not validate_phone_number(r.phone_number):
-                invalid_phone_count += 1
-                r.status = "FAILED"
-                # Create log entry for invalid phone
-                logs_to_create.append(CampaignLog(
-                    campaign_id=campaign.id,
-                    job_id=job.id,
-                    target_type="recipient",
-                    target_id=r.id,
-                    phone_number=r.phone_number,
-                    status="failure",
-                    error_code="INVALID_PHONE",
-                    error_message=f"Invalid phone number format: {r.phone_number}",
-                    created_at=datetime.utcnow()
-                ))
-                continue
-
-            # Deduplication within this batch (use normalized phone)
-            if r.phone_number in processed_phones:
-                duplicate_count += 1
-                continue
-            processed_phones.add(r.phone_number)
-
-            task = {
-                "job_id": str(job.id),
-                "campaign_id": str(campaign.id),
-                "target_type": "recipient",
-                "target_id": str(r.id),
-                "batch_size": int(batch_size) if batch_size is not None else 0,
-                "batch_delay": int(batch_delay) if batch_delay is not None else 0,
-            }
-            messages_to_queue.append((task, r))
-
-            # Create queued log entry
-            logs_to_create.append(CampaignLog(
-                campaign_id=campaign.id,
-                job_id=job.id,
-                target_type="recipient",
-                target_id=r.id,
-                phone_number=r.phone_number,
-                status="queued",
-                created_at=datetime.utcnow()
-            ))
+    params = {"campaign_id": str(campaign.id), "job_id": str(job.id), "now": datetime.utcnow()}
+    has_recipients = db.query(
+        db.query(CampaignRecipient.id).filter(CampaignRecipient.campaign_id == campaign.id).exists()
+    ).scalar()
 
-        # IMPORTANT: Save logs FIRST before publishing to queue
-        # This prevents race condition where worker tries to update non-existent log
-        if logs_to_create:
-            if is_large_campaign:
-                # Batch commit logs for better performance
-                for i in range(0, len(logs_to_create), log_batch_size):
-                    batch = logs_to_create[i:i + log_batch_size]
-                    db.add_all(batch)
-                    db.flush()
-            else:
-                db.add_all(logs_to_create)
-
-        # Update recipient statuses
-        for task, recipient in messages_to_queue:
-            recipient.status = "QUEUED"
-
-        # Commit logs to DB BEFORE publishing to queue
-        db.commit()
-
-        # Now publish messages - logs already exist in DB for worker to update
-        if messages_to_queue:
-            tasks_to_publish = [m[0] for m in messages_to_queue]
-            logger.info(f"📤 Publishing {len(tasks_to_publish)} messages to queue:")
-            for idx, task in enumerate(tasks_to_publish):
-                logger.info(f"   [{idx+1}] target_id={task.get('target_id')}")
-
-            success, failure, failed_msgs = publish_batch_to_queue(tasks_to_publish)
-            logger.info(f"📤 Publish result: success={success}, failure={failure}, failed_count={len(failed_msgs)}")
-
-            # Update campaign_logs for failed publishes
-            if failed_msgs:
-                failed_target_ids = [msg.get("target_id") for msg in failed_msgs]
-                db.query(CampaignLog).filter(
-                    CampaignLog.campaign_id == campaign.id,
-                    CampaignLog.job_id == job.id,
-                    cast(CampaignLog.target_id, String).in_(failed_target_ids)
-                ).update({
-                    CampaignLog.status: "failure",
-                    CampaignLog.error_code: "PUBLISH_FAILED",
-                    CampaignLog.error_message: "Failed to publish message to queue",
-                    CampaignLog.processed_at: datetime.utcnow()
-                }, synchronize_session=False)
-                db.commit()
-                logger.warning(f"⚠️ {len(failed_msgs)} messages failed to publish to queue")
-
-        # Log summary for large campaigns
-        elapsed = time_module.time() - start_time
-        queued_count = len(messages_to_queue)
-        if is_large_campaign:
-            logger.info(f"✅ Campaign {campaign.id} queuing complete in {elapsed:.1f}s:")
-            logger.info(f"   📤 Queued: {queued_count:,}")
-            logger.info(f"   ⏭️  Skipped (already sent): {skipped_count:,}")
-            logger.info(f"   🔄 Duplicates removed: {duplicate_count:,}")
-            logger.info(f"   ❌ Invalid phones: {invalid_phone_count}")
-            logger.info(f"   ⏱️  Estimated send time: ~{max(1, queued_count // (80 * 60))} minutes (Meta limit: 80 msg/sec)")
-        else:
-            logger.info(f"Queued {queued_count} messages, {skipped_count} skipped, {invalid_phone_count} invalid")
-
-        return job
-
-    # No recipients → normal CRM customers
-    total_customers = len(campaign.customers)
-    is_large_campaign = total_customers > 1000
-
-    if is_large_campaign:
-        logger.info(f"🚀 HIGH-VOLUME Campaign {campaign.id}: {total_customers:,} customers - starting queue process")
+    skipped_count = 0
+    if has_recipients:
+        target_type = "recipient"
+        skipped_count = db.query(func.count(CampaignRecipient.id)).filter(
+            CampaignRecipient.campaign_id == campaign.id,
+            CampaignRecipient.status.in_(("SENT", "FAILED")),
+        ).scalar()
+        normalized = db.execute(text(_RECIPIENT_NORMALIZE_SQL), params).rowcount
+        invalid_phone_count = db.execute(text(_RECIPIENT_INVALID_SQL), params).rowcount
+        counts = db.execute(text(_RECIPIENT_QUEUE_SQL), params).one()
     else:
-        logger.info(f"Campaign {campaign.id} has {total_customers} customers - preparing to queue")
-
-    processed_wa_ids = set()
-
-    for c in campaign.customers:
-        # Normalize wa_id (add 91 country code if missing)
-        original_wa_id = c.wa_id
-        normalized_wa_id = normalize_phone_number(c.wa_id)
-        if normalized_wa_id != original_wa_id:
-            c.wa_id = normalized_wa_id
-            logger.info(f"Normalized wa_id: {original_wa_id} -> {normalized_wa_id}")
-
-        # Validate wa_id
-        if not validate_phone_number(c.wa_id):
-            invalid_phone_count += 1
-            logs_to_create.append(CampaignLog(
-                campaign_id=campaign.id,
-                job_id=job.id,
-                target_type="customer",
-                target_id=c.id,
-                phone_number=c.wa_id,
-                status="failure",
-                error_code="INVALID_PHONE",
-                error_message=f"Invalid wa_id format: {c.wa_id}",
-                created_at=datetime.utcnow()
-            ))
-            continue
-
-        # Deduplication (use normalized wa_id)
-        if c.wa_id in processed_wa_ids:
-            duplicate_count += 1
-            continue
-        processed_wa_ids.add(c.wa_id)
-
-        task = {
-            "job_id": str(job.id),
-            "campaign_id": str(campaign.id),
-            "target_type": "customer",
-            "target_id": str(c.id),
-            "batch_size": batch_size,
-            "batch_delay": batch_delay,
-        }
-        messages_to_queue.append(task)
-
-        logs_to_create.append(CampaignLog(
-            campaign_id=campaign.id,
-            job_id=job.id,
-            target_type="customer",
-            target_id=c.id,
-            phone_number=c.wa_id,
-            status="queued",
-            created_at=datetime.utcnow()
-        ))
+        target_type = "customer"
+        renamed = db.execute(text(_CUSTOMER_NORMALIZE_SQL), params).mappings().all()
+        # Raw SQL skips the Customer after_update hook; keep the inbox summaries in step
+        record_customer_updates(db.connection(), renamed)
+        normalized = len(renamed)
+        counts = db.execute(text(_CUSTOMER_QUEUE_SQL), params).one()
+        invalid_phone_count = counts.invalid
 
-    # IMPORTANT: Save logs FIRST before publishing to queue
-    # This prevents race condition where worker tries to update non-existent log
-    if logs_to_create:
-        if is_large_campaign:
-            for i in range(0, len(logs_to_create), log_batch_size):
-                batch = logs_to_create[i:i + log_batch_size]
-                db.add_all(batch)
-                db.flush()
-        else:
-            db.add_all(logs_to_create)
+    queued_count, duplicate_count = counts.queued, counts.duplicates
 
     # Commit logs to DB BEFORE publishing to queue
+    # This prevents race condition where worker tries to update non-existent log
     db.commit()
+    logger.info(
+        f"Campaign {campaign.id}: {queued_count:,} {target_type}s to queue "
+        f"({normalized} normalised, {invalid_phone_count} invalid, {duplicate_count} duplicates, "
+        f"{skipped_count} already processed) in {time_module.time() - start_time:.1f}s"
+    )
 
     # Now publish messages - logs already exist in DB for worker to update
-    if messages_to_queue:
-        success, failure, failed_msgs = publish_batch_to_queue(messages_to_queue)
+    if queued_count:
+        published, failed_target_ids = _publish_queued_targets(
+            db, campaign, job, target_type, batch_size, batch_delay, publish_chunk_size
+        )
 
         # Update campaign_logs for failed publishes
-        if failed_msgs:
-            failed_target_ids = [msg.get("target_id") for msg in failed_msgs]
+        if failed_target_ids:
             db.query(CampaignLog).filter(
                 CampaignLog.campaign_id == campaign.id,
                 CampaignLog.job_id == job.id,
@@ -949,19 +927,16 @@ def run_campaign(
                 CampaignLog.processed_at: datetime.utcnow()
             }, synchronize_session=False)
             db.commit()
-            logger.warning(f"⚠️ {len(failed_msgs)} messages failed to publish to queue")
+            logger.warning(f"⚠️ {len(failed_target_ids)} messages failed to publish to queue")
 
     # Log summary
     elapsed = time_module.time() - start_time
-    queued_count = len(messages_to_queue)
-    if is_large_campaign:
-        logger.info(f"✅ Campaign {campaign.id} queuing complete in {elapsed:.1f}s:")
-        logger.info(f"   📤 Queued: {queued_count:,}")
-        logger.info(f"   🔄 Duplicates removed: {duplicate_count:,}")
-        logger.info(f"   ❌ Invalid phones: {invalid_phone_count}")
-        logger.info(f"   ⏱️  Estimated send time: ~{max(1, queued_count // (80 * 60))} minutes (Meta limit: 80 msg/sec)")
-    else:
-        logger.info(f"Queued {queued_count} customer messages, {duplicate_count} duplicates, {invalid_phone_count} invalid")
+    logger.info(f"✅ Campaign {campaign.id} queuing complete in {elapsed:.1f}s:")
+    logger.info(f"   📤 Queued: {queued_count:,}")
+    logger.info(f"   ⏭️  Skipped (already sent): {skipped_count:,}")
+    logger.info(f"   🔄 Duplicates removed: {duplicate_count:,}")
+    logger.info(f"   ❌ Invalid phones: {invalid_phone_count}")
+    logger.info(f"   ⏱️  Estimated send time: ~{max(1, queued_count // (80 * 60))} minutes (Meta limit: 80 msg/sec)")
 
     return job
 
@@ -1078,7 +1053,7 @@ def _aggregations_subqueries(db: Session):
     return job_status_agg, cust_count_sq, recip_count_sq, last_job_sq
 
 
-def get_campaign_reports(
+def _campaign_reports_query(
     db: Session,
     *,
     from_date: Optional[date] = None,
@@ -1086,11 +1061,8 @@ def get_campaign_reports(
     type_filter: Optional[str] = None,
     campaign_id: Optional[str] = None,
     search: Optional[str] = None,
-    page: int = 1,
-    limit: int = 25,
-    sort_by: Optional[str] = None,
-    sort_dir: Optional[str] = None,
-) -> List[Dict[str, Any]]:
+):
+    """Campaigns with their delivery aggregates; one row per campaign for _campaign_report_row()."""
     base_q = _build_campaign_base_query(
         db,
         from_date=from_date,
@@ -1102,7 +1074,7 @@ def get_campaign_reports(
 
     job_agg, cust_sq, recip_sq, last_job_sq = _aggregations_subqueries(db)
 
-    q = (
+    return (
         base_q
         .outerjoin(job_agg, job_agg.c.campaign_id == Campaign.id)
         .outerjoin(cust_sq, cust_sq.c.campaign_id == Campaign.id)
@@ -1127,57 +1099,82 @@ def get_campaign_reports(
         )
     )
 
-    rows = []
-    for campaign, success_count, failure_count, pending_count, last_processed, customers_count, recipients_count, price, ufn, uln, uname, last_attempted_by, last_triggered_time, job_created_at in q.all():
-        # Use last_processed (from CampaignLog) or fall back to job's last_triggered_time or job creation time
-        last_triggered = last_processed or last_triggered_time or job_created_at
-        success_count = int(success_count or 0)
-        failure_count = int(failure_count or 0)
-        pending_count = int(pending_count or 0)
-        customers_count = int(customers_count or 0)
-        recipients_count = int(recipients_count or 0)
-        total_recipients = customers_count + recipients_count
-        denom = total_recipients if total_recipients > 0 else (success_count + failure_count + pending_count)
-        denom = denom or 1
-        success_rate = round((success_count / denom) * 100, 2)
-        failure_rate = round((failure_count / denom) * 100, 2)
-        pending_rate = round((pending_count / denom) * 100, 2)
-        total_cost = float(price or 0) * float(total_recipients)
 
-        template_name = None
-        try:
-            if isinstance(campaign.content, dict):
-                template_name = campaign.content.get("name")
-        except Exception:
-            pass
+def _campaign_report_row(row) -> Dict[str, Any]:
+    campaign, success_count, failure_count, pending_count, last_processed, customers_count, recipients_count, price, ufn, uln, uname, last_attempted_by, last_triggered_time, job_created_at = row
+    # Use last_processed (from CampaignLog) or fall back to job's last_triggered_time or job creation time
+    last_triggered = last_processed or last_triggered_time or job_created_at
+    success_count = int(success_count or 0)
+    failure_count = int(failure_count or 0)
+    pending_count = int(pending_count or 0)
+    customers_count = int(customers_count or 0)
+    recipients_count = int(recipients_count or 0)
+    total_recipients = customers_count + recipients_count
+    denom = total_recipients if total_recipients > 0 else (success_count + failure_count + pending_count)
+    denom = denom or 1
+    success_rate = round((success_count / denom) * 100, 2)
+    failure_rate = round((failure_count / denom) * 100, 2)
+    pending_rate = round((pending_count / denom) * 100, 2)
+    total_cost = float(price or 0) * float(total_recipients)
+
+    template_name = None
+    try:
+        if isinstance(campaign.content, dict):
+            template_name = campaign.content.get("name")
+    except Exception:
+        pass
 
+    created_by_name = None
+    try:
+        fullname = " ".join([p for p in [ufn, uln] if p])
+        created_by_name = fullname if fullname.strip() else uname
+    except Exception:
         created_by_name = None
-        try:
-            fullname = " ".join([p for p in [ufn, uln] if p])
-            created_by_name = fullname if fullname.strip() else uname
-        except Exception:
-            created_by_name = None
 
-        rows.append({
-            "id": str(campaign.id),
-            "name": campaign.name,
-            "description": campaign.description,
-            "type": str(campaign.type),
-            "template_name": template_name,
-            "created_at": campaign.created_at.isoformat() if campaign.created_at else None,
-            "created_by": str(campaign.created_by),
-            "created_by_name": created_by_name,
-            "total_recipients": total_recipients,
-            "success_count": success_count,
-            "failure_count": failure_count,
-            "pending_count": pending_count,
-            "success_rate": success_rate,
-            "failure_rate": failure_rate,
-            "pending_rate": pending_rate,
-            "total_cost": round(total_cost, 2),
-            "last_triggered": last_triggered.isoformat() if last_triggered else None,
-            "last_triggered_by": str(last_attempted_by) if last_attempted_by else None,
-        })
+    return {
+        "id": str(campaign.id),
+        "name": campaign.name,
+        "description": campaign.description,
+        "type": str(campaign.type),
+        "template_name": template_name,
+        "created_at": campaign.created_at.isoformat() if campaign.created_at else None,
+        "created_by": str(campaign.created_by),
+        "created_by_name": created_by_name,
+        "total_recipients": total_recipients,
+        "success_count": success_count,
+        "failure_count": failure_count,
+        "pending_count": pending_count,
+        "success_rate": success_rate,
+        "failure_rate": failure_rate,
+        "pending_rate": pending_rate,
+        "total_cost": round(total_cost, 2),
+        "last_triggered": last_triggered.isoformat() if last_triggered else None,
+        "last_triggered_by": str(last_attempted_by) if last_attempted_by else None,
+    }
+
+
+def get_campaign_reports(
+    db: Session,
+    *,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    type_filter: Optional[str] = None,
+    campaign_id: Optional[str] = None,
+    search: Optional[str] = None,
+    page: int = 1,
+    limit: int = 25,
+    sort_by: Optional[str] = None,
+    sort_dir: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    q = _campaign_reports_query(
+        db,
+        from_date=from_date,
+        to_date=to_date,
+        type_filter=type_filter,
+        campaign_id=campaign_id,
+        search=search,
+    )
+    rows = [_campaign_report_row(row) for row in q.all()]
 
     # Sorting
     key_map = {
@@ -1207,6 +1204,26 @@ def get_campaign_reports(
     return rows[start:end]
 
 
+CAMPAIGN_REPORT_COLUMNS = [
+    ("Campaign Name", "name"),
+    ("Description", "description"),
+    ("Type", "type"),
+    ("Template Name", "template_name"),
+    ("Created Date", "created_at"),
+    ("Created By", None),
+    ("Total Recipients", "total_recipients"),
+    ("Success Count", "success_count"),
+    ("Failure Count", "failure_count"),
+    ("Pending Count", "pending_count"),
+    ("Success Rate (% )", "success_rate"),
+    ("Failure Rate (% )", "failure_rate"),
+    ("Pending Rate (% )", "pending_rate"),
+    ("Total Cost (₹)", "total_cost"),
+    ("Last Triggered", "last_triggered"),
+    ("Last Triggered By", "last_triggered_by"),
+]
+
+
 def export_campaign_reports_excel(
     db: Session,
     *,
@@ -1215,46 +1232,44 @@ def export_campaign_reports_excel(
     type_filter: Optional[str] = None,
     campaign_id: Optional[str] = None,
     search: Optional[str] = None,
-) -> bytes:
-    rows = get_campaign_reports(
+    filename: str = "campaign_reports",
+    file_format: str = "xlsx",
+    background: bool = False,
+    owner=None,
+):
+    """
+    Campaign reports export (StreamingResponse, or a job dict when background=True).
+
+    Every matching campaign is exported, read through a server-side cursor.
+    """
+    def build_rows(session: Session):
+        query = _campaign_reports_query(
+            session,
+            from_date=from_date,
+            to_date=to_date,
+            type_filter=type_filter,
+            campaign_id=campaign_id,
+            search=search,
+        )
+        for row in stream_rows(query):
+            r = _campaign_report_row(row)
+            yield [
+                (r.get("created_by_name") or r.get("created_by")) if key is None else r.get(key)
+                for _, key in CAMPAIGN_REPORT_COLUMNS
+            ]
+
+    return export(
         db,
-        from_date=from_date,
-        to_date=to_date,
-        type_filter=type_filter,
-        campaign_id=campaign_id,
-        search=search,
-        page=1,
-        limit=10_000,
+        filename=filename,
+        sheet_title="Campaign Reports",
+        header=[column for column, _ in CAMPAIGN_REPORT_COLUMNS],
+        rows=build_rows,
+        file_format=file_format,
+        background=background,
+        allow_empty=True,
+        owner=owner,
     )
 
-    # Map to Excel columns in requested order
-    export_rows = []
-    for r in rows:
-        export_rows.append({
-            "Campaign Name": r.get("name"),
-            "Description": r.get("description"),
-            "Type": r.get("type"),
-            "Template Name": r.get("template_name"),
-            "Created Date": r.get("created_at"),
-            "Created By": r.get("created_by_name") or r.get("created_by"),
-            "Total Recipients": r.get("total_recipients"),
-            "Success Count": r.get("success_count"),
-            "Failure Count": r.get("failure_count"),
-            "Pending Count": r.get("pending_count"),
-            "Success Rate (% )": r.get("success_rate"),
-            "Failure Rate (% )": r.get("failure_rate"),
-            "Pending Rate (% )": r.get("pending_rate"),
-            "Total Cost (₹)": r.get("total_cost"),
-            "Last Triggered": r.get("last_triggered"),
-            "Last Triggered By": r.get("last_triggered_by"),
-        })
-    df = pd.DataFrame(export_rows)
-    bio = BytesIO()
-    with pd.ExcelWriter(bio, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name="Campaign Reports")
-    bio.seek(0)
-    return bio.read()
-
 
 def get_single_campaign_report(db: Session, campaign_id: str) -> Dict[str, Any]:
     rows = get_campaign_reports(db, campaign_id=campaign_id, limit=1)
@@ -1454,7 +1469,38 @@ def export_campaign_delivery_logs_excel(
     status: Optional[str] = None,
     from_date: Optional[date] = None,
     to_date: Optional[date] = None,
-) -> bytes:
+    filename: Optional[str] = None,
+    file_format: str = "xlsx",
+    background: bool = False,
+    owner=None,
+):
+    """Campaign delivery log export, streamed from a server-side cursor."""
+    return export(
+        db,
+        filename=filename or f"campaign_{campaign_id}_delivery_logs",
+        sheet_title="Delivery Logs",
+        header=[
+            "Campaign ID", "Recipient Type", "Recipient ID", "Recipient Name", "Phone Number",
+            "Status", "Failure Reason", "Error Code", "HTTP Status", "WhatsApp Message ID",
+            "Processing Time (ms)", "Retry Count", "Last Retry At", "Logged At", "Processed At",
+        ],
+        rows=lambda session: _campaign_delivery_log_rows(
+            session, campaign_id, status=status, from_date=from_date, to_date=to_date
+        ),
+        empty_detail="No campaign logs found for export",
+        file_format=file_format,
+        background=background,
+        owner=owner,
+    )
+
+
+def _campaign_delivery_log_rows(
+    db: Session,
+    campaign_id: str,
+    status: Optional[str] = None,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+):
     recipient_alias = aliased(CampaignRecipient)
     customer_alias = aliased(Customer)
 
@@ -1505,34 +1551,22 @@ def export_campaign_delivery_logs_excel(
         end_dt = datetime.combine(to_date, datetime.max.time())
         query = query.filter(CampaignLog.created_at <= end_dt)
 
-    logs = query.all()
-    if not logs:
-        raise HTTPException(status_code=404, detail="No campaign logs found for export")
-
-    records: List[Dict[str, Any]] = []
-    for row in logs:
+    for row in stream_rows(query):
         name = row.recipient_name or row.customer_name
-        records.append({
-            "Campaign ID": str(campaign_id),
-            "Recipient Type": row.target_type,
-            "Recipient ID": str(row.target_id) if row.target_id else None,
-            "Recipient Name": name,
-            "Phone Number": row.phone_number,
-            "Status": row.status.upper(),
-            "Failure Reason": row.error_message if row.status == "failure" else None,
-            "Error Code": row.error_code,
-            "HTTP Status": row.http_status_code,
-            "WhatsApp Message ID": row.whatsapp_message_id,
-            "Processing Time (ms)": row.processing_time_ms,
-            "Retry Count": row.retry_count,
-            "Last Retry At": row.last_retry_at.isoformat() if row.last_retry_at else None,
-            "Logged At": row.created_at.isoformat() if row.created_at else None,
-            "Processed At": row.processed_at.isoformat() if row.processed_at else None,
-        })
-
-    df = pd.DataFrame(records)
-    bio = BytesIO()
-    with pd.ExcelWriter(bio, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name="Delivery Logs")
-    bio.seek(0)
-    return bio.read()
+        yield [
+            str(campaign_id),
+            row.target_type,
+            str(row.target_id) if row.target_id else None,
+            name,
+            row.phone_number,
+            row.status.upper(),
+            row.error_message if row.status == "failure" else None,
+            row.error_code,
+            row.http_status_code,
+            row.whatsapp_message_id,
+            row.processing_time_ms,
+            row.retry_count,
+            row.last_retry_at.isoformat() if row.last_retry_at else None,
+            row.created_at.isoformat() if row.created_at else None,
+            row.processed_at.isoformat() if row.processed_at else None,
+        ]
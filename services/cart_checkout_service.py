@@ -10,6 +10,7 @@ from services.payment_service import create_payment_link
 from schemas.payment_schema import PaymentCreate
 from utils.whatsapp import send_message_to_waid
 from utils.razorpay_utils import create_razorpay_payment_link
+from utils.whatsapp_client import whatsapp_client
 
 
 class CartCheckoutService:
@@ -293,7 +294,6 @@ Click the payment link above to redirect to Razorpay's secure payment page. Than
             from services.whatsapp_service import get_latest_token
             from config.constants import get_messages_url
             import os
-            import requests
             
             token_entry = get_latest_token(self.db)
             if not token_entry or not token_entry.token:
@@ -348,7 +348,7 @@ Click the payment link above to redirect to Razorpay's secure payment page. Than
                 }
             }
 
-            response = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+            response = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
             
             if response.status_code == 200:
                 print(f"[interactive_buttons] Payment buttons sent successfully")
@@ -394,7 +394,6 @@ Click the link above to complete your payment securely. Thank you! 🙏"""
             from services.whatsapp_service import get_latest_token
             from config.constants import get_messages_url
             import os
-            import requests
             
             token_entry = get_latest_token(self.db)
             if not token_entry or not token_entry.token:
@@ -443,7 +442,7 @@ Click the link above to complete your payment securely. Thank you! 🙏"""
                 }
             }
 
-            response = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+            response = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
             
             if response.status_code == 200:
                 print(f"[payment_link] Payment message sent successfully")
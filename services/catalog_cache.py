@@ -0,0 +1,184 @@
+"""
+Process-wide catalog snapshot for the shopping flow.
+
+Every tap in the shopping flow sent an interactive list built from fresh
+Category / SubCategory / Product queries. The catalog changes only through
+the admin API, so the snapshot loads the three tables once and prebuilds the
+`interactive` part of each list message: the category list, one subcategory
+list per category and one product list per category and per subcategory. It
+also prebuilds the admin category trees. Sending a list is then a dict lookup
+plus the recipient envelope.
+
+Freshness follows services.number_registry (cache.versioned_snapshot): the catalog write paths
+(create_category, create_product, upload_excel, normalisation) call
+invalidate_catalog_cache(). That marks the local copy stale and bumps a
+version counter in Redis, which every process checks at most every
+CATALOG_CACHE_SYNC_SECONDS. The snapshot is also reloaded after
+CATALOG_CACHE_MAX_AGE_SECONDS, to pick up rows (e.g. stock) changed outside
+the API.
+"""
+
+import os
+import copy
+import logging
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from cache.versioned_snapshot import VersionedSnapshot
+
+logger = logging.getLogger(__name__)
+
+CATALOG_CACHE_SYNC_SECONDS = float(os.getenv("CATALOG_CACHE_SYNC_SECONDS", "5"))
+CATALOG_CACHE_MAX_AGE_SECONDS = float(os.getenv("CATALOG_CACHE_MAX_AGE_SECONDS", "600"))
+
+# WhatsApp list messages allow at most 10 rows
+PRODUCT_LIST_LIMIT = 10
+
+_VERSION_KEY = "catalog_cache:version"
+
+
+def _list_message(header: str, body: str, section: str, rows: List[Dict[str, str]]) -> Dict[str, Any]:
+    return {
+        "type": "list",
+        "header": {"type": "text", "text": header},
+        "body": {"text": body},
+        "action": {
+            "button": "Choose",
+            "sections": [{"title": section, "rows": rows}],
+        },
+    }
+
+
+def category_list_message(rows: List[Dict[str, str]]) -> Dict[str, Any]:
+    return _list_message(
+        "Browse Categories", "Choose a category", "Categories",
+        rows or [{"id": "noop", "title": "No categories", "description": "Add from admin"}],
+    )
+
+
+def subcategory_list_message(category_id: str, rows: List[Dict[str, str]]) -> Dict[str, Any]:
+    return _list_message(
+        "Subcategories", "Choose a subcategory", "Subcategories",
+        rows or [{"id": f"cat:{category_id}", "title": "All items", "description": "No subcategories"}],
+    )
+
+
+def product_list_message(rows: List[Dict[str, str]]) -> Dict[str, Any]:
+    return _list_message(
+        "Products", "Pick a product", "Products",
+        rows or [{"id": "noop", "title": "No products available"}],
+    )
+
+
+_EMPTY_PRODUCT_LIST = product_list_message([])
+
+
+class _Snapshot:
+    def __init__(self, categories, subcategories, products):
+        self.category_list = category_list_message([
+            {"id": str(c.id), "title": c.name[:24], "description": (c.description or "")[:72]}
+            for c in categories
+        ])
+
+        sub_rows: Dict[str, List[Dict[str, str]]] = defaultdict(list)
+        subs_by_category: Dict[str, list] = defaultdict(list)
+        for s in subcategories:
+            sub_rows[str(s.category_id)].append(
+                {"id": str(s.id), "title": s.name[:24], "description": (s.description or "")[:72]}
+            )
+            subs_by_category[str(s.category_id)].append(s)
+        self.subcategory_lists: Dict[str, Dict[str, Any]] = {
+            str(c.id): subcategory_list_message(str(c.id), sub_rows.get(str(c.id), [])) for c in categories
+        }
+
+        all_rows: List[Dict[str, str]] = []
+        by_category: Dict[str, List[Dict[str, str]]] = defaultdict(list)
+        by_subcategory: Dict[str, List[Dict[str, str]]] = defaultdict(list)
+        for p in products:
+            row = {"id": str(p.id), "title": p.name[:24], "description": f"₹{int(p.price)} | Stock: {p.stock}"}
+            for bucket in (
+                all_rows,
+                by_category[str(p.category_id)] if p.category_id else None,
+                by_subcategory[str(p.sub_category_id)] if p.sub_category_id else None,
+            ):
+                if bucket is not None and len(bucket) < PRODUCT_LIST_LIMIT:
+                    bucket.append(row)
+        self.all_products_list = product_list_message(all_rows)
+        self.products_by_category = {key: product_list_message(rows) for key, rows in by_category.items()}
+        self.products_by_subcategory = {key: product_list_message(rows) for key, rows in by_subcategory.items()}
+
+        self.category_trees: Dict[str, Dict[str, Any]] = {
+            str(c.id): {
+                "id": str(c.id),
+                "name": c.name,
+                "description": c.description,
+                "image_url": c.image_url,
+                "subcategories": [
+                    {"id": str(s.id), "name": s.name, "description": s.description, "image_url": None, "subcategories": []}
+                    for s in subs_by_category.get(str(c.id), [])
+                ],
+            }
+            for c in categories
+        }
+
+
+def _load() -> _Snapshot:
+    from database.db import SessionLocal
+    from models.models import Category, Product, SubCategory
+
+    db = SessionLocal()
+    try:
+        categories = db.query(Category).order_by(Category.created_at, Category.id).all()
+        subcategories = db.query(SubCategory).order_by(SubCategory.created_at, SubCategory.id).all()
+        products = db.query(Product).order_by(Product.created_at, Product.id).all()
+        snapshot = _Snapshot(categories, subcategories, products)
+    finally:
+        db.close()
+    logger.debug(f"Catalog snapshot loaded: {len(categories)} categories, {len(products)} products")
+    return snapshot
+
+
+class CatalogCache:
+    def __init__(self):
+        self._snapshot = VersionedSnapshot(
+            _load,
+            version_key=_VERSION_KEY,
+            sync_seconds=CATALOG_CACHE_SYNC_SECONDS,
+            max_age_seconds=CATALOG_CACHE_MAX_AGE_SECONDS,
+            label="Catalog cache",
+        )
+
+    def _current(self) -> _Snapshot:
+        return self._snapshot.get()
+
+    def invalidate(self) -> None:
+        self._snapshot.invalidate()
+
+    # ---- lookups -----------------------------------------------------------
+    # Interactive payloads are shared between sends; callers must not mutate them.
+
+    def category_list(self) -> Dict[str, Any]:
+        return self._current().category_list
+
+    def subcategory_list(self, category_id) -> Dict[str, Any]:
+        key = str(category_id)
+        return self._current().subcategory_lists.get(key) or subcategory_list_message(key, [])
+
+    def product_list(self, category_id=None, subcategory_id=None) -> Dict[str, Any]:
+        snapshot = self._current()
+        if subcategory_id:
+            return snapshot.products_by_subcategory.get(str(subcategory_id), _EMPTY_PRODUCT_LIST)
+        if category_id:
+            return snapshot.products_by_category.get(str(category_id), _EMPTY_PRODUCT_LIST)
+        return snapshot.all_products_list
+
+    def category_tree(self, category_id) -> Optional[Dict[str, Any]]:
+        tree = self._current().category_trees.get(str(category_id))
+        return copy.deepcopy(tree) if tree is not None else None
+
+
+catalog_cache = CatalogCache()
+
+
+def invalidate_catalog_cache() -> None:
+    catalog_cache.invalidate()
@@ -0,0 +1,272 @@
+"""
+Conversation summaries for the inbox list.
+
+`conversation_summaries` holds one row per customer with the latest message,
+unread count, latest flow step, assigned agent and organization. Rows are
+kept current on write, inside the same transaction as the change:
+
+- Message insert    -> last message (if newer), unread count for inbound messages
+- FlowLog insert    -> last flow step (if newer and one of INBOX_FLOW_STEPS)
+- Customer insert   -> empty summary row (customers with no messages are listed)
+- Customer update   -> wa_id / organization / assigned agent
+
+ORM writes are picked up by the mapper listeners below, which each process
+registers at startup with register_write_hooks(); bulk SQL writers (e.g. the
+campaign consumer) call record_messages() / record_flow_steps() /
+record_customer_updates() themselves.
+
+unread_count is the only unread counter: unread_counts() reads it and
+mark_conversation_read() resets it.
+"""
+
+import logging
+
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+
+from models.models import ConversationSummary, Customer, FlowLog, Message
+
+logger = logging.getLogger(__name__)
+
+INBOX_FLOW_STEPS = ("entry", "city_selection", "treatment", "concern_list", "last_step")
+
+_LAST_MESSAGE_FIELDS = (
+    "last_message_id", "last_message_body", "last_message_at",
+    "last_message_from", "last_message_to", "last_message_direction",
+)
+_NEWER = (
+    "(s.last_message_at IS NULL OR (EXCLUDED.last_message_at, EXCLUDED.last_message_id)"
+    " >= (s.last_message_at, s.last_message_id))"
+)
+
+_UPSERT_MESSAGE_SQL = text(f"""
+    INSERT INTO conversation_summaries AS s (
+        customer_id, wa_id, organization_id, assigned_user_id,
+        {", ".join(_LAST_MESSAGE_FIELDS)}, unread_count, sort_at, updated_at
+    )
+    SELECT c.id, c.wa_id, c.organization_id, c.user_id,
+           :message_pk, :body, :ts, :from_wa_id, :to_wa_id, :direction,
+           :unread, COALESCE(:ts, c.last_message_at, c.created_at, now()), now()
+    FROM customers c
+    WHERE c.id = CAST(:customer_id AS uuid)
+    ON CONFLICT (customer_id) DO UPDATE SET
+        {", ".join(f"{f} = CASE WHEN {_NEWER} THEN EXCLUDED.{f} ELSE s.{f} END" for f in _LAST_MESSAGE_FIELDS)},
+        unread_count = s.unread_count + EXCLUDED.unread_count,
+        sort_at = GREATEST(s.sort_at, EXCLUDED.sort_at),
+        updated_at = now()
+""")
+
+_UPDATE_FLOW_SQL = text("""
+    UPDATE conversation_summaries
+    SET last_flow_step = :step, last_flow_description = :description,
+        last_flow_at = :created_at, updated_at = now()
+    WHERE wa_id = :wa_id AND (last_flow_at IS NULL OR last_flow_at <= :created_at)
+""")
+
+_INSERT_CUSTOMER_SQL = text(f"""
+    INSERT INTO conversation_summaries (
+        customer_id, wa_id, organization_id, assigned_user_id,
+        last_flow_step, last_flow_description, last_flow_at, unread_count, sort_at, updated_at
+    )
+    SELECT CAST(:customer_id AS uuid), :wa_id, CAST(:organization_id AS uuid), CAST(:user_id AS uuid),
+           f.step, f.description, f.created_at, 0, COALESCE(:sort_at, now()), now()
+    FROM (SELECT 1) AS one
+    LEFT JOIN LATERAL (
+        SELECT step, description, created_at FROM flow_logs
+        WHERE wa_id = :wa_id AND step IN ({", ".join(f"'{s}'" for s in INBOX_FLOW_STEPS)})
+        ORDER BY created_at DESC LIMIT 1
+    ) f ON true
+    ON CONFLICT (customer_id) DO NOTHING
+""")
+
+_UPDATE_CUSTOMER_SQL = text("""
+    UPDATE conversation_summaries
+    SET wa_id = :wa_id, organization_id = CAST(:organization_id AS uuid),
+        assigned_user_id = CAST(:user_id AS uuid), updated_at = now()
+    WHERE customer_id = CAST(:customer_id AS uuid)
+""")
+
+
+def _str_or_none(value) -> Optional[str]:
+    return str(value) if value is not None else None
+
+
+def message_direction(sender_type: Optional[str]) -> str:
+    return "inbound" if sender_type == "customer" else "outbound"
+
+
+def record_messages(connection, rows: Iterable[Dict[str, Any]]) -> None:
+    """
+    Fold newly inserted messages into their summaries.
+
+    Each row needs: id, customer_id, body, timestamp, from_wa_id, to_wa_id, sender_type.
+    """
+    params = [
+        {
+            "customer_id": str(r["customer_id"]),
+            "message_pk": r["id"],
+            "body": r.get("body"),
+            "ts": r.get("timestamp"),
+            "from_wa_id": r.get("from_wa_id"),
+            "to_wa_id": r.get("to_wa_id"),
+            "direction": message_direction(r.get("sender_type")),
+            "unread": 1 if r.get("sender_type") == "customer" else 0,
+        }
+        for r in rows
+        if r.get("customer_id")
+    ]
+    if params:
+        connection.execute(_UPSERT_MESSAGE_SQL, params)
+
+
+def record_flow_steps(connection, rows: Iterable[Dict[str, Any]]) -> None:
+    """Fold flow log rows (wa_id, step, description, created_at) into their summaries."""
+    params = [
+        {
+            "wa_id": r["wa_id"],
+            "step": r["step"],
+            "description": r.get("description"),
+            "created_at": r.get("created_at") or datetime.utcnow(),
+        }
+        for r in rows
+        if r.get("wa_id") and r.get("step") in INBOX_FLOW_STEPS
+    ]
+    if params:
+        connection.execute(_UPDATE_FLOW_SQL, params)
+
+
+def record_customer_updates(connection, rows: Iterable[Dict[str, Any]]) -> None:
+    """Copy changed customer fields (id, wa_id, organization_id, user_id) into their summaries."""
+    params = [
+        {
+            "customer_id": str(r["id"]),
+            "wa_id": r["wa_id"],
+            "organization_id": _str_or_none(r.get("organization_id")),
+            "user_id": _str_or_none(r.get("user_id")),
+        }
+        for r in rows
+    ]
+    if params:
+        connection.execute(_UPDATE_CUSTOMER_SQL, params)
+
+
+def mark_conversation_read(db: Session, wa_id: str) -> None:
+    """
+    Reset the unread counter when an agent opens the chat.
+
+    Runs in a savepoint, so a failure leaves the caller's transaction usable.
+    """
+    try:
+        with db.begin_nested():
+            result = db.execute(
+                text("UPDATE conversation_summaries SET unread_count = 0 WHERE wa_id = :wa_id AND unread_count <> 0"),
+                {"wa_id": wa_id},
+            )
+    except Exception as e:
+        logger.warning(f"Could not reset unread count for {wa_id}: {e}")
+        return
+    if result.rowcount:
+        db.commit()
+
+
+def unread_counts(db: Session, wa_ids: Iterable[str]) -> Dict[str, int]:
+    """Unread inbound messages per customer wa_id; customers without any are omitted."""
+    wa_ids = list({w for w in wa_ids if w})
+    if not wa_ids:
+        return {}
+    rows = (
+        db.query(ConversationSummary.wa_id, ConversationSummary.unread_count)
+        .filter(ConversationSummary.wa_id.in_(wa_ids), ConversationSummary.unread_count > 0)
+        .all()
+    )
+    return {wa_id: count for wa_id, count in rows}
+
+
+# ---------------------------------------------------------------------------
+# ORM write hooks
+# ---------------------------------------------------------------------------
+
+def _message_inserted(mapper, connection, target: Message):
+    record_messages(connection, [{
+        "id": target.id,
+        "customer_id": target.customer_id,
+        "body": target.body,
+        "timestamp": target.timestamp,
+        "from_wa_id": target.from_wa_id,
+        "to_wa_id": target.to_wa_id,
+        "sender_type": target.sender_type,
+    }])
+
+
+def _flow_log_inserted(mapper, connection, target: FlowLog):
+    record_flow_steps(connection, [{
+        "wa_id": target.wa_id,
+        "step": target.step,
+        "description": target.description,
+        "created_at": target.created_at,
+    }])
+
+
+def _customer_inserted(mapper, connection, target: Customer):
+    connection.execute(_INSERT_CUSTOMER_SQL, {
+        "customer_id": str(target.id),
+        "wa_id": target.wa_id,
+        "organization_id": _str_or_none(target.organization_id),
+        "user_id": _str_or_none(target.user_id),
+        "sort_at": target.last_message_at or target.created_at,
+    })
+
+
+def _customer_updated(mapper, connection, target: Customer):
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in ("wa_id", "organization_id", "user_id")):
+        return
+    record_customer_updates(connection, [{
+        "id": target.id,
+        "wa_id": target.wa_id,
+        "organization_id": target.organization_id,
+        "user_id": target.user_id,
+    }])
+
+
+_WRITE_HOOKS = (
+    (Message, "after_insert", _message_inserted),
+    (FlowLog, "after_insert", _flow_log_inserted),
+    (Customer, "after_insert", _customer_inserted),
+    (Customer, "after_update", _customer_updated),
+)
+
+
+def register_write_hooks() -> None:
+    """Attach the summary mapper listeners; safe to call more than once."""
+    for model, identifier, fn in _WRITE_HOOKS:
+        if not event.contains(model, identifier, fn):
+            event.listen(model, identifier, fn)
+
+
+# ---------------------------------------------------------------------------
+# Inbox reads
+# ---------------------------------------------------------------------------
+
+def encode_inbox_cursor(summary: ConversationSummary) -> str:
+    return f"{summary.sort_at.isoformat()}_{summary.customer_id}"
+
+
+def decode_inbox_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """Inverse of encode_inbox_cursor(). Raises ValueError on malformed input."""
+    try:
+        sort_at, customer_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(sort_at), uuid.UUID(customer_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def summary_rows(query, limit: int) -> Tuple[List[Tuple[ConversationSummary, Customer]], Optional[str]]:
+    """Fetch one keyset page (limit + 1 probe row) and the cursor for the next page."""
+    rows = query.limit(limit + 1).all()
+    next_cursor = encode_inbox_cursor(rows[limit - 1][0]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
@@ -4,8 +4,8 @@ from typing import List
 from sqlalchemy.orm import Session
 from starlette import status
 
-from cache.redis_connection import get_redis_client
 from models.models import Customer, User
+from services.conversation_summary_service import unread_counts
 from schemas.customer_schema import CustomerCreate, CustomerUpdate, CustomerStatusEnum
 from uuid import UUID
 
@@ -70,16 +70,6 @@ def get_customer_by_id(db: Session, customer_id: UUID) -> Customer:
 
 
 # List all customers
-def get_unread_count(wa_id: str) -> int:
-    redis_client = get_redis_client()
-    if not redis_client:
-        return 0
-    try:
-        count = redis_client.get(f"unread:{wa_id}")
-        return int(count) if count else 0
-    except Exception:
-        return 0
-
 def get_all_customers(db: Session, skip: int = 0, limit: int = 50, search: str = None,
                        include_flow_step: bool = False, flow_type: str = None, organization_id=None):
     """Get all customers with pagination, optional search, and optional flow step data.
@@ -108,8 +98,9 @@ def get_all_customers(db: Session, skip: int = 0, limit: int = 50, search: str =
     # Apply ordering and pagination
     customers = query.order_by(Customer.last_message_at.desc().nullslast()).offset(skip).limit(limit).all()
 
+    unread_map = unread_counts(db, [c.wa_id for c in customers])
     for customer in customers:
-        customer.unread_count = get_unread_count(customer.wa_id)
+        customer.unread_count = unread_map.get(customer.wa_id, 0)
 
     # If flow step data is requested, fetch it in a single query
     flow_step_map = {}
@@ -375,98 +366,26 @@ def get_conversations_optimized(
     date_filter: str = None,
     unread_only: bool = False,
     organization_id=None,
+    cursor: str = None,
 ):
     """
     Optimized unified conversation list API including:
     - Customers with NO messages
     - Filters that correctly include empty-message customers
+
+    Reads the conversation_summaries table (one row per customer, maintained
+    on write), so a page costs O(page) instead of a window over all messages.
+    Pass the returned `next_cursor` as `cursor` for keyset pagination; `skip`
+    is still honoured when no cursor is given.
     """
-    from sqlalchemy import func, and_, or_, desc
-    from models.models import Message, FlowLog
+    from sqlalchemy import and_, or_, desc, tuple_
+    from models.models import Message, ConversationSummary
+    from services.conversation_summary_service import decode_inbox_cursor, summary_rows
     from datetime import datetime
     import re
 
-    # -----------------------------
-    # SUBQUERY: latest message per customer
-    # -----------------------------
-    latest_msg_subq = (
-        db.query(
-            Message.customer_id,
-            Message.body.label("body"),
-            Message.timestamp.label("timestamp"),
-            Message.from_wa_id.label("from_"),
-            Message.to_wa_id.label("to_"),
-            Message.sender_type.label("sender_type"),
-            func.row_number().over(
-                partition_by=Message.customer_id,
-                order_by=(Message.timestamp.desc(), Message.id.desc())
-            ).label("rn")
-        )
-        .subquery()
-    )
-
-    latest_msg = (
-        db.query(
-            latest_msg_subq.c.customer_id,
-            latest_msg_subq.c.body,
-            latest_msg_subq.c.timestamp,
-            latest_msg_subq.c.from_,
-            latest_msg_subq.c.to_,
-            latest_msg_subq.c.sender_type
-        )
-        .filter(latest_msg_subq.c.rn == 1)
-        .subquery()
-    )
-
-    # -----------------------------
-    # SUBQUERY: latest flow step
-    # -----------------------------
-    valid_steps = ["entry", "city_selection", "treatment", "concern_list", "last_step"]
-
-    flow_subq = (
-        db.query(
-            FlowLog.wa_id,
-            FlowLog.step,
-            FlowLog.description,
-            FlowLog.created_at,
-            func.row_number().over(
-                partition_by=FlowLog.wa_id,
-                order_by=FlowLog.created_at.desc()
-            ).label("rn")
-        )
-        .filter(FlowLog.step.in_(valid_steps))
-        .subquery()
-    )
-
-    flow_latest = (
-        db.query(
-            flow_subq.c.wa_id,
-            flow_subq.c.step,
-            flow_subq.c.description,
-            flow_subq.c.created_at
-        )
-        .filter(flow_subq.c.rn == 1)
-        .subquery()
-    )
-
-    # -----------------------------
-    # MAIN QUERY
-    # -----------------------------
-    query = (
-        db.query(
-            Customer,
-            latest_msg.c.body,
-            latest_msg.c.timestamp,
-            latest_msg.c.from_,
-            latest_msg.c.to_,
-            latest_msg.c.sender_type,
-            flow_latest.c.step,
-            flow_latest.c.description,
-            flow_latest.c.created_at
-        )
-        .outerjoin(latest_msg, Customer.id == latest_msg.c.customer_id)
-        .outerjoin(flow_latest, Customer.wa_id == flow_latest.c.wa_id)
-    )
+    S = ConversationSummary
+    query = db.query(S, Customer).join(Customer, Customer.id == S.customer_id)
 
     # -----------------------------
     # FILTERS
@@ -474,7 +393,7 @@ def get_conversations_optimized(
 
     # Organization filter
     if organization_id is not None:
-        query = query.filter(Customer.organization_id == organization_id)
+        query = query.filter(S.organization_id == organization_id)
 
     # Search filter
     if search:
@@ -489,11 +408,11 @@ def get_conversations_optimized(
 
     # Assigned agent filter
     if user_id:
-        query = query.filter(Customer.user_id == UUID(user_id))
+        query = query.filter(S.assigned_user_id == UUID(user_id))
 
     # Unassigned
     if unassigned_only:
-        query = query.filter(Customer.user_id.is_(None))
+        query = query.filter(S.assigned_user_id.is_(None))
 
     # Business number filter (customer must have ANY message with that business number, not just latest)
     if business_number:
@@ -526,7 +445,7 @@ def get_conversations_optimized(
         msg_exists = (
             db.query(Message.id)
             .filter(
-                Message.customer_id == Customer.id,
+                Message.customer_id == S.customer_id,
                 or_(
                     Message.from_wa_id.in_(variants),
                     Message.to_wa_id.in_(variants)
@@ -537,7 +456,7 @@ def get_conversations_optimized(
 
         query = query.filter(msg_exists)
 
-    # Date filter (UPDATED to include customers with NO messages)
+    # Date filter (includes customers with NO messages)
     if date_filter:
         try:
             target = datetime.strptime(date_filter, "%Y-%m-%d")
@@ -546,68 +465,44 @@ def get_conversations_optimized(
 
             query = query.filter(
                 or_(
-                    and_(
-                        latest_msg.c.timestamp >= start_dt,
-                        latest_msg.c.timestamp <= end_dt
-                    ),
-                    latest_msg.c.timestamp.is_(None)  # <-- keeps customers with NO messages
+                    and_(S.last_message_at >= start_dt, S.last_message_at <= end_dt),
+                    S.last_message_at.is_(None)  # <-- keeps customers with NO messages
                 )
             )
         except:
             pass
 
-    # Pending reply filter (UPDATED)
+    # Pending reply filter (includes customers with NO messages)
     if pending_reply_only:
         query = query.filter(
-            or_(
-                latest_msg.c.sender_type == "customer",
-                latest_msg.c.sender_type.is_(None)  # <-- keeps customers with NO messages
-            )
+            or_(S.last_message_direction == "inbound", S.last_message_id.is_(None))
         )
 
+    if unread_only:
+        query = query.filter(S.unread_count > 0)
+
     # -----------------------------
-    # ORDER + PAGINATION + UNREAD FILTER
+    # ORDER + PAGINATION
     # -----------------------------
-    query = query.order_by(
-        desc(func.coalesce(latest_msg.c.timestamp, Customer.last_message_at, Customer.created_at))
-    )
-
-    if not unread_only:
-        # Default behaviour: paginate in the database and then attach unread counts
-        total = query.count()
-        rows = query.offset(skip).limit(limit).all()
-        unread_map = {r.Customer.wa_id: get_unread_count(r.Customer.wa_id) for r in rows}
-    else:
-        # When filtering by unread we need to base the count on the unread counter,
-        # which is stored in Redis and not in Postgres. We therefore:
-        # - Load all matching conversations
-        # - Keep only those where unread_count > 0
-        # - Apply pagination in Python
-        all_rows = query.all()
-
-        unread_map: dict[str, int] = {}
-        filtered_rows = []
-        for r in all_rows:
-            wa_id = r.Customer.wa_id
-            count = get_unread_count(wa_id)
-            if count > 0:
-                unread_map[wa_id] = count
-                filtered_rows.append(r)
-
-        total = len(filtered_rows)
-        rows = filtered_rows[skip : skip + limit]
+    total = query.count()
+    query = query.order_by(desc(S.sort_at), desc(S.customer_id))
+    if cursor:
+        query = query.filter(tuple_(S.sort_at, S.customer_id) < decode_inbox_cursor(cursor))
+    elif skip:
+        query = query.offset(skip)
+    rows, next_cursor = summary_rows(query, limit)
 
     # -----------------------------
     # FORMAT RESPONSE
     # -----------------------------
     items = []
-    for r in rows:
-        c = r.Customer
-
+    for summary, c in rows:
         # Determine business number
         business_num = None
-        if r.from_ and r.to_:
-            business_num = r.to_ if r.from_ == c.wa_id else r.from_
+        if summary.last_message_from and summary.last_message_to:
+            business_num = (
+                summary.last_message_to if summary.last_message_from == c.wa_id else summary.last_message_from
+            )
 
         items.append({
             "id": str(c.id),
@@ -622,25 +517,26 @@ def get_conversations_optimized(
 
             # Last message
             "last_message": {
-                "body": r.body,
-                "timestamp": r.timestamp.isoformat() if r.timestamp else None
+                "body": summary.last_message_body,
+                "timestamp": summary.last_message_at.isoformat() if summary.last_message_at else None
             },
 
             "business_number": business_num,
 
-            "last_step": r.step,
-            "step_description": r.description,
-            "step_reached_at": r.created_at.isoformat() if r.created_at else None,
+            "last_step": summary.last_flow_step,
+            "step_description": summary.last_flow_description,
+            "step_reached_at": summary.last_flow_at.isoformat() if summary.last_flow_at else None,
 
-            "unread_count": unread_map.get(c.wa_id, 0),
-            "is_pending_reply": True if r.sender_type == "customer" else False
+            "unread_count": summary.unread_count or 0,
+            "is_pending_reply": summary.last_message_direction == "inbound"
         })
 
     return {
         "items": items,
         "total": total,
         "skip": skip,
-        "limit": limit
+        "limit": limit,
+        "next_cursor": next_cursor,
     }
 
 
@@ -839,19 +735,13 @@ def get_conversations_by_peer(
     if not unread_only:
         total = query.count()
         rows = query.offset(skip).limit(limit).all()
-        unread_map = {r.Customer.wa_id: get_unread_count(r.Customer.wa_id) for r in rows}
+        unread_map = unread_counts(db, [r.Customer.wa_id for r in rows])
     else:
-        # For unread-only view, compute total based on Redis-backed unread counters.
+        # For unread-only view, compute total based on conversation_summaries unread counters.
         all_rows = query.all()
 
-        unread_map: dict[str, int] = {}
-        filtered_rows = []
-        for r in all_rows:
-            wa_id = r.Customer.wa_id
-            count = get_unread_count(wa_id)
-            if count > 0:
-                unread_map[wa_id] = count
-                filtered_rows.append(r)
+        unread_map = unread_counts(db, [r.Customer.wa_id for r in all_rows])
+        filtered_rows = [r for r in all_rows if r.Customer.wa_id in unread_map]
 
         total = len(filtered_rows)
         rows = filtered_rows[skip : skip + limit]
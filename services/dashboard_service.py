@@ -9,6 +9,8 @@ from clients.schema import AppointmentQuery
 import clients.service as client_service
 from models.models import Template, JobStatus, Campaign, Job, CampaignRecipient
 from sqlalchemy import case, and_, or_
+from services.metric_rollup_service import count_metric
+from services.agent_response_stats_service import get_agent_stat
 
 
 def get_today_metrics(db: Session):
@@ -86,51 +88,20 @@ def get_appointments_booked_today(center_id: Optional[str] = None, db: Session =
 
 def get_agent_avg_response_time(agent_id: str, center_id: Optional[str], db: Session) -> Optional[float]:
     """
-    Calculates the average time taken by a specific agent to reply to a customer message.
+    Average time taken by a specific agent to reply to a customer message.
 
-    The function uses the 'agent_id' and the optional 'center_id' to filter messages.
+    Read from the precomputed agent_response_stats (last AGENT_SLA_WINDOW_DAYS days,
+    see services/agent_response_stats_service), which also has p50/p90/p99.
 
     :param agent_id: The ID of the agent whose response time is being measured.
     :param center_id: The ID of the center to filter messages by. Optional.
     :param db: The database session.
     :return: The average response time in seconds, or None if no agent replies are found.
     """
-    # Start with a base query for all messages related to the agent
-    query = db.query(Message).filter(
-        Message.agent_id == agent_id
-    )
+    stat = get_agent_stat(db, agent_id, center_id)
+    return stat["avg_seconds"] if stat else None
+
 
-    # If a center_id is provided, add the filter
-    if center_id:
-        query = query.filter(Message.center_id == center_id)
-
-    # Order the messages by timestamp for accurate calculation
-    messages = query.order_by(Message.timestamp).all()
-
-    if not messages:
-        return None
-
-    response_times = []
-    last_customer_message_time = None
-
-    for message in messages:
-        # Check if the current message is from a customer
-        if message.sender_type == "customer":
-            last_customer_message_time = message.timestamp
-        # Check if the current message is from the specified agent and we have a preceding customer message
-        elif message.sender_type == "agent" and message.agent_id == agent_id and last_customer_message_time:
-            # Calculate the time difference
-            time_diff: timedelta = message.timestamp - last_customer_message_time
-            response_times.append(time_diff.total_seconds())
-            # Reset the last customer message time, as this response concludes the sequence
-            last_customer_message_time = None
-
-    if not response_times:
-        return None  # No agent replies found
-
-    # Calculate the average response time
-    avg_response_time = sum(response_times) / len(response_times)
-    return avg_response_time
 def get_template_status(db: Session):
     """
     Returns counts of approved, pending, and rejected templates
@@ -345,52 +316,20 @@ def get_dashboard_summary_optimized(
         except (ValueError, TypeError):
             campaign_uuid = None
 
-    # === BATCH 1: Simple count queries (fast) ===
-    # Filter messages by organization through customer.organization_id (direct relationship)
-    message_query = db.query(func.count(Message.id)).filter(
-        Message.timestamp >= today_start,
-        Message.timestamp <= today_end
-    )
-    if org_uuid:
-        # Get customers belonging to this organization directly
-        org_customer_ids = [c.id for c in db.query(Customer.id).filter(Customer.organization_id == org_uuid).all()]
-        if org_customer_ids:
-            message_query = message_query.filter(Message.customer_id.in_(org_customer_ids))
-        else:
-            # No customers for this org, return 0 by filtering for non-existent customer_id
-            message_query = message_query.filter(Message.customer_id == None)  # Will return 0
-    new_conversations = message_query.scalar() or 0
-
-    # Filter customers by organization directly
-    customer_query = db.query(func.count(Customer.id)).filter(
-        Customer.created_at >= today_start,
-        Customer.created_at <= today_end
+    # === BATCH 1: Counters from the hourly metric rollups ===
+    tomorrow_start = today_start + timedelta(days=1)
+    new_conversations = count_metric(db, "messages", today_start, tomorrow_start, org_uuid)
+    new_customers = count_metric(db, "customers", today_start, tomorrow_start, org_uuid)
+    # Date filter applies to total customers (customers created in date range)
+    total_customers = count_metric(
+        db, "customers",
+        filter_start,
+        filter_end + timedelta(microseconds=1) if filter_end else None,
+        org_uuid,
     )
-    if org_uuid:
-        customer_query = customer_query.filter(Customer.organization_id == org_uuid)
-    new_customers = customer_query.scalar() or 0
-
-    total_customer_query = db.query(func.count(Customer.id))
-    if org_uuid:
-        total_customer_query = total_customer_query.filter(Customer.organization_id == org_uuid)
-    # Apply date filter to total customers (customers created in date range)
-    if filter_start:
-        total_customer_query = total_customer_query.filter(Customer.created_at >= filter_start)
-    if filter_end:
-        total_customer_query = total_customer_query.filter(Customer.created_at <= filter_end)
-    total_customers = total_customer_query.scalar() or 0
 
     # === BATCH 2: Appointments TODAY (always today, not affected by date filter) ===
-    appointments_query = db.query(func.count(ReferrerTracking.id)).filter(
-        ReferrerTracking.is_appointment_booked == True,
-        func.date(ReferrerTracking.created_at) == today
-    )
-    if org_uuid:
-        # Filter appointments by organization through ReferrerTracking.customer_id -> Customer.organization_id
-        appointments_query = appointments_query.join(
-            Customer, ReferrerTracking.customer_id == Customer.id
-        ).filter(Customer.organization_id == org_uuid)
-    appointments_today = appointments_query.scalar() or 0
+    appointments_today = count_metric(db, "appointments", today_start, tomorrow_start, org_uuid)
 
     # === BATCH 3: Template status (single query with case) ===
     status_expr = func.lower(Template.template_body["status"].astext)
@@ -409,71 +348,41 @@ def get_dashboard_summary_optimized(
     # === BATCH 4: Campaign summary (simplified - just counts) ===
     # Filter campaigns by organization through created_by user, campaign_id, and date range
     from models.models import Campaign
-    
-    # Get org_user_ids for campaign filtering (campaigns are filtered by user.organization_id)
-    org_user_ids_for_campaigns = None
+
+    campaign_filter_query = db.query(Campaign.id)
     if org_uuid:
-        org_user_ids_for_campaigns = [u.id for u in db.query(User.id).filter(User.organization_id == org_uuid).all()]
-    
-    campaign_filter_ids = None  # None means all campaigns
-    
-    # Build campaign filter if any filters are applied
-    has_filters = org_user_ids_for_campaigns or campaign_uuid or filter_start or filter_end
-    if has_filters:
-        campaign_filter_query = db.query(Campaign.id)
-        
-        if org_user_ids_for_campaigns:
-            campaign_filter_query = campaign_filter_query.filter(Campaign.created_by.in_(org_user_ids_for_campaigns))
-        if campaign_uuid:
-            campaign_filter_query = campaign_filter_query.filter(Campaign.id == campaign_uuid)
-        if filter_start:
-            campaign_filter_query = campaign_filter_query.filter(Campaign.created_at >= filter_start)
-        if filter_end:
-            campaign_filter_query = campaign_filter_query.filter(Campaign.created_at <= filter_end)
-        
-        campaign_filter_ids = [c.id for c in campaign_filter_query.all()]
-        if not campaign_filter_ids:
-            # No campaigns match the filter, return zeros
-            campaign_filter_ids = []
-    
+        # Campaigns are filtered by the creating user's organization_id
+        org_user_ids = db.query(User.id).filter(User.organization_id == org_uuid)
+        campaign_filter_query = campaign_filter_query.filter(Campaign.created_by.in_(org_user_ids))
+    if campaign_uuid:
+        campaign_filter_query = campaign_filter_query.filter(Campaign.id == campaign_uuid)
+    if filter_start:
+        campaign_filter_query = campaign_filter_query.filter(Campaign.created_at >= filter_start)
+    if filter_end:
+        campaign_filter_query = campaign_filter_query.filter(Campaign.created_at <= filter_end)
+    has_filters = org_uuid or campaign_uuid or filter_start or filter_end
+    campaign_filter_ids = campaign_filter_query.subquery() if has_filters else None
+
     # JobStatus has composite key (job_id, customer_id), so count rows instead
-    total_sent = 0
-    total_delivered = 0
-    
-    if campaign_filter_ids is not None and len(campaign_filter_ids) == 0:
-        # No campaigns match the filter, return zeros
-        total_sent = 0
-        total_delivered = 0
-    else:
-        # Get job IDs for filtered campaigns (or all if campaign_filter_ids is None)
-        if campaign_filter_ids is not None:
-            job_ids = [j.id for j in db.query(Job.id).filter(Job.campaign_id.in_(campaign_filter_ids)).all()]
-        else:
-            job_ids = [j.id for j in db.query(Job.id).all()]
-        
-        if job_ids:
-            total_sent = db.query(func.count()).select_from(JobStatus).filter(
-                JobStatus.job_id.in_(job_ids)
-            ).scalar() or 0
-            total_delivered = db.query(func.count()).select_from(JobStatus).filter(
-                JobStatus.job_id.in_(job_ids),
-                JobStatus.status == "success"
-            ).scalar() or 0
-        
-        # Add CampaignRecipient counts
-        recipient_query = db.query(func.count(CampaignRecipient.id)).filter(
-            CampaignRecipient.status.in_(["SENT", "FAILED", "QUEUED"])
+    job_status_query = db.query(
+        func.count().label("sent"),
+        func.sum(case((JobStatus.status == "success", 1), else_=0)).label("delivered"),
+    ).select_from(JobStatus)
+    recipient_query = db.query(
+        func.count().label("sent"),
+        func.sum(case((CampaignRecipient.status == "SENT", 1), else_=0)).label("delivered"),
+    ).filter(CampaignRecipient.status.in_(["SENT", "FAILED", "QUEUED"]))
+    if campaign_filter_ids is not None:
+        job_status_query = job_status_query.join(Job, Job.id == JobStatus.job_id).filter(
+            Job.campaign_id.in_(db.query(campaign_filter_ids.c.id))
         )
-        if campaign_filter_ids is not None:
-            recipient_query = recipient_query.filter(CampaignRecipient.campaign_id.in_(campaign_filter_ids))
-        total_sent += recipient_query.scalar() or 0
-        
-        delivered_query = db.query(func.count(CampaignRecipient.id)).filter(
-            CampaignRecipient.status == "SENT"
+        recipient_query = recipient_query.filter(
+            CampaignRecipient.campaign_id.in_(db.query(campaign_filter_ids.c.id))
         )
-        if campaign_filter_ids is not None:
-            delivered_query = delivered_query.filter(CampaignRecipient.campaign_id.in_(campaign_filter_ids))
-        total_delivered += delivered_query.scalar() or 0
+    job_counts = job_status_query.one()
+    recipient_counts = recipient_query.one()
+    total_sent = (job_counts.sent or 0) + (recipient_counts.sent or 0)
+    total_delivered = int(job_counts.delivered or 0) + int(recipient_counts.delivered or 0)
 
     delivered_pct = round((total_delivered / total_sent * 100), 1) if total_sent > 0 else 0
 
@@ -494,51 +403,44 @@ def get_dashboard_summary_optimized(
         Campaign.type,
         Campaign.created_at
     )
-    # Filter campaigns by organization
     if org_uuid:
         # Filter campaigns by organization through created_by user's organization_id
-        if org_user_ids_for_campaigns:
-            campaign_query = campaign_query.filter(Campaign.created_by.in_(org_user_ids_for_campaigns))
-            campaigns = campaign_query.order_by(Campaign.created_at.desc()).limit(campaign_limit).all()
-        else:
-            # No users for this org, return empty list
-            campaigns = []
-    else:
-        campaigns = campaign_query.order_by(Campaign.created_at.desc()).limit(campaign_limit).all()
-    
+        campaign_query = campaign_query.filter(
+            Campaign.created_by.in_(db.query(User.id).filter(User.organization_id == org_uuid))
+        )
+    campaigns = campaign_query.order_by(Campaign.created_at.desc()).limit(campaign_limit).all()
+
     campaign_list = []
+    if campaigns:
+        # Sent / delivered per campaign with one grouped query per source
+        listed_ids = [camp.id for camp in campaigns]
+        per_campaign = {camp_id: [0, 0] for camp_id in listed_ids}
+        job_rows = (
+            db.query(
+                Job.campaign_id,
+                func.count(),
+                func.sum(case((JobStatus.status == "success", 1), else_=0)),
+            )
+            .select_from(JobStatus)
+            .join(Job, Job.id == JobStatus.job_id)
+            .filter(Job.campaign_id.in_(listed_ids))
+            .group_by(Job.campaign_id)
+        )
+        recipient_rows = (
+            db.query(
+                CampaignRecipient.campaign_id,
+                func.count(CampaignRecipient.id),
+                func.sum(case((CampaignRecipient.status == "SENT", 1), else_=0)),
+            )
+            .filter(CampaignRecipient.campaign_id.in_(listed_ids))
+            .group_by(CampaignRecipient.campaign_id)
+        )
+        for camp_id, sent, delivered in list(job_rows) + list(recipient_rows):
+            per_campaign[camp_id][0] += sent or 0
+            per_campaign[camp_id][1] += int(delivered or 0)
 
-    # Initialize campaign_list
-    if 'campaign_list' not in locals():
-        campaign_list = []
-    
-    # Process campaigns if we have any
-    if 'campaigns' in locals() and campaigns:
         for camp in campaigns:
-            # Get job IDs for this campaign
-            job_ids = db.query(Job.id).filter(Job.campaign_id == camp.id).all()
-            job_ids = [j[0] for j in job_ids]
-
-            sent = 0
-            delivered = 0
-            if job_ids:
-                sent = db.query(func.count()).select_from(JobStatus).filter(
-                    JobStatus.job_id.in_(job_ids)
-                ).scalar() or 0
-                delivered = db.query(func.count()).select_from(JobStatus).filter(
-                    JobStatus.job_id.in_(job_ids),
-                    JobStatus.status == "success"
-                ).scalar() or 0
-
-            # Add CampaignRecipient counts
-            sent += db.query(func.count(CampaignRecipient.id)).filter(
-                CampaignRecipient.campaign_id == camp.id
-            ).scalar() or 0
-            delivered += db.query(func.count(CampaignRecipient.id)).filter(
-                CampaignRecipient.campaign_id == camp.id,
-                CampaignRecipient.status == "SENT"
-            ).scalar() or 0
-
+            sent, delivered = per_campaign[camp.id]
             campaign_list.append({
                 "id": str(camp.id),
                 "name": camp.name,
@@ -1,6 +1,5 @@
 # services/dummy_payment_service.py
 import os
-import requests
 from typing import Dict, Any, Optional
 from datetime import datetime
 from sqlalchemy.orm import Session
@@ -9,6 +8,7 @@ from uuid import uuid4
 from models.models import Payment, Order
 from schemas.payment_schema import PaymentCreate
 from utils.whatsapp import send_message_to_waid
+from utils.whatsapp_client import whatsapp_client
 
 
 class DummyPaymentService:
@@ -78,7 +78,6 @@ class DummyPaymentService:
         try:
             from services.whatsapp_service import get_latest_token
             from config.constants import get_messages_url
-            import requests
             
             token_entry = get_latest_token(self.db)
             if not token_entry or not token_entry.token:
@@ -127,7 +126,7 @@ class DummyPaymentService:
                 }
             }
 
-            response = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+            response = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
             
             if response.status_code == 200:
                 print(f"[dummy_payment] Test payment message sent successfully")
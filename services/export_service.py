@@ -0,0 +1,335 @@
+"""
+Shared export engine for XLSX / CSV downloads.
+
+Exports are described by a header row and a generator of data rows. Rows are
+read from server-side cursors (`stream_rows`) and written one at a time into a
+write-only openpyxl workbook or a CSV file on disk, so memory stays flat no
+matter how many rows an export has. The finished file is streamed back in
+chunks and deleted afterwards.
+
+Large exports can run as background jobs instead (`background=true` on the
+export endpoints): the file is built in a worker thread with its own DB
+session, progress is kept in Redis (in-process fallback), and the client polls
+/api/exports/{job_id} and downloads from /api/exports/{job_id}/download. A job
+records the user and organization that started it; only they can read it
+(export_job_visible_to).
+EXPORT_DIR must be shared between app processes for downloads to work
+behind a load balancer.
+"""
+
+import os
+import csv
+import json
+import time
+import uuid
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from openpyxl import Workbook
+from sqlalchemy.orm import Session
+
+from cache.redis_connection import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join(tempfile.gettempdir(), "exports"))
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+EXPORT_JOB_TTL_SECONDS = int(os.getenv("EXPORT_JOB_TTL_SECONDS", str(24 * 3600)))
+EXPORT_PROGRESS_EVERY = 1000
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+MEDIA_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv; charset=utf-8",
+}
+
+RowsBuilder = Callable[[Session], Iterable[List[Any]]]
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_local_jobs: Dict[str, Dict[str, Any]] = {}
+
+
+# ---------------------------------------------------------------------------
+# Query helpers
+# ---------------------------------------------------------------------------
+
+def stream_rows(query, batch_size: int = EXPORT_BATCH_SIZE):
+    """Iterate a query through a server-side cursor, batch_size rows at a time."""
+    return query.execution_options(stream_results=True, yield_per=batch_size)
+
+
+def iter_chunks(iterable: Iterable[Any], size: int = EXPORT_BATCH_SIZE) -> Iterator[List[Any]]:
+    """Group an iterable into lists of `size` (for per-chunk lookups)."""
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# ---------------------------------------------------------------------------
+# Writers
+# ---------------------------------------------------------------------------
+
+def _cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return value
+
+
+def write_export(
+    path: str,
+    *,
+    file_format: str,
+    sheet_title: str,
+    header: List[str],
+    rows: Iterable[List[Any]],
+    progress: Optional[Callable[[int], None]] = None,
+) -> int:
+    """Write header + rows to `path`; returns the number of data rows written."""
+    written = 0
+    if file_format == "csv":
+        with open(path, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            for row in rows:
+                writer.writerow([_cell(v) for v in row])
+                written += 1
+                if progress and written % EXPORT_PROGRESS_EVERY == 0:
+                    progress(written)
+    else:
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet(title=sheet_title[:31])
+        worksheet.append(header)
+        for row in rows:
+            worksheet.append([_cell(v) for v in row])
+            written += 1
+            if progress and written % EXPORT_PROGRESS_EVERY == 0:
+                progress(written)
+        workbook.save(path)
+    return written
+
+
+def _iter_file(path: str, delete: bool) -> Iterator[bytes]:
+    try:
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(EXPORT_CHUNK_BYTES)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        if delete:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def file_response(path: str, filename: str, file_format: str, delete: bool = True) -> StreamingResponse:
+    return StreamingResponse(
+        _iter_file(path, delete),
+        media_type=MEDIA_TYPES[file_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Content-Length": str(os.path.getsize(path)),
+        },
+    )
+
+
+def _normalize_format(file_format: Optional[str]) -> str:
+    fmt = (file_format or "xlsx").lower()
+    if fmt not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be 'xlsx' or 'csv'")
+    return fmt
+
+
+def export(
+    db: Session,
+    *,
+    filename: str,
+    sheet_title: str,
+    header: List[str],
+    rows: RowsBuilder,
+    empty_detail: str = "No data to export.",
+    file_format: str = "xlsx",
+    background: bool = False,
+    allow_empty: bool = False,
+    owner=None,
+):
+    """
+    Build an export now (StreamingResponse) or as a background job (job dict).
+
+    filename is without extension; rows(db) yields the data rows. Without
+    allow_empty an export with no rows is a 404 (empty_detail). owner is the
+    requesting user, recorded on background jobs.
+    """
+    fmt = _normalize_format(file_format)
+    if background:
+        return start_export_job(
+            filename=filename, sheet_title=sheet_title, header=header,
+            rows=rows, empty_detail=empty_detail, file_format=fmt, allow_empty=allow_empty,
+            owner=owner,
+        )
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="export-", suffix=f".{fmt}", dir=EXPORT_DIR)
+    os.close(fd)
+    try:
+        written = write_export(path, file_format=fmt, sheet_title=sheet_title, header=header, rows=rows(db))
+    except BaseException:
+        os.remove(path)
+        raise
+    if written == 0 and not allow_empty:
+        os.remove(path)
+        raise HTTPException(status_code=404, detail=empty_detail)
+    return file_response(path, f"{filename}.{fmt}", fmt)
+
+
+# ---------------------------------------------------------------------------
+# Background jobs
+# ---------------------------------------------------------------------------
+
+def _job_key(job_id: str) -> str:
+    return f"export_job:{job_id}"
+
+
+def _save_job(job_id: str, **fields) -> None:
+    fields["updated_at"] = time.time()
+    redis_client = get_redis_client()
+    if redis_client:
+        try:
+            key = _job_key(job_id)
+            pipe = redis_client.pipeline()
+            pipe.hset(key, mapping={k: json.dumps(v) for k, v in fields.items()})
+            pipe.expire(key, EXPORT_JOB_TTL_SECONDS)
+            pipe.execute()
+            return
+        except Exception as e:
+            logger.warning(f"Could not store export job {job_id} in Redis: {e}")
+    _local_jobs.setdefault(job_id, {}).update(fields)
+
+
+def get_export_job(job_id: str) -> Optional[Dict[str, Any]]:
+    redis_client = get_redis_client()
+    if redis_client:
+        try:
+            raw = redis_client.hgetall(_job_key(job_id))
+            if raw:
+                return {k: json.loads(v) for k, v in raw.items()}
+        except Exception as e:
+            logger.warning(f"Could not read export job {job_id} from Redis: {e}")
+    job = _local_jobs.get(job_id)
+    return dict(job) if job else None
+
+
+def _str_or_none(value) -> Optional[str]:
+    return str(value) if value is not None else None
+
+
+def export_job_visible_to(job: Dict[str, Any], user) -> bool:
+    """
+    The requesting user, or a user of the same organization, may read a job.
+    Jobs started without an owner (unauthenticated export endpoints) are
+    readable by any authenticated user.
+    """
+    owner_id = job.get("owner_id")
+    if owner_id is None:
+        return True
+    if owner_id == str(user.id):
+        return True
+    organization_id = job.get("organization_id")
+    return organization_id is not None and organization_id == _str_or_none(getattr(user, "organization_id", None))
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="export")
+    return _executor
+
+
+def _remove_expired_files() -> None:
+    cutoff = time.time() - EXPORT_JOB_TTL_SECONDS
+    try:
+        for name in os.listdir(EXPORT_DIR):
+            path = os.path.join(EXPORT_DIR, name)
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+    except OSError:
+        pass
+
+
+def _run_job(job_id: str, path: str, sheet_title: str, header: List[str], rows: RowsBuilder,
+             empty_detail: str, file_format: str, allow_empty: bool) -> None:
+    from database.db import SessionLocal
+
+    db = SessionLocal()
+    started = time.time()
+    _save_job(job_id, status="running", started_at=started)
+    try:
+        written = write_export(
+            path, file_format=file_format, sheet_title=sheet_title, header=header, rows=rows(db),
+            progress=lambda n: _save_job(job_id, rows_written=n),
+        )
+        if written == 0 and not allow_empty:
+            os.remove(path)
+            _save_job(job_id, status="empty", rows_written=0, error=empty_detail)
+        else:
+            _save_job(
+                job_id, status="done", rows_written=written,
+                size_bytes=os.path.getsize(path), duration_seconds=round(time.time() - started, 1),
+            )
+        logger.info(f"📦 Export job {job_id} finished: {written} rows in {time.time() - started:.1f}s")
+    except Exception as e:
+        logger.error(f"❌ Export job {job_id} failed: {e}", exc_info=True)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        _save_job(job_id, status="failed", error=str(e))
+    finally:
+        db.close()
+
+
+def start_export_job(
+    *,
+    filename: str,
+    sheet_title: str,
+    header: List[str],
+    rows: RowsBuilder,
+    empty_detail: str = "No data to export.",
+    file_format: str = "xlsx",
+    allow_empty: bool = False,
+    owner=None,
+) -> Dict[str, Any]:
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    _remove_expired_files()
+    job_id = uuid.uuid4().hex
+    path = os.path.join(EXPORT_DIR, f"{job_id}.{file_format}")
+    _save_job(
+        job_id, status="queued", rows_written=0, file_format=file_format,
+        filename=f"{filename}.{file_format}", path=path, created_at=time.time(),
+        owner_id=_str_or_none(getattr(owner, "id", None)),
+        organization_id=_str_or_none(getattr(owner, "organization_id", None)),
+    )
+    _get_executor().submit(_run_job, job_id, path, sheet_title, header, rows, empty_detail, file_format, allow_empty)
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/api/exports/{job_id}",
+        "download_url": f"/api/exports/{job_id}/download",
+    }
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import re
+import logging
 from datetime import datetime, timezone, timedelta
 from typing import Optional, Sequence, Tuple
 
@@ -8,6 +9,9 @@ from sqlalchemy.orm import Session
 from sqlalchemy import select
 
 from models.models import NumberFlowConfig
+from services.number_registry import invalidate_number_registry, number_registry
+
+logger = logging.getLogger(__name__)
 
 IST_OFFSET = timedelta(hours=5, minutes=30)
 IST_TZ = timezone(IST_OFFSET)
@@ -75,7 +79,19 @@ def get_flow_for_incoming(
     phone_number_id: Optional[str],
     display_number: Optional[str],
 ) -> Optional[NumberFlowConfig]:
+    """
+    Flow route for an incoming number, by phone_number_id then display digits.
+
+    Served from the in-memory number registry (a FlowRoute snapshot); the DB
+    is queried directly only if the registry cannot be loaded.
+    """
     phone_number_id = str(phone_number_id).strip() if phone_number_id else None
+    digits = _normalize_digits(display_number)
+    try:
+        return number_registry.flow_for_incoming(phone_number_id=phone_number_id, display_digits=digits)
+    except Exception as e:
+        logger.warning(f"Number registry unavailable, querying flow config directly: {e}")
+
     if phone_number_id:
         flow = (
             db.execute(select(NumberFlowConfig).where(NumberFlowConfig.phone_number_id == phone_number_id))
@@ -85,7 +101,6 @@ def get_flow_for_incoming(
         if flow:
             return flow
 
-    digits = _normalize_digits(display_number)
     if digits:
         return (
             db.execute(select(NumberFlowConfig).where(NumberFlowConfig.display_digits == digits))
@@ -150,6 +165,7 @@ def update_flow_settings(
     db.add(flow)
     db.commit()
     db.refresh(flow)
+    invalidate_number_registry()
     return flow
 
 
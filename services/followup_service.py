@@ -14,6 +14,10 @@ from marketing.services.followup_service import (  # noqa: F401
     schedule_next_followup,
     mark_customer_replied,
     due_customers_for_followup,
+    followup_skip_reason,
+    claim_due_followups,
+    release_followup_lease,
+    next_followup_due_at,
     send_followup1_interactive,
     send_followup2,
 )
@@ -28,6 +32,10 @@ __all__ = [
     "schedule_next_followup",
     "mark_customer_replied",
     "due_customers_for_followup",
+    "followup_skip_reason",
+    "claim_due_followups",
+    "release_followup_lease",
+    "next_followup_due_at",
     "send_followup1_interactive",
     "send_followup2",
 ]
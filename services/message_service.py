@@ -1,14 +1,30 @@
+import base64
+from typing import List, Optional, Tuple
+
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, func
+from sqlalchemy import or_, and_, func, tuple_
+from sqlalchemy.exc import IntegrityError
 
-from cache.service import increment_unread, reset_unread
+from services.conversation_summary_service import mark_conversation_read
+from services import message_tag_service  # noqa: F401  (registers the keyword tagging hook)
 from models.models import Message, Customer
 from sqlalchemy import func, and_, over
 from schemas.message_schema import MessageCreate
 from datetime import datetime
 
+CHAT_PAGE_SIZE = 200
+CHAT_MAX_PAGE_SIZE = 1000
+
+
 # Create a new message
 def create_message(db: Session, message_data: MessageCreate) -> Message:
+    # WhatsApp message ids are unique (ux_messages_message_id); a repeated id is
+    # a retried webhook or a double save, so return the row we already have.
+    if message_data.message_id:
+        existing = db.query(Message).filter(Message.message_id == message_data.message_id).first()
+        if existing:
+            return existing
+
     customer = db.query(Customer).filter(Customer.id == message_data.customer_id).first()
     sender_type = message_data.sender_type
     if not sender_type and customer:
@@ -44,19 +60,19 @@ def create_message(db: Session, message_data: MessageCreate) -> Message:
     if customer:
         # Track when we last saw a message for ordering in conversation list
         customer.last_message_at = new_message.timestamp
-
-        # If this message is from the customer, increment their unread counter.
-        # The counter will be reset when the agent opens the chat via get_messages().
-        try:
-            if sender_type == "customer":
-                # Use the canonical customer wa_id as the key for unread tracking
-                increment_unread(customer.wa_id)
-        except Exception:
-            # Never block message creation if Redis is unavailable
-            pass
+        # Inbound messages bump conversation_summaries.unread_count on insert;
+        # get_messages() resets it when the agent opens the chat.
 
     db.add(new_message)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Lost a race with a concurrent insert of the same message id
+        db.rollback()
+        existing = db.query(Message).filter(Message.message_id == message_data.message_id).first()
+        if existing:
+            return existing
+        raise
     db.refresh(new_message)
     return new_message
 
@@ -125,29 +141,87 @@ def delete_message(db: Session, message_id: int):
         db.commit()
     return message
 
-def get_messages(db: Session, wa_id: str, peer: str | None):
-    
-    base_query = db.query(Message).filter(
-        (Message.from_wa_id == wa_id) | (Message.to_wa_id == wa_id)
-    )
+def encode_message_cursor(message: Message) -> str:
+    raw = f"{message.timestamp.isoformat() if message.timestamp else ''}|{message.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
 
-    # If peer is NOT provided → return all messages involving wa_id
-    if not peer:
-        reset_unread(wa_id)  # optional
-        return base_query.order_by(Message.timestamp.asc()).all()
-
-    # If peer IS provided → return only messages between wa_id and peer
-    reset_unread(wa_id)  # optional
-    return (
-        base_query.filter(
-            or_(
-                and_(Message.from_wa_id == wa_id, Message.to_wa_id == peer),
-                and_(Message.from_wa_id == peer, Message.to_wa_id == wa_id),
-            )
-        )
-        .order_by(Message.timestamp.asc())
-        .all()
-    )
+
+def decode_message_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    """
+    Inverse of encode_message_cursor(); the timestamp is None for messages
+    stored without one. Raises ValueError on malformed input.
+    """
+    try:
+        ts, message_pk = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return (datetime.fromisoformat(ts) if ts else None), int(message_pk)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _older_messages(query, cursor: Optional[Tuple[Optional[datetime], int]], count: int) -> List[Message]:
+    """
+    Up to `count` messages of `query` before `cursor`, newest first. Messages
+    without a timestamp sort after (older than) every timestamped one, by id;
+    they are read by a separate scan so the timestamped scan keeps its index.
+    """
+    ts, message_pk = cursor if cursor else (None, None)
+    rows: List[Message] = []
+    if cursor is None or ts is not None:
+        timed = query.filter(Message.timestamp.isnot(None))
+        if cursor:
+            timed = timed.filter(tuple_(Message.timestamp, Message.id) < (ts, message_pk))
+        rows = timed.order_by(Message.timestamp.desc(), Message.id.desc()).limit(count).all()
+    if len(rows) < count:
+        untimed = query.filter(Message.timestamp.is_(None))
+        if cursor and ts is None:
+            untimed = untimed.filter(Message.id < message_pk)
+        rows += untimed.order_by(Message.id.desc()).limit(count - len(rows)).all()
+    return rows
+
+
+def get_messages(
+    db: Session,
+    wa_id: str,
+    peer: str | None,
+    *,
+    limit: int = CHAT_PAGE_SIZE,
+    before: Optional[str] = None,
+) -> Tuple[List[Message], Optional[str]]:
+    """
+    One page of a chat, oldest first, plus the cursor for the previous page.
+
+    Pages are keyset-paginated on (timestamp, id): the first page is the most
+    recent `limit` messages, and passing the returned cursor as `before` loads
+    the page preceding it. The sender and receiver sides are read as two
+    separate ordered scans so each uses its (wa_id, timestamp) index, then
+    merged; cost depends on the page size, not the length of the history.
+    Returns (messages, next_cursor); next_cursor is None on the oldest page.
+    """
+    limit = max(1, min(int(limit or CHAT_PAGE_SIZE), CHAT_MAX_PAGE_SIZE))
+    cursor = decode_message_cursor(before) if before else None
+
+    if peer:
+        branches = [
+            and_(Message.from_wa_id == wa_id, Message.to_wa_id == peer),
+            and_(Message.from_wa_id == peer, Message.to_wa_id == wa_id),
+        ]
+    else:
+        branches = [Message.from_wa_id == wa_id, Message.to_wa_id == wa_id]
+
+    rows = {}
+    for condition in branches:
+        for message in _older_messages(db.query(Message).filter(condition), cursor, limit + 1):
+            rows[message.id] = message
+
+    # Same order as _older_messages: untimed messages are the oldest
+    newest_first = sorted(rows.values(), key=lambda m: (m.timestamp is not None, m.timestamp or datetime.min, m.id), reverse=True)
+    page = newest_first[:limit]
+    next_cursor = encode_message_cursor(page[-1]) if len(newest_first) > limit else None
+
+    if not before:
+        mark_conversation_read(db, wa_id)
+    page.reverse()
+    return page, next_cursor
 
 
 def get_customer_wa_ids_by_date(db: Session, target_date: str) -> list[str]:
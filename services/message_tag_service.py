@@ -0,0 +1,200 @@
+"""
+Keyword tags for customer messages.
+
+Customer message bodies are matched once, when the message is inserted,
+against MESSAGE_TAG_KEYWORDS. The matched keywords are stored in
+messages.keyword_tags, which has a GIN index, so exports and analytics can
+read the tags instead of scanning message text.
+
+All keywords are matched in one pass by a single compiled regex. A lookahead
+finds matches that start at every offset, so overlapping keywords are all
+found. Keywords that occur inside a longer matched keyword are added from a
+precomputed table. The result equals checking `keyword in body.lower()` for
+each keyword.
+
+Messages inserted through the ORM are tagged by the before_insert listener
+below; message_service imports this module so the listener is registered.
+When the keyword set changes, the startup backfill re-tags existing customer
+messages in id order. It runs once per keyword-set signature (tracked in
+Redis) and is guarded by a Redis lock.
+"""
+
+import os
+import re
+import hashlib
+import logging
+import threading
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from sqlalchemy import event, text
+
+from cache.redis_connection import get_redis_client
+from models.models import Message
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEYWORDS = (
+    "price",
+    "appointment",
+    "cost",
+    "vacancy",
+    "contact us",
+    "clinic address",
+    "clinic number",
+    "treatment information",
+    "treatment type",
+)
+
+MESSAGE_TAG_BACKFILL_ENABLED = os.getenv("MESSAGE_TAG_BACKFILL_ENABLED", "true").lower() == "true"
+MESSAGE_TAG_BACKFILL_BATCH_SIZE = int(os.getenv("MESSAGE_TAG_BACKFILL_BATCH_SIZE", "5000"))
+
+_SIGNATURE_KEY = "message_tags:keyword_signature"
+_BACKFILL_LOCK_KEY = "message_tags:backfill_lock"
+_BACKFILL_LOCK_TTL_SECONDS = 600
+
+_backfill_thread: Optional[threading.Thread] = None
+
+
+def _configured_keywords() -> Tuple[str, ...]:
+    raw = os.getenv("MESSAGE_TAG_KEYWORDS")
+    if not raw:
+        return DEFAULT_KEYWORDS
+    return tuple(k.strip() for k in raw.split(",") if k.strip())
+
+
+class KeywordMatcher:
+    """Compiled multi-keyword matcher with `keyword in text` semantics."""
+
+    def __init__(self, keywords: Tuple[str, ...]):
+        # Deduplicate case-insensitively, keeping the configured spelling for display
+        by_lower: Dict[str, str] = {}
+        for keyword in keywords:
+            by_lower.setdefault(keyword.lower(), keyword)
+        self.keywords = tuple(by_lower.values())
+        self.signature = hashlib.sha1("\n".join(sorted(by_lower)).encode("utf-8")).hexdigest()[:16]
+
+        # Longest first so the alternation prefers the longest keyword at each offset
+        ordered = sorted(by_lower, key=len, reverse=True)
+        self._pattern = re.compile("(?=(" + "|".join(re.escape(k) for k in ordered) + "))") if ordered else None
+        # A matched keyword implies every keyword that is a substring of it
+        self._implied: Dict[str, FrozenSet[str]] = {
+            k: frozenset(by_lower[o] for o in by_lower if o in k) for k in by_lower
+        }
+
+    def tags(self, body: Optional[str]) -> Optional[List[str]]:
+        """Sorted keywords found in body, or None when there are none."""
+        if not body or self._pattern is None:
+            return None
+        found = set()
+        for match in self._pattern.finditer(body.lower()):
+            found.update(self._implied[match.group(1)])
+        return sorted(found) if found else None
+
+
+@lru_cache(maxsize=1)
+def get_matcher() -> KeywordMatcher:
+    return KeywordMatcher(_configured_keywords())
+
+
+def tags_for(sender_type: Optional[str], body: Optional[str]) -> Optional[List[str]]:
+    """Tags for a message; only customer messages are tagged."""
+    if sender_type != "customer":
+        return None
+    return get_matcher().tags(body)
+
+
+@event.listens_for(Message, "before_insert")
+def _tag_message(mapper, connection, target: Message):
+    if target.keyword_tags is None:
+        target.keyword_tags = tags_for(target.sender_type, target.body)
+
+
+# ---------------------------------------------------------------------------
+# Backfill when the keyword set changes
+# ---------------------------------------------------------------------------
+
+def backfill_message_tags(
+    batch_size: int = MESSAGE_TAG_BACKFILL_BATCH_SIZE,
+    on_batch: Optional[Callable[[int], None]] = None,
+) -> int:
+    """Re-tag all customer messages with the current keyword set; returns rows changed."""
+    from database.db import SessionLocal
+
+    matcher = get_matcher()
+    changed = 0
+    last_id = 0
+    db = SessionLocal()
+    try:
+        while True:
+            rows = db.execute(
+                text("""
+                    SELECT id, body, keyword_tags FROM messages
+                    WHERE id > :last_id AND sender_type = 'customer'
+                    ORDER BY id LIMIT :limit
+                """),
+                {"last_id": last_id, "limit": batch_size},
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            updates = []
+            for row in rows:
+                tags = matcher.tags(row.body)
+                if (tags or None) != (list(row.keyword_tags) if row.keyword_tags else None):
+                    updates.append({"id": row.id, "tags": tags})
+            if updates:
+                db.execute(text("UPDATE messages SET keyword_tags = :tags WHERE id = :id"), updates)
+                changed += len(updates)
+            db.commit()
+            if on_batch:
+                on_batch(last_id)
+        return changed
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _run_backfill_if_needed() -> None:
+    redis_client = get_redis_client()
+    if not redis_client:
+        logger.info("Redis unavailable; skipping message tag backfill check")
+        return
+    signature = get_matcher().signature
+    try:
+        if redis_client.get(_SIGNATURE_KEY) == signature:
+            return
+        if not redis_client.set(_BACKFILL_LOCK_KEY, signature, nx=True, ex=_BACKFILL_LOCK_TTL_SECONDS):
+            return  # another worker is backfilling
+    except Exception as e:
+        logger.warning(f"Message tag backfill check failed: {e}")
+        return
+
+    try:
+        logger.info(f"🏷️ Backfilling message keyword tags (keyword set {signature})")
+        changed = backfill_message_tags(
+            on_batch=lambda _: redis_client.expire(_BACKFILL_LOCK_KEY, _BACKFILL_LOCK_TTL_SECONDS)
+        )
+        redis_client.set(_SIGNATURE_KEY, signature)
+        logger.info(f"✅ Message tag backfill done: {changed} messages updated")
+    except Exception as e:
+        logger.error(f"❌ Message tag backfill failed: {e}", exc_info=True)
+    finally:
+        try:
+            redis_client.delete(_BACKFILL_LOCK_KEY)
+        except Exception:
+            pass
+
+
+def start_message_tag_backfill() -> None:
+    """Start the keyword-set backfill in a background thread (no-op if up to date)."""
+    global _backfill_thread
+    if not MESSAGE_TAG_BACKFILL_ENABLED:
+        return
+    if _backfill_thread and _backfill_thread.is_alive():
+        return
+    _backfill_thread = threading.Thread(target=_run_backfill_if_needed, name="message-tag-backfill", daemon=True)
+    _backfill_thread.start()
@@ -0,0 +1,279 @@
+"""
+Hourly metric rollups for the dashboard and analytics overview.
+
+`metric_rollups` holds one row per (metric, organization, hour) with the
+number of source rows created in that hour. Dashboard counters read it
+instead of running count(*) over messages, customers, leads, ... on every
+page load:
+
+- count_metric() sums the closed hours from the rollup table and counts the
+  partial hours at either end of the range live from the source table, so
+  it touches at most two hours of raw rows.
+- A background aggregator re-aggregates the last ROLLUP_RECENT_HOURS hours
+  every ROLLUP_INTERVAL_SECONDS, and the previous day once a day. Rebuilds
+  replace whole hours, so they are idempotent.
+- Rollups are exact for rows that keep their bucket once written. Changes to
+  older rows (e.g. a customer moved between organisations last week) show up
+  only after rebuild_rollups() covers their hours.
+- LIVE_METRICS are never rolled up: appointments are bucketed by the
+  referral's created_at but flagged as booked later, on any row, so they are
+  always counted from referrer_tracking.
+- rebuild_rollups() re-aggregates any range (backfills, corrections); the
+  migration that creates the table does the initial backfill.
+
+Rows with no organisation are stored under NO_ORG so that the organisation
+is part of the primary key; reads without an organisation sum all of them.
+"""
+
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database.db import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+METRIC_ROLLUPS_ENABLED = os.getenv("METRIC_ROLLUPS_ENABLED", "true").lower() == "true"
+ROLLUP_INTERVAL_SECONDS = int(os.getenv("ROLLUP_INTERVAL_SECONDS", "60"))
+ROLLUP_RECENT_HOURS = int(os.getenv("ROLLUP_RECENT_HOURS", "2"))
+ROLLUP_BACKFILL_CHUNK_DAYS = int(os.getenv("ROLLUP_BACKFILL_CHUNK_DAYS", "7"))
+
+NO_ORG = "00000000-0000-0000-0000-000000000000"
+
+# metric -> (FROM clause, timestamp column, organisation expression, extra WHERE)
+METRIC_SOURCES: Dict[str, Tuple[str, str, str, str]] = {
+    "messages": (
+        "messages m LEFT JOIN customers c ON c.id = m.customer_id",
+        "m.timestamp", "c.organization_id", "",
+    ),
+    "customers": (
+        "customers c",
+        "c.created_at", "c.organization_id", "",
+    ),
+    "leads": (
+        "leads l LEFT JOIN customers c ON c.wa_id = l.wa_id",
+        "l.created_at", "c.organization_id", "",
+    ),
+    "campaigns": (
+        "campaigns cp LEFT JOIN users u ON u.id = cp.created_by",
+        "cp.created_at", "u.organization_id", "",
+    ),
+    "orders": (
+        "orders o LEFT JOIN customers c ON c.id = o.customer_id",
+        "o.timestamp", "c.organization_id", "",
+    ),
+    "flow_completions": (
+        "flow_logs f LEFT JOIN customers c ON c.wa_id = f.wa_id",
+        "f.created_at", "c.organization_id", "AND f.step = 'result' AND f.status_code = 200",
+    ),
+    "appointments": (
+        "referrer_tracking r LEFT JOIN customers c ON c.id = r.customer_id",
+        "r.created_at", "c.organization_id", "AND r.is_appointment_booked = true",
+    ),
+}
+
+# Metrics whose rows change bucket membership after insert; counted live only
+LIVE_METRICS = frozenset({"appointments"})
+ROLLUP_METRICS = tuple(m for m in METRIC_SOURCES if m not in LIVE_METRICS)
+
+# Serialises aggregators across app processes (pg_try_advisory_xact_lock key)
+_ROLLUP_LOCK_KEY = 7316001
+
+_aggregator_task: Optional[asyncio.Task] = None
+
+
+def _floor_hour(dt: datetime) -> datetime:
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def _ceil_hour(dt: datetime) -> datetime:
+    floored = _floor_hour(dt)
+    return floored if floored == dt else floored + timedelta(hours=1)
+
+
+def _org_param(organization_id) -> Optional[str]:
+    return str(organization_id) if organization_id else None
+
+
+# ---------------------------------------------------------------------------
+# Reads
+# ---------------------------------------------------------------------------
+
+def _live_count(db: Session, metric: str, start: Optional[datetime], end: Optional[datetime],
+                organization_id: Optional[str]) -> int:
+    source, ts, org, extra = METRIC_SOURCES[metric]
+    where = [f"{ts} IS NOT NULL"]
+    params = {"no_org": NO_ORG}
+    if start:
+        where.append(f"{ts} >= :start")
+        params["start"] = start
+    if end:
+        where.append(f"{ts} < :end")
+        params["end"] = end
+    if organization_id:
+        where.append(f"COALESCE({org}, CAST(:no_org AS uuid)) = CAST(:org AS uuid)")
+        params["org"] = organization_id
+    sql = f"SELECT count(*) FROM {source} WHERE {' AND '.join(where)} {extra}"
+    return int(db.execute(text(sql), params).scalar() or 0)
+
+
+def _rollup_sum(db: Session, metric: str, start: Optional[datetime], end: datetime,
+                organization_id: Optional[str]) -> int:
+    where = ["metric = :metric", "bucket_start < :end"]
+    params = {"metric": metric, "end": end}
+    if start:
+        where.append("bucket_start >= :start")
+        params["start"] = start
+    if organization_id:
+        where.append("org_key = CAST(:org AS uuid)")
+        params["org"] = organization_id
+    sql = f"SELECT COALESCE(SUM(count), 0) FROM metric_rollups WHERE {' AND '.join(where)}"
+    return int(db.execute(text(sql), params).scalar() or 0)
+
+
+def count_metric(
+    db: Session,
+    metric: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    organization_id=None,
+) -> int:
+    """
+    Rows of `metric` created in [start, end) (open-ended when None),
+    optionally for one organisation.
+    """
+    org = _org_param(organization_id)
+    if not METRIC_ROLLUPS_ENABLED or metric in LIVE_METRICS:
+        return _live_count(db, metric, start, end, org)
+
+    now = datetime.utcnow()
+    # Whole hours in the range that are already closed come from the rollup
+    rollup_start = _ceil_hour(start) if start else None
+    rollup_end = _floor_hour(min(end, now) if end else now)
+    if rollup_start and rollup_start >= rollup_end:
+        return _live_count(db, metric, start, end, org)
+
+    total = _rollup_sum(db, metric, rollup_start, rollup_end, org)
+    if start and start < rollup_start:
+        total += _live_count(db, metric, start, rollup_start, org)
+    total += _live_count(db, metric, rollup_end, end, org)
+    return total
+
+
+# ---------------------------------------------------------------------------
+# Aggregation
+# ---------------------------------------------------------------------------
+
+def _rebuild_range(db: Session, metric: str, start: datetime, end: datetime) -> None:
+    source, ts, org, extra = METRIC_SOURCES[metric]
+    params = {"metric": metric, "start": start, "end": end, "no_org": NO_ORG}
+    db.execute(
+        text("DELETE FROM metric_rollups WHERE metric = :metric AND bucket_start >= :start AND bucket_start < :end"),
+        params,
+    )
+    db.execute(text(f"""
+        INSERT INTO metric_rollups (metric, org_key, bucket_start, count, updated_at)
+        SELECT :metric, COALESCE({org}, CAST(:no_org AS uuid)), date_trunc('hour', {ts}), count(*), now()
+        FROM {source}
+        WHERE {ts} >= :start AND {ts} < :end {extra}
+        GROUP BY 2, 3
+    """), params)
+
+
+def rebuild_rollups(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    metrics: Optional[Iterable[str]] = None,
+) -> Dict[str, int]:
+    """
+    Re-aggregate [start, end) for the given metrics (default: all) in
+    ROLLUP_BACKFILL_CHUNK_DAYS chunks. Without start, begins at each metric's
+    oldest row. Returns the number of hours rebuilt per metric.
+    """
+    metrics = list(metrics or ROLLUP_METRICS)
+    unknown = [m for m in metrics if m not in ROLLUP_METRICS]
+    if unknown:
+        raise ValueError(f"Unknown metrics: {', '.join(unknown)}")
+    end = _ceil_hour(end or datetime.utcnow())
+    rebuilt: Dict[str, int] = {}
+    for metric in metrics:
+        db = SessionLocal()
+        try:
+            metric_start = start
+            if metric_start is None:
+                source, ts, _, extra = METRIC_SOURCES[metric]
+                metric_start = db.execute(
+                    text(f"SELECT min({ts}) FROM {source} WHERE {ts} IS NOT NULL {extra}")
+                ).scalar()
+                if metric_start is None:
+                    rebuilt[metric] = 0
+                    continue
+            cursor = _floor_hour(metric_start)
+            while cursor < end:
+                chunk_end = min(cursor + timedelta(days=ROLLUP_BACKFILL_CHUNK_DAYS), end)
+                db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _ROLLUP_LOCK_KEY})
+                _rebuild_range(db, metric, cursor, chunk_end)
+                db.commit()
+                cursor = chunk_end
+            rebuilt[metric] = int((end - _floor_hour(metric_start)).total_seconds() // 3600)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    return rebuilt
+
+
+def refresh_recent_rollups(rebuild_previous_day: bool = False) -> None:
+    """One aggregator pass; skipped when another process holds the lock."""
+    db = SessionLocal()
+    try:
+        if not db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _ROLLUP_LOCK_KEY}).scalar():
+            return
+        now = datetime.utcnow()
+        start = _floor_hour(now) - timedelta(hours=ROLLUP_RECENT_HOURS - 1)
+        if rebuild_previous_day:
+            start = min(start, datetime.combine(now.date() - timedelta(days=1), datetime.min.time()))
+        end = _floor_hour(now) + timedelta(hours=1)
+        for metric in ROLLUP_METRICS:
+            _rebuild_range(db, metric, start, end)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def _run_aggregator():
+    last_daily_rebuild = None
+    while True:
+        today = datetime.utcnow().date()
+        try:
+            await asyncio.to_thread(refresh_recent_rollups, last_daily_rebuild != today)
+            last_daily_rebuild = today
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Metric rollup aggregator error: {e}")
+        await asyncio.sleep(ROLLUP_INTERVAL_SECONDS)
+
+
+async def start_metric_rollups():
+    global _aggregator_task
+    if not METRIC_ROLLUPS_ENABLED or _aggregator_task is not None:
+        return
+    _aggregator_task = asyncio.create_task(_run_aggregator())
+    logger.info(f"✅ Metric rollup aggregator started (interval={ROLLUP_INTERVAL_SECONDS}s)")
+
+
+async def stop_metric_rollups():
+    global _aggregator_task
+    if _aggregator_task is not None:
+        _aggregator_task.cancel()
+        _aggregator_task = None
@@ -0,0 +1,218 @@
+"""
+Process-wide routing registry for WhatsApp business numbers.
+
+Webhooks and sends resolve a business number many times per message: the
+number's credentials, its NumberFlowConfig route and its organisation. The
+registry loads `whatsapp_numbers` (with organisation names) and
+`number_flow_configs` once and indexes them in dicts by phone_number_id,
+exact display number, normalised display digits and last 10 digits. Lookups
+are dict hits and hand back immutable snapshots, not session-bound rows.
+
+Freshness: the write paths (whatsapp_number_service create/update/delete,
+flow_config_service.update_flow_settings, organisation updates) call
+invalidate_number_registry(). That marks the local copy stale and bumps a
+version counter in Redis. Every process compares the counter at most every
+NUMBER_REGISTRY_SYNC_SECONDS and reloads when it has moved. The registry is
+also reloaded after NUMBER_REGISTRY_MAX_AGE_SECONDS regardless, to pick up
+rows changed outside the API (see cache.versioned_snapshot).
+"""
+
+import os
+import re
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from cache.versioned_snapshot import VersionedSnapshot
+
+logger = logging.getLogger(__name__)
+
+NUMBER_REGISTRY_SYNC_SECONDS = float(os.getenv("NUMBER_REGISTRY_SYNC_SECONDS", "5"))
+NUMBER_REGISTRY_MAX_AGE_SECONDS = float(os.getenv("NUMBER_REGISTRY_MAX_AGE_SECONDS", "300"))
+
+_VERSION_KEY = "number_registry:version"
+_NON_DIGITS = re.compile(r"\D")
+
+
+def digits_of(value: Optional[str]) -> str:
+    return _NON_DIGITS.sub("", value) if value else ""
+
+
+@dataclass(frozen=True)
+class OrganizationRef:
+    id: Any
+    name: Optional[str]
+
+
+@dataclass(frozen=True)
+class NumberRoute:
+    """Snapshot of a WhatsAppNumber row."""
+
+    id: Any
+    phone_number_id: str
+    display_number: Optional[str]
+    access_token: Optional[str]
+    webhook_path: Optional[str]
+    organization_id: Any
+    organization_name: Optional[str]
+    is_active: bool
+
+    @property
+    def organization(self) -> Optional[OrganizationRef]:
+        if self.organization_id is None:
+            return None
+        return OrganizationRef(id=self.organization_id, name=self.organization_name)
+
+
+@dataclass(frozen=True)
+class FlowRoute:
+    """Snapshot of a NumberFlowConfig row (same attribute names)."""
+
+    id: Any
+    phone_number_id: str
+    display_number: str
+    display_digits: Optional[str]
+    flow_key: str
+    flow_name: str
+    description: Optional[str]
+    priority: Optional[int]
+    is_enabled: bool
+    auto_enable_from: Optional[datetime]
+    auto_enable_to: Optional[datetime]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+
+class _Snapshot:
+    def __init__(self, numbers, flows):
+        self.numbers_by_phone_id: Dict[str, NumberRoute] = {}
+        self.numbers_by_display: Dict[str, NumberRoute] = {}
+        self.active_by_digits: Dict[str, NumberRoute] = {}
+        self.active_by_last10: Dict[str, NumberRoute] = {}
+        for number in numbers:
+            self.numbers_by_phone_id[number.phone_number_id] = number
+            if number.display_number:
+                self.numbers_by_display.setdefault(number.display_number, number)
+            digits = digits_of(number.display_number)
+            if number.is_active and digits:
+                self.active_by_digits.setdefault(digits, number)
+                if len(digits) >= 10:
+                    self.active_by_last10.setdefault(digits[-10:], number)
+
+        self.flows_by_phone_id: Dict[str, FlowRoute] = {}
+        self.flows_by_digits: Dict[str, FlowRoute] = {}
+        for flow in flows:
+            self.flows_by_phone_id.setdefault(flow.phone_number_id, flow)
+            if flow.display_digits:
+                self.flows_by_digits.setdefault(flow.display_digits, flow)
+
+
+def _load() -> _Snapshot:
+    from database.db import SessionLocal
+    from models.models import NumberFlowConfig, Organization, WhatsAppNumber
+
+    db = SessionLocal()
+    try:
+        numbers = [
+            NumberRoute(
+                id=row.id,
+                phone_number_id=row.phone_number_id,
+                display_number=row.display_number,
+                access_token=row.access_token,
+                webhook_path=row.webhook_path,
+                organization_id=row.organization_id,
+                organization_name=org_name,
+                is_active=row.is_active is True,
+            )
+            for row, org_name in (
+                db.query(WhatsAppNumber, Organization.name)
+                .outerjoin(Organization, Organization.id == WhatsAppNumber.organization_id)
+                .order_by(WhatsAppNumber.created_at)
+            )
+        ]
+        flows = [
+            FlowRoute(
+                id=row.id,
+                phone_number_id=row.phone_number_id,
+                display_number=row.display_number,
+                display_digits=row.display_digits,
+                flow_key=row.flow_key,
+                flow_name=row.flow_name,
+                description=row.description,
+                priority=row.priority,
+                is_enabled=bool(row.is_enabled),
+                auto_enable_from=row.auto_enable_from,
+                auto_enable_to=row.auto_enable_to,
+                created_at=row.created_at,
+                updated_at=row.updated_at,
+            )
+            for row in db.query(NumberFlowConfig).order_by(NumberFlowConfig.priority.asc(), NumberFlowConfig.flow_name.asc())
+        ]
+    finally:
+        db.close()
+    return _Snapshot(numbers, flows)
+
+
+class NumberRegistry:
+    def __init__(self):
+        self._snapshot = VersionedSnapshot(
+            _load,
+            version_key=_VERSION_KEY,
+            sync_seconds=NUMBER_REGISTRY_SYNC_SECONDS,
+            max_age_seconds=NUMBER_REGISTRY_MAX_AGE_SECONDS,
+            label="Number registry",
+        )
+
+    def _current(self) -> _Snapshot:
+        return self._snapshot.get()
+
+    def invalidate(self) -> None:
+        self._snapshot.invalidate()
+
+    # ---- lookups -----------------------------------------------------------
+
+    def number_by_phone_id(self, phone_number_id: Optional[str]) -> Optional[NumberRoute]:
+        if not phone_number_id:
+            return None
+        return self._current().numbers_by_phone_id.get(str(phone_number_id).strip())
+
+    def number_for_peer(self, peer: str) -> Optional[NumberRoute]:
+        """phone_number_id, then exact display number, then active numbers by digits / last 10 digits."""
+        snapshot = self._current()
+        number = snapshot.numbers_by_phone_id.get(peer) or snapshot.numbers_by_display.get(peer)
+        if number:
+            return number
+        peer_digits = digits_of(peer)
+        if not peer_digits:
+            return None
+        number = snapshot.active_by_digits.get(peer_digits)
+        if number is None and len(peer_digits) >= 10:
+            number = snapshot.active_by_last10.get(peer_digits[-10:])
+        return number
+
+    def active_numbers(self):
+        return [n for n in self._current().numbers_by_phone_id.values() if n.is_active]
+
+    def organization_for_phone_id(self, phone_number_id: Optional[str]) -> Optional[OrganizationRef]:
+        number = self.number_by_phone_id(phone_number_id)
+        if not number or not number.is_active:
+            return None
+        return number.organization
+
+    def flow_for_incoming(self, *, phone_number_id: Optional[str], display_digits: Optional[str]) -> Optional[FlowRoute]:
+        snapshot = self._current()
+        if phone_number_id:
+            flow = snapshot.flows_by_phone_id.get(phone_number_id)
+            if flow:
+                return flow
+        if display_digits:
+            return snapshot.flows_by_digits.get(display_digits)
+        return None
+
+
+number_registry = NumberRegistry()
+
+
+def invalidate_number_registry() -> None:
+    number_registry.invalidate()
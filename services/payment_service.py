@@ -1,5 +1,4 @@
 import os
-import requests
 from datetime import datetime
 from uuid import uuid4
 from typing import Optional, Tuple
@@ -10,6 +9,8 @@ from models.models import Payment, Order
 from schemas.payment_schema import PaymentCreate
 from utils.razorpay_utils import create_razorpay_payment_link, get_razorpay_payment_details
 from utils.notification_service import send_payment_notifications
+from utils.razorpay_proxy import RAZORPAY_PAYMENT_URL, proxy_post
+from utils.http_session import http_session
 
 # Load env variables
 load_dotenv()
@@ -20,10 +21,7 @@ RAZORPAY_SECRET = os.getenv("RAZORPAY_SECRET", "test_secret_123456789")
 RAZORPAY_BASE_URL = os.getenv("RAZORPAY_BASE_URL", "https://api.razorpay.com/v1")
 
 # ---- Oliva Razorpay Proxy Config (Fallback) ----
-RAZORPAY_TOKEN_URL = "https://payments.olivaclinic.com/api/token"
-RAZORPAY_PAYMENT_URL = "https://payments.olivaclinic.com/api/payment"
-RAZORPAY_USERNAME = os.getenv("RAZORPAY_USERNAME", "test@example.com")
-RAZORPAY_PASSWORD = os.getenv("RAZORPAY_PASSWORD", "123")
+# Proxy URLs, credentials and the cached bearer token live in utils.razorpay_proxy
 
 # ---- Shopify Config ----
 SHOPIFY_STORE = os.getenv("SHOPIFY_STORE", "oliva-clinic")
@@ -35,25 +33,7 @@ SHOPIFY_PASSWORD = os.getenv("SHOPIFY_PASSWORD", "your_password")
 
 # ---------------- Razorpay Helpers ---------------- #
 
-def _get_payment_token() -> str:
-    """Get Bearer token from Razorpay proxy API."""
-    try:
-        data = {
-            "username": RAZORPAY_USERNAME,
-            "password": RAZORPAY_PASSWORD
-        }
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/x-www-form-urlencoded"
-        }
-        resp = requests.post(RAZORPAY_TOKEN_URL, data=data, headers=headers, timeout=20)
-        resp.raise_for_status()
-        return resp.json().get("access_token")
-    except Exception as e:
-        raise RuntimeError(f"Failed to get Razorpay token: {e}")
-
-
-def _create_payment_link(token: str, payload: PaymentCreate, order: Order) -> dict:
+def _create_payment_link(payload: PaymentCreate, order: Order) -> dict:
     """Create Razorpay payment link through Oliva proxy API."""
     try:
         amount_paise = int(round(payload.amount * 100))
@@ -63,14 +43,7 @@ def _create_payment_link(token: str, payload: PaymentCreate, order: Order) -> di
             "description": f"Payment for order {str(order.id)}",
             "reminder_enable": True,
         }
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-        }
-        resp = requests.post(RAZORPAY_PAYMENT_URL, json=data, headers=headers, timeout=20)
-        resp.raise_for_status()
-        return resp.json()
+        return proxy_post(RAZORPAY_PAYMENT_URL, data)
     except Exception as e:
         raise RuntimeError(f"Failed to create Razorpay payment link: {e}")
 
@@ -131,8 +104,7 @@ def create_payment_link(db: Session, payload: PaymentCreate, mock: bool = False)
                 raise ValueError(f"Order not found: {payload.order_id}")
             
             try:
-                token = _get_payment_token()
-                rzp_resp = _create_payment_link(token, payload, order)
+                rzp_resp = _create_payment_link(payload, order)
                 
                 razorpay_id = rzp_resp.get("id", f"fallback_rzp_{uuid4().hex[:12]}")
                 short_url = rzp_resp.get("short_url", f"http://localhost:8000/payments/mock-pay/{razorpay_id}")
@@ -240,7 +212,7 @@ def create_shopify_order(payment_data: dict) -> Tuple[int, dict]:
 
         shopify_url = f"https://{SHOPIFY_API_KEY}:{SHOPIFY_PASSWORD}@{SHOPIFY_STORE}.myshopify.com/admin/api/2024-04/orders.json"
         headers = {"Content-Type": "application/json"}
-        resp = requests.post(shopify_url, json=order_data, headers=headers, timeout=20)
+        resp = http_session.post(shopify_url, json=order_data, headers=headers, timeout=20)
 
         return resp.status_code, resp.json()
     except Exception as e:
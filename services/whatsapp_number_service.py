@@ -1,6 +1,7 @@
 """
 WhatsApp Number service for business logic
 """
+import logging
 from typing import Optional, List
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
@@ -8,6 +9,9 @@ from uuid import UUID
 
 from models.models import WhatsAppNumber, Organization
 from schemas.whatsapp_number_schema import WhatsAppNumberCreate, WhatsAppNumberUpdate
+from services.number_registry import invalidate_number_registry, number_registry
+
+logger = logging.getLogger(__name__)
 
 
 def create_whatsapp_number(db: Session, whatsapp_number_data: WhatsAppNumberCreate) -> WhatsAppNumber:
@@ -36,6 +40,7 @@ def create_whatsapp_number(db: Session, whatsapp_number_data: WhatsAppNumberCrea
     db.add(whatsapp_number)
     db.commit()
     db.refresh(whatsapp_number)
+    invalidate_number_registry()
     return whatsapp_number
 
 
@@ -112,6 +117,7 @@ def update_whatsapp_number(
     
     db.commit()
     db.refresh(whatsapp_number)
+    invalidate_number_registry()
     return whatsapp_number
 
 
@@ -123,11 +129,21 @@ def delete_whatsapp_number(db: Session, whatsapp_number_id: UUID) -> bool:
     
     db.delete(whatsapp_number)
     db.commit()
+    invalidate_number_registry()
     return True
 
 
 def get_organization_by_phone_id(db: Session, phone_number_id: str) -> Optional[Organization]:
-    """Get organization by WhatsApp phone_number_id (used in webhooks)"""
+    """
+    Get organization by WhatsApp phone_number_id (used in webhooks).
+
+    Returns an OrganizationRef (id, name) from the number registry; falls back
+    to the DB when the registry cannot be loaded.
+    """
+    try:
+        return number_registry.organization_for_phone_id(phone_number_id)
+    except Exception as e:
+        logger.warning(f"Number registry unavailable, querying organization directly: {e}")
     whatsapp_number = get_whatsapp_number_by_phone_id(db, phone_number_id)
     if not whatsapp_number or not whatsapp_number.is_active:
         return None
@@ -1,9 +1,12 @@
+import os
 import json
 import copy
+import time
 import logging
 
 import pika
 from sqlalchemy.orm import Session
+from cache.versioned_snapshot import RedisVersion
 from models.models import WhatsAppToken
 from schemas.whatsapp_token_schema import WhatsAppTokenCreate
 from utils.json_placeholder import fill_placeholders
@@ -14,18 +17,48 @@ logger = logging.getLogger(__name__)
 # Correct queue name - must match consumer.py
 CAMPAIGN_QUEUE_NAME = "campaign_queue"
 
+# How long get_latest_token_value() reuses the newest DB token
+WHATSAPP_TOKEN_CACHE_SECONDS = float(os.getenv("WHATSAPP_TOKEN_CACHE_SECONDS", "60"))
+# How often other processes check whether a new token was stored
+WHATSAPP_TOKEN_SYNC_SECONDS = float(os.getenv("WHATSAPP_TOKEN_SYNC_SECONDS", "5"))
+
+_latest_token_cache = {"value": None, "expires": 0.0}
+_token_version = RedisVersion("whatsapp_token:version", WHATSAPP_TOKEN_SYNC_SECONDS, "WhatsApp token cache")
+
 
 def create_whatsapp_token(db: Session, token_data: WhatsAppTokenCreate):
     token_entry = WhatsAppToken(token=token_data.token)
     db.add(token_entry)
     db.commit()
     db.refresh(token_entry)
+    _latest_token_cache["expires"] = 0.0  # rotate immediately in this process
+    _token_version.bump()  # and within WHATSAPP_TOKEN_SYNC_SECONDS in the others
     return token_entry
 
 
 def get_latest_token(db: Session):
     return db.query(WhatsAppToken).order_by(WhatsAppToken.created_at.desc()).first()
 
+
+def get_latest_token_value(db: Session):
+    """
+    Newest DB token string, cached for WHATSAPP_TOKEN_CACHE_SECONDS.
+
+    A token stored by another process is picked up within
+    WHATSAPP_TOKEN_SYNC_SECONDS through a Redis version counter; without Redis
+    it can take up to WHATSAPP_TOKEN_CACHE_SECONDS.
+    """
+    now = time.monotonic()
+    if _token_version.changed(now):
+        _latest_token_cache["expires"] = 0.0
+    if _latest_token_cache["expires"] > now:
+        return _latest_token_cache["value"]
+    token_obj = get_latest_token(db)
+    value = getattr(token_obj, "token", None) if token_obj else None
+    _latest_token_cache["value"] = value
+    _latest_token_cache["expires"] = now + WHATSAPP_TOKEN_CACHE_SECONDS
+    return value
+
 def build_template_payload(customer: dict, template_content: dict):
 
     template_name = template_content.get("name")
@@ -21,6 +21,8 @@ logger = logging.getLogger(__name__)
 # Configuration
 QUEUE_NAME = "campaign_queue"
 DEFAULT_NUM_WORKERS = 4
+# "async" runs consumer.py --async (one process keeps hundreds of sends in flight)
+CONSUMER_MODE = os.getenv("CAMPAIGN_CONSUMER_MODE", "threaded").lower()
 IDLE_SHUTDOWN_SECONDS = 30  # Stop workers after queue empty for this duration
 CHECK_INTERVAL_SECONDS = 5  # How often to check queue status
 
@@ -85,13 +87,18 @@ class WorkerManager:
             # Get the path to consumer.py
             project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
             consumer_path = os.path.join(project_root, "consumer.py")
+            consumer_cmd = [sys.executable, consumer_path]
+            if CONSUMER_MODE == "async":
+                # Throughput is set by the shared rate limiter, not process count
+                consumer_cmd.append("--async")
+                num_workers = 1
 
             # Start worker processes
             for i in range(num_workers):
                 try:
                     # Start each worker as a separate process
                     process = subprocess.Popen(
-                        [sys.executable, consumer_path],
+                        consumer_cmd,
                         stdout=subprocess.PIPE,
                         stderr=subprocess.PIPE,
                         cwd=project_root
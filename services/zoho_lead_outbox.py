@@ -0,0 +1,436 @@
+"""
+Outbox + background pusher for Zoho CRM leads.
+
+Flows no longer call the Zoho Leads API while handling a webhook. They add a
+row to `zoho_lead_outbox` (see enqueue_lead) and return. A pusher task claims
+pending rows with FOR UPDATE SKIP LOCKED (so several app processes can run
+it), and per batch of up to ZOHO_LEAD_BATCH_SIZE rows (Zoho's limit is 100):
+
+1. coalesces rows for the same phone + Lead Source + Sub Source on one day
+2. drops rows already present in the local `leads` table for that day
+3. checks Zoho for same-day leads on those phones with one COQL query
+4. inserts the rest with a single bulk POST /Leads call
+5. writes per-lead results back to `leads`, `zoho_payload_logs` and `flow_logs`
+
+Transport failures (timeouts, 429, 5xx) retry the whole batch with
+exponential backoff; per-record errors retry only that row, and rows that
+exhaust ZOHO_LEAD_MAX_ATTEMPTS are marked failed.
+"""
+
+import os
+import re
+import json
+import random
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import requests
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from database.db import SessionLocal
+from models.models import FlowLog, Lead, ZohoLeadOutbox, ZohoPayloadLog
+from utils.zoho_auth import get_valid_access_token
+
+logger = logging.getLogger(__name__)
+
+ZOHO_LEADS_URL = "https://www.zohoapis.in/crm/v2.1/Leads"
+ZOHO_COQL_URL = "https://www.zohoapis.in/crm/v2.1/coql"
+ZOHO_LEAD_TRIGGERS = ["approval", "workflow", "blueprint"]
+
+ZOHO_LEAD_PUSH_MODE = os.getenv("ZOHO_LEAD_PUSH_MODE", "outbox").lower()  # outbox | inline
+ZOHO_LEAD_PUSHER_ENABLED = os.getenv("ZOHO_LEAD_PUSHER_ENABLED", "true").lower() in ("1", "true", "yes")
+ZOHO_LEAD_BATCH_SIZE = min(100, int(os.getenv("ZOHO_LEAD_BATCH_SIZE", "100")))
+ZOHO_LEAD_POLL_SECONDS = float(os.getenv("ZOHO_LEAD_POLL_SECONDS", "5"))
+ZOHO_LEAD_MAX_ATTEMPTS = int(os.getenv("ZOHO_LEAD_MAX_ATTEMPTS", "8"))
+ZOHO_LEAD_BACKOFF_BASE = float(os.getenv("ZOHO_LEAD_BACKOFF_BASE", "30"))
+ZOHO_LEAD_BACKOFF_MAX = float(os.getenv("ZOHO_LEAD_BACKOFF_MAX", "3600"))
+# In-flight rows older than this belong to a pusher that died mid-batch
+ZOHO_LEAD_CLAIM_TIMEOUT_SECONDS = int(os.getenv("ZOHO_LEAD_CLAIM_TIMEOUT_SECONDS", "600"))
+
+# COQL accepts at most 50 values in an IN clause
+_COQL_IN_LIMIT = 50
+_RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+_session = requests.Session()
+_pusher_task: Optional[asyncio.Task] = None
+
+
+class _BatchRetry(Exception):
+    """The whole batch failed for a transient reason and should be retried."""
+
+
+def outbox_enabled() -> bool:
+    return ZOHO_LEAD_PUSH_MODE == "outbox"
+
+
+def phone_key(phone: Optional[str]) -> str:
+    digits = re.sub(r"\D", "", phone or "")
+    return digits[-10:] if len(digits) >= 10 else digits
+
+
+def _day_start(ts: datetime) -> datetime:
+    return datetime(ts.year, ts.month, ts.day)
+
+
+# ---------------------------------------------------------------------------
+# Producer side
+# ---------------------------------------------------------------------------
+
+def find_pending_duplicate(db: Session, *, phone: str, lead_source: Optional[str]) -> Optional[ZohoLeadOutbox]:
+    """A same-day outbox row for this phone and Lead Source that is not pushed yet."""
+    return (
+        db.query(ZohoLeadOutbox)
+        .filter(
+            ZohoLeadOutbox.phone_key == phone_key(phone),
+            ZohoLeadOutbox.lead_source == lead_source,
+            ZohoLeadOutbox.created_at >= _day_start(datetime.utcnow()),
+            ZohoLeadOutbox.status.in_(("pending", "in_flight")),
+        )
+        .order_by(ZohoLeadOutbox.id)
+        .first()
+    )
+
+
+def enqueue_lead(
+    db: Session,
+    *,
+    wa_id: str,
+    customer_id: Any,
+    flow_type: str,
+    record: Dict[str, Any],
+    lead_fields: Optional[Dict[str, Any]] = None,
+    payload_log: Optional[Dict[str, Any]] = None,
+) -> ZohoLeadOutbox:
+    """Queue one Zoho lead record for the pusher and commit.
+
+    lead_fields: `leads` columns (besides zoho_lead_id / wa_id / customer_id)
+    written once Zoho has created the lead.
+    """
+    row = ZohoLeadOutbox(
+        wa_id=wa_id,
+        customer_id=customer_id,
+        flow_type=flow_type,
+        phone_key=phone_key(record.get("Phone") or record.get("Mobile")),
+        lead_source=record.get("Lead_Source"),
+        sub_source=record.get("Sub_Source"),
+        record=json.loads(json.dumps(record, default=str)),
+        lead_fields=json.loads(json.dumps(lead_fields, default=str)) if lead_fields else None,
+        payload_log=json.loads(json.dumps(payload_log, default=str)) if payload_log else None,
+        status="pending",
+        next_attempt_at=datetime.utcnow(),
+    )
+    db.add(row)
+    db.commit()
+    db.refresh(row)
+    logger.info(f"📥 Queued Zoho lead for {wa_id} (outbox id={row.id}, source={row.lead_source})")
+    return row
+
+
+# ---------------------------------------------------------------------------
+# Pusher
+# ---------------------------------------------------------------------------
+
+def _claim_batch(db: Session) -> List[ZohoLeadOutbox]:
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=ZOHO_LEAD_CLAIM_TIMEOUT_SECONDS)
+    rows = (
+        db.query(ZohoLeadOutbox)
+        .filter(or_(
+            and_(ZohoLeadOutbox.status == "pending", ZohoLeadOutbox.next_attempt_at <= now),
+            and_(ZohoLeadOutbox.status == "in_flight", ZohoLeadOutbox.locked_at < stale),
+        ))
+        .order_by(ZohoLeadOutbox.id)
+        .limit(ZOHO_LEAD_BATCH_SIZE)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    for row in rows:
+        row.status = "in_flight"
+        row.locked_at = now
+        row.attempts = (row.attempts or 0) + 1
+    db.commit()
+    return rows
+
+
+def _backoff(attempts: int) -> timedelta:
+    delay = min(ZOHO_LEAD_BACKOFF_MAX, ZOHO_LEAD_BACKOFF_BASE * (2 ** max(0, attempts - 1)))
+    return timedelta(seconds=random.uniform(delay / 2, delay))
+
+
+def _dedup_key(row: ZohoLeadOutbox) -> Tuple:
+    return (row.phone_key, row.lead_source, row.sub_source, row.created_at.date())
+
+
+def _phone_variants(keys: Iterable[str]) -> List[str]:
+    """Stored spellings of each phone key: bare, 91-prefixed and +91-prefixed for 10-digit numbers."""
+    variants = set()
+    for key in keys:
+        if len(key) == 10:
+            variants.update({key, f"91{key}", f"+91{key}"})
+        elif key:
+            variants.add(key)
+    return sorted(variants)
+
+
+def _find_local_leads(db: Session, rows: List[ZohoLeadOutbox]) -> Dict[Tuple, str]:
+    """
+    (phone_key, lead_source, day) -> zoho_lead_id for leads already in the
+    `leads` table. Leads are also keyed with lead_source None, which is what
+    rows without a source look up.
+    """
+    variants = _phone_variants(r.phone_key for r in rows)
+    if not variants:
+        return {}
+    day_start = _day_start(min(r.created_at for r in rows))
+    found: Dict[Tuple, str] = {}
+    query = db.query(Lead.phone, Lead.mobile, Lead.lead_source, Lead.zoho_lead_id, Lead.created_at).filter(
+        Lead.created_at >= day_start,
+        or_(Lead.phone.in_(variants), Lead.mobile.in_(variants)),
+    )
+    # Rows without a source match leads of any source
+    if all(r.lead_source for r in rows):
+        query = query.filter(Lead.lead_source.in_({r.lead_source for r in rows}))
+    for lead in query.all():
+        for number in (lead.phone, lead.mobile):
+            for source in (lead.lead_source, None):
+                found.setdefault((phone_key(number), source, lead.created_at.date()), lead.zoho_lead_id)
+    return found
+
+
+def _zoho_request(method: str, url: str, **kwargs) -> requests.Response:
+    """Call Zoho with a cached token, refreshing once on INVALID_TOKEN."""
+    token = get_valid_access_token()
+    headers = {"Authorization": f"Zoho-oauthtoken {token}", "Content-Type": "application/json"}
+    try:
+        resp = _session.request(method, url, headers=headers, timeout=30, **kwargs)
+        if resp.status_code == 401 and "invalid" in (resp.text or "").lower():
+            token = get_valid_access_token(force_refresh=True, stale_token=token)
+            headers["Authorization"] = f"Zoho-oauthtoken {token}"
+            resp = _session.request(method, url, headers=headers, timeout=30, **kwargs)
+    except requests.RequestException as e:
+        raise _BatchRetry(str(e))
+    if resp.status_code in _RETRYABLE_STATUS:
+        raise _BatchRetry(f"Zoho {resp.status_code}: {resp.text[:300]}")
+    return resp
+
+
+def _find_zoho_leads(rows: List[ZohoLeadOutbox]) -> Dict[Tuple[str, str], str]:
+    """
+    (phone_key, lead_source) -> lead id for leads Zoho already has today, via
+    COQL; also keyed with lead_source None like _find_local_leads(). Numbers
+    are reduced to their phone keys, so only digits and '+' reach the query.
+    """
+    numbers = _phone_variants({
+        phone_key(str(r.record.get(field)))
+        for r in rows for field in ("Phone", "Mobile")
+        if r.record.get(field)
+    })
+    if not numbers:
+        return {}
+    since = _day_start(datetime.utcnow()).strftime("%Y-%m-%dT%H:%M:%S+00:00")
+    found: Dict[Tuple[str, str], str] = {}
+    for i in range(0, len(numbers), _COQL_IN_LIMIT):
+        chunk = ", ".join(f"'{n}'" for n in numbers[i:i + _COQL_IN_LIMIT])
+        query = (
+            "select id, Phone, Mobile, Lead_Source from Leads "
+            f"where ((Phone in ({chunk})) or (Mobile in ({chunk}))) and Created_Time >= '{since}' "
+            "limit 2000"
+        )
+        try:
+            resp = _zoho_request("POST", ZOHO_COQL_URL, json={"select_query": query})
+        except _BatchRetry as e:
+            logger.warning(f"Zoho duplicate lookup failed, pushing without it: {e}")
+            return found
+        if resp.status_code != 200:
+            # 204 = no matches; anything else, fall through like the old per-lead search did
+            if resp.status_code != 204:
+                logger.warning(f"Zoho duplicate lookup returned {resp.status_code}: {resp.text[:300]}")
+            continue
+        for lead in (resp.json() or {}).get("data") or []:
+            for number in (lead.get("Phone"), lead.get("Mobile")):
+                if number:
+                    for source in (lead.get("Lead_Source"), None):
+                        found.setdefault((phone_key(number), source), str(lead.get("id")))
+    return found
+
+
+def _bulk_insert(rows: List[ZohoLeadOutbox]) -> List[Dict[str, Any]]:
+    """POST all records in one call; returns Zoho's per-record results in request order."""
+    body = {"data": [r.record for r in rows], "trigger": ZOHO_LEAD_TRIGGERS}
+    resp = _zoho_request("POST", ZOHO_LEADS_URL, json=body)
+    try:
+        results = (resp.json() or {}).get("data") or []
+    except ValueError:
+        results = []
+    if len(results) != len(rows):
+        # Request-level error (bad token, malformed body): the same for every record
+        error = {"status": "error", "code": f"HTTP_{resp.status_code}", "message": resp.text[:500]}
+        return [error] * len(rows)
+    return results
+
+
+def _record_result(
+    db: Session,
+    row: ZohoLeadOutbox,
+    status: str,
+    *,
+    zoho_lead_id: Optional[str] = None,
+    response: Any = None,
+    error: Optional[str] = None,
+) -> None:
+    """Finish one outbox row and write its outcome to leads / zoho_payload_logs / flow_logs."""
+    now = datetime.utcnow()
+    row.status = status
+    row.zoho_lead_id = zoho_lead_id
+    row.last_error = error
+    row.locked_at = None
+    row.updated_at = now
+    if status == "pending":
+        row.next_attempt_at = now + _backoff(row.attempts)
+        return
+
+    name = " ".join(p for p in (row.record.get("First_Name"), row.record.get("Last_Name")) if p)
+    if status == "done" and row.lead_fields and zoho_lead_id:
+        if not db.query(Lead.id).filter(Lead.zoho_lead_id == zoho_lead_id).first():
+            db.add(Lead(zoho_lead_id=zoho_lead_id, wa_id=row.wa_id, customer_id=row.customer_id, **row.lead_fields))
+
+    db.add(ZohoPayloadLog(
+        wa_id=row.wa_id,
+        lead_id=zoho_lead_id or "",
+        zoho_lead_id=zoho_lead_id or "",
+        payload=row.payload_log or row.record,
+        response=response if response is not None else {"error": error},
+        status={"done": "success", "duplicate": "duplicate"}.get(status, "error"),
+        error_message=error,
+    ))
+    if status == "done":
+        description = f"Zoho lead created: {zoho_lead_id}"
+    elif status == "duplicate":
+        description = f"Duplicate avoided: existing {row.lead_source} lead {zoho_lead_id}"
+    else:
+        description = f"Zoho lead push failed after {row.attempts} attempt(s): {error}"
+    db.add(FlowLog(
+        flow_type=row.flow_type,
+        step="result",
+        status_code=200 if status in ("done", "duplicate") else 500,
+        wa_id=row.wa_id,
+        name=name,
+        description=description,
+        response_json=json.dumps(response, default=str) if response is not None else None,
+        created_at=now,
+    ))
+
+
+def push_pending_batch() -> int:
+    """Claim and push one batch. Returns the number of outbox rows handled."""
+    db = SessionLocal()
+    try:
+        rows = _claim_batch(db)
+        if not rows:
+            return 0
+
+        # 1) coalesce same phone / source / day inside the batch
+        primaries: Dict[Tuple, ZohoLeadOutbox] = {}
+        followers: Dict[int, List[ZohoLeadOutbox]] = {}
+        for row in rows:
+            key = _dedup_key(row)
+            if key in primaries:
+                followers.setdefault(primaries[key].id, []).append(row)
+            else:
+                primaries[key] = row
+        candidates = list(primaries.values())
+
+        def _finish(row: ZohoLeadOutbox, status: str, **kw) -> None:
+            _record_result(db, row, status, **kw)
+            for dup in followers.get(row.id, []):
+                if status == "pending":
+                    _record_result(db, dup, "pending", error=kw.get("error"))
+                elif kw.get("zoho_lead_id"):
+                    _record_result(db, dup, "duplicate", zoho_lead_id=kw["zoho_lead_id"])
+                else:
+                    _record_result(db, dup, status, error=kw.get("error"))
+
+        try:
+            # 2) + 3) duplicate-by-phone checks against local leads and Zoho
+            local = _find_local_leads(db, candidates)
+            remote = _find_zoho_leads(candidates)
+            to_insert = []
+            for row in candidates:
+                existing = (
+                    local.get((row.phone_key, row.lead_source, row.created_at.date()))
+                    or remote.get((row.phone_key, row.lead_source))
+                )
+                if existing:
+                    _finish(row, "duplicate", zoho_lead_id=existing)
+                else:
+                    to_insert.append(row)
+
+            # 4) one bulk insert for the rest
+            results = _bulk_insert(to_insert) if to_insert else []
+        except _BatchRetry as e:
+            logger.warning(f"⚠️ Zoho lead batch of {len(candidates)} deferred: {e}")
+            for row in candidates:
+                if row.status == "in_flight":
+                    retry = row.attempts < ZOHO_LEAD_MAX_ATTEMPTS
+                    _finish(row, "pending" if retry else "failed", error=str(e))
+            db.commit()
+            return len(rows)
+
+        # 5) per-record results
+        created = 0
+        for row, result in zip(to_insert, results):
+            details = result.get("details") or {}
+            code = result.get("code")
+            if result.get("status") == "success":
+                created += 1
+                _finish(row, "done", zoho_lead_id=str(details.get("id")), response=result)
+            elif code == "DUPLICATE_DATA" and details.get("id"):
+                _finish(row, "duplicate", zoho_lead_id=str(details.get("id")), response=result)
+            else:
+                error = f"{code}: {result.get('message')}"
+                retryable = code not in ("INVALID_DATA", "MANDATORY_NOT_FOUND")
+                status = "pending" if retryable and row.attempts < ZOHO_LEAD_MAX_ATTEMPTS else "failed"
+                _finish(row, status, response=result, error=error)
+        db.commit()
+        logger.info(
+            f"📤 Zoho lead batch: {len(rows)} queued, {len(to_insert)} pushed, {created} created"
+        )
+        return len(rows)
+    except Exception as e:
+        logger.error(f"❌ Zoho lead pusher batch failed: {e}", exc_info=True)
+        db.rollback()
+        return 0
+    finally:
+        db.close()
+
+
+async def _run_pusher():
+    while True:
+        try:
+            handled = await asyncio.to_thread(push_pending_batch)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Zoho lead pusher error: {e}")
+            handled = 0
+        # A full batch means more is probably waiting; otherwise let leads accumulate
+        if handled < ZOHO_LEAD_BATCH_SIZE:
+            await asyncio.sleep(ZOHO_LEAD_POLL_SECONDS)
+
+
+async def start_zoho_lead_pusher():
+    global _pusher_task
+    if not outbox_enabled() or not ZOHO_LEAD_PUSHER_ENABLED or _pusher_task is not None:
+        return
+    _pusher_task = asyncio.create_task(_run_pusher())
+    logger.info(f"✅ Zoho lead pusher started (batch={ZOHO_LEAD_BATCH_SIZE}, poll={ZOHO_LEAD_POLL_SECONDS}s)")
+
+
+async def stop_zoho_lead_pusher():
+    global _pusher_task
+    if _pusher_task is not None:
+        _pusher_task.cancel()
+        _pusher_task = None
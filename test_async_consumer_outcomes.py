@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+OutcomeWriteBehind: a poison outcome must not stall the campaign writer.
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("aio_pika")
+pytest.importorskip("sqlalchemy")
+
+import async_consumer
+from async_consumer import OutcomeWriteBehind, FLUSH_MAX_ATTEMPTS
+
+
+class FakeMessage:
+    def __init__(self):
+        self.acked = False
+        self.nacked = None
+
+    async def ack(self):
+        self.acked = True
+
+    async def nack(self, requeue=True):
+        self.nacked = requeue
+
+
+def _run_db_factory(poison, db_up=True):
+    async def run_db(fn, *args):
+        if fn is async_consumer._ping_db:
+            if not db_up:
+                raise RuntimeError("db down")
+            return None
+        outcomes = args[0]
+        if any(o["wa_id"] in poison for o in outcomes):
+            raise ValueError("bad row")
+        return None
+    return run_db
+
+
+def _fill(writer, wa_ids):
+    messages = {}
+    for wa_id in wa_ids:
+        messages[wa_id] = FakeMessage()
+        writer.add({"wa_id": wa_id}, messages[wa_id])
+    return messages
+
+
+def test_poison_outcome_is_dead_lettered_and_good_rows_acked():
+    writer = OutcomeWriteBehind(_run_db_factory({"bad"}), interval_ms=1, max_rows=10)
+    messages = _fill(writer, ["a", "bad", "b", "c"])
+
+    async def flush_until_drained():
+        for _ in range(FLUSH_MAX_ATTEMPTS):
+            await writer.flush()
+
+    asyncio.run(flush_until_drained())
+
+    assert not writer._pending
+    assert writer._failures == 0
+    assert messages["bad"].nacked is False and not messages["bad"].acked
+    for wa_id in ("a", "b", "c"):
+        assert messages[wa_id].acked and messages[wa_id].nacked is None
+
+
+def test_outcomes_stay_buffered_while_database_is_down():
+    writer = OutcomeWriteBehind(_run_db_factory({"a", "b"}, db_up=False), interval_ms=1, max_rows=10)
+    messages = _fill(writer, ["a", "b"])
+
+    async def flush_repeatedly():
+        for _ in range(FLUSH_MAX_ATTEMPTS + 1):
+            await writer.flush()
+
+    asyncio.run(flush_repeatedly())
+
+    assert [o["wa_id"] for o, _ in writer._pending] == ["a", "b"]
+    assert writer._failures >= FLUSH_MAX_ATTEMPTS
+    assert all(not m.acked and m.nacked is None for m in messages.values())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Conversation summary bookkeeping for writers that bypass the ORM hooks.
+"""
+
+import uuid
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from services import conversation_summary_service as summaries
+
+
+class FakeConnection:
+    def __init__(self):
+        self.calls = []
+
+    def execute(self, statement, params=None):
+        self.calls.append((str(statement), params))
+
+
+def test_record_customer_updates_copies_renamed_wa_ids():
+    customer_id, org_id = uuid.uuid4(), uuid.uuid4()
+    connection = FakeConnection()
+
+    summaries.record_customer_updates(connection, [
+        {"id": customer_id, "wa_id": "919876543210", "organization_id": org_id, "user_id": None},
+    ])
+
+    assert len(connection.calls) == 1
+    sql, params = connection.calls[0]
+    assert "UPDATE conversation_summaries" in sql
+    assert params == [{
+        "customer_id": str(customer_id),
+        "wa_id": "919876543210",
+        "organization_id": str(org_id),
+        "user_id": None,
+    }]
+
+
+def test_record_customer_updates_skips_empty_batches():
+    connection = FakeConnection()
+    summaries.record_customer_updates(connection, [])
+    assert connection.calls == []
+
+
+class FakeSession:
+    """Records commits/rollbacks; execute() fails when `fail` is set."""
+
+    def __init__(self, rowcount=1, fail=False):
+        self.rowcount, self.fail = rowcount, fail
+        self.commits = self.rollbacks = self.savepoints = 0
+
+    def begin_nested(self):
+        session = self
+
+        class Savepoint:
+            def __enter__(self):
+                session.savepoints += 1
+
+            def __exit__(self, *exc):
+                return False
+
+        return Savepoint()
+
+    def execute(self, statement, params=None):
+        if self.fail:
+            raise RuntimeError("conversation_summaries unavailable")
+        return type("Result", (), {"rowcount": self.rowcount})()
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def test_mark_conversation_read_commits_reset():
+    db = FakeSession(rowcount=1)
+    summaries.mark_conversation_read(db, "919876543210")
+    assert (db.savepoints, db.commits, db.rollbacks) == (1, 1, 0)
+
+
+def test_mark_conversation_read_skips_commit_when_already_read():
+    db = FakeSession(rowcount=0)
+    summaries.mark_conversation_read(db, "919876543210")
+    assert db.commits == 0
+
+
+def test_mark_conversation_read_failure_leaves_caller_session_alone():
+    db = FakeSession(fail=True)
+    summaries.mark_conversation_read(db, "919876543210")
+    assert (db.savepoints, db.commits, db.rollbacks) == (1, 0, 0)
+
+
+def test_unread_counts_without_wa_ids_skips_query():
+    assert summaries.unread_counts(object(), [None, ""]) == {}
+
+
+def test_write_hooks_register_once():
+    from sqlalchemy import event
+    from models.models import Message
+
+    summaries.register_write_hooks()
+    summaries.register_write_hooks()
+    assert event.contains(Message, "after_insert", summaries._message_inserted)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Background export jobs: ownership checks on status/download and the
+campaign reports export reading every row.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("openpyxl")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from auth import get_current_user
+from controllers import exports_controller
+from services import export_service
+
+
+@pytest.fixture
+def jobs(monkeypatch, tmp_path):
+    monkeypatch.setattr(export_service, "get_redis_client", lambda: None)
+    monkeypatch.setattr(export_service, "EXPORT_DIR", str(tmp_path))
+    monkeypatch.setattr(export_service, "_local_jobs", {})
+    monkeypatch.setattr(export_service, "_get_executor", lambda: SimpleNamespace(submit=lambda *a: None))
+    return export_service
+
+
+def _client(user):
+    app = FastAPI()
+    app.include_router(exports_controller.router)
+    app.dependency_overrides[get_current_user] = lambda: user
+    return TestClient(app)
+
+
+OWNER = SimpleNamespace(id="user-1", organization_id="org-1")
+COLLEAGUE = SimpleNamespace(id="user-2", organization_id="org-1")
+OUTSIDER = SimpleNamespace(id="user-3", organization_id="org-2")
+
+
+def test_job_records_owner(jobs):
+    job = jobs.start_export_job(filename="x", sheet_title="X", header=["a"], rows=lambda db: [], owner=OWNER)
+    stored = jobs.get_export_job(job["job_id"])
+    assert (stored["owner_id"], stored["organization_id"]) == ("user-1", "org-1")
+
+
+def test_status_visible_to_owner_and_organization_only(jobs):
+    job_id = jobs.start_export_job(filename="x", sheet_title="X", header=["a"], rows=lambda db: [], owner=OWNER)["job_id"]
+
+    assert _client(OWNER).get(f"/api/exports/{job_id}").status_code == 200
+    assert _client(COLLEAGUE).get(f"/api/exports/{job_id}").status_code == 200
+    assert _client(OUTSIDER).get(f"/api/exports/{job_id}").status_code == 404
+    assert _client(OUTSIDER).get(f"/api/exports/{job_id}/download").status_code == 404
+
+
+def test_endpoints_require_authentication(jobs):
+    app = FastAPI()
+    app.include_router(exports_controller.router)
+    assert TestClient(app).get("/api/exports/some-job").status_code == 401
+
+
+def test_campaign_export_streams_every_row(monkeypatch):
+    from services import campaign_service
+
+    query = object()
+    streamed = []
+    captured = {}
+
+    def fake_stream_rows(q):
+        streamed.append(q)
+        return iter(range(12_000))
+
+    monkeypatch.setattr(campaign_service, "_campaign_reports_query", lambda session, **filters: query)
+    monkeypatch.setattr(campaign_service, "stream_rows", fake_stream_rows)
+    monkeypatch.setattr(campaign_service, "_campaign_report_row", lambda row: {"name": f"c{row}"})
+    monkeypatch.setattr(campaign_service, "export", lambda db, **kwargs: captured.update(kwargs))
+
+    campaign_service.export_campaign_reports_excel(None, owner=OWNER)
+    rows = list(captured["rows"](None))
+
+    assert streamed == [query]
+    assert len(rows) == 12_000
+    assert captured["owner"] is OWNER
+
+
+def test_delivery_log_export_job_hidden_from_other_organizations(jobs):
+    from services import campaign_service
+
+    job_id = campaign_service.export_campaign_delivery_logs_excel(
+        None, "campaign-1", background=True, owner=OWNER
+    )["job_id"]
+
+    assert _client(OWNER).get(f"/api/exports/{job_id}").status_code == 200
+    assert _client(OUTSIDER).get(f"/api/exports/{job_id}").status_code == 404
+    assert _client(OUTSIDER).get(f"/api/exports/{job_id}/download").status_code == 404
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Buffered flow log writer: a failing batch falls back to row-by-row inserts.
+"""
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+import database.db
+from utils import flow_log
+
+
+class FakeSession:
+    def __init__(self):
+        self.rollbacks = 0
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        pass
+
+
+def _rows(*steps):
+    return [flow_log._row(flow_type="treatment", step=step, status_code=None, wa_id="919876543210",
+                          name=None, description=None, response_json=None) for step in steps]
+
+
+def test_bad_row_does_not_drop_the_batch(monkeypatch):
+    written = []
+
+    def fake_write(db, rows):
+        if any(r["step"] == "poison" for r in rows):
+            raise ValueError("value too long for type character varying")
+        written.extend(r["step"] for r in rows)
+
+    monkeypatch.setattr(database.db, "SessionLocal", FakeSession)
+    monkeypatch.setattr(flow_log, "_write_rows", fake_write)
+
+    flow_log._insert_batch(_rows("entry", "poison", "treatment"))
+
+    assert written == ["entry", "treatment"]
+
+
+def test_healthy_batch_is_written_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(database.db, "SessionLocal", FakeSession)
+    monkeypatch.setattr(flow_log, "_write_rows", lambda db, rows: calls.append(len(rows)))
+
+    flow_log._insert_batch(_rows("entry", "treatment"))
+
+    assert calls == [2]
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+FlowStateStore interface and the async accessors on FlowStateMap.
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("redis")
+
+from controllers.state.store import FlowStateMap, FlowStateStore, InMemoryFlowStateStore
+
+
+def test_store_interface_is_abstract():
+    with pytest.raises(TypeError):
+        FlowStateStore()
+
+    class Partial(FlowStateStore):
+        def get(self, namespace, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_async_accessors_write_through():
+    state = FlowStateMap("test_async", store=InMemoryFlowStateStore())
+
+    async def scenario():
+        assert await state.aget("919876543210") is None
+        await state.aupdate_fields("919876543210", {"awaiting_phone": True})
+        record = await state.aget("919876543210")
+        record["corrected_name"] = "Ravi"
+        return record
+
+    record = asyncio.run(scenario())
+    assert record["awaiting_phone"] is True
+    assert state.get("919876543210") == {"awaiting_phone": True, "corrected_name": "Ravi"}
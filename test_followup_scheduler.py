@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Follow-up scheduler: a send that returns without rescheduling must not leave
+the customer due, or it is claimed again on every pass.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from marketing.services import followup_scheduler, followup_service
+
+
+class FakeQuery:
+    def __init__(self, row):
+        self._row = row
+
+    def filter(self, *args):
+        return self
+
+    def first(self):
+        return self._row
+
+
+class FakeSession:
+    def __init__(self, row):
+        self._row = row
+
+    def query(self, model):
+        return FakeQuery(self._row)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_send_without_reschedule_finishes_the_followup(monkeypatch):
+    due = datetime.utcnow() - timedelta(minutes=1)
+    customer = SimpleNamespace(id="c-1", wa_id="919000000001", next_followup_time=due,
+                               last_message_type=None, last_interaction_time=None)
+    finished, released = [], []
+
+    async def send_returns_early(db, *, wa_id, from_wa_id=None):
+        return None  # e.g. phone id not enabled for the flow
+
+    def finish(db, customer_id, now):
+        finished.append((customer_id, now))
+        return True
+
+    monkeypatch.setattr(followup_scheduler, "SessionLocal", lambda: FakeSession(customer))
+    monkeypatch.setattr(followup_scheduler, "followup_skip_reason", lambda c, now: None)
+    monkeypatch.setattr(followup_scheduler, "send_followup1_interactive", send_returns_early)
+    monkeypatch.setattr(followup_scheduler, "finish_followup", finish)
+    monkeypatch.setattr(followup_scheduler, "release_followup_lease", lambda db, cid: released.append(cid))
+
+    asyncio.run(followup_scheduler.process_followup("c-1"))
+
+    assert [cid for cid, _ in finished] == ["c-1"]
+    assert finished[0][1] >= due
+    assert released == []
+
+
+@pytest.fixture
+def customers():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE customers (id TEXT PRIMARY KEY, next_followup_time TIMESTAMP, followup_lease_until TIMESTAMP)"))
+    db = sessionmaker(bind=engine)()
+    yield db
+    db.close()
+
+
+def _row(db, customer_id):
+    return db.execute(
+        text("SELECT next_followup_time, followup_lease_until FROM customers WHERE id = :id"), {"id": customer_id}
+    ).first()
+
+
+def test_finish_followup_clears_a_followup_left_due(customers):
+    now = datetime(2026, 1, 1, 12, 0)
+    customers.execute(text("INSERT INTO customers VALUES ('due', :t, :lease), ('later', :later, :lease)"),
+                      {"t": now - timedelta(minutes=5), "later": now + timedelta(hours=1), "lease": now + timedelta(minutes=5)})
+    customers.commit()
+
+    assert followup_service.finish_followup(customers, "due", now) is True
+    assert followup_service.finish_followup(customers, "later", now) is False
+
+    assert tuple(_row(customers, "due")) == (None, None)
+    later = _row(customers, "later")
+    assert later[0] is not None and later[1] is None
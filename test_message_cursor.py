@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Keyset cursor for chat history pages, including messages without a timestamp.
+"""
+
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from services.message_service import _older_messages, decode_message_cursor, encode_message_cursor
+
+
+class FakeQuery:
+    """Serves timestamped or untimed rows depending on the NULL filter applied."""
+
+    def __init__(self, timed, untimed, filters=()):
+        self.timed, self.untimed, self.filters = timed, untimed, list(filters)
+
+    def filter(self, condition):
+        return FakeQuery(self.timed, self.untimed, self.filters + [str(condition)])
+
+    def order_by(self, *columns):
+        return self
+
+    def limit(self, count):
+        self.count = count
+        return self
+
+    def all(self):
+        rows = self.untimed if any("IS NULL" in f for f in self.filters) else self.timed
+        return rows[:self.count]
+
+
+def test_cursor_round_trip():
+    message = SimpleNamespace(timestamp=datetime(2026, 10, 1, 12, 30), id=42)
+    assert decode_message_cursor(encode_message_cursor(message)) == (datetime(2026, 10, 1, 12, 30), 42)
+
+
+def test_cursor_for_message_without_timestamp():
+    message = SimpleNamespace(timestamp=None, id=7)
+    assert decode_message_cursor(encode_message_cursor(message)) == (None, 7)
+
+
+def test_malformed_cursor_is_rejected():
+    with pytest.raises(ValueError):
+        decode_message_cursor("not-a-cursor")
+
+
+def test_untimed_messages_follow_timestamped_ones():
+    timed = [SimpleNamespace(timestamp=datetime(2026, 10, 1), id=5)]
+    untimed = [SimpleNamespace(timestamp=None, id=3), SimpleNamespace(timestamp=None, id=2)]
+    rows = _older_messages(FakeQuery(timed, untimed), None, 3)
+    assert [m.id for m in rows] == [5, 3, 2]
+
+
+def test_untimed_cursor_skips_timestamped_scan():
+    timed = [SimpleNamespace(timestamp=datetime(2026, 10, 1), id=5)]
+    untimed = [SimpleNamespace(timestamp=None, id=2)]
+    rows = _older_messages(FakeQuery(timed, untimed), (None, 3), 3)
+    assert [m.id for m in rows] == [2]
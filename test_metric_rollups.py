@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Dashboard metric rollups: which metrics are served from metric_rollups.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from services import metric_rollup_service as rollups
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(rollups, "METRIC_ROLLUPS_ENABLED", True)
+    monkeypatch.setattr(rollups, "_live_count", lambda db, metric, start, end, org: calls.append(("live", start, end)) or 1)
+    monkeypatch.setattr(rollups, "_rollup_sum", lambda db, metric, start, end, org: calls.append(("rollup", start, end)) or 10)
+    return calls
+
+
+def test_appointments_are_counted_live_over_the_whole_range(calls):
+    start = datetime.utcnow() - timedelta(days=30)
+    assert rollups.count_metric(None, "appointments", start) == 1
+    assert calls == [("live", start, None)]
+
+
+def test_other_metrics_read_closed_hours_from_rollups(calls):
+    start = datetime.utcnow().replace(minute=30) - timedelta(days=2)
+    assert rollups.count_metric(None, "messages", start) == 12
+    assert [kind for kind, _, _ in calls] == ["rollup", "live", "live"]
+
+
+def test_aggregator_and_rebuild_skip_live_metrics(monkeypatch):
+    rebuilt = []
+
+    class FakeSession:
+        def execute(self, *args, **kwargs):
+            return type("Result", (), {"scalar": lambda self: True})()
+
+        def commit(self):
+            pass
+
+        def rollback(self):
+            pass
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(rollups, "SessionLocal", FakeSession)
+    monkeypatch.setattr(rollups, "_rebuild_range", lambda db, metric, start, end: rebuilt.append(metric))
+
+    rollups.refresh_recent_rollups()
+    assert "appointments" not in rebuilt
+    assert set(rebuilt) == set(rollups.ROLLUP_METRICS)
+
+    with pytest.raises(ValueError):
+        rollups.rebuild_rollups(metrics=["appointments"])
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Name validation: which messages are settled locally and which go to the LLM.
+"""
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("redis")
+
+from marketing import llm_validation, name_validator
+
+
+@pytest.fixture
+def llm_calls(monkeypatch):
+    calls = []
+
+    def fake_resolve(kind, key, system_prompt, user_content, interpret):
+        calls.append(key)
+        return interpret({"valid": False, "name": None, "reason": "not a name"})
+
+    monkeypatch.setattr(llm_validation, "resolve", fake_resolve)
+    return calls
+
+
+@pytest.mark.parametrize("text", [
+    "Price list", "Skin treatment", "Book appointment", "Need callback", "Laser cost", "Hair fall treatment",
+])
+def test_phrases_are_not_accepted_locally(text, llm_calls):
+    result = name_validator.validate_human_name(text)
+    assert llm_calls, f"{text!r} was settled locally"
+    assert result["valid"] is False
+
+
+def test_single_common_name_is_accepted_locally(llm_calls):
+    result = name_validator.validate_human_name("Ravi 9876543210")
+    assert result == {"valid": True, "name": "Ravi", "reason": "local_accept"}
+    assert llm_calls == []
+
+
+def test_unusual_full_name_goes_to_llm(llm_calls):
+    name_validator.validate_human_name("Tanvir Hossain")
+    assert llm_calls == ["Tanvir Hossain"]
+
+
+@pytest.mark.parametrize("text", ["ok", "12345", "asdfgh"])
+def test_junk_is_rejected_locally(text, llm_calls):
+    assert name_validator.validate_human_name(text)["valid"] is False
+    assert llm_calls == []
+
+
+def test_failed_llm_call_counts_against_breaker(monkeypatch):
+    outcomes = []
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(llm_validation._breaker, "allow", lambda: True)
+    monkeypatch.setattr(llm_validation._breaker, "record_failure", lambda: outcomes.append("failure"))
+    monkeypatch.setattr(llm_validation._breaker, "record_success", lambda: outcomes.append("success"))
+
+    def boom(*args, **kwargs):
+        raise ConnectionError("openai unreachable")
+
+    monkeypatch.setattr(llm_validation.http_session, "post", boom)
+
+    assert llm_validation._chat_json("prompt", "content") is None
+    assert outcomes == ["failure"]
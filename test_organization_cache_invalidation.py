@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Organisation writes invalidate the WhatsApp number registry.
+"""
+
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("sqlalchemy")
+
+from controllers import organization_controller as controller
+
+
+@pytest.fixture
+def invalidations(monkeypatch):
+    calls = []
+    monkeypatch.setattr(controller, "invalidate_number_registry", lambda: calls.append("numbers"))
+    monkeypatch.setattr(controller, "invalidate_organization", lambda org_id: calls.append("organization"))
+    return calls
+
+
+def test_create_organization_invalidates_number_registry(monkeypatch, invalidations):
+    organization = SimpleNamespace(id=uuid.uuid4())
+    monkeypatch.setattr(controller.organization_service, "create_organization", lambda db, data, user: organization)
+
+    assert controller.create_organization(SimpleNamespace(), db=None, current_user=None) is organization
+    assert invalidations == ["numbers"]
+
+
+def test_failed_create_does_not_invalidate(monkeypatch, invalidations):
+    def fail(db, data, user):
+        raise ValueError("WhatsApp number already exists")
+
+    monkeypatch.setattr(controller.organization_service, "create_organization", fail)
+
+    with pytest.raises(controller.HTTPException):
+        controller.create_organization(SimpleNamespace(), db=None, current_user=None)
+    assert invalidations == []
+
+
+def test_delete_organization_invalidates_number_registry(monkeypatch, invalidations):
+    monkeypatch.setattr(controller.organization_service, "delete_organization", lambda db, org_id, user: True)
+
+    controller.delete_organization(uuid.uuid4(), db=None, current_user=None)
+    assert invalidations == ["organization", "numbers"]
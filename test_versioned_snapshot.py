@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Versioned snapshots shared by the number registry, catalog cache and auth cache.
+"""
+
+import pytest
+
+pytest.importorskip("redis")
+
+from cache import versioned_snapshot
+from cache.versioned_snapshot import RedisVersion, VersionedSnapshot
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        value = self.values.get(key)
+        return str(value) if value is not None else None
+
+    def incr(self, key):
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(versioned_snapshot, "get_redis_client", lambda: fake)
+    return fake
+
+
+def _counting_loader():
+    loads = []
+
+    def load():
+        loads.append(len(loads) + 1)
+        return {"generation": len(loads)}
+
+    return load, loads
+
+
+def _snapshot(load, **overrides):
+    options = {"version_key": "test:version", "sync_seconds": 0, "max_age_seconds": 300, "label": "Test"}
+    options.update(overrides)
+    return VersionedSnapshot(load, **options)
+
+
+def test_snapshot_is_loaded_once_until_invalidated(redis):
+    load, loads = _counting_loader()
+    snapshot = _snapshot(load)
+
+    assert snapshot.get() is snapshot.get()
+    assert loads == [1]
+
+    snapshot.invalidate()
+    assert snapshot.get() == {"generation": 2}
+
+
+def test_invalidation_reaches_other_processes(redis):
+    load_a, loads_a = _counting_loader()
+    load_b, loads_b = _counting_loader()
+    process_a, process_b = _snapshot(load_a), _snapshot(load_b)
+    process_a.get()
+    process_b.get()
+
+    process_a.invalidate()
+
+    assert process_b.get() == {"generation": 2}
+    assert loads_b == [1, 2]
+
+
+def test_snapshot_reloads_after_max_age(redis):
+    load, loads = _counting_loader()
+    snapshot = _snapshot(load, max_age_seconds=0)
+    snapshot.get()
+    snapshot.get()
+    assert len(loads) == 2
+
+
+def test_failed_load_is_retried(redis):
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("database unavailable")
+        return "loaded"
+
+    snapshot = _snapshot(flaky)
+    with pytest.raises(RuntimeError):
+        snapshot.get()
+    assert snapshot.get() == "loaded"
+
+
+def test_version_is_polled_at_most_every_sync_interval(redis):
+    version = RedisVersion("test:version", sync_seconds=10, label="Test")
+    assert version.changed(100.0) is False
+    redis.incr("test:version")
+    assert version.changed(105.0) is False  # not due yet
+    assert version.changed(110.0) is True
+    assert version.changed(120.0) is False
+
+
+def test_auth_cache_clears_on_remote_invalidation(redis, monkeypatch):
+    from cache import auth_cache
+
+    monkeypatch.setattr(auth_cache, "_generation", RedisVersion("auth:test", 0, "Auth cache"))
+    monkeypatch.setattr(auth_cache, "AUTH_CACHE_ENABLED", True)
+    principal = object()
+    auth_cache.put_principal("user-1", principal)
+    assert auth_cache.get_principal("user-1") is principal
+
+    redis.incr("auth:test")  # another process invalidated
+    assert auth_cache.get_principal("user-1") is None
+
+
+def test_whatsapp_token_cache_follows_tokens_stored_elsewhere(redis, monkeypatch):
+    pytest.importorskip("sqlalchemy")
+    pytest.importorskip("pika")
+    from types import SimpleNamespace
+    from services import whatsapp_service
+
+    tokens = ["token-1"]
+    monkeypatch.setattr(whatsapp_service, "get_latest_token", lambda db: SimpleNamespace(token=tokens[-1]))
+    monkeypatch.setattr(whatsapp_service, "_latest_token_cache", {"value": None, "expires": 0.0})
+    monkeypatch.setattr(whatsapp_service, "_token_version", RedisVersion("token:test", 0, "WhatsApp token cache"))
+
+    assert whatsapp_service.get_latest_token_value(None) == "token-1"
+    tokens.append("token-2")
+    assert whatsapp_service.get_latest_token_value(None) == "token-1"  # cached
+
+    redis.incr("token:test")  # another process stored a token
+    assert whatsapp_service.get_latest_token_value(None) == "token-2"
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Webhook queue workers: events are acked only after the handler succeeds, and
+failures are rejected into the dead-letter queue with their message id logged.
+"""
+
+import json
+import asyncio
+import logging
+
+import pytest
+
+from services import webhook_ingest
+
+
+class FakeMessage:
+    def __init__(self, body: bytes):
+        self.body = body
+        self.outcome = None
+
+    async def ack(self):
+        self.outcome = "ack"
+
+    async def nack(self, requeue=True):
+        self.outcome = ("nack", requeue)
+
+
+class FakeIterator:
+    def __init__(self, messages):
+        self._messages = list(messages)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._messages:
+            raise StopAsyncIteration
+        return self._messages.pop(0)
+
+
+class FakeQueue:
+    def __init__(self, messages):
+        self._messages = messages
+
+    def iterator(self):
+        return FakeIterator(self._messages)
+
+
+def _event(message_id: str) -> bytes:
+    body = {"entry": [{"changes": [{"value": {
+        "contacts": [{"wa_id": "919000000001"}],
+        "messages": [{"id": message_id, "from": "919000000001"}],
+    }}]}]}
+    return json.dumps({"body": json.dumps(body), "headers": {}, "query_string": ""}).encode("utf-8")
+
+
+def test_failed_event_is_dead_lettered_and_others_acked(monkeypatch, caplog):
+    async def process_event(event):
+        if "wamid.bad" in event["body"]:
+            raise RuntimeError("boom")
+
+    monkeypatch.setattr(webhook_ingest, "process_event", process_event)
+    good, bad, garbage = FakeMessage(_event("wamid.good")), FakeMessage(_event("wamid.bad")), FakeMessage(b"not json")
+
+    with caplog.at_level(logging.ERROR, logger=webhook_ingest.__name__):
+        asyncio.run(webhook_ingest._RabbitBackend._consume_partition(FakeQueue([good, bad, garbage]), 0))
+
+    assert good.outcome == "ack"
+    assert bad.outcome == ("nack", False)
+    assert garbage.outcome == ("nack", False)
+    assert "wamid.bad" in caplog.text
+
+
+def test_handler_failure_status_raises(monkeypatch):
+    pytest.importorskip("sqlalchemy")
+    pytest.importorskip("starlette")
+    import database.db as db_module
+    from controllers import web_socket
+
+    class Session:
+        def close(self):
+            pass
+
+    async def failed(request, db):
+        return {"status": "failed", "error": "db down"}
+
+    monkeypatch.setattr(db_module, "SessionLocal", Session)
+    monkeypatch.setattr(web_socket, "process_webhook_request", failed)
+
+    with pytest.raises(webhook_ingest.WebhookEventFailed):
+        asyncio.run(webhook_ingest.process_event(json.loads(_event("wamid.x"))))
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+WhatsAppClient retry policy: message sends must never be sent twice.
+"""
+
+import asyncio
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("redis")
+
+from utils.whatsapp_client import WhatsAppClient
+
+URL = "https://graph.facebook.com/v22.0/123456/messages"
+
+
+class NoLimit:
+    async def acquire_async(self, key):
+        return 0.0
+
+
+def _client(responses):
+    """Client whose transport replays `responses` (status codes or exceptions) in order."""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        item = responses[len(calls) - 1]
+        if isinstance(item, Exception):
+            raise item
+        return httpx.Response(item, json={})
+
+    client = WhatsAppClient(max_retries=3, rate_limiter=NoLimit())
+    client._client = lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    client._backoff = lambda attempt, response=None: 0
+    return client, calls
+
+
+def test_server_error_is_not_retried():
+    client, calls = _client([500, 200])
+    response = asyncio.run(client.post(URL, json={"to": "919876543210"}))
+    assert response.status_code == 500
+    assert len(calls) == 1
+
+
+def test_read_timeout_is_not_retried():
+    client, calls = _client([httpx.ReadTimeout("slow"), 200])
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(client.post(URL, json={}))
+    assert len(calls) == 1
+
+
+def test_rate_limit_and_connect_errors_are_retried():
+    client, calls = _client([429, httpx.ConnectError("refused"), 200])
+    response = asyncio.run(client.post(URL, json={}))
+    assert response.status_code == 200
+    assert len(calls) == 3
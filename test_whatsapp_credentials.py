@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Outbound credential resolution follows the conversation's routing state.
+"""
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("httpx")
+
+from utils import whatsapp
+
+NUMBERS = {
+    "111": {"token": "token-111"},
+    "222": {"token": "token-222"},
+}
+
+
+@pytest.fixture
+def states(monkeypatch):
+    appointment_state, lead_appointment_state = {}, {}
+    monkeypatch.setattr(whatsapp, "WHATSAPP_NUMBERS", NUMBERS)
+    monkeypatch.setattr(whatsapp, "_flow_states", lambda: (appointment_state, lead_appointment_state))
+    monkeypatch.delenv("WHATSAPP_PHONE_ID", raising=False)
+    return appointment_state, lead_appointment_state
+
+
+def test_routing_change_applies_to_next_send(states):
+    appointment_state, _ = states
+    appointment_state["919876543210"] = {"incoming_phone_id": "111"}
+    assert whatsapp._resolve_credentials(None, wa_id="919876543210") == ("token-111", "111")
+
+    appointment_state["919876543210"] = {"incoming_phone_id": "222"}
+    assert whatsapp._resolve_credentials(None, wa_id="919876543210") == ("token-222", "222")
+
+
+def test_incoming_number_wins_over_hint(states):
+    appointment_state, _ = states
+    appointment_state["919876543210"] = {"incoming_phone_id": "222"}
+    assert whatsapp._resolve_credentials(None, hint_phone_id="111", wa_id="919876543210") == ("token-222", "222")
+
+
+def test_lead_state_used_without_appointment_state(states):
+    _, lead_appointment_state = states
+    lead_appointment_state["919876543210"] = {"phone_id": "111"}
+    assert whatsapp._resolve_credentials(None, wa_id="919876543210") == ("token-111", "111")
+
+
+def test_resolution_is_counted(states):
+    before = whatsapp.credential_resolution_stats()["lookups"]
+    whatsapp._resolve_credentials(None, hint_phone_id="111", wa_id="919876543210")
+    assert whatsapp.credential_resolution_stats()["lookups"] == before + 1
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Duplicate lookups in the Zoho lead outbox pusher.
+"""
+
+import re
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from services import zoho_lead_outbox as outbox
+
+
+def _row(phone, lead_source="WhatsApp"):
+    return SimpleNamespace(
+        phone_key=outbox.phone_key(phone),
+        lead_source=lead_source,
+        created_at=datetime.utcnow(),
+        record={"Phone": phone},
+    )
+
+
+class FakeResponse:
+    status_code = 200
+    text = ""
+
+    def __init__(self, data):
+        self._data = data
+
+    def json(self):
+        return {"data": self._data}
+
+
+def test_coql_query_only_contains_normalised_numbers(monkeypatch):
+    queries = []
+
+    def fake_request(method, url, **kwargs):
+        queries.append(kwargs["json"]["select_query"])
+        return FakeResponse([{"id": 7, "Phone": "+919876543210", "Lead_Source": "WhatsApp"}])
+
+    monkeypatch.setattr(outbox, "_zoho_request", fake_request)
+    found = outbox._find_zoho_leads([_row("98765'43210) or (id != '0"), _row("+91 98765-43210")])
+
+    (query,) = queries
+    in_lists = re.findall(r"in \(([^)]*)\)", query)
+    assert in_lists and all(re.fullmatch(r"('\+?\d+'(, )?)+", values) for values in in_lists)
+    assert "'9876543210'" in query and "'+919876543210'" in query
+    assert found[("9876543210", "WhatsApp")] == "7"
+    assert found[("9876543210", None)] == "7"
+
+
+class FakeQuery:
+    def __init__(self, leads):
+        self.leads, self.filters = leads, []
+
+    def filter(self, *conditions):
+        self.filters.extend(str(c) for c in conditions)
+        return self
+
+    def all(self):
+        return self.leads
+
+
+def _fake_db(leads):
+    query = FakeQuery(leads)
+    return SimpleNamespace(query=lambda *columns: query), query
+
+
+def test_local_lookup_without_sources_skips_source_filter():
+    lead = SimpleNamespace(phone="919876543210", mobile=None, lead_source="Website",
+                           zoho_lead_id="z-1", created_at=datetime.utcnow())
+    db, query = _fake_db([lead])
+    row = _row("9876543210", lead_source=None)
+
+    found = outbox._find_local_leads(db, [row])
+
+    assert not any("lead_source" in f for f in query.filters)
+    assert found[(row.phone_key, None, row.created_at.date())] == "z-1"
+
+
+def test_local_lookup_filters_on_row_sources():
+    db, query = _fake_db([])
+    outbox._find_local_leads(db, [_row("9876543210", lead_source="WhatsApp")])
+    assert any("lead_source" in f for f in query.filters)
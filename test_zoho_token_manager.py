@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Background refresh of the cached Zoho access token near expiry.
+"""
+
+import time
+
+import pytest
+
+pytest.importorskip("redis")
+
+from utils import zoho_auth
+
+
+def _wait_idle(manager, timeout=2.0):
+    deadline = time.time() + timeout
+    while manager._background_in_flight and time.time() < deadline:
+        time.sleep(0.01)
+    assert not manager._background_in_flight
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setattr(zoho_auth, "get_redis_client", lambda: None)
+    m = zoho_auth.ZohoTokenManager(refresh_margin=300)
+    m._store("cached-token", time.time() + 60)  # inside the refresh margin
+    return m
+
+
+def test_failed_background_refresh_backs_off(manager, monkeypatch):
+    attempts = []
+
+    def failing_request():
+        attempts.append(time.time())
+        raise RuntimeError("accounts.zoho.in unavailable")
+
+    monkeypatch.setattr(manager, "_request_token", failing_request)
+
+    assert manager.get_token() == "cached-token"
+    _wait_idle(manager)
+    for _ in range(5):
+        assert manager.get_token() == "cached-token"
+    _wait_idle(manager)
+
+    assert len(attempts) == 1
+    assert manager._next_background_attempt > time.time()
+
+    # Once the retry time passes, one more attempt is made and the delay doubles
+    manager._next_background_attempt = 0.0
+    manager.get_token()
+    _wait_idle(manager)
+    assert len(attempts) == 2
+    assert manager._background_failures == 2
+    assert manager._next_background_attempt - time.time() > zoho_auth.ZOHO_TOKEN_RETRY_SECONDS
+
+
+def test_successful_background_refresh_clears_backoff(manager, monkeypatch):
+    monkeypatch.setattr(manager, "_request_token", lambda: ("fresh-token", 3600))
+    manager._background_failures = 3
+
+    manager.get_token()
+    _wait_idle(manager)
+
+    assert manager.get_token() == "fresh-token"
+    assert manager._background_failures == 0
+    assert manager._next_background_attempt == 0.0
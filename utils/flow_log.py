@@ -1,12 +1,199 @@
+"""
+Flow step logging (FlowLog rows).
+
+By default log_flow_event() / log_last_step_reached() do not touch the
+caller's session. Each row is appended to an in-process buffer, and a
+background writer bulk-inserts the buffer every FLOW_LOG_FLUSH_MS, or sooner
+once FLOW_LOG_BATCH_SIZE rows are waiting, using its own session. The buffer
+is bounded (FLOW_LOG_BUFFER_SIZE) and is flushed on shutdown.
+
+The rows are written with a bulk INSERT, which bypasses the ORM hooks, so
+the writer calls record_flow_steps() to keep the inbox summaries current. If
+a batch insert fails, its rows are retried one at a time and only the rows
+that still fail are dropped (and logged).
+
+Rows are written inline on the caller's session, as before, when:
+- FLOW_LOG_MODE=sync (tests, scripts);
+- the writer is not running (e.g. outside the API process);
+- the buffer is full.
+"""
+
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+import os
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
 from datetime import datetime
 import uuid as _uuid
 
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
 from models.models import FlowLog
+from services.conversation_summary_service import record_flow_steps
+
+logger = logging.getLogger(__name__)
+
+FLOW_LOG_MODE = os.getenv("FLOW_LOG_MODE", "async").lower()
+FLOW_LOG_FLUSH_MS = int(os.getenv("FLOW_LOG_FLUSH_MS", "250"))
+FLOW_LOG_BATCH_SIZE = int(os.getenv("FLOW_LOG_BATCH_SIZE", "500"))
+FLOW_LOG_BUFFER_SIZE = int(os.getenv("FLOW_LOG_BUFFER_SIZE", "10000"))
+
+_buffer: Deque[Dict[str, Any]] = deque()
+_buffer_lock = threading.Lock()
+_writer_task: Optional[asyncio.Task] = None
+_writer_loop: Optional[asyncio.AbstractEventLoop] = None
+_wakeup: Optional[asyncio.Event] = None
+
+
+def _write_inline(db: Session, row: Dict[str, Any]) -> str:
+    """Old behaviour: insert through the caller's session and commit."""
+    try:
+        db.add(FlowLog(**row))
+        db.commit()
+        return str(row["id"])
+    except Exception:
+        try:
+            db.rollback()
+        except Exception:
+            pass
+        return ""
+
+
+def _enqueue(db: Session, row: Dict[str, Any]) -> str:
+    if FLOW_LOG_MODE == "sync" or _writer_task is None:
+        return _write_inline(db, row)
+    with _buffer_lock:
+        if len(_buffer) >= FLOW_LOG_BUFFER_SIZE:
+            full = True
+        else:
+            full = False
+            _buffer.append(row)
+            pending = len(_buffer)
+    if full:
+        return _write_inline(db, row)
+    if pending >= FLOW_LOG_BATCH_SIZE and _writer_loop is not None and _wakeup is not None:
+        try:
+            _writer_loop.call_soon_threadsafe(_wakeup.set)
+        except RuntimeError:
+            pass  # loop closed during shutdown
+    return str(row["id"])
+
+
+def _take_batch() -> List[Dict[str, Any]]:
+    with _buffer_lock:
+        count = min(len(_buffer), FLOW_LOG_BATCH_SIZE)
+        return [_buffer.popleft() for _ in range(count)]
+
+
+def _write_rows(db: Session, rows: List[Dict[str, Any]]) -> None:
+    db.execute(insert(FlowLog), rows)
+    # Bulk insert bypasses the ORM hooks that keep the inbox summaries current
+    record_flow_steps(db.connection(), rows)
+    db.commit()
+
+
+def _insert_batch(rows: List[Dict[str, Any]]) -> None:
+    """Bulk-insert a batch; if that fails, insert row by row so one bad row loses only itself."""
+    from database.db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        try:
+            _write_rows(db, rows)
+            return
+        except Exception as e:
+            db.rollback()
+            if len(rows) == 1:
+                logger.error(f"❌ Failed to write flow log row {rows[0]['id']}: {e}")
+                return
+            logger.warning(f"⚠️ Bulk write of {len(rows)} flow log rows failed, retrying row by row: {e}")
+        failed = 0
+        for row in rows:
+            try:
+                _write_rows(db, [row])
+            except Exception as e:
+                db.rollback()
+                failed += 1
+                logger.error(f"❌ Failed to write flow log row {row['id']} ({row.get('step')}): {e}")
+        if failed:
+            logger.error(f"❌ Dropped {failed} of {len(rows)} flow log rows")
+    finally:
+        db.close()
+
+
+def flush_flow_logs() -> int:
+    """Write everything buffered so far; returns the number of rows written."""
+    written = 0
+    while True:
+        rows = _take_batch()
+        if not rows:
+            return written
+        _insert_batch(rows)
+        written += len(rows)
+
+
+async def _run_writer():
+    while True:
+        try:
+            await asyncio.wait_for(_wakeup.wait(), FLOW_LOG_FLUSH_MS / 1000)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+        try:
+            await asyncio.to_thread(flush_flow_logs)
+        except Exception as e:
+            logger.error(f"❌ Flow log writer error: {e}")
+
+
+async def start_flow_log_writer():
+    global _writer_task, _writer_loop, _wakeup
+    if FLOW_LOG_MODE == "sync" or _writer_task is not None:
+        return
+    _writer_loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    _writer_task = asyncio.create_task(_run_writer())
+    logger.info(f"✅ Flow log writer started (flush every {FLOW_LOG_FLUSH_MS}ms)")
+
+
+async def stop_flow_log_writer():
+    """Stop the writer and flush what is still buffered."""
+    global _writer_task
+    if _writer_task is None:
+        return
+    task, _writer_task = _writer_task, None  # new events are written inline from here on
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    await asyncio.to_thread(flush_flow_logs)
+
+
+def _row(
+    *,
+    flow_type: str,
+    step: Optional[str],
+    status_code: Optional[int],
+    wa_id: Optional[str],
+    name: Optional[str],
+    description: Optional[str],
+    response_json: Optional[str],
+) -> Dict[str, Any]:
+    return {
+        "id": _uuid.uuid4(),
+        "flow_type": flow_type,
+        "step": step,
+        "status_code": status_code,
+        "wa_id": wa_id,
+        "name": name,
+        "description": description,
+        "response_json": response_json,
+        "created_at": datetime.utcnow(),
+    }
 
 
 def log_flow_event(
@@ -20,30 +207,19 @@ def log_flow_event(
     description: Optional[str] = None,
     response_json: Optional[str] = None,
 ) -> str:
-    """Persist a flow log entry. Swallows DB errors to avoid impacting user flows.
+    """Record a flow log entry. Swallows DB errors to avoid impacting user flows.
 
-    Returns the created FlowLog id (as str) if successful, else empty string.
+    Returns the FlowLog id (as str), or empty string if an inline write failed.
     """
-    try:
-        log = FlowLog(
-            flow_type=flow_type,
-            step=step,
-            status_code=status_code,
-            wa_id=wa_id,
-            name=name,
-            description=description,
-            response_json=response_json,
-            created_at=datetime.utcnow(),
-        )
-        db.add(log)
-        db.commit()
-        return str(log.id)
-    except Exception:
-        try:
-            db.rollback()
-        except Exception:
-            pass
-        return ""
+    return _enqueue(db, _row(
+        flow_type=flow_type,
+        step=step,
+        status_code=status_code,
+        wa_id=wa_id,
+        name=name,
+        description=description,
+        response_json=response_json,
+    ))
 
 
 def _get_customer_name_from_flow_state(db: Session, wa_id: Optional[str], flow_type: str) -> Optional[str]:
@@ -106,23 +282,14 @@ def log_last_step_reached(
         # If name not provided, try to get it from flow state
         if not name:
             name = _get_customer_name_from_flow_state(db, wa_id, flow_type)
-        
-        log = FlowLog(
-            flow_type=flow_type,
-            step=step,
-            status_code=None,
-            wa_id=wa_id,
-            name=name,
-            description=f"Last step reached: {step}",
-            response_json=None,
-            created_at=datetime.utcnow(),
-        )
-        db.add(log)
-        db.commit()
-        return str(log.id)
     except Exception:
-        try:
-            db.rollback()
-        except Exception:
-            pass
-        return ""
\ No newline at end of file
+        pass
+    return _enqueue(db, _row(
+        flow_type=flow_type,
+        step=step,
+        status_code=None,
+        wa_id=wa_id,
+        name=name,
+        description=f"Last step reached: {step}",
+        response_json=None,
+    ))
@@ -0,0 +1,27 @@
+"""
+Pooled blocking HTTP session for payment and commerce APIs.
+
+Razorpay, the Oliva Razorpay proxy and Shopify were called with bare
+`requests.post`, which opens a new TCP/TLS connection for every call. They
+now share `http_session`, a requests.Session with a keep-alive pool per host,
+so repeat calls reuse connections. Call sites keep the requests API:
+`http_session.post(url, json=..., headers=..., timeout=...)`.
+"""
+
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+
+PAYMENT_HTTP_POOL_SIZE = int(os.getenv("PAYMENT_HTTP_POOL_SIZE", "20"))
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=PAYMENT_HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+http_session = _build_session()
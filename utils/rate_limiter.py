@@ -0,0 +1,128 @@
+"""
+Token-bucket rate limiter shared across campaign workers.
+
+Meta enforces a per phone_number_id throughput limit (80 msg/s by default).
+Instead of every worker sleeping a fixed delay derived from a guessed worker
+count, each send reserves a token from a bucket keyed by phone_number_id:
+
+- Redis backend: the bucket lives in a Redis hash and is updated atomically by
+  a Lua script, so every worker process on every host shares one budget.
+- In-process fallback: used when Redis is not reachable. It only limits the
+  current process, so run a single worker process in that situation.
+
+Reservations are allowed to drive the bucket negative; the caller simply waits
+for the returned delay. This keeps the limiter to a single round-trip per send.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+from cache.redis_connection import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+META_MAX_MSG_PER_SECOND = float(os.getenv("WHATSAPP_MAX_MSG_PER_SECOND", "80"))
+RATE_LIMIT_BURST = float(os.getenv("WHATSAPP_RATE_LIMIT_BURST", str(META_MAX_MSG_PER_SECOND)))
+RATE_LIMIT_KEY_PREFIX = "ratelimit:wa"
+
+# KEYS[1] = bucket key; ARGV = rate per second, capacity, tokens requested.
+# Uses the Redis server clock so workers on different hosts agree on time.
+# Returns the number of milliseconds the caller must wait before sending.
+_TOKEN_BUCKET_LUA = """
+if redis.replicate_commands then pcall(redis.replicate_commands) end
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1]) or capacity
+local ts = tonumber(data[2]) or now
+local elapsed = math.max(0, now - ts)
+tokens = math.min(capacity, tokens + elapsed * rate / 1000)
+tokens = tokens - requested
+local wait_ms = 0
+if tokens < 0 then
+    wait_ms = math.ceil(-tokens * 1000 / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + wait_ms + 1000)
+return wait_ms
+"""
+
+
+class TokenBucketLimiter:
+    """Per-key token bucket with a Redis backend and an in-process fallback."""
+
+    def __init__(self, rate_per_second: float, burst: Optional[float] = None,
+                 key_prefix: str = RATE_LIMIT_KEY_PREFIX):
+        if rate_per_second <= 0:
+            raise ValueError("rate_per_second must be positive")
+        self.rate = float(rate_per_second)
+        self.capacity = float(burst if burst is not None else rate_per_second)
+        self.key_prefix = key_prefix
+        self._script = None
+        self._local_lock = threading.Lock()
+        self._local_buckets: Dict[str, Tuple[float, float]] = {}
+
+    def _redis_reserve(self, key: str, tokens: int) -> Optional[float]:
+        redis_client = get_redis_client()
+        if not redis_client:
+            return None
+        try:
+            if self._script is None:
+                self._script = redis_client.register_script(_TOKEN_BUCKET_LUA)
+            wait_ms = self._script(
+                keys=[f"{self.key_prefix}:{key}"],
+                args=[self.rate, self.capacity, tokens],
+                client=redis_client,
+            )
+            return int(wait_ms) / 1000.0
+        except Exception as e:
+            logger.warning(f"Redis rate limiter unavailable, using in-process bucket: {e}")
+            return None
+
+    def _local_reserve(self, key: str, tokens: int) -> float:
+        with self._local_lock:
+            now = time.monotonic()
+            available, last = self._local_buckets.get(key, (self.capacity, now))
+            available = min(self.capacity, available + (now - last) * self.rate)
+            available -= tokens
+            self._local_buckets[key] = (available, now)
+        return -available / self.rate if available < 0 else 0.0
+
+    def reserve(self, key: str, tokens: int = 1) -> float:
+        """Reserve tokens for `key` and return how many seconds to wait before using them."""
+        wait = self._redis_reserve(key, tokens)
+        if wait is None:
+            wait = self._local_reserve(key, tokens)
+        return wait
+
+    def acquire(self, key: str, tokens: int = 1) -> float:
+        """Blocking acquire for threaded workers. Returns the time spent waiting."""
+        wait = self.reserve(key, tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, key: str, tokens: int = 1) -> float:
+        """Non-blocking acquire for asyncio workers. Returns the time spent waiting."""
+        wait = await asyncio.to_thread(self.reserve, key, tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+_whatsapp_limiter: Optional[TokenBucketLimiter] = None
+
+
+def get_whatsapp_rate_limiter() -> TokenBucketLimiter:
+    """Process-wide limiter for WhatsApp Cloud API sends, keyed by phone_number_id."""
+    global _whatsapp_limiter
+    if _whatsapp_limiter is None:
+        _whatsapp_limiter = TokenBucketLimiter(META_MAX_MSG_PER_SECOND, RATE_LIMIT_BURST)
+    return _whatsapp_limiter
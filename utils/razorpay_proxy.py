@@ -0,0 +1,136 @@
+"""
+Oliva Razorpay proxy client with a shared bearer-token cache.
+
+The proxy used to be asked for a new token before every payment link. Now
+`proxy_token` keeps one token per process, shared by all threads:
+
+- Expiry comes from the token response (`expires_in` / `expires_at`), or
+  else from the JWT `exp` claim, or else RAZORPAY_PROXY_TOKEN_TTL_SECONDS.
+- The token is refreshed RAZORPAY_PROXY_TOKEN_REFRESH_MARGIN_SECONDS before
+  it expires. If that early refresh fails, the still-valid token is used.
+- Refreshes are single-flight: concurrent callers wait for one token request
+  rather than each logging in.
+- proxy_post() retries once with a forced refresh when the proxy answers 401.
+"""
+
+import os
+import time
+import json
+import base64
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+from utils.http_session import http_session
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+RAZORPAY_TOKEN_URL = os.getenv("RAZORPAY_TOKEN_URL", "https://payments.olivaclinic.com/api/token")
+RAZORPAY_PAYMENT_URL = os.getenv("RAZORPAY_PAYMENT_URL", "https://payments.olivaclinic.com/api/payment")
+RAZORPAY_USERNAME = os.getenv("RAZORPAY_USERNAME", "test@example.com")
+RAZORPAY_PASSWORD = os.getenv("RAZORPAY_PASSWORD", "123")
+RAZORPAY_PROXY_TIMEOUT = float(os.getenv("RAZORPAY_PROXY_TIMEOUT", "20"))
+RAZORPAY_PROXY_TOKEN_TTL_SECONDS = float(os.getenv("RAZORPAY_PROXY_TOKEN_TTL_SECONDS", "1800"))
+RAZORPAY_PROXY_TOKEN_REFRESH_MARGIN_SECONDS = float(os.getenv("RAZORPAY_PROXY_TOKEN_REFRESH_MARGIN_SECONDS", "60"))
+
+
+def _jwt_exp(token: str) -> Optional[float]:
+    """`exp` claim of a JWT (unverified; only used to schedule refreshes)."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return float(exp) if exp else None
+    except Exception:
+        return None
+
+
+def _expires_at(body: Dict[str, Any], token: str) -> float:
+    """Wall-clock expiry for a token response."""
+    now = time.time()
+    try:
+        if body.get("expires_in"):
+            return now + float(body["expires_in"])
+        if body.get("expires_at"):
+            return float(body["expires_at"])
+    except (TypeError, ValueError):
+        pass
+    return _jwt_exp(token) or now + RAZORPAY_PROXY_TOKEN_TTL_SECONDS
+
+
+class ProxyTokenCache:
+    def __init__(self):
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def _fetch(self) -> None:
+        resp = http_session.post(
+            RAZORPAY_TOKEN_URL,
+            data={"username": RAZORPAY_USERNAME, "password": RAZORPAY_PASSWORD},
+            headers={"Accept": "application/json", "Content-Type": "application/x-www-form-urlencoded"},
+            timeout=RAZORPAY_PROXY_TIMEOUT,
+        )
+        resp.raise_for_status()
+        body = resp.json()
+        token = body.get("access_token")
+        if not token:
+            raise ValueError("Token response has no access_token")
+        self._token = token
+        self._expires_at = _expires_at(body, token)
+
+    def get_token(self, force_refresh: bool = False) -> str:
+        now = time.time()
+        token = self._token
+        if token and not force_refresh and now < self._expires_at - RAZORPAY_PROXY_TOKEN_REFRESH_MARGIN_SECONDS:
+            return token
+        with self._lock:
+            # Another thread may have refreshed while we waited
+            now = time.time()
+            if self._token and self._token != token and now < self._expires_at:
+                return self._token
+            if self._token and not force_refresh and now < self._expires_at - RAZORPAY_PROXY_TOKEN_REFRESH_MARGIN_SECONDS:
+                return self._token
+            try:
+                self._fetch()
+            except Exception as e:
+                if self._token and not force_refresh and now < self._expires_at:
+                    logger.warning(f"Razorpay proxy token refresh failed, using current token: {e}")
+                    return self._token
+                raise
+            return self._token
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._token = None
+            self._expires_at = 0.0
+
+
+proxy_token = ProxyTokenCache()
+
+
+def _post(url: str, data: Dict[str, Any], token: str):
+    return http_session.post(
+        url,
+        json=data,
+        headers={
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+        },
+        timeout=RAZORPAY_PROXY_TIMEOUT,
+    )
+
+
+def proxy_post(url: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """POST JSON to the proxy with the cached bearer token; one retry with a fresh token on 401."""
+    resp = _post(url, data, proxy_token.get_token())
+    if resp.status_code == 401:
+        logger.info("Razorpay proxy rejected cached token; refreshing")
+        resp = _post(url, data, proxy_token.get_token(force_refresh=True))
+    resp.raise_for_status()
+    return resp.json()
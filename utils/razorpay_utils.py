@@ -6,6 +6,8 @@ import base64
 from typing import Dict, Any
 from dotenv import load_dotenv
 
+from utils.http_session import http_session
+
 # Load environment variables
 load_dotenv()
 
@@ -132,7 +134,7 @@ def create_razorpay_payment_link(amount: float, currency: str = "INR", descripti
         print(f"[RAZORPAY_DEBUG] Making API request to: {url}")
         print(f"[RAZORPAY_DEBUG] Request data: {data}")
         
-        response = requests.post(url, json=data, headers=headers, timeout=30)
+        response = http_session.post(url, json=data, headers=headers, timeout=30)
         
         print(f"[RAZORPAY_DEBUG] Response status: {response.status_code}")
         print(f"[RAZORPAY_DEBUG] Response headers: {dict(response.headers)}")
@@ -182,7 +184,7 @@ def get_razorpay_payment_details(payment_id: str) -> Dict[str, Any]:
             "Content-Type": "application/json"
         }
         
-        response = requests.get(url, headers=headers, timeout=30)
+        response = http_session.get(url, headers=headers, timeout=30)
         response.raise_for_status()
         
         return response.json()
@@ -222,7 +224,7 @@ def capture_razorpay_payment(payment_id: str, amount: float, currency: str = "IN
             "currency": currency
         }
         
-        response = requests.post(url, json=data, headers=headers, timeout=30)
+        response = http_session.post(url, json=data, headers=headers, timeout=30)
         response.raise_for_status()
         
         return response.json()
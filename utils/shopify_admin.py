@@ -1,5 +1,6 @@
 import os
-import requests
+
+from utils.http_session import http_session
 
 
 def update_variant_price(variant_id: str, new_price_inr: float) -> bool:
@@ -35,7 +36,7 @@ def update_variant_price(variant_id: str, new_price_inr: float) -> bool:
                 "price": str(int(new_price_inr))
             }
         }
-        resp = requests.put(url, json=payload, headers=headers, timeout=20)
+        resp = http_session.put(url, json=payload, headers=headers, timeout=20)
         if resp.status_code in (200, 201):
             return True
         else:
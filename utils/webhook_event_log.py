@@ -0,0 +1,314 @@
+"""
+Append-only, compressed log of raw webhook payloads.
+
+Replaces the two JSON files per request that used to be written into
+webhook_logs/. Request handlers call `webhook_event_log.append(...)`, which
+only enqueues the payload; a background writer thread batches records and
+appends each batch as one compressed frame (zstd when `zstandard` is
+installed, gzip otherwise) to the current segment file. Concatenated frames
+are valid zstd/gzip streams, so a segment is readable at any point.
+
+Segments rotate by size and are deleted after WEBHOOK_LOG_RETENTION_DAYS.
+A SQLite index next to the segments records, per event, its received time,
+kind, wa_id and message_id plus the frame offset, so the /logs endpoints
+answer lookups with B-tree queries and decompress only the frames they need.
+"""
+
+import os
+import gzip
+import json
+import time
+import queue
+import atexit
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from services.webhook_ingest import extract_routing
+
+logger = logging.getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+WEBHOOK_LOG_DIR = os.getenv("WEBHOOK_LOG_DIR", "webhook_logs")
+WEBHOOK_LOG_SEGMENT_MB = float(os.getenv("WEBHOOK_LOG_SEGMENT_MB", "64"))
+WEBHOOK_LOG_RETENTION_DAYS = float(os.getenv("WEBHOOK_LOG_RETENTION_DAYS", "14"))
+WEBHOOK_LOG_COMPRESSION = os.getenv("WEBHOOK_LOG_COMPRESSION", "zstd" if zstandard else "gzip").lower()
+WEBHOOK_LOG_FLUSH_INTERVAL_MS = int(os.getenv("WEBHOOK_LOG_FLUSH_INTERVAL_MS", "500"))
+WEBHOOK_LOG_BATCH_SIZE = int(os.getenv("WEBHOOK_LOG_BATCH_SIZE", "500"))
+WEBHOOK_LOG_QUEUE_MAX = int(os.getenv("WEBHOOK_LOG_QUEUE_MAX", "100000"))
+
+_INDEX_FILE = "index.sqlite3"
+_RETENTION_CHECK_SECONDS = 3600
+
+_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    received_at REAL NOT NULL,
+    kind TEXT NOT NULL,
+    wa_id TEXT,
+    message_id TEXT,
+    segment TEXT NOT NULL,
+    frame_offset INTEGER NOT NULL,
+    frame_length INTEGER NOT NULL,
+    line_no INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_events_kind_received ON events (kind, received_at);
+CREATE INDEX IF NOT EXISTS ix_events_received ON events (received_at);
+CREATE INDEX IF NOT EXISTS ix_events_wa_id ON events (wa_id, received_at);
+CREATE INDEX IF NOT EXISTS ix_events_message_id ON events (message_id);
+CREATE INDEX IF NOT EXISTS ix_events_segment ON events (segment);
+"""
+
+
+def _routing_keys(payload: str) -> Dict[str, Optional[str]]:
+    """Best-effort wa_id / message_id of a raw Cloud API webhook payload."""
+    try:
+        routing = extract_routing(json.loads(payload))
+    except Exception:
+        return {"wa_id": None, "message_id": None}
+    return {"wa_id": routing["wa_id"], "message_id": routing["message_id"] or routing["status_id"]}
+
+
+class WebhookEventLog:
+    """Background-written, size-rotated, indexed event log."""
+
+    def __init__(
+        self,
+        directory: str = WEBHOOK_LOG_DIR,
+        segment_bytes: int = int(WEBHOOK_LOG_SEGMENT_MB * 1024 * 1024),
+        retention_days: float = WEBHOOK_LOG_RETENTION_DAYS,
+        compression: str = WEBHOOK_LOG_COMPRESSION,
+    ):
+        if compression == "zstd" and zstandard is None:
+            logger.warning("zstandard not installed; webhook event log falls back to gzip")
+            compression = "gzip"
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.retention_days = retention_days
+        self.compression = compression
+        self._queue: "queue.Queue" = queue.Queue(maxsize=WEBHOOK_LOG_QUEUE_MAX)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._segment: Optional[str] = None
+        self._segment_size = 0
+        self._last_retention_check = 0.0
+        self._index: Optional[sqlite3.Connection] = None
+
+    # ---- producer side -------------------------------------------------
+
+    def append(self, kind: str, payload: str, received_at: Optional[float] = None) -> None:
+        """Queue a raw payload for writing. Never blocks the request."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((received_at or time.time(), kind, payload))
+        except queue.Full:
+            logger.warning(f"Webhook event log queue full, dropping {kind} event")
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Wait until everything appended so far is on disk."""
+        if self._thread is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    # ---- writer thread -------------------------------------------------
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="webhook-event-log", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _open_index(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(os.path.join(self.directory, _INDEX_FILE), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_INDEX_SCHEMA)
+        return conn
+
+    def _run(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self._index = self._open_index()
+        interval = WEBHOOK_LOG_FLUSH_INTERVAL_MS / 1000.0
+        while True:
+            batch: List[tuple] = []
+            waiters: List[threading.Event] = []
+            try:
+                item = self._queue.get(timeout=interval)
+            except queue.Empty:
+                self._maybe_apply_retention()
+                continue
+            deadline = time.monotonic() + interval
+            while True:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if len(batch) >= WEBHOOK_LOG_BATCH_SIZE:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            try:
+                if batch:
+                    self._write_batch(batch)
+                self._maybe_apply_retention()
+            except Exception as e:
+                logger.error(f"Webhook event log write failed ({len(batch)} events lost): {e}")
+            finally:
+                for waiter in waiters:
+                    waiter.set()
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor(level=3).compress(data)
+        return gzip.compress(data, compresslevel=6)
+
+    def _decompress(self, data: bytes, segment: str) -> bytes:
+        if segment.endswith(".zst"):
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    def _current_segment(self) -> str:
+        if self._segment is None or self._segment_size >= self.segment_bytes:
+            ext = "zst" if self.compression == "zstd" else "gz"
+            stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+            # pid keeps segments of different worker processes apart
+            self._segment = f"events-{stamp}-{os.getpid()}.jsonl.{ext}"
+            self._segment_size = 0
+        return self._segment
+
+    def _write_batch(self, batch: List[tuple]) -> None:
+        lines = []
+        rows = []
+        segment = self._current_segment()
+        for line_no, (received_at, kind, payload) in enumerate(batch):
+            keys = _routing_keys(payload)
+            lines.append(json.dumps({
+                "received_at": received_at,
+                "kind": kind,
+                "wa_id": keys["wa_id"],
+                "message_id": keys["message_id"],
+                "payload": payload,
+            }, ensure_ascii=False))
+            rows.append((received_at, kind, keys["wa_id"], keys["message_id"], segment, line_no))
+
+        frame = self._compress(("\n".join(lines) + "\n").encode("utf-8"))
+        path = os.path.join(self.directory, segment)
+        with open(path, "ab") as f:
+            offset = f.tell()
+            f.write(frame)
+        self._segment_size = offset + len(frame)
+
+        self._index.executemany(
+            "INSERT INTO events (received_at, kind, wa_id, message_id, segment, frame_offset, frame_length, line_no) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(r[0], r[1], r[2], r[3], r[4], offset, len(frame), r[5]) for r in rows],
+        )
+        self._index.commit()
+
+    def _maybe_apply_retention(self) -> None:
+        now = time.time()
+        if now - self._last_retention_check < _RETENTION_CHECK_SECONDS:
+            return
+        self._last_retention_check = now
+        cutoff = now - self.retention_days * 86400
+        removed = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.startswith("events-") or name == self._segment:
+                continue
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    self._index.execute("DELETE FROM events WHERE segment = ?", (name,))
+                    removed += 1
+            except OSError as e:
+                logger.warning(f"Could not remove expired webhook log segment {name}: {e}")
+        if removed:
+            self._index.commit()
+            logger.info(f"🧹 Removed {removed} expired webhook log segment(s)")
+
+    # ---- reader side ---------------------------------------------------
+
+    def query(
+        self,
+        *,
+        kinds: Optional[List[str]] = None,
+        wa_id: Optional[str] = None,
+        message_id: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 20,
+    ) -> List[Dict[str, Any]]:
+        """Newest-first events matching the filters, with parsed payloads."""
+        index_path = os.path.join(self.directory, _INDEX_FILE)
+        if not os.path.exists(index_path):
+            return []
+
+        where, params = [], []
+        if kinds:
+            where.append(f"kind IN ({', '.join('?' for _ in kinds)})")
+            params.extend(kinds)
+        if wa_id:
+            where.append("wa_id = ?")
+            params.append(wa_id)
+        if message_id:
+            where.append("message_id = ?")
+            params.append(message_id)
+        if since is not None:
+            where.append("received_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("received_at < ?")
+            params.append(until)
+        sql = "SELECT received_at, kind, wa_id, message_id, segment, frame_offset, frame_length, line_no FROM events"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY received_at DESC LIMIT ?"
+        params.append(int(limit))
+
+        conn = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True, timeout=30)
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+        frames: Dict[tuple, List[str]] = {}
+        events = []
+        for received_at, kind, row_wa_id, row_message_id, segment, offset, length, line_no in rows:
+            entry = {
+                "kind": kind,
+                "timestamp": datetime.fromtimestamp(received_at).isoformat(),
+                "wa_id": row_wa_id,
+                "message_id": row_message_id,
+                "segment": segment,
+            }
+            try:
+                key = (segment, offset)
+                if key not in frames:
+                    with open(os.path.join(self.directory, segment), "rb") as f:
+                        f.seek(offset)
+                        frames[key] = self._decompress(f.read(length), segment).decode("utf-8").splitlines()
+                payload = json.loads(frames[key][line_no])["payload"]
+                try:
+                    entry["data"] = json.loads(payload)
+                except ValueError:
+                    entry["data"] = payload
+            except Exception as e:
+                entry["error"] = str(e)
+            events.append(entry)
+        return events
+
+
+webhook_event_log = WebhookEventLog()
@@ -1,19 +1,103 @@
+import time
+import logging
+import threading
 from datetime import datetime
 from fastapi import HTTPException
 
-
-import requests
-
 from schemas.customer_schema import CustomerCreate
 from sqlalchemy.orm import Session
-from models.models import Category, SubCategory, Product
 from config.constants import get_messages_url
 import os
 from schemas.message_schema import MessageCreate
 from services import whatsapp_service, customer_service, message_service
 from services.followup_service import schedule_next_followup
+from services.catalog_cache import catalog_cache
 from utils.ws_manager import manager
 from marketing.whatsapp_numbers import WHATSAPP_NUMBERS
+from utils.whatsapp_client import whatsapp_client
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Outbound credential resolution
+#
+# Every send reads the conversation's routing fields (incoming / treatment /
+# lead phone ids) from the shared flow state, so a routing change made by any
+# worker applies to the next message. The result is not memoised: a memo
+# would need that same state read to stay correct. The DB-token fallback
+# reads get_latest_token_value(), which caches the token for a short TTL and
+# drops it when a token is added.
+# ---------------------------------------------------------------------------
+
+_credential_lock = threading.Lock()
+_credential_stats = {"lookups": 0, "resolve_seconds": 0.0}
+_flow_state_dicts = None
+
+
+def _flow_states():
+    """(appointment_state, lead_appointment_state), imported once."""
+    global _flow_state_dicts
+    if _flow_state_dicts is None:
+        from controllers.web_socket import appointment_state, lead_appointment_state  # type: ignore
+        _flow_state_dicts = (appointment_state, lead_appointment_state)
+    return _flow_state_dicts
+
+
+def _routing_fields(wa_id: str | None) -> tuple:
+    if not wa_id:
+        return ()
+    try:
+        appointment_state, lead_appointment_state = _flow_states()
+    except Exception:
+        return ()
+    st = appointment_state.get(wa_id) or {}
+    lst = lead_appointment_state.get(wa_id) or {}
+    return (
+        st.get("incoming_phone_id"),
+        st.get("treatment_flow_phone_id"),
+        st.get("lead_phone_id"),
+        lst.get("phone_id") or lst.get("lead_phone_id"),
+    )
+
+
+def _number_token(phone_id) -> str | None:
+    if phone_id and isinstance(WHATSAPP_NUMBERS, dict) and phone_id in WHATSAPP_NUMBERS:
+        return (WHATSAPP_NUMBERS.get(phone_id) or {}).get("token")
+    return None
+
+
+def _resolve_from_numbers(fingerprint: tuple, hint_phone_id: str | None, wa_id: str | None):
+    """Steps 1-6 of the precedence chain (WHATSAPP_NUMBERS only); None if none applies."""
+    incoming_phone_id, treatment_phone_id, lead_phone_id_appt, lead_phone_id = fingerprint or (None, None, None, None)
+
+    # 1) incoming_phone_id - the CURRENT number customer messaged to (lets treatment customers switch numbers)
+    tok = _number_token(incoming_phone_id)
+    if tok:
+        return tok, incoming_phone_id
+    if incoming_phone_id:
+        logger.warning(f"[_resolve_credentials] incoming_phone_id {incoming_phone_id} found but no token available for wa_id={wa_id}")
+
+    # 2) Explicit phone_id hint, 3) stored treatment / lead phone ids, 4) legacy lead state
+    for phone_id in (hint_phone_id, treatment_phone_id, lead_phone_id_appt, lead_phone_id):
+        tok = _number_token(phone_id)
+        if tok:
+            return tok, phone_id
+
+    # 5) Env-configured phone id
+    env_pid = os.getenv("WHATSAPP_PHONE_ID")
+    tok = _number_token(env_pid)
+    if tok:
+        logger.warning(f"[_resolve_credentials] FALLBACK to env WHATSAPP_PHONE_ID: {env_pid} for wa_id={wa_id} (no stored state found)")
+        return tok, env_pid
+
+    # 6) Single mapping entry
+    entries = [(pid, cfg) for pid, cfg in (WHATSAPP_NUMBERS or {}).items() if (cfg or {}).get("token")]
+    if len(entries) == 1:
+        pid, cfg = entries[0]
+        logger.warning(f"[_resolve_credentials] FALLBACK to single WHATSAPP_NUMBERS entry: {pid} for wa_id={wa_id}")
+        return cfg.get("token"), pid
+    return None
+
 
 def _resolve_credentials(db, *, hint_phone_id: str | None = None, hint_display_number: str | None = None, wa_id: str | None = None):
     """Pick the correct token and phone_id for outbound sends.
@@ -30,104 +114,33 @@ def _resolve_credentials(db, *, hint_phone_id: str | None = None, hint_display_n
     6) Single entry in WHATSAPP_NUMBERS
     7) Fallback to DB token + env WHATSAPP_PHONE_ID
     """
-    # CRITICAL: Check stored incoming_phone_id FIRST (the number customer messaged to)
-    # This is the MOST important - ensures replies go from the same number customer contacted
-    # For treatment flow numbers, always use the CURRENT incoming_phone_id to allow switching between numbers
-    if wa_id:
-        try:
-            from controllers.web_socket import appointment_state  # type: ignore
-            from marketing.whatsapp_numbers import TREATMENT_FLOW_ALLOWED_PHONE_IDS  # type: ignore
-            st = appointment_state.get(wa_id) or {}
-            
-            # FIRST: Check incoming_phone_id - this is the CURRENT number customer messaged to
-            # For treatment flow, this allows customers to switch between 7617613030 and 8297882978
-            incoming_phone_id = st.get("incoming_phone_id")
-            if incoming_phone_id and isinstance(WHATSAPP_NUMBERS, dict) and incoming_phone_id in WHATSAPP_NUMBERS:
-                cfg = WHATSAPP_NUMBERS.get(incoming_phone_id) or {}
-                tok = cfg.get("token")
-                if tok:
-                    # Verify it's a treatment flow number (both numbers should work)
-                    is_treatment_number = str(incoming_phone_id) in TREATMENT_FLOW_ALLOWED_PHONE_IDS if TREATMENT_FLOW_ALLOWED_PHONE_IDS else False
-                    print(f"[_resolve_credentials] RESOLVED via incoming_phone_id: {incoming_phone_id} for wa_id={wa_id} (treatment_flow={is_treatment_number})")
-                    return tok, incoming_phone_id
-                else:
-                    print(f"[_resolve_credentials] WARNING - incoming_phone_id {incoming_phone_id} found but no token available for wa_id={wa_id}")
-        except Exception as e:
-            print(f"[_resolve_credentials] WARNING - Could not check incoming_phone_id: {e}")
-
-    # 2) Explicit phone_id hint (only if incoming_phone_id not set)
-    if hint_phone_id and isinstance(WHATSAPP_NUMBERS, dict) and hint_phone_id in WHATSAPP_NUMBERS:
-        cfg = WHATSAPP_NUMBERS.get(hint_phone_id) or {}
-        tok = cfg.get("token")
-        if tok:
-            print(f"[_resolve_credentials] RESOLVED via hint_phone_id: {hint_phone_id} for wa_id={wa_id}")
-            return tok, hint_phone_id
-
-    # 3) Check for treatment flow phone_id (only if incoming_phone_id not set)
-    if wa_id:
-        try:
-            from controllers.web_socket import appointment_state  # type: ignore
-            st = appointment_state.get(wa_id) or {}
-            
-            stored_phone_id = st.get("treatment_flow_phone_id")
-            if stored_phone_id and isinstance(WHATSAPP_NUMBERS, dict) and stored_phone_id in WHATSAPP_NUMBERS:
-                cfg = WHATSAPP_NUMBERS.get(stored_phone_id) or {}
-                tok = cfg.get("token")
-                if tok:
-                    print(f"[_resolve_credentials] RESOLVED via stored treatment_flow_phone_id: {stored_phone_id} for wa_id={wa_id}")
-                    return tok, stored_phone_id
-            # Check for lead phone_id in appointment_state
-            lead_phone_id_appt = st.get("lead_phone_id")
-            if lead_phone_id_appt and isinstance(WHATSAPP_NUMBERS, dict) and lead_phone_id_appt in WHATSAPP_NUMBERS:
-                cfg = WHATSAPP_NUMBERS.get(lead_phone_id_appt) or {}
-                tok = cfg.get("token")
-                if tok:
-                    print(f"[_resolve_credentials] RESOLVED via stored lead_phone_id (appointment_state): {lead_phone_id_appt} for wa_id={wa_id}")
-                    return tok, lead_phone_id_appt
-        except Exception:
-            pass
-
-    # 3) Check stored phone_id from lead appointment state (legacy)
-    if wa_id:
-        try:
-            from controllers.web_socket import lead_appointment_state  # type: ignore
-            lst = lead_appointment_state.get(wa_id) or {}
-            lead_phone_id = lst.get("phone_id") or lst.get("lead_phone_id")
-            if lead_phone_id and isinstance(WHATSAPP_NUMBERS, dict) and lead_phone_id in WHATSAPP_NUMBERS:
-                cfg = WHATSAPP_NUMBERS.get(lead_phone_id) or {}
-                tok = cfg.get("token")
-                if tok:
-                    print(f"[_resolve_credentials] RESOLVED via stored lead_phone_id (lead_appointment_state): {lead_phone_id} for wa_id={wa_id}")
-                    return tok, lead_phone_id
-        except Exception:
-            pass
-
-    # 4) Env-configured phone id
-    env_pid = os.getenv("WHATSAPP_PHONE_ID")
-    if env_pid and isinstance(WHATSAPP_NUMBERS, dict) and env_pid in WHATSAPP_NUMBERS:
-        cfg = WHATSAPP_NUMBERS.get(env_pid) or {}
-        tok = cfg.get("token")
-        if tok:
-            print(f"[_resolve_credentials] WARNING - FALLBACK to env WHATSAPP_PHONE_ID: {env_pid} for wa_id={wa_id} (no stored state found)")
-            return tok, env_pid
-
-    # 5) Single mapping entry
+    started = time.perf_counter()
     try:
-        entries = [(pid, cfg) for pid, cfg in (WHATSAPP_NUMBERS or {}).items() if (cfg or {}).get("token")]
-        if len(entries) == 1:
-            pid, cfg = entries[0]
-            print(f"[_resolve_credentials] WARNING - FALLBACK to single WHATSAPP_NUMBERS entry: {pid} for wa_id={wa_id}")
-            return cfg.get("token"), pid
-    except Exception:
-        pass
-
-    # 6) Fallback to DB token + env phone id
-    token_obj = whatsapp_service.get_latest_token(db)
-    if token_obj and getattr(token_obj, "token", None):
-        pid_final = (env_pid or os.getenv("WHATSAPP_PHONE_ID", "367633743092037"))
-        print(f"[_resolve_credentials] WARNING - FALLBACK to DB token + default phone_id: {pid_final} for wa_id={wa_id}")
-        return token_obj.token, pid_final
-    raise HTTPException(status_code=400, detail="Token not available")
+        resolved = _resolve_from_numbers(_routing_fields(wa_id), hint_phone_id, wa_id)
+        if resolved:
+            return resolved
+
+        # 7) Fallback to DB token + env phone id (token cached with a TTL, see get_latest_token_value)
+        token = whatsapp_service.get_latest_token_value(db)
+        if token:
+            pid_final = os.getenv("WHATSAPP_PHONE_ID", "367633743092037")
+            logger.warning(f"[_resolve_credentials] FALLBACK to DB token + default phone_id: {pid_final} for wa_id={wa_id}")
+            return token, pid_final
+        raise HTTPException(status_code=400, detail="Token not available")
+    finally:
+        elapsed = time.perf_counter() - started
+        with _credential_lock:
+            _credential_stats["lookups"] += 1
+            _credential_stats["resolve_seconds"] += elapsed
+
+
+def credential_resolution_stats() -> dict:
+    with _credential_lock:
+        lookups = _credential_stats["lookups"]
+        return {
+            "lookups": lookups,
+            "avg_resolve_us": round(_credential_stats["resolve_seconds"] / lookups * 1e6, 2) if lookups else None,
+        }
 
 async def send_message_to_waid(wa_id: str, message_body: str, db, from_wa_id="917729992376", *, schedule_followup: bool = False, stage_label: str | None = None, phone_id_hint: str | None = None):
     access_token, phone_id = _resolve_credentials(db, hint_phone_id=phone_id_hint, wa_id=wa_id)
@@ -147,7 +160,7 @@ async def send_message_to_waid(wa_id: str, message_body: str, db, from_wa_id="91
         "text": { "body": message_body }
     }
 
-    res = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+    res = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
     try:
         j = res.json() if hasattr(res, "json") else None
         msg_ids = (j.get("messages") if isinstance(j, dict) else None) or []
@@ -283,44 +296,29 @@ async def send_message_to_waid(wa_id: str, message_body: str, db, from_wa_id="91
 
 
 def _get_headers(db):
-    token_obj = whatsapp_service.get_latest_token(db)
-    if not token_obj:
+    token = whatsapp_service.get_latest_token_value(db)
+    if not token:
         raise HTTPException(status_code=400, detail="Token not available")
     return {
-        "Authorization": f"Bearer {token_obj.token}",
+        "Authorization": f"Bearer {token}",
         "Content-Type": "application/json"
     }
 
 
-async def send_category_list(wa_id: str, db: Session):
-    headers = _get_headers(db)
-    phone_id = os.getenv("WHATSAPP_PHONE_ID", "367633743092037")
-    categories = db.query(Category).all()
-    rows = []
-    for c in categories:
-        rows.append({
-            "id": str(c.id),
-            "title": c.name[:24],
-            "description": (c.description or "")[:72]
-        })
-    payload = {
+def _interactive_payload(wa_id: str, interactive: dict) -> dict:
+    return {
         "messaging_product": "whatsapp",
         "to": wa_id,
         "type": "interactive",
-        "interactive": {
-            "type": "list",
-            "header": {"type": "text", "text": "Browse Categories"},
-            "body": {"text": "Choose a category"},
-            "action": {
-                "button": "Choose",
-                "sections": [{
-                    "title": "Categories",
-                    "rows": rows or [{"id": "noop", "title": "No categories", "description": "Add from admin"}]
-                }]
-            }
-        }
+        "interactive": interactive,
     }
-    res = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+
+
+async def send_category_list(wa_id: str, db: Session):
+    headers = _get_headers(db)
+    phone_id = os.getenv("WHATSAPP_PHONE_ID", "367633743092037")
+    payload = _interactive_payload(wa_id, catalog_cache.category_list())
+    res = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
     if res.status_code != 200:
         raise HTTPException(status_code=500, detail=f"Failed to send categories: {res.text}")
 
@@ -328,32 +326,8 @@ async def send_category_list(wa_id: str, db: Session):
 async def send_subcategory_list(wa_id: str, category_id: str, db: Session):
     headers = _get_headers(db)
     phone_id = os.getenv("WHATSAPP_PHONE_ID", "367633743092037")
-    subs = db.query(SubCategory).filter(SubCategory.category_id == category_id).all()
-    rows = []
-    for s in subs:
-        rows.append({
-            "id": str(s.id),
-            "title": s.name[:24],
-            "description": (s.description or "")[:72]
-        })
-    payload = {
-        "messaging_product": "whatsapp",
-        "to": wa_id,
-        "type": "interactive",
-        "interactive": {
-            "type": "list",
-            "header": {"type": "text", "text": "Subcategories"},
-            "body": {"text": "Choose a subcategory"},
-            "action": {
-                "button": "Choose",
-                "sections": [{
-                    "title": "Subcategories",
-                    "rows": rows or [{"id": f"cat:{category_id}", "title": "All items", "description": "No subcategories"}]
-                }]
-            }
-        }
-    }
-    res = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+    payload = _interactive_payload(wa_id, catalog_cache.subcategory_list(category_id))
+    res = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
     if res.status_code != 200:
         raise HTTPException(status_code=500, detail=f"Failed to send subcategories: {res.text}")
 
@@ -361,34 +335,8 @@ async def send_subcategory_list(wa_id: str, category_id: str, db: Session):
 async def send_products_list(wa_id: str, category_id: str = None, subcategory_id: str = None, db: Session = None):
     headers = _get_headers(db)
     phone_id = os.getenv("WHATSAPP_PHONE_ID", "367633743092037")
-    q = db.query(Product)
-    if subcategory_id:
-        q = q.filter(Product.sub_category_id == subcategory_id)
-    elif category_id:
-        q = q.filter(Product.category_id == category_id)
-    products = q.limit(10).all()
-    rows = []
-    for p in products:
-        rows.append({
-            "id": str(p.id),
-            "title": p.name[:24],
-            "description": f"₹{int(p.price)} | Stock: {p.stock}"
-        })
-    payload = {
-        "messaging_product": "whatsapp",
-        "to": wa_id,
-        "type": "interactive",
-        "interactive": {
-            "type": "list",
-            "header": {"type": "text", "text": "Products"},
-            "body": {"text": "Pick a product"},
-            "action": {
-                "button": "Choose",
-                "sections": [{"title": "Products", "rows": rows or [{"id": "noop", "title": "No products available"}]}]
-            }
-        }
-    }
-    res = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+    payload = _interactive_payload(wa_id, catalog_cache.product_list(category_id, subcategory_id))
+    res = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
     if res.status_code != 200:
         raise HTTPException(status_code=500, detail=f"Failed to send products: {res.text}")
 
@@ -415,7 +363,7 @@ async def send_location_to_waid(wa_id: str, latitude: float, longitude: float, n
         "location": location_data
     }
 
-    res = requests.post(get_messages_url(phone_id), headers=headers, json=payload)
+    res = await whatsapp_client.post(get_messages_url(phone_id), headers=headers, json=payload)
     if res.status_code != 200:
         raise HTTPException(status_code=500, detail=f"Failed to send location message: {res.text}")
 
@@ -0,0 +1,212 @@
+"""
+Shared async client for WhatsApp Cloud (Graph) API calls.
+
+Send helpers used to call `requests.post` straight from async handlers, which
+blocks the event loop for the whole Graph API round-trip and opens a new
+TCP/TLS connection per message. `whatsapp_client` replaces that with:
+
+- one pooled httpx.AsyncClient per event loop (HTTP/2 when `h2` is installed,
+  keep-alive otherwise)
+- per phone_number_id rate limiting via utils.rate_limiter
+- retries with jittered exponential backoff on 429 and on connection errors
+  raised before the request was sent. Sends are not idempotent, so 5xx
+  responses, read timeouts and dropped connections are not retried: Meta may
+  already have accepted the message.
+- timing hooks, called once per attempt with a dict of timings
+
+Responses are plain httpx.Response objects, so call sites keep using
+`res.status_code`, `res.json()` and `res.text`.
+"""
+
+import os
+import re
+import time
+import random
+import asyncio
+import logging
+import weakref
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from config.constants import get_messages_url
+from utils.rate_limiter import get_whatsapp_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+WHATSAPP_HTTP_TIMEOUT = float(os.getenv("WHATSAPP_HTTP_TIMEOUT", "20"))
+WHATSAPP_HTTP_MAX_CONNECTIONS = int(os.getenv("WHATSAPP_HTTP_MAX_CONNECTIONS", "100"))
+WHATSAPP_HTTP_MAX_RETRIES = int(os.getenv("WHATSAPP_HTTP_MAX_RETRIES", "3"))
+WHATSAPP_HTTP_BACKOFF_BASE = float(os.getenv("WHATSAPP_HTTP_BACKOFF_BASE", "0.5"))
+WHATSAPP_HTTP_BACKOFF_MAX = float(os.getenv("WHATSAPP_HTTP_BACKOFF_MAX", "8"))
+WHATSAPP_HTTP2 = os.getenv("WHATSAPP_HTTP2", "true").lower() in ("1", "true", "yes")
+WHATSAPP_SLOW_REQUEST_MS = float(os.getenv("WHATSAPP_SLOW_REQUEST_MS", "2000"))
+
+# 429 means the request was rejected before it was processed
+RETRY_STATUS_CODES = {429}
+# Errors raised before the request reached Meta, so a retry cannot double-send
+RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+_MESSAGES_URL_RE = re.compile(r"/v[\d.]+/(\d+)/messages")
+
+TimingHook = Callable[[Dict[str, Any]], None]
+
+
+def _log_slow_requests(timing: Dict[str, Any]) -> None:
+    if timing["elapsed_ms"] >= WHATSAPP_SLOW_REQUEST_MS:
+        logger.warning(
+            f"🐢 Slow Graph API call: {timing['elapsed_ms']:.0f}ms status={timing['status_code']} "
+            f"phone_id={timing['phone_id']} attempt={timing['attempt']}"
+        )
+
+
+class WhatsAppClient:
+    """Pooled, rate limited, retrying Graph API client."""
+
+    def __init__(
+        self,
+        timeout: float = WHATSAPP_HTTP_TIMEOUT,
+        max_connections: int = WHATSAPP_HTTP_MAX_CONNECTIONS,
+        max_retries: int = WHATSAPP_HTTP_MAX_RETRIES,
+        http2: bool = WHATSAPP_HTTP2,
+        rate_limiter=None,
+    ):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.http2 = http2 and _HTTP2_AVAILABLE
+        if http2 and not _HTTP2_AVAILABLE:
+            logger.info("h2 not installed; WhatsApp client using HTTP/1.1 keep-alive")
+        self._rate_limiter = rate_limiter
+        self._timing_hooks: List[TimingHook] = [_log_slow_requests]
+        # httpx connection pools are bound to the loop they were created on
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    @property
+    def rate_limiter(self):
+        return self._rate_limiter or get_whatsapp_rate_limiter()
+
+    def add_timing_hook(self, hook: TimingHook) -> None:
+        self._timing_hooks.append(hook)
+
+    def remove_timing_hook(self, hook: TimingHook) -> None:
+        if hook in self._timing_hooks:
+            self._timing_hooks.remove(hook)
+
+    def _client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                http2=self.http2,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+            self._clients[loop] = client
+        return client
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        if response is not None and response.status_code == 429:
+            try:
+                return min(WHATSAPP_HTTP_BACKOFF_MAX, float(response.headers.get("Retry-After")))
+            except (TypeError, ValueError):
+                pass
+        # Full jitter keeps retries from many workers from lining up
+        return random.uniform(0, min(WHATSAPP_HTTP_BACKOFF_MAX, WHATSAPP_HTTP_BACKOFF_BASE * (2 ** attempt)))
+
+    def _emit_timing(self, timing: Dict[str, Any]) -> None:
+        for hook in self._timing_hooks:
+            try:
+                hook(timing)
+            except Exception as e:
+                logger.debug(f"WhatsApp timing hook failed: {e}")
+
+    async def post(
+        self,
+        url: str,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        json: Any = None,
+        data: Any = None,
+        files: Any = None,
+        phone_id: Optional[str] = None,
+        retry: bool = True,
+    ) -> httpx.Response:
+        """
+        POST to the Graph API. Message sends (…/{phone_id}/messages) are rate
+        limited per phone_id; pass `phone_id` explicitly for other URLs to opt in.
+        Raises httpx.HTTPError if every attempt fails at the transport level.
+        """
+        if phone_id is None:
+            match = _MESSAGES_URL_RE.search(url)
+            phone_id = match.group(1) if match else None
+
+        attempts = 1 + (self.max_retries if retry else 0)
+        for attempt in range(attempts):
+            waited = 0.0
+            if phone_id:
+                waited = await self.rate_limiter.acquire_async(phone_id)
+
+            started = time.perf_counter()
+            response = None
+            error = None
+            try:
+                response = await self._client().post(url, headers=headers, json=json, data=data, files=files)
+            except RETRY_EXCEPTIONS as e:
+                error = e
+            finally:
+                self._emit_timing({
+                    "url": url,
+                    "phone_id": phone_id,
+                    "attempt": attempt + 1,
+                    "status_code": response.status_code if response is not None else None,
+                    "elapsed_ms": (time.perf_counter() - started) * 1000,
+                    "rate_limit_wait_ms": waited * 1000,
+                })
+
+            last_attempt = attempt == attempts - 1
+            if error is not None:
+                if last_attempt:
+                    raise error
+                logger.warning(f"⚠️ Graph API connection error (attempt {attempt + 1}/{attempts}): {error}")
+            elif response.status_code in RETRY_STATUS_CODES and not last_attempt:
+                logger.warning(
+                    f"⚠️ Graph API returned {response.status_code} (attempt {attempt + 1}/{attempts}), retrying"
+                )
+            else:
+                return response
+
+            await asyncio.sleep(self._backoff(attempt, response))
+
+    async def send_message(self, phone_id: str, access_token: str, payload: Dict[str, Any]) -> httpx.Response:
+        """Send a Cloud API message payload from `phone_id`."""
+        return await self.post(
+            get_messages_url(phone_id),
+            headers={"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"},
+            json=payload,
+            phone_id=phone_id,
+        )
+
+    async def aclose(self) -> None:
+        """Close the pool for the current loop (call on app shutdown)."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        client = self._clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+
+whatsapp_client = WhatsAppClient()
@@ -1,43 +1,299 @@
-from typing import List
+"""
+WebSocket fan-out for the agent dashboard.
 
-from fastapi import FastAPI, WebSocket,WebSocketDisconnect
+Each socket has a Subscription: organisation ids, business numbers, customer
+wa_ids and event types. An empty field matches everything, so a socket that
+does not subscribe still receives all events, as before. broadcast() only
+queues the event for matching sockets. Each socket has its own writer task, so
+a slow client never delays the others.
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+Per-socket queues are bounded (WS_SEND_QUEUE_SIZE). When a queue is full the
+oldest event is dropped. The dropped events are then coalesced into a single
+{"type": "resync", "dropped": n} event, sent once the client catches up, so
+the UI knows to refetch. A send that takes longer than WS_SEND_TIMEOUT_SECONDS
+closes the socket.
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
+With Redis available, each broadcast is also published on WS_REDIS_CHANNEL.
+Every worker relays events from other workers to its own sockets, so a
+webhook handled by one worker reaches dashboards connected to another.
+"""
+
+import os
+import json
+import uuid
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from cache.redis_connection import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+WS_REDIS_BRIDGE_ENABLED = os.getenv("WS_REDIS_BRIDGE_ENABLED", "true").lower() == "true"
+WS_REDIS_CHANNEL = os.getenv("WS_REDIS_CHANNEL", "ws:broadcast")
+WS_ORG_CACHE_TTL_SECONDS = int(os.getenv("WS_ORG_CACHE_TTL_SECONDS", "300"))
+
+
+def _as_set(values: Optional[Iterable[Any]]) -> Set[str]:
+    if not values:
+        return set()
+    if isinstance(values, str):
+        values = values.split(",")
+    return {str(v).strip() for v in values if v is not None and str(v).strip()}
+
+
+@dataclass
+class Subscription:
+    """What a socket wants to receive; empty fields match everything."""
+
+    organization_ids: Set[str] = field(default_factory=set)
+    numbers: Set[str] = field(default_factory=set)
+    wa_ids: Set[str] = field(default_factory=set)
+    events: Set[str] = field(default_factory=set)
+
+    @classmethod
+    def from_params(cls, params: Dict[str, Any]) -> "Subscription":
+        return cls(
+            organization_ids=_as_set(params.get("organization_ids") or params.get("organization_id") or params.get("org")),
+            numbers=_as_set(params.get("numbers") or params.get("number")),
+            wa_ids=_as_set(params.get("wa_ids") or params.get("wa_id")),
+            events=_as_set(params.get("events") or params.get("event")),
+        )
+
+    def matches(self, scope: Dict[str, Any]) -> bool:
+        if self.events and scope.get("event") not in self.events:
+            return False
+        if self.organization_ids and scope.get("organization_id") not in self.organization_ids:
+            return False
+        parties = scope.get("parties") or ()
+        if self.numbers and not self.numbers.intersection(parties):
+            return False
+        if self.wa_ids and not self.wa_ids.intersection(parties):
+            return False
+        return True
+
+
+class _Client:
+    """One socket: bounded send queue drained by a dedicated writer task."""
+
+    def __init__(self, websocket: WebSocket, subscription: Subscription, on_close):
+        self.websocket = websocket
+        self.subscription = subscription
+        self._queue: Deque[dict] = deque()
+        self._ready = asyncio.Event()
+        self._dropped = 0
+        self._on_close = on_close
+        self.task = asyncio.create_task(self._writer())
+
+    def enqueue(self, message: dict) -> None:
+        if len(self._queue) >= WS_SEND_QUEUE_SIZE:
+            self._queue.popleft()
+            self._dropped += 1
+        self._queue.append(message)
+        self._ready.set()
+
+    async def _writer(self) -> None:
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                while self._queue:
+                    await asyncio.wait_for(self.websocket.send_json(self._queue.popleft()), WS_SEND_TIMEOUT_SECONDS)
+                if self._dropped:
+                    dropped, self._dropped = self._dropped, 0
+                    logger.info(f"[WS] Slow client skipped {dropped} events; sending resync")
+                    await asyncio.wait_for(
+                        self.websocket.send_json({"type": "resync", "dropped": dropped}), WS_SEND_TIMEOUT_SECONDS
+                    )
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            logger.warning("[WS] Send timed out; closing slow client")
+            await self._close()
+        except (WebSocketDisconnect, RuntimeError):
+            self._on_close(self.websocket)
+        except Exception as e:
+            logger.warning(f"[WS] Send error: {e}")
+            await self._close()
+
+    async def _close(self) -> None:
+        self._on_close(self.websocket)
         try:
-            print(f"[WS] Connected. Active connections: {len(self.active_connections)}")
+            await self.websocket.close(code=1013)  # try again later
         except Exception:
             pass
 
+
+class ConnectionManager:
+    def __init__(self):
+        self._clients: Dict[WebSocket, _Client] = {}
+        self._instance_id = uuid.uuid4().hex
+        self._org_cache: Dict[str, Tuple[Optional[str], float]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._bridge_thread: Optional[threading.Thread] = None
+        self._bridge_stop = threading.Event()
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self._clients)
+
+    async def connect(self, websocket: WebSocket, subscription: Optional[Subscription] = None):
+        await websocket.accept()
+        self._clients[websocket] = _Client(websocket, subscription or Subscription(), self.disconnect)
+        logger.debug(f"[WS] Connected. Active connections: {len(self._clients)}")
+
+    def subscribe(self, websocket: WebSocket, subscription: Subscription) -> None:
+        client = self._clients.get(websocket)
+        if client:
+            client.subscription = subscription
+
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        client = self._clients.pop(websocket, None)
+        if client and client.task is not asyncio.current_task():
+            client.task.cancel()
+        logger.debug(f"[WS] Disconnected. Active connections: {len(self._clients)}")
+
+    async def broadcast(
+        self,
+        message: dict,
+        *,
+        organization_id: Optional[str] = None,
+        wa_id: Optional[str] = None,
+        number: Optional[str] = None,
+    ):
+        """
+        Queue message for every subscribed socket, here and on other workers.
+
+        The scope defaults to the payload's "from"/"to" (customer wa_id and
+        business number) and "type"; the organisation is looked up from the
+        customer when not given.
+        """
+        parties = _as_set([wa_id, number, message.get("from"), message.get("to")])
+        if organization_id is None and self._wants_organization():
+            organization_id = await self._organization_for(parties)
+        scope = {
+            "event": message.get("type"),
+            "organization_id": str(organization_id) if organization_id else None,
+            "parties": sorted(parties),
+        }
+        self._deliver(message, scope)
+        await self._publish(message, scope)
+
+    def _deliver(self, message: dict, scope: Dict[str, Any]) -> None:
+        for client in list(self._clients.values()):
+            if client.subscription.matches(scope):
+                client.enqueue(message)
+
+    # ---- organisation lookup ---------------------------------------------
+
+    def _wants_organization(self) -> bool:
+        # Other workers may hold organisation-scoped sockets
+        return bool(self._bridge_thread) or any(c.subscription.organization_ids for c in self._clients.values())
+
+    async def _organization_for(self, parties: Set[str]) -> Optional[str]:
+        if not parties:
+            return None
+        now = time.time()
+        for party in parties:
+            cached = self._org_cache.get(party)
+            if cached and cached[1] > now and cached[0]:
+                return cached[0]
+        missing = [p for p in parties if not (self._org_cache.get(p) and self._org_cache[p][1] > now)]
+        if not missing:
+            return None
         try:
-            print(f"[WS] Disconnected. Active connections: {len(self.active_connections)}")
-        except Exception:
-            pass
+            found = await asyncio.to_thread(_lookup_organizations, missing)
+        except Exception as e:
+            logger.warning(f"[WS] Organisation lookup failed: {e}")
+            return None
+        if len(self._org_cache) > 50000:
+            self._org_cache.clear()
+        expires = now + WS_ORG_CACHE_TTL_SECONDS
+        for party in missing:
+            self._org_cache[party] = (found.get(party), expires)
+        return next((found[p] for p in missing if found.get(p)), None)
+
+    # ---- Redis bridge ------------------------------------------------------
 
-    async def broadcast(self, message: dict):
-        disconnected = []
+    async def _publish(self, message: dict, scope: Dict[str, Any]) -> None:
+        if not WS_REDIS_BRIDGE_ENABLED or not self._bridge_thread:
+            return
+        redis_client = get_redis_client()
+        if not redis_client:
+            return
         try:
-            print(f"[WS] Broadcasting to {len(self.active_connections)} connections. Payload keys: {list(message.keys())}")
-        except Exception:
-            pass
-        for connection in self.active_connections:
+            payload = json.dumps({"origin": self._instance_id, "scope": scope, "message": message}, default=str)
+            await asyncio.to_thread(redis_client.publish, WS_REDIS_CHANNEL, payload)
+        except Exception as e:
+            logger.warning(f"[WS] Redis publish failed: {e}")
+
+    def start_bridge(self) -> None:
+        """Relay broadcasts from other workers (call from the running event loop)."""
+        if not WS_REDIS_BRIDGE_ENABLED or self._bridge_thread:
+            return
+        if not get_redis_client():
+            logger.info("[WS] Redis unavailable; broadcasts stay local to this worker")
+            return
+        self._loop = asyncio.get_running_loop()
+        self._bridge_stop.clear()
+        self._bridge_thread = threading.Thread(target=self._listen, name="ws-redis-bridge", daemon=True)
+        self._bridge_thread.start()
+
+    def stop_bridge(self) -> None:
+        self._bridge_stop.set()
+        self._bridge_thread = None
+
+    def _listen(self) -> None:
+        while not self._bridge_stop.is_set():
+            pubsub = None
             try:
-                await connection.send_json(message)
-            except WebSocketDisconnect:
-                disconnected.append(connection)
+                redis_client = get_redis_client()
+                if not redis_client:
+                    self._bridge_stop.wait(5)
+                    continue
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(WS_REDIS_CHANNEL)
+                while not self._bridge_stop.is_set():
+                    item = pubsub.get_message(timeout=1.0)
+                    if not item:
+                        continue
+                    data = json.loads(item["data"])
+                    if data.get("origin") == self._instance_id:
+                        continue
+                    self._loop.call_soon_threadsafe(self._deliver, data["message"], data["scope"])
             except Exception as e:
-                try:
-                    print(f"[WS] Broadcast error: {e}")
-                except Exception:
-                    pass
-        for conn in disconnected:
-            self.disconnect(conn)
-
-manager = ConnectionManager()
\ No newline at end of file
+                logger.warning(f"[WS] Redis bridge error: {e}; reconnecting")
+                self._bridge_stop.wait(1)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+
+def _lookup_organizations(wa_ids: List[str]) -> Dict[str, str]:
+    from database.db import SessionLocal
+    from models.models import Customer
+
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(Customer.wa_id, Customer.organization_id)
+            .filter(Customer.wa_id.in_(wa_ids), Customer.organization_id.isnot(None))
+            .all()
+        )
+        return {wa_id: str(org_id) for wa_id, org_id in rows}
+    finally:
+        db.close()
+
+
+manager = ConnectionManager()
@@ -1,57 +1,288 @@
+"""
+Zoho OAuth access-token manager.
+
+Access tokens live for about an hour, so they are cached until shortly before
+expiry instead of refreshing on every call:
+
+- in-process cache: served directly while the token is valid; once it is
+  within ZOHO_TOKEN_REFRESH_MARGIN_SECONDS of expiry the cached token is still
+  returned and one background thread refreshes it; after a failed
+  background refresh the next attempt waits ZOHO_TOKEN_RETRY_SECONDS,
+  doubling per consecutive failure up to ZOHO_TOKEN_RETRY_MAX_SECONDS
+- Redis cache: shares the token between workers so a new process does not
+  need its own OAuth round-trip
+- single-flight refresh: an in-process lock plus a Redis lock make sure only
+  one worker calls accounts.zoho.in at a time; the others wait for the token
+  it publishes
+
+`metrics()` reports cache hits/misses and refresh latency.
+"""
+
 import os
+import json
+import time
+import uuid
+import logging
+import threading
+from typing import Dict, Optional
+
 import requests
 from dotenv import load_dotenv
 
+from cache.redis_connection import get_redis_client
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 ZOHO_CLIENT_ID = os.getenv("ZOHO_CLIENT_ID")
 ZOHO_CLIENT_SECRET = os.getenv("ZOHO_CLIENT_SECRET")
 ZOHO_REFRESH_TOKEN = os.getenv("ZOHO_REFRESH_TOKEN")
 ZOHO_TOKEN_URL = "https://accounts.zoho.in/oauth/v2/token"
+ZOHO_TOKEN_REFRESH_MARGIN_SECONDS = int(os.getenv("ZOHO_TOKEN_REFRESH_MARGIN_SECONDS", "300"))
+ZOHO_TOKEN_RETRY_SECONDS = float(os.getenv("ZOHO_TOKEN_RETRY_SECONDS", "15"))
+ZOHO_TOKEN_RETRY_MAX_SECONDS = float(os.getenv("ZOHO_TOKEN_RETRY_MAX_SECONDS", "120"))
 
-_access_token_cache = {
-    "access_token": None,
-    "expires_at": 0,
-}
+_REDIS_TOKEN_KEY = "zoho:oauth:access_token"
+_REDIS_LOCK_KEY = "zoho:oauth:refresh_lock"
+_REDIS_LOCK_TTL_MS = 30000
+_LOCK_WAIT_SECONDS = 10.0
+# Treat tokens as expired slightly early so in-flight requests don't race expiry
+_EXPIRY_SAFETY_SECONDS = 60
 
-import time
 
-def get_valid_access_token():
-    """Return a fresh Zoho OAuth access_token, raising a clear error if refresh fails."""
-    # Basic validation of required env vars
-    missing = [
-        name for name, val in [
-            ("ZOHO_CLIENT_ID", ZOHO_CLIENT_ID),
-            ("ZOHO_CLIENT_SECRET", ZOHO_CLIENT_SECRET),
-            ("ZOHO_REFRESH_TOKEN", ZOHO_REFRESH_TOKEN),
-        ] if not val
-    ]
-    if missing:
-        raise RuntimeError(f"Missing Zoho OAuth env vars: {', '.join(missing)}")
-
-    params = {
-        "refresh_token": ZOHO_REFRESH_TOKEN,
-        "client_id": ZOHO_CLIENT_ID,
-        "client_secret": ZOHO_CLIENT_SECRET,
-        "grant_type": "refresh_token",
-    }
-
-    resp = requests.post(ZOHO_TOKEN_URL, params=params, timeout=30)
-
-    # Handle HTTP errors explicitly
-    if resp.status_code != 200:
+class ZohoTokenManager:
+    """Caches the Zoho access token and refreshes it with single-flight locking."""
+
+    def __init__(self, refresh_margin: int = ZOHO_TOKEN_REFRESH_MARGIN_SECONDS):
+        self.refresh_margin = refresh_margin
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._background_lock = threading.Lock()
+        self._background_in_flight = False
+        self._background_failures = 0
+        self._next_background_attempt = 0.0
+        self._metrics = {
+            "hits": 0,
+            "shared_hits": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "background_refreshes": 0,
+            "refresh_failures": 0,
+            "last_refresh_ms": None,
+            "total_refresh_ms": 0.0,
+        }
+
+    # ---- public API ----------------------------------------------------
+
+    def get_token(self, force_refresh: bool = False, stale_token: Optional[str] = None) -> str:
+        """
+        Return a valid access token.
+
+        force_refresh: the caller got INVALID_TOKEN; refresh unless another
+        caller already replaced `stale_token` (the token that was rejected).
+        """
+        now = time.time()
+        if force_refresh:
+            with self._lock:
+                if stale_token is None or self._token == stale_token:
+                    self._token, self._expires_at = None, 0.0
+            self._drop_shared_token(stale_token)
+
+        token = self._token
+        if token and now < self._expires_at:
+            self._metrics["hits"] += 1
+            if self._expires_at - now < self.refresh_margin:
+                self._refresh_in_background()
+            return token
+
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self._token and time.time() < self._expires_at:
+                self._metrics["hits"] += 1
+                return self._token
+            shared = self._load_shared_token()
+            if shared:
+                self._metrics["shared_hits"] += 1
+                return shared
+            self._metrics["misses"] += 1
+            return self._refresh_single_flight()
+
+    def metrics(self) -> Dict:
+        m = dict(self._metrics)
+        refreshes = m["refreshes"] or 0
+        m["avg_refresh_ms"] = round(m.pop("total_refresh_ms") / refreshes, 1) if refreshes else None
+        lookups = m["hits"] + m["shared_hits"] + m["misses"]
+        m["hit_ratio"] = round((m["hits"] + m["shared_hits"]) / lookups, 4) if lookups else None
+        m["expires_in_seconds"] = max(0, int(self._expires_at - time.time())) if self._token else 0
+        return m
+
+    # ---- refresh -------------------------------------------------------
+
+    def _refresh_in_background(self) -> None:
+        with self._background_lock:
+            if self._background_in_flight or time.time() < self._next_background_attempt:
+                return
+            self._background_in_flight = True
+
+        def _run():
+            failed = False
+            try:
+                with self._lock:
+                    if self._expires_at - time.time() >= self.refresh_margin:
+                        return  # someone else already refreshed
+                    self._metrics["background_refreshes"] += 1
+                    self._refresh_single_flight()
+            except Exception as e:
+                failed = True
+                logger.warning(f"Background Zoho token refresh failed: {e}")
+            finally:
+                with self._background_lock:
+                    if failed:
+                        self._background_failures += 1
+                        delay = min(
+                            ZOHO_TOKEN_RETRY_SECONDS * 2 ** (self._background_failures - 1),
+                            ZOHO_TOKEN_RETRY_MAX_SECONDS,
+                        )
+                        self._next_background_attempt = time.time() + delay
+                    else:
+                        self._background_failures = 0
+                        self._next_background_attempt = 0.0
+                    self._background_in_flight = False
+
+        threading.Thread(target=_run, name="zoho-token-refresh", daemon=True).start()
+
+    def _refresh_single_flight(self) -> str:
+        """Refresh under the Redis lock; called with self._lock held."""
+        redis_client = get_redis_client()
+        lock_value = str(uuid.uuid4())
+        have_lock = False
+        if redis_client:
+            try:
+                have_lock = bool(redis_client.set(_REDIS_LOCK_KEY, lock_value, nx=True, px=_REDIS_LOCK_TTL_MS))
+                if not have_lock:
+                    # Another worker is refreshing; wait for it to publish
+                    deadline = time.time() + _LOCK_WAIT_SECONDS
+                    while time.time() < deadline:
+                        time.sleep(0.2)
+                        shared = self._load_shared_token(min_ttl=self.refresh_margin)
+                        if shared:
+                            return shared
+                    logger.warning("Timed out waiting for another worker's Zoho token refresh; refreshing here")
+            except Exception as e:
+                logger.warning(f"Redis unavailable for Zoho refresh lock: {e}")
         try:
-            body = resp.text
+            token, expires_in = self._request_token()
+            self._store(token, time.time() + expires_in - _EXPIRY_SAFETY_SECONDS, publish=True)
+            return token
+        finally:
+            if have_lock:
+                try:
+                    if redis_client.get(_REDIS_LOCK_KEY) == lock_value:
+                        redis_client.delete(_REDIS_LOCK_KEY)
+                except Exception:
+                    pass
+
+    def _request_token(self):
+        # Basic validation of required env vars
+        missing = [
+            name for name, val in [
+                ("ZOHO_CLIENT_ID", ZOHO_CLIENT_ID),
+                ("ZOHO_CLIENT_SECRET", ZOHO_CLIENT_SECRET),
+                ("ZOHO_REFRESH_TOKEN", ZOHO_REFRESH_TOKEN),
+            ] if not val
+        ]
+        if missing:
+            raise RuntimeError(f"Missing Zoho OAuth env vars: {', '.join(missing)}")
+
+        params = {
+            "refresh_token": ZOHO_REFRESH_TOKEN,
+            "client_id": ZOHO_CLIENT_ID,
+            "client_secret": ZOHO_CLIENT_SECRET,
+            "grant_type": "refresh_token",
+        }
+
+        started = time.perf_counter()
+        try:
+            resp = requests.post(ZOHO_TOKEN_URL, params=params, timeout=30)
         except Exception:
-            body = "<unavailable>"
-        raise RuntimeError(f"Zoho token refresh failed: {resp.status_code} {body}")
-
-    try:
-        data = resp.json()
-    except Exception:
-        raise RuntimeError("Zoho token refresh returned non-JSON body")
-
-    token = data.get("access_token")
-    if not token:
-        raise RuntimeError(f"Zoho token refresh response missing access_token: {data}")
-    return token
+            self._metrics["refresh_failures"] += 1
+            raise
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        # Handle HTTP errors explicitly
+        if resp.status_code != 200:
+            self._metrics["refresh_failures"] += 1
+            try:
+                body = resp.text
+            except Exception:
+                body = "<unavailable>"
+            raise RuntimeError(f"Zoho token refresh failed: {resp.status_code} {body}")
+
+        try:
+            data = resp.json()
+        except Exception:
+            self._metrics["refresh_failures"] += 1
+            raise RuntimeError("Zoho token refresh returned non-JSON body")
+
+        token = data.get("access_token")
+        if not token:
+            self._metrics["refresh_failures"] += 1
+            raise RuntimeError(f"Zoho token refresh response missing access_token: {data}")
+
+        self._metrics["refreshes"] += 1
+        self._metrics["last_refresh_ms"] = round(elapsed_ms, 1)
+        self._metrics["total_refresh_ms"] += elapsed_ms
+        logger.info(f"🔄 Zoho access token refreshed in {elapsed_ms:.0f}ms")
+        return token, int(data.get("expires_in") or 3600)
+
+    # ---- caches --------------------------------------------------------
+
+    def _store(self, token: str, expires_at: float, publish: bool = False) -> None:
+        self._token, self._expires_at = token, expires_at
+        if not publish:
+            return
+        redis_client = get_redis_client()
+        if redis_client:
+            try:
+                ttl = int(expires_at - time.time())
+                if ttl > 0:
+                    redis_client.set(_REDIS_TOKEN_KEY, json.dumps({"token": token, "expires_at": expires_at}), ex=ttl)
+            except Exception as e:
+                logger.warning(f"Could not share Zoho token via Redis: {e}")
+
+    def _load_shared_token(self, min_ttl: int = 0) -> Optional[str]:
+        redis_client = get_redis_client()
+        if not redis_client:
+            return None
+        try:
+            raw = redis_client.get(_REDIS_TOKEN_KEY)
+            if not raw:
+                return None
+            data = json.loads(raw)
+            if data["expires_at"] - time.time() <= min_ttl:
+                return None
+            self._store(data["token"], float(data["expires_at"]))
+            return data["token"]
+        except Exception:
+            return None
+
+    def _drop_shared_token(self, stale_token: Optional[str]) -> None:
+        redis_client = get_redis_client()
+        if not redis_client:
+            return
+        try:
+            raw = redis_client.get(_REDIS_TOKEN_KEY)
+            if raw and (stale_token is None or json.loads(raw).get("token") == stale_token):
+                redis_client.delete(_REDIS_TOKEN_KEY)
+        except Exception:
+            pass
+
+
+zoho_token_manager = ZohoTokenManager()
+
+
+def get_valid_access_token(force_refresh: bool = False, stale_token: Optional[str] = None) -> str:
+    """Return a valid Zoho OAuth access_token, raising a clear error if refresh fails."""
+    return zoho_token_manager.get_token(force_refresh=force_refresh, stale_token=stale_token)